@@ -4,6 +4,8 @@ from django.core.validators import URLValidator,FileExtensionValidator
 from django.conf import settings  
 from django.core.exceptions import ObjectDoesNotExist
 
+from myproject.thumbnails import thumbnail_url
+
 # Create your models here.
 class Company(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -66,6 +68,12 @@ class Company(models.Model):
             # In case of any database-related issue, return a fallback logo
             return '/static/images/default-company-logo.png'
 
+    def get_logo(self):
+        """Returns a small copy of the uploaded logo, or the external logo URL."""
+        if self.logo:
+            return thumbnail_url(self.logo, 'thumb')
+        return self.logo_url or None
+
 
 class Branch(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="branches")
@@ -124,4 +132,10 @@ class CompanyProfile(models.Model):
             return self.profile_picture.url
         elif self.picture_url:
             return self.picture_url
-        return None
\ No newline at end of file
+        return None
+
+    def get_picture_thumbnail(self):
+        """Returns a small copy of the uploaded picture, or the external URL."""
+        if self.profile_picture:
+            return thumbnail_url(self.profile_picture, 'thumb')
+        return self.picture_url or None
\ No newline at end of file
@@ -0,0 +1,14 @@
+# Picked up automatically by `gunicorn myproject.wsgi` (see Procfile) when run
+# from the project root. Only hooks live here; workers, timeouts etc. keep
+# gunicorn's defaults or come from GUNICORN_CMD_ARGS.
+
+
+def post_worker_init(worker):
+    # The Django app is loaded at this point: warm the worker before it accepts
+    # its first request instead of making that request pay for it.
+    from django.conf import settings
+
+    if settings.WARMUP_ON_BOOT:
+        from uniworlderp.warmup import warmup
+
+        warmup()
@@ -107,8 +107,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'uniworlderp.db_routing.PrimaryAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'uniworlderp.nplusone.NPlusOneMiddleware',
     # 'allauth.account.middleware.AccountMiddleware', 
 
 ]
@@ -140,9 +142,147 @@ WSGI_APPLICATION = 'myproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+
+# Persistent connections: keep a connection open for DB_CONN_MAX_AGE seconds
+# instead of reconnecting on every request (0 = close after each request).
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
+# PostgreSQL only. DB_POOL uses Django 5.1's built-in psycopg (v3) pool, it
+# needs `psycopg[pool]` installed and always runs with CONN_MAX_AGE = 0.
+# DB_PGBOUNCER is for a pgbouncer in transaction pooling mode.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)
+DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+
+# SQLite only, applied by uniworlderp.signals when a connection is opened
+SQLITE_JOURNAL_MODE = config('SQLITE_JOURNAL_MODE', default='WAL')
+SQLITE_SYNCHRONOUS = config('SQLITE_SYNCHRONOUS', default='NORMAL')
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int)  # milliseconds
+
 DATABASES = {
-    'default': config('DATABASE_URL', default='sqlite:///db.sqlite3', cast=db_url),
+    'default': db_url(
+        config('DATABASE_URL', default='sqlite:///db.sqlite3'),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    ),
+}
+
+# Read replica for the reports, exports, dashboard and detailed lists (see
+# uniworlderp/db_routing.py); unset, every query goes to DATABASE_URL.
+# A session that writes reads from the primary for REPLICA_STICKY_SECONDS.
+REPORTING_DATABASE_URL = config('REPORTING_DATABASE_URL', default='')
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+
+if REPORTING_DATABASE_URL:
+    DATABASES['reporting'] = db_url(
+        REPORTING_DATABASE_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        test_options={'MIRROR': 'default'},
+    )
+    DATABASE_ROUTERS = ['uniworlderp.db_routing.ReportingRouter']
+
+for database in DATABASES.values():
+    if database['ENGINE'] != 'django.db.backends.postgresql':
+        continue
+    if DB_POOL:
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    elif DB_PGBOUNCER:
+        # Server-side cursors do not survive transaction pooling
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+
+# Cache
+# CACHE_BACKEND is one of locmem (default), file or redis. Redis needs the
+# `redis` package and CACHE_LOCATION=redis://host:6379/1.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
 }
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'uniworlderp',
+    'file': os.path.join(BASE_DIR, 'tmp', 'django_cache'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default=CACHE_DEFAULT_LOCATIONS.get(CACHE_BACKEND, '')),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': 'uniworlderp',
+    }
+}
+
+# Largest batch accepted by the sales-order import endpoint
+SALES_ORDER_IMPORT_MAX_ORDERS = config('SALES_ORDER_IMPORT_MAX_ORDERS', default=5000, cast=int)
+# Largest request body of that endpoint, in bytes; it bypasses DATA_UPLOAD_MAX_MEMORY_SIZE
+SALES_ORDER_IMPORT_MAX_BYTES = config('SALES_ORDER_IMPORT_MAX_BYTES', default=20 * 1024 * 1024, cast=int)
+
+# Most documents rendered by one batch print request
+PRINT_BATCH_MAX_DOCUMENTS = config('PRINT_BATCH_MAX_DOCUMENTS', default=500, cast=int)
+
+# Threads (and so extra DB connections per process) that run the independent
+# queries of the async dashboard/report views concurrently; 1 runs them in turn
+ASYNC_QUERY_CONCURRENCY = config('ASYNC_QUERY_CONCURRENCY', default=4, cast=int)
+
+# Resolve URLs, compile templates and connect to the database in each gunicorn
+# worker right after it boots (see gunicorn.conf.py and uniworlderp/warmup.py)
+WARMUP_ON_BOOT = config('WARMUP_ON_BOOT', default=False, cast=bool)
+
+# Counter rows per product when `stock_shards --enable` shards its stock
+# (uniworlderp/stock_counters.py)
+STOCK_COUNTER_SHARDS = config('STOCK_COUNTER_SHARDS', default=8, cast=int)
+
+# Log the queries each request repeats per row (N+1) with the template line
+# and code that ran them (uniworlderp/nplusone.py); for the development server
+NPLUSONE_WARNINGS = config('NPLUSONE_WARNINGS', default=False, cast=bool)
+
+# Change feed for downstream sync (uniworlderp/change_log.py): changes are served
+# once CHANGE_FEED_SETTLE_SECONDS old, so their transaction has committed, and
+# `change_feed --compact` drops those older than CHANGE_LOG_RETENTION_DAYS
+CHANGE_FEED_SETTLE_SECONDS = config('CHANGE_FEED_SETTLE_SECONDS', default=5, cast=int)
+CHANGE_LOG_RETENTION_DAYS = config('CHANGE_LOG_RETENTION_DAYS', default=30, cast=int)
+
+# Read API (uniworlderp/read_api.py): rows per page unless ?limit= asks for
+# another size, up to READ_API_MAX_PAGE_SIZE
+READ_API_PAGE_SIZE = config('READ_API_PAGE_SIZE', default=500, cast=int)
+READ_API_MAX_PAGE_SIZE = config('READ_API_MAX_PAGE_SIZE', default=10000, cast=int)
+
+# Part of the ETag of the document and past report pages (uniworlderp/conditional_get.py);
+# bump it on deploys that change their templates so browsers fetch them again
+HTTP_CACHE_VERSION = config('HTTP_CACHE_VERSION', default='1')
+
+# Reorder suggestions (uniworlderp/reorder.py, `python manage.py suggest_reorders`):
+# days of OUT / RET history the demand is measured over, supplier lead time in
+# days, days of demand an order should cover and the safety stock z-score
+# (1.65 is about a 95% service level)
+REORDER_HISTORY_DAYS = config('REORDER_HISTORY_DAYS', default=90, cast=int)
+REORDER_LEAD_TIME_DAYS = config('REORDER_LEAD_TIME_DAYS', default=7, cast=int)
+REORDER_COVER_DAYS = config('REORDER_COVER_DAYS', default=30, cast=int)
+REORDER_SERVICE_LEVEL_Z = config('REORDER_SERVICE_LEVEL_Z', default=1.65, cast=float)
+
+# ABC classes (uniworlderp/abc_analysis.py, `python manage.py classify_abc`):
+# days of sales ranked, and the cumulative share of the total closing the A
+# and the B class (the rest is C)
+ABC_HISTORY_DAYS = config('ABC_HISTORY_DAYS', default=365, cast=int)
+ABC_CLASS_A_SHARE = config('ABC_CLASS_A_SHARE', default=0.80, cast=float)
+ABC_CLASS_B_SHARE = config('ABC_CLASS_B_SHARE', default=0.95, cast=float)
+
+# Hot-path benchmark (uniworlderp/benchmarks.py, `python manage.py benchmark_hot_paths`):
+# the JSON baseline runs are compared with, and the relative p50 latency /
+# peak memory increase flagged as a regression (any extra query is one)
+BENCHMARK_BASELINE = config('BENCHMARK_BASELINE', default=os.path.join(BASE_DIR, 'benchmark_baseline.json'))
+BENCHMARK_TOLERANCE = config('BENCHMARK_TOLERANCE', default=0.25, cast=float)
 
 
 # DATABASES = {
@@ -198,8 +338,23 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # Where `collectstatic` com
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
 # Whitenoise এর সাথে Gzip এবং Brotli কম্প্রেশন এনাবল করুন
-WHITENOISE_USE_FINDERS = True
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+# STATIC_MANIFEST=True (production): collectstatic writes content-hashed copies
+# plus .gz / .br variants and a manifest; WhiteNoise serves the hashed files with
+# far-future immutable headers and never searches the finders at runtime.
+# Check the {% static %} references with `manage.py check --deploy`.
+STATIC_MANIFEST = config('STATIC_MANIFEST', default=False, cast=bool)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+WHITENOISE_USE_FINDERS = not STATIC_MANIFEST
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
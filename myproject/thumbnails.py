@@ -0,0 +1,186 @@
+"""
+Resized, recompressed derivatives of uploaded images.
+
+Product images, employee / profile pictures and company logos are uploaded
+at whatever size the user had; list and print pages only need a few dozen
+pixels. ``thumbnail_url(field_file, 'thumb')`` returns the URL of a
+derivative that fits the named size, generating it with Pillow on first use.
+
+Derivatives live in the default storage under
+``thumbnails/<size>/<hash>.<ext>``, where the hash covers the source's name
+and bytes and the size spec: a new upload or a changed spec gets a new name,
+and the files can be served with a far-future expiry. The source name ->
+derivative name mapping is kept in the cache so a page render does not
+re-read the source. Derivatives are also made when an image is uploaded, and
+those of the image it replaces are deleted (see uniworlderp/signals.py); they
+can be backfilled with ``python manage.py generate_thumbnails``.
+
+It sits in the project package rather than an app because images of both
+the ``company`` and the ``uniworlderp`` apps use it, and ``company`` must
+not depend on ``uniworlderp``.
+"""
+
+import hashlib
+import logging
+from io import BytesIO
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height, JPEG quality)
+SIZES = {
+    'thumb': (100, 100, 80),    # list rows, avatars, invoice lines (40-50 px at 2x)
+    'small': (300, 300, 82),
+    'medium': (800, 800, 85),
+}
+
+# (app_label.Model, image field, sizes made on upload / backfill)
+IMAGE_FIELDS = [
+    ('uniworlderp.Product', 'image', ('thumb', 'small')),
+    ('uniworlderp.SalesEmployee', 'profile_picture', ('thumb',)),
+    ('company.CompanyProfile', 'profile_picture', ('thumb',)),
+    ('company.Company', 'logo', ('thumb', 'small')),
+]
+
+ROOT = 'thumbnails'
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+FAILURE_TIMEOUT = 60 * 5
+# Bump to regenerate every derivative after changing the encoder settings
+VERSION = 1
+
+
+def image_fields():
+    """``(model, field name, sizes)`` of every image field that gets derivatives."""
+    return [(apps.get_model(label), field, sizes) for label, field, sizes in IMAGE_FIELDS]
+
+
+def _cache_key(name, size):
+    return f'thumbnail:{VERSION}:{size}:{name}'
+
+
+def derivative_name(source_name, content, size):
+    """Hash naming the ``size`` derivative of the image ``source_name`` with bytes ``content``."""
+    width, height, quality = SIZES[size]
+    digest = hashlib.sha256(content)
+    # Per source, so that deleting the derivatives of a replaced image never
+    # takes those of an identical upload with them
+    digest.update(f'{VERSION}:{source_name}:{width}x{height}q{quality}'.encode())
+    return digest.hexdigest()[:32]
+
+
+def _render(content, size):
+    """Resize ``content`` to fit ``size``; returns ``(bytes, extension)``."""
+    # Pillow is imported on first use: this module loads with the models in every worker
+    from PIL import Image, ImageOps
+
+    width, height, quality = SIZES[size]
+    with Image.open(BytesIO(content)) as image:
+        image.seek(0)  # first frame of an animated GIF
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+        out = BytesIO()
+        if has_alpha:
+            # 256-colour palette: logos and icons, where a truecolour PNG is several times larger
+            image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+            image.save(out, 'PNG', optimize=True)
+            return out.getvalue(), 'png'
+        image.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+        return out.getvalue(), 'jpg'
+
+
+def generate(field_file, size, force=False):
+    """
+    Make sure the ``size`` derivative of ``field_file`` exists and return its
+    storage name. Raises ``OSError`` (including Pillow's
+    ``UnidentifiedImageError``) or ``Image.DecompressionBombError`` for
+    missing or unreadable sources.
+    """
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        content = source.read()
+    digest = derivative_name(field_file.name, content, size)
+
+    if not force:
+        for extension in ('jpg', 'png'):
+            name = f'{ROOT}/{size}/{digest}.{extension}'
+            if default_storage.exists(name):
+                cache.set(_cache_key(field_file.name, size), name, CACHE_TIMEOUT)
+                return name
+
+    data, extension = _render(content, size)
+    name = f'{ROOT}/{size}/{digest}.{extension}'
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    saved = default_storage.save(name, ContentFile(data))
+    cache.set(_cache_key(field_file.name, size), saved, CACHE_TIMEOUT)
+    return saved
+
+
+def thumbnail_url(field_file, size='thumb'):
+    """
+    URL of the ``size`` derivative of ``field_file``, generated on first use.
+    Falls back to the original URL if the source cannot be read, and to ``''``
+    for an empty field.
+    """
+    if not field_file:
+        return ''
+    if size not in SIZES:
+        raise ValueError(f'Unknown thumbnail size "{size}", expected one of {", ".join(SIZES)}')
+
+    key = _cache_key(field_file.name, size)
+    name = cache.get(key)
+    if name is None:
+        from PIL import Image
+
+        try:
+            name = generate(field_file, size)
+        except (OSError, Image.DecompressionBombError) as e:
+            logger.warning('Cannot make the %s thumbnail of %s: %s', size, field_file.name, e)
+            # Remember the failure for a while instead of retrying on every render
+            name = ''
+            cache.set(key, name, FAILURE_TIMEOUT)
+    if not name:
+        return field_file.url
+    return default_storage.url(name)
+
+
+def generate_for_instance(instance, field, sizes, force=False):
+    """Make every derivative of one image field; returns the number written or found."""
+    field_file = getattr(instance, field)
+    if not field_file:
+        return 0
+    for size in sizes:
+        generate(field_file, size, force=force)
+    return len(sizes)
+
+
+def delete_derivatives(storage, name, sizes):
+    """
+    Delete the ``sizes`` derivatives of the image stored as ``name`` in
+    ``storage`` (one that was replaced); returns the number deleted.
+    """
+    names = {cache.get(_cache_key(name, size)) for size in sizes} - {None, ''}
+    try:
+        with storage.open(name, 'rb') as source:
+            content = source.read()
+    except OSError:
+        content = None
+    if content is not None:
+        names.update(
+            f'{ROOT}/{size}/{derivative_name(name, content, size)}.{extension}'
+            for size in sizes for extension in ('jpg', 'png')
+        )
+    deleted = 0
+    for derivative in names:
+        if default_storage.exists(derivative):
+            default_storage.delete(derivative)
+            deleted += 1
+    cache.delete_many([_cache_key(name, size) for size in sizes])
+    return deleted
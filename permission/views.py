@@ -515,14 +515,17 @@ from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 from django.core.serializers.json import DjangoJSONEncoder
+from uniworlderp.db_routing import reporting_view
 import json
 import logging
 
 from django.contrib.auth.models import User
 from uniworlderp.models import (
-    CustomerVendor, SalesEmployee, Product, SalesOrder, SalesOrderItem,
+    CustomerVendor, Product, SalesOrder, SalesOrderItem,
     PurchaseOrder, ARInvoice, StockTransaction
 )
+from uniworlderp import sales_performance, stock_counters
+from uniworlderp.views.async_support import arender, run_queries
 
 logger = logging.getLogger(__name__)
 
@@ -532,7 +535,7 @@ class ProductEncoder(DjangoJSONEncoder):
             return {
                 'id': str(obj.id),
                 'name': obj.name,
-                'stock_quantity': obj.stock_quantity,
+                'stock_quantity': obj.available_stock,
                 'price': float(obj.price) if obj.price is not None else None,
                 'category': obj.category,
                 'revenue': float(obj.revenue) if hasattr(obj, 'revenue') and obj.revenue is not None else None,
@@ -554,103 +557,103 @@ class ChartJSONEncoder(DjangoJSONEncoder):
         return super().default(obj)
 
 @login_required
-def dashboard_view(request):
+@reporting_view
+async def dashboard_view(request):
     context = {}
     try:
-        user = request.user
+        user = await request.auser()
         current_date = timezone.now()
         start_of_month = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         thirty_days_ago = current_date - timedelta(days=30)
         seven_days_ago = current_date - timedelta(days=7)
         start_of_year = current_date.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
 
-        # User counts
+        # Every figure below is independent of the others: run them concurrently
+        context.update(await run_queries(
+            # User counts
+            total_users=User.objects.count,
+            total_customers=CustomerVendor.objects.filter(entity_type='customer').count,
+            total_vendors=CustomerVendor.objects.filter(entity_type='vendor').count,
+            new_customers=CustomerVendor.objects.filter(entity_type='customer', created_at__gte=thirty_days_ago).count,
+
+            # Sales employee leaderboard of this month
+            sales_employees=sales_performance.leaderboard,
+
+            # Product data
+            total_products=Product.objects.count,
+            low_stock_products=Product.objects.alias(on_hand=stock_counters.on_hand()).filter(on_hand__lte=F('reorder_level')).count,
+            out_of_stock_products=Product.objects.alias(on_hand=stock_counters.on_hand()).filter(on_hand=0).count,
+
+            # Sales Order data
+            total_sales_orders=SalesOrder.objects.count,
+            recent_sales_orders=lambda: list(SalesOrder.objects.select_related('customer').order_by('-order_date')[:10]),
+            current_month_sales=lambda: SalesOrder.objects.filter(order_date__gte=start_of_month).aggregate(
+                total_value=Sum('total_amount')
+            )['total_value'] or 0,
+
+            # Top selling products
+            top_selling_products=lambda: list(Product.objects.annotate(
+                total_sold=Sum('salesorderitem__quantity')
+            ).order_by('-total_sold')[:5]),
+
+            # Purchase Order data
+            total_purchase_orders=PurchaseOrder.objects.count,
+            current_month_purchases=lambda: PurchaseOrder.objects.filter(order_date__gte=start_of_month).aggregate(
+                total_value=Sum('total_amount')
+            )['total_value'] or 0,
+
+            # AR Invoice data
+            total_ar_invoices=ARInvoice.objects.count,
+            pending_invoices=ARInvoice.objects.filter(payment_status='P').count,
+            overdue_invoices=ARInvoice.objects.filter(due_date__lt=current_date, payment_status='P').count,
+
+            # Stock Transaction data
+            recent_stock_transactions=lambda: list(
+                StockTransaction.objects.select_related('product').order_by('-transaction_date')[:10]
+            ),
+
+            # Monthly Sales Data (Line Chart)
+            monthly_sales=lambda: json.dumps(list(SalesOrder.objects.filter(
+                order_date__gte=start_of_year
+            ).annotate(
+                month=TruncMonth('order_date')
+            ).values('month').annotate(
+                total_sales=Sum('total_amount')
+            ).order_by('month')), cls=ChartJSONEncoder),
+
+            # Revenue Breakdown (Bar Chart)
+            revenue_breakdown=lambda: json.dumps(list(Product.objects.annotate(
+                revenue=Sum(F('salesorderitem__quantity') * F('salesorderitem__unit_price'))
+            ).order_by('-revenue')[:5]), cls=ChartJSONEncoder),
+
+            # Top Sales Categories (Pie Chart)
+            top_categories=lambda: json.dumps(list(Product.objects.values('category').annotate(
+                total_sales=Sum(F('salesorderitem__quantity') * F('salesorderitem__unit_price'))
+            ).order_by('-total_sales')[:5]), cls=ChartJSONEncoder),
+
+            # Sales Trend (Last 7 Days)
+            sales_trend=lambda: json.dumps(list(SalesOrder.objects.filter(
+                order_date__gte=seven_days_ago
+            ).annotate(
+                date=F('order_date')  # already a date; TruncDate of a DateField fails on SQLite
+            ).values('date').annotate(
+                daily_sales=Sum('total_amount')
+            ).order_by('date')), cls=ChartJSONEncoder),
+
+            # Additional metrics
+            average_order_value=lambda: SalesOrder.objects.filter(order_date__gte=thirty_days_ago).aggregate(
+                avg_value=Avg('total_amount')
+            )['avg_value'] or 0,
+
+            customer_retention_rate=lambda: calculate_customer_retention_rate(thirty_days_ago),
+
+            top_customers=lambda: list(CustomerVendor.objects.filter(entity_type='customer').annotate(
+                total_purchases=Sum('sales_orders__total_amount')
+            ).order_by('-total_purchases')[:5]),
+
+            inventory_turnover=lambda: calculate_inventory_turnover(thirty_days_ago),
+        ))
         context['user'] = user
-        context['total_users'] = User.objects.count()
-        context['total_customers'] = CustomerVendor.objects.filter(entity_type='customer').count()
-        context['total_vendors'] = CustomerVendor.objects.filter(entity_type='vendor').count()
-        context['new_customers'] = CustomerVendor.objects.filter(entity_type='customer', created_at__gte=thirty_days_ago).count()
-
-        # Sales Employee data
-        context['sales_employees'] = SalesEmployee.objects.annotate(
-            achievement_percentage=F('sales_achieved') / F('sales_target') * 100
-        ).order_by('-achievement_percentage')[:5]
-
-        # Product data
-        context['total_products'] = Product.objects.count()
-        context['low_stock_products'] = Product.objects.filter(stock_quantity__lte=F('reorder_level')).count()
-        context['out_of_stock_products'] = Product.objects.filter(stock_quantity=0).count()
-
-        # Sales Order data
-        context['total_sales_orders'] = SalesOrder.objects.count()
-        context['recent_sales_orders'] = SalesOrder.objects.select_related('customer').order_by('-order_date')[:10]
-        context['current_month_sales'] = SalesOrder.objects.filter(order_date__gte=start_of_month).aggregate(
-            total_value=Sum('total_amount')
-        )['total_value'] or 0
-
-        # Top selling products
-        context['top_selling_products'] = Product.objects.annotate(
-            total_sold=Sum('salesorderitem__quantity')
-        ).order_by('-total_sold')[:5]
-
-        # Purchase Order data
-        context['total_purchase_orders'] = PurchaseOrder.objects.count()
-        context['current_month_purchases'] = PurchaseOrder.objects.filter(order_date__gte=start_of_month).aggregate(
-            total_value=Sum('total_amount')
-        )['total_value'] or 0
-
-        # AR Invoice data
-        context['total_ar_invoices'] = ARInvoice.objects.count()
-        context['pending_invoices'] = ARInvoice.objects.filter(payment_status='P').count()
-        context['overdue_invoices'] = ARInvoice.objects.filter(due_date__lt=current_date, payment_status='P').count()
-
-        # Stock Transaction data
-        context['recent_stock_transactions'] = StockTransaction.objects.select_related('product').order_by('-transaction_date')[:10]
-
-        # Monthly Sales Data (Line Chart)
-        monthly_sales = list(SalesOrder.objects.filter(
-            order_date__gte=start_of_year
-        ).annotate(
-            month=TruncMonth('order_date')
-        ).values('month').annotate(
-            total_sales=Sum('total_amount')
-        ).order_by('month'))
-        context['monthly_sales'] = json.dumps(monthly_sales, cls=ChartJSONEncoder)
-
-        # Revenue Breakdown (Bar Chart)
-        revenue_breakdown = list(Product.objects.annotate(
-            revenue=Sum(F('salesorderitem__quantity') * F('salesorderitem__unit_price'))
-        ).order_by('-revenue')[:5])
-        context['revenue_breakdown'] = json.dumps(revenue_breakdown, cls=ChartJSONEncoder)
-
-        # Top Sales Categories (Pie Chart)
-        top_categories = list(Product.objects.values('category').annotate(
-            total_sales=Sum(F('salesorderitem__quantity') * F('salesorderitem__unit_price'))
-        ).order_by('-total_sales')[:5])
-        context['top_categories'] = json.dumps(top_categories, cls=ChartJSONEncoder)
-
-        # Sales Trend (Last 7 Days)
-        sales_trend = list(SalesOrder.objects.filter(
-            order_date__gte=seven_days_ago
-        ).annotate(
-            date=TruncDate('order_date')
-        ).values('date').annotate(
-            daily_sales=Sum('total_amount')
-        ).order_by('date'))
-        context['sales_trend'] = json.dumps(sales_trend, cls=ChartJSONEncoder)
-
-        # Additional metrics
-        context['average_order_value'] = SalesOrder.objects.filter(order_date__gte=thirty_days_ago).aggregate(
-            avg_value=Avg('total_amount')
-        )['avg_value'] or 0
-
-        context['customer_retention_rate'] = calculate_customer_retention_rate(thirty_days_ago)
-
-        context['top_customers'] = CustomerVendor.objects.filter(entity_type='customer').annotate(
-            total_purchases=Sum('sales_orders__total_amount')
-        ).order_by('-total_purchases')[:5]
-
-        context['inventory_turnover'] = calculate_inventory_turnover(thirty_days_ago)
 
     except OperationalError as e:
         logger.error(f"OperationalError in dashboard_view: {str(e)}")
@@ -659,7 +662,7 @@ def dashboard_view(request):
         logger.error(f"Unexpected error in dashboard_view: {str(e)}")
         context['error'] = "An unexpected error occurred. Please try again later."
 
-    return render(request, 'auth/dashboard.html', context)
+    return await arender(request, 'auth/dashboard.html', context)
 
 def calculate_customer_retention_rate(start_date):
     total_customers = CustomerVendor.objects.filter(entity_type='customer', created_at__lt=start_date).count()
@@ -0,0 +1,166 @@
+"""
+ABC (Pareto) classes of the products and customers.
+
+``classify()`` ranks, over the sales orders of the last ``ABC_HISTORY_DAYS``:
+
+- the active products by net revenue (line totals less the amount returned
+  against them) and by movement (number of sales lines),
+- the customers by net sales, on the same lines.
+
+Each ranking sorts the values in descending order and walks the cumulative
+share of the total: an entry is A while the share before it is below
+``ABC_CLASS_A_SHARE``, B while it is below ``ABC_CLASS_B_SHARE`` and C after
+that; entries without sales are always C.
+
+All three rankings come from one grouped query over ``SalesOrderItem`` (per
+product and customer), spread per product and per customer and then ranked
+for the whole catalogue at once. The results replace the
+``ProductClassification`` and ``CustomerClassification`` rows, whose class
+indexes the product list, the customer list and the stock report filter and
+sort on. ``python manage.py classify_abc`` runs it, nightly from cron.
+"""
+
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.utils import timezone
+
+from uniworlderp.models import (
+    CustomerClassification, CustomerVendor, Product, ProductClassification, SalesOrderItem,
+)
+
+
+BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class Policy:
+    history_days: int
+    a_share: float
+    b_share: float
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        values = {
+            'history_days': settings.ABC_HISTORY_DAYS,
+            'a_share': settings.ABC_CLASS_A_SHARE,
+            'b_share': settings.ABC_CLASS_B_SHARE,
+        }
+        values.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(**values)
+
+
+def sales_lines(history_days):
+    """``[(product_id, customer_id, net amount, lines)]`` of the sales orders of the last ``history_days``."""
+    start = timezone.localdate() - datetime.timedelta(days=history_days)
+    return list(
+        SalesOrderItem.objects
+        .filter(sales_order__order_date__gte=start)
+        .values_list('product_id', 'sales_order__customer_id')
+        .annotate(
+            net=Sum(F('total') - F('returned_amount'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            lines=Count('pk'),
+        )
+        .order_by()
+    )
+
+
+def rank(values, policy):
+    """The ABC class of each of ``values``, in the same order."""
+    total = sum(values)
+    classes = ['C'] * len(values)
+    if total <= 0:
+        return classes
+    running = 0.0
+    for i in sorted(range(len(values)), key=lambda i: -values[i]):
+        if values[i] <= 0:
+            break
+        share_before = running / total
+        if share_before < policy.a_share:
+            classes[i] = 'A'
+        elif share_before < policy.b_share:
+            classes[i] = 'B'
+        running += values[i]
+    return classes
+
+
+def _spread(rows, index, position, value):
+    """Sum the ``value`` column of ``rows`` per entry of ``index``, keyed on the ``position`` column."""
+    totals = [0.0] * len(index)
+    for row in rows:
+        i = index.get(row[position])
+        if i is not None:
+            totals[i] += float(row[value])
+    return totals
+
+
+def _amount(value):
+    return Decimal(f'{max(value, 0):.2f}')
+
+
+def classify(policy=None, dry_run=False):
+    """
+    Rank the active products and the customers and, unless ``dry_run``,
+    replace the classification rows with the results; returns the (unsaved
+    when ``dry_run``) ``(product classifications, customer classifications)``.
+    """
+    policy = policy or Policy.from_settings()
+    if policy.history_days < 1:
+        raise ValueError('The ranked period must cover at least one day')
+    if not 0 < policy.a_share <= policy.b_share <= 1:
+        raise ValueError('The class shares must satisfy 0 < A <= B <= 1')
+
+    product_ids = list(Product.objects.filter(is_active=True).order_by().values_list('pk', flat=True))
+    customer_ids = list(CustomerVendor.objects.filter(entity_type='customer').order_by().values_list('pk', flat=True))
+    rows = sales_lines(policy.history_days)
+
+    product_index = {pk: i for i, pk in enumerate(product_ids)}
+    revenue = _spread(rows, product_index, 0, 2)
+    movements = _spread(rows, product_index, 0, 3)
+    net_sales = _spread(rows, {pk: i for i, pk in enumerate(customer_ids)}, 1, 2)
+
+    now = timezone.now()
+    products = [
+        ProductClassification(
+            product_id=pk,
+            revenue=_amount(amount),
+            revenue_class=revenue_class,
+            movement_count=int(count),
+            movement_class=movement_class,
+            computed_at=now,
+        )
+        for pk, amount, revenue_class, count, movement_class in zip(
+            product_ids, revenue, rank(revenue, policy), movements, rank(movements, policy),
+        )
+    ]
+    customers = [
+        CustomerClassification(customer_id=pk, net_sales=_amount(amount), sales_class=sales_class, computed_at=now)
+        for pk, amount, sales_class in zip(customer_ids, net_sales, rank(net_sales, policy))
+    ]
+    if dry_run:
+        return products, customers
+
+    with transaction.atomic():
+        ProductClassification.objects.exclude(product_id__in=Product.objects.filter(is_active=True).values('pk')).delete()
+        ProductClassification.objects.bulk_create(
+            products,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['revenue', 'revenue_class', 'movement_count', 'movement_class', 'computed_at'],
+        )
+        CustomerClassification.objects.exclude(
+            customer_id__in=CustomerVendor.objects.filter(entity_type='customer').values('pk')
+        ).delete()
+        CustomerClassification.objects.bulk_create(
+            customers,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=['net_sales', 'sales_class', 'computed_at'],
+        )
+    return products, customers
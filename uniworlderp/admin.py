@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import stock_counters
 from .models import (
     CustomerVendor, CustomerVendorAttachment, SalesEmployee, Product,
     SalesOrder, SalesOrderItem, PurchaseOrder, PurchaseOrderItem,
@@ -24,8 +25,23 @@ class SalesEmployeeAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'stock_quantity', 'price', 'created_at')
-    list_filter = ('created_at',)
+    list_filter = ('created_at', 'sharded_stock')
     search_fields = ('name', 'description')
+    # Only enable() / disable() may flip it: they move the stock in and out of the shards
+    readonly_fields = ('sharded_stock',)
+    actions = ['enable_sharded_stock', 'disable_sharded_stock']
+
+    @admin.action(description='Shard the stock of the selected products', permissions=['change'])
+    def enable_sharded_stock(self, request, queryset):
+        for product in queryset:
+            stock_counters.enable(product)
+        self.message_user(request, f'Sharded the stock of {len(queryset)} product(s).')
+
+    @admin.action(description='Fold the shards of the selected products back into stock_quantity', permissions=['change'])
+    def disable_sharded_stock(self, request, queryset):
+        for product in queryset:
+            stock_counters.disable(product)
+        self.message_user(request, f'Unsharded the stock of {len(queryset)} product(s).')
 
 class SalesOrderItemInline(admin.TabularInline):
     model = SalesOrderItem
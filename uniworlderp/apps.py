@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UniworlderpConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'uniworlderp'
+
+    def ready(self):
+        import uniworlderp.checks
+        import uniworlderp.signals
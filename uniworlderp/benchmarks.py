@@ -0,0 +1,259 @@
+"""
+Benchmark suite of the ERP hot paths.
+
+Each case is one request through the in-process test client: the sales
+report (``ReportView.post``), the stock report, the sales order report, the
+dashboard, the sales order form and its submit (``SalesOrderCreateView``,
+rolled back so every run sees the same stock) and the list views. A case is
+requested ``warmup`` times untimed, once with ``tracemalloc`` and the
+queries captured on every database alias, then ``repeat`` times timed. The
+profiled request runs the async views' queries one after another
+(``ASYNC_QUERY_CONCURRENCY=1``) on the request's thread, so that all of them
+are counted; the timed requests use the configured concurrency.
+
+``compare()`` flags every case slower (p50), heavier (peak memory) or
+chattier (queries) than the JSON baseline of a previous run, past a
+tolerance. Seed a scratch database with ``seed_benchmark_data`` first: the
+numbers only compare between runs over the same data, which the baseline
+records (row counts of the main tables, database vendor).
+"""
+
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from uniworlderp.models import CustomerVendor, Product, SalesEmployee, SalesOrder, SalesOrderItem, StockTransaction
+
+
+LIST_VIEWS = [
+    'customer_vendor:customer_list',
+    'customer_vendor:sales_employee_list',
+    'customer_vendor:product_list',
+    'customer_vendor:stock_transfer_detailed_list',
+    'customer_vendor:sales_order_list',
+    'customer_vendor:invoice_list',
+    'customer_vendor:purchase_order_list',
+]
+
+# Latency and memory below these are noise, whatever the relative change
+MIN_LATENCY_MS = 2.0
+MIN_MEMORY_KIB = 256
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@dataclass
+class Case:
+    name: str
+    url_name: str
+    method: str = 'get'
+    # fixtures -> GET parameters / POST data
+    data: object = None
+    status: int = 200
+    # Roll the request back, for the cases that write
+    rollback: bool = False
+
+
+def _sales_order_form(fixtures):
+    data = {
+        'customer': fixtures['customer'],
+        'sales_employee': fixtures['employee'] or '',
+        'delivery_status': 'P',
+        'order_date': fixtures['today'],
+        'discount': '0.00',
+        'shipping': '0.00',
+        'notes': 'benchmark',
+        'order_items-TOTAL_FORMS': len(fixtures['products']),
+        'order_items-INITIAL_FORMS': 0,
+        'order_items-MIN_NUM_FORMS': 0,
+        'order_items-MAX_NUM_FORMS': 1000,
+    }
+    for index, (pk, price, stock) in enumerate(fixtures['products']):
+        data.update({
+            f'order_items-{index}-product': pk,
+            f'order_items-{index}-quantity': 1,
+            f'order_items-{index}-unit_price': price,
+            f'order_items-{index}-stock_quantity': stock,
+        })
+    return data
+
+
+def _period(fixtures, **extra):
+    return {'start_date': fixtures['month_ago'], 'end_date': fixtures['today'], **extra}
+
+
+CASES = [
+    Case('sales_report', 'customer_vendor:sales_report', 'post', _period),
+    Case('sales_report_customer', 'customer_vendor:sales_report', 'post',
+         lambda f: _period(f, customer=f['customer'])),
+    Case('stock_report', 'customer_vendor:stock_report', 'post',
+         lambda f: {'date_range': 'custom', 'start_date': f['stock_from'], 'end_date': f['today']}),
+    Case('sales_order_report', 'customer_vendor:sales_order_report', 'get', _period),
+    Case('sales_order_report_customer', 'customer_vendor:sales_order_report', 'get',
+         lambda f: _period(f, customer=f['customer'])),
+    Case('dashboard', 'permission:dashboard'),
+    Case('sales_order_form', 'customer_vendor:sales_order_create'),
+    Case('sales_order_create', 'customer_vendor:sales_order_create', 'post', _sales_order_form,
+         status=302, rollback=True),
+] + [Case(name.split(':')[1], name) for name in LIST_VIEWS]
+
+
+def fixtures():
+    """The busiest customer and employee, three well-stocked products and the report periods."""
+    from uniworlderp.views.report_views import MIN_STOCK_DATE
+
+    today = timezone.localdate()
+    month_ago = today - timedelta(days=30)
+    customer = (
+        CustomerVendor.objects.filter(entity_type='customer')
+        .annotate(orders=Count('sales_orders')).order_by('-orders').values_list('pk', flat=True).first()
+    )
+    employee = (
+        SalesEmployee.objects.annotate(orders=Count('sales_orders'))
+        .order_by('-orders').values_list('pk', flat=True).first()
+    )
+    products = list(
+        Product.objects.filter(is_active=True, sharded_stock=False, stock_quantity__gt=0)
+        .order_by('-stock_quantity').values_list('pk', 'price', 'stock_quantity')[:3]
+    )
+    if customer is None or not products:
+        raise ValueError('No customer or no product in stock: run seed_benchmark_data first.')
+    return {
+        'customer': customer,
+        'employee': employee,
+        'products': products,
+        'today': today.isoformat(),
+        'month_ago': month_ago.isoformat(),
+        'stock_from': max(month_ago, MIN_STOCK_DATE.date()).isoformat(),
+    }
+
+
+def dataset():
+    """Row counts and database vendor the numbers were measured on."""
+    counts = {
+        model._meta.model_name: model.objects.count()
+        for model in (CustomerVendor, Product, SalesOrder, SalesOrderItem, StockTransaction)
+    }
+    return {'vendor': connections['default'].vendor, **counts}
+
+
+def _request(client, case, url, data):
+    if not case.rollback:
+        return getattr(client, case.method)(url, data)
+    with transaction.atomic():
+        response = getattr(client, case.method)(url, data)
+        transaction.set_rollback(True)
+    return response
+
+
+def measure(client, case, fixtures, repeat=20, warmup=2):
+    """Latency percentiles, query count and peak traced memory of one case."""
+    url = reverse(case.url_name)
+    data = case.data(fixtures) if case.data else {}
+
+    def request():
+        response = _request(client, case, url, data)
+        if response.status_code != case.status:
+            raise AssertionError(f'{case.name}: {url} answered {response.status_code}, expected {case.status}')
+        return response
+
+    for _ in range(warmup):
+        request()
+
+    with ExitStack() as stack, override_settings(ASYNC_QUERY_CONCURRENCY=1):
+        captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+        tracemalloc.start()
+        try:
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    queries = sum(len(context.captured_queries) for context in captured)
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'p50_ms': round(percentile(samples, 50), 2),
+        'p95_ms': round(percentile(samples, 95), 2),
+        'mean_ms': round(statistics.mean(samples), 2) if samples else 0.0,
+        'queries': queries,
+        'peak_kib': round(peak / 1024),
+    }
+
+
+def run(user, cases=CASES, repeat=20, warmup=2, progress=None):
+    """Measure ``cases`` as ``user``; returns ``{"dataset": ..., "results": {case name: numbers}}``."""
+    client = Client()
+    client.force_login(user)
+    data = fixtures()
+    results = {}
+    for case in cases:
+        results[case.name] = measure(client, case, data, repeat=repeat, warmup=warmup)
+        if progress:
+            progress(case.name, results[case.name])
+    return {'created_at': timezone.now().isoformat(), 'dataset': dataset(), 'results': results}
+
+
+@dataclass
+class Regression:
+    case: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self):
+        change = f'{(self.current / self.baseline - 1) * 100:+.0f}%' if self.baseline else 'new'
+        return f'{self.case}: {self.metric} {self.baseline} -> {self.current} ({change})'
+
+
+def compare(current, baseline, tolerance):
+    """The regressions of ``current`` against ``baseline``: any extra query, or p50 / memory past ``tolerance``."""
+    regressions = []
+    for name, now in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        if now['queries'] > before['queries']:
+            regressions.append(Regression(name, 'queries', before['queries'], now['queries']))
+        if now['p50_ms'] > before['p50_ms'] * (1 + tolerance) + MIN_LATENCY_MS:
+            regressions.append(Regression(name, 'p50_ms', before['p50_ms'], now['p50_ms']))
+        if now['peak_kib'] > before['peak_kib'] * (1 + tolerance) + MIN_MEMORY_KIB:
+            regressions.append(Regression(name, 'peak_kib', before['peak_kib'], now['peak_kib']))
+    return regressions
+
+
+def load_baseline(path):
+    """The baseline at ``path``, or None when there is none yet."""
+    try:
+        with open(path, encoding='utf-8') as fileobj:
+            return json.load(fileobj)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, current):
+    with open(path, 'w', encoding='utf-8') as fileobj:
+        json.dump(current, fileobj, indent=2, sort_keys=True)
+        fileobj.write('\n')
@@ -0,0 +1,154 @@
+"""
+Shared caching helpers for dashboards, reports and lookups.
+
+Keys are versioned by tag: every cached value is stored under a key that
+includes the current version of each tag it depends on (e.g. ``product``,
+``salesorder``). Invalidating a tag bumps its version, so every key built from
+the old version is simply never read again and ages out of the cache.
+
+Usage:
+    from uniworlderp.cache import cached, get_or_set, invalidate_tags
+
+    @cached(tags=['salesorder'], timeout=600)
+    def monthly_sales(year):
+        ...
+
+    value = get_or_set('low-stock-count', compute_low_stock, tags=['product'])
+
+    invalidate_tags('product')
+"""
+
+import functools
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+
+
+# Tags invalidated automatically by uniworlderp.signals on save/delete
+PRODUCT = 'product'
+SALES_ORDER = 'salesorder'
+AR_INVOICE = 'arinvoice'
+STOCK_TRANSACTION = 'stocktransaction'
+COMPANY = 'company'
+
+LOCK_TIMEOUT = 30  # seconds a recompute lock is held at most
+LOCK_WAIT = 5  # seconds to wait for another worker's recompute before computing anyway
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+# Striped in-process locks so concurrent threads recomputing the same key
+# wait for each other instead of all hitting the database
+_LOCAL_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _new_version():
+    # Time based so a tag key that was evicted never restarts at an old version
+    return time.time_ns() // 1000
+
+
+def get_tag_versions(tags):
+    """Return {tag: version} for the given tags, creating missing versions."""
+    tags = sorted(set(tags))
+    if not tags:
+        return {}
+    stored = cache.get_many([_tag_key(tag) for tag in tags])
+    versions = {}
+    for tag in tags:
+        version = stored.get(_tag_key(tag))
+        if version is None:
+            version = _new_version()
+            if not cache.add(_tag_key(tag), version, timeout=None):
+                version = cache.get(_tag_key(tag), version)
+        versions[tag] = version
+    return versions
+
+
+def invalidate_tags(*tags):
+    """Bump the version of each tag, orphaning every key built on it."""
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), _new_version(), timeout=None)
+
+
+def make_key(name, tags=()):
+    """Build a cache key for ``name`` that changes whenever one of ``tags`` is invalidated."""
+    versions = get_tag_versions(tags)
+    suffix = ','.join(f'{tag}.{version}' for tag, version in versions.items())
+    return f'{name}:{suffix}' if suffix else name
+
+
+def get_or_set(name, compute, timeout=None, tags=()):
+    """
+    Return the cached value for ``name`` or compute, store and return it.
+
+    Only one caller recomputes a missing key at a time: threads in the same
+    process serialize on a local lock and other processes on a ``cache.add``
+    lock, and everyone else waits briefly for the fresh value.
+    """
+    key = make_key(name, tags)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    with _LOCAL_LOCKS[hash(key) % len(_LOCAL_LOCKS)]:
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            try:
+                value = compute()
+                cache.set(key, value, timeout=timeout)
+            finally:
+                cache.delete(lock_key)
+            return value
+
+        # Another process is recomputing, wait for its result
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        return compute()
+
+
+def _args_digest(args, kwargs):
+    raw = repr((args, sorted(kwargs.items())))
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def cached(timeout=None, tags=(), key=None):
+    """
+    Decorator caching a function's return value through ``get_or_set``.
+
+    The key is the function's dotted name plus a digest of its arguments,
+    unless ``key`` (a callable taking the same arguments) is given.
+    """
+    def decorator(func):
+        prefix = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            suffix = key(*args, **kwargs) if key else _args_digest(args, kwargs)
+            return get_or_set(
+                f'{prefix}:{suffix}',
+                lambda: func(*args, **kwargs),
+                timeout=timeout,
+                tags=tags,
+            )
+
+        wrapper.invalidate = lambda: invalidate_tags(*tags)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,166 @@
+"""
+Change feed for downstream sync (BI warehouse, mobile apps).
+
+Every create, update and delete of the synced models writes a ``ChangeLog``
+row in the transaction of the change: ``post_save`` / ``post_delete``
+signals (uniworlderp/signals.py) for ordinary saves and ``record_many()``
+in the bulk paths that bypass them (imports, order intake, return posting,
+stock ledger rebuilds, shard reconciliation). Consumers keep the last
+sequence number they have seen and ask for the changes after it, through
+``GET /erp/changes/?since=<seq>`` or ``python manage.py change_feed``,
+instead of re-pulling whole tables. Each change carries the current row
+(``None`` once deleted).
+
+Sequence numbers are allocated when a change is written, not when it
+commits, so a change may become visible after a higher one. The feed only
+serves changes older than ``CHANGE_FEED_SETTLE_SECONDS``, by which time
+their transaction has committed (or rolled back): a consumer never skips
+one by advancing its cursor past it. Transactions running longer than
+that (a very large import) can still be missed; re-sync after them.
+
+Once a change commits, the cache tag ``commit_tag(model)`` of its model is
+bumped (uniworlderp/cache.py): the read API versions its data on the newest
+sequence number plus these tags, which also move when a change commits
+after a higher-numbered one.
+
+``compact()`` (``change_feed --compact``, daily) drops changes older than
+``CHANGE_LOG_RETENTION_DAYS``. A consumer whose cursor is older than the
+oldest kept change gets ``FeedExpired`` (HTTP 410) and must re-sync in full,
+then continue from the ``newest`` sequence number it was given.
+
+The stock of a ``sharded_stock`` product moves without its row being
+written: follow its stock transactions, or the ``Product`` update that
+``stock_shards --reconcile`` records.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from uniworlderp import cache as erp_cache
+from uniworlderp.models import (
+    ARInvoice, ARInvoiceItem, ChangeLog, CustomerVendor, Product, ReturnSales, SalesEmployee, SalesOrder,
+    SalesOrderItem, StockTransaction,
+)
+
+
+TRACKED_MODELS = [
+    SalesOrder, SalesOrderItem, ARInvoice, ARInvoiceItem, Product, CustomerVendor, SalesEmployee, StockTransaction,
+    ReturnSales,
+]
+MODELS_BY_NAME = {model._meta.model_name: model for model in TRACKED_MODELS}
+
+CREATED, UPDATED, DELETED = 'C', 'U', 'D'
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+BATCH_SIZE = 1000
+
+
+class FeedExpired(Exception):
+    """The changes after the cursor were compacted away; the consumer must re-sync in full."""
+
+    def __init__(self, since, oldest, newest):
+        self.since, self.oldest, self.newest = since, oldest, newest
+        super().__init__(f'Changes after {since} are no longer kept (oldest kept: {oldest}); re-sync in full')
+
+
+def commit_tag(model_name):
+    """Cache tag bumped when changes of the model ``model_name`` commit."""
+    return f'changes.{model_name}'
+
+
+def _bump_on_commit(model_names):
+    tags = [commit_tag(name) for name in model_names]
+    transaction.on_commit(lambda: erp_cache.invalidate_tags(*tags))
+
+
+def record(instance, action):
+    """Log one change of a tracked model instance."""
+    ChangeLog.objects.create(model=instance._meta.model_name, object_id=str(instance.pk), action=action)
+    _bump_on_commit([instance._meta.model_name])
+
+
+def record_changes(changes):
+    """Log ``(model, pk, action)`` changes in one insert (bulk writes skip the signals)."""
+    now = timezone.now()
+    entries = ChangeLog.objects.bulk_create(
+        [
+            ChangeLog(model=model._meta.model_name, object_id=str(pk), action=action, changed_at=now)
+            for model, pk, action in changes
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    if entries:
+        _bump_on_commit({entry.model for entry in entries})
+
+
+def record_many(model, pks, action):
+    """Log the same change of many rows of ``model``."""
+    record_changes((model, pk, action) for pk in pks)
+
+
+def _rows(model, object_ids):
+    """``{object id: serialized fields}`` of the rows of ``model`` that still exist, in one query."""
+    pks = [model._meta.pk.to_python(object_id) for object_id in object_ids]
+    return {
+        str(row['pk']): row['fields']
+        for row in serializers.serialize('python', model._default_manager.filter(pk__in=pks))
+    }
+
+
+def changes_since(since=0, limit=DEFAULT_LIMIT, models=None):
+    """
+    The settled changes after sequence number ``since``, oldest first, at
+    most ``limit``: ``{'changes': [...], 'next': <cursor for the next call>,
+    'has_more': bool}``. ``models`` restricts them to these model names.
+    ``since=0`` starts at the oldest change still kept; a later cursor raises
+    ``FeedExpired`` when changes after it were compacted.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    bounds = ChangeLog.objects.aggregate(oldest=Min('id'), newest=Max('id'))
+    if since and bounds['oldest'] is not None and since < bounds['oldest'] - 1 and since < bounds['newest']:
+        # compact() keeps the newest change, so an emptied log is never mistaken for a full one
+        raise FeedExpired(since, bounds['oldest'], bounds['newest'])
+
+    settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    entries = ChangeLog.objects.filter(id__gt=since, changed_at__lte=settled)
+    if models:
+        entries = entries.filter(model__in=models)
+    entries = list(entries.order_by('id')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    current = {}
+    for name in {entry.model for entry in entries if entry.action != DELETED}:
+        current[name] = _rows(
+            MODELS_BY_NAME[name], {entry.object_id for entry in entries if entry.model == name},
+        )
+
+    changes = [
+        {
+            'seq': entry.id,
+            'model': entry.model,
+            'id': entry.object_id,
+            'action': entry.action,
+            'changed_at': entry.changed_at,
+            'data': current.get(entry.model, {}).get(entry.object_id),
+        }
+        for entry in entries
+    ]
+    return {'changes': changes, 'next': entries[-1].id if entries else since, 'has_more': has_more}
+
+
+def compact(retention_days=None):
+    """Delete the changes older than the retention window, keeping the newest; returns how many."""
+    retention_days = settings.CHANGE_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    newest = ChangeLog.objects.aggregate(newest=Max('id'))['newest']
+    if newest is None:
+        return 0
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = ChangeLog.objects.filter(changed_at__lt=cutoff, id__lt=newest).delete()
+    return deleted
@@ -0,0 +1,80 @@
+"""
+Deployment checks, run by ``python manage.py check --deploy``.
+"""
+
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.checks import Tags, Warning, register
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+
+# {% static 'path' %} / {% static "path" as name %} with a literal path; computed
+# paths ({% static 'js/'|add:name %}) cannot be checked statically.
+STATIC_TAG = re.compile(r"""\{%\s*static\s+(?P<quote>['"])(?P<path>[^'"]+)(?P=quote)\s*(?:as\s+\w+\s*)?%\}""")
+
+
+def template_files():
+    """Every file under the template directories of the Django template engines."""
+    seen = set()
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if path not in seen:
+                        seen.add(path)
+                        yield path
+
+
+def static_references():
+    """``(template path, line number, static path)`` of every literal ``{% static %}`` tag."""
+    for path in template_files():
+        try:
+            with open(path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except (OSError, UnicodeDecodeError):
+            continue
+        for number, line in enumerate(lines, start=1):
+            for match in STATIC_TAG.finditer(line):
+                yield path, number, match.group('path')
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_static_references(app_configs, **kwargs):
+    """
+    Every ``{% static %}`` path in the templates must resolve: to a manifest
+    entry when the hashed storage is used (a miss is a 500 at render time),
+    otherwise to a file the finders can locate.
+    """
+    manifest = None
+    if isinstance(staticfiles_storage, ManifestFilesMixin):
+        manifest = staticfiles_storage.hashed_files
+        if not manifest:
+            return [Warning(
+                'The staticfiles manifest is missing or empty.',
+                hint='Run "python manage.py collectstatic" before serving with STATIC_MANIFEST=True.',
+                id='uniworlderp.W001',
+            )]
+
+    errors = []
+    for template, line, path in static_references():
+        name = path.lstrip('/')
+        if manifest is not None:
+            found = name in manifest
+        else:
+            found = finders.find(name) is not None
+        if not found:
+            errors.append(Warning(
+                f'{{% static "{path}" %}} does not resolve to a static file.',
+                hint='Add the file to a static directory or fix the reference.',
+                obj=f'{os.path.relpath(template, settings.BASE_DIR)}:{line}',
+                id='uniworlderp.W002',
+            ))
+    return errors
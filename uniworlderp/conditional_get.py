@@ -0,0 +1,242 @@
+"""
+Conditional GET (ETag / Last-Modified) for the document and report pages.
+
+Posted invoices, received purchase orders and old sales orders rarely
+change, yet every view or print of them used to run all the view's queries
+and render the template again. These views now compute the version of what
+they show first, in one cheap query, and answer a browser that already has
+that version with 304 Not Modified:
+
+- the detail and print pages of a sales order, invoice or purchase order
+  (``DocumentConditionalGetMixin``): the document's ``updated_at``, the
+  newest ``updated_at`` and the number of its lines (a deleted line lowers
+  it), the ``updated_at`` of its customer / supplier and, on detail pages,
+  the first / previous / next / last document ids of the navigation bar;
+- report pages whose date range is fully past (``PastReportConditionalGetMixin``):
+  the newest ``updated_at`` and the number of rows of each source table
+  dated in the range, and of the whole customer / product / sales employee
+  tables whose names and levels the reports show. A range reaching today is
+  rendered every time.
+
+The ETag also covers the user, the CSRF secret (forms on the page carry a
+token made from it), the company cache tag (uniworlderp/cache.py) and
+``HTTP_CACHE_VERSION``, to be bumped on deploys that change these templates.
+Last-Modified is the newest of the timestamps; browsers send back the ETag,
+which wins over it. As with the rendered print cache (uniworlderp/printing.py),
+renaming a product does not change the version of the documents showing it.
+Pages are sent ``Cache-Control: private, no-cache``, so browsers revalidate
+every time instead of showing a stale copy.
+"""
+
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+
+from uniworlderp import cache as erp_cache, printing
+from uniworlderp.models import (
+    CustomerVendor, Product, ReturnSales, ReturnSalesItem, SalesEmployee, SalesOrder, SalesOrderItem, StockTransaction,
+)
+
+
+class Version:
+    """What a page shows depends on: hashed into its ETag, plus its Last-Modified time."""
+
+    def __init__(self, parts, timestamps):
+        self.parts = parts
+        self.last_modified = max((stamp for stamp in timestamps if stamp), default=None)
+        self._etag = None
+
+    def etag(self, request):
+        if self._etag is not None:
+            return self._etag
+        user = request.user.pk if request.user.is_authenticated else None
+        # The CSRF secret the page's form tokens are made from, issued now on a first visit
+        get_token(request)
+        key = repr((
+            settings.HTTP_CACHE_VERSION,
+            request.get_full_path(),
+            user,
+            request.META['CSRF_COOKIE'],
+            erp_cache.get_tag_versions([erp_cache.COMPANY]),
+            self.parts,
+        ))
+        self._etag = f'"{hashlib.sha1(key.encode()).hexdigest()[:24]}"'
+        return self._etag
+
+
+def not_modified(request, version):
+    """The 304 response when the browser already has ``version`` of the page, else ``None``."""
+    if version is None or len(messages.get_messages(request)):
+        # Pending messages are shown by the next rendered page
+        return None
+    last_modified = int(version.last_modified.timestamp()) if version.last_modified else None
+    response = get_conditional_response(request, etag=version.etag(request), last_modified=last_modified)
+    if response is not None:
+        set_validators(request, response, version)
+    return response
+
+
+def set_validators(request, response, version):
+    """Put the ETag / Last-Modified of ``version`` on a rendered page."""
+    if version is None or response.status_code not in (200, 304):
+        return response
+    response.headers['ETag'] = version.etag(request)
+    if version.last_modified:
+        response.headers['Last-Modified'] = http_date(int(version.last_modified.timestamp()))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _has_updated_at(model):
+    return any(f.name == 'updated_at' for f in model._meta.concrete_fields)
+
+
+def document_version(doc_type, pk, navigation=False):
+    """
+    ``Version`` of a document of ``doc_type`` (a ``printing.DOCUMENT_TYPES``
+    entry) in one query, or ``None`` when it does not exist.
+    """
+    model = doc_type.model
+    parent = model._meta.get_field(doc_type.items).field.name
+    lines = doc_type.item_model._default_manager.filter(**{parent: OuterRef('pk')}).order_by().values(parent)
+    annotations = {
+        'lines_updated_at': Subquery(lines.annotate(latest=Max('updated_at')).values('latest')),
+        'line_count': Subquery(lines.annotate(count=Count('pk')).values('count')),
+    }
+    if navigation:
+        documents = model._base_manager.values('pk')
+        annotations.update(
+            first_id=Subquery(documents.order_by('pk')[:1]),
+            previous_id=Subquery(documents.filter(pk__lt=OuterRef('pk')).order_by('-pk')[:1]),
+            next_id=Subquery(documents.filter(pk__gt=OuterRef('pk')).order_by('pk')[:1]),
+            last_id=Subquery(documents.order_by('-pk')[:1]),
+        )
+    stamps = ['updated_at'] + [
+        f'{name}__updated_at' for name in doc_type.related
+        if _has_updated_at(model._meta.get_field(name).related_model)
+    ]
+    row = model._base_manager.filter(pk=pk).annotate(**annotations).values(*stamps, *annotations).first()
+    if row is None:
+        return None
+    return Version(sorted(row.items()), [row[name] for name in stamps + ['lines_updated_at']])
+
+
+class ConditionalGetMixin:
+    """
+    View mixin answering GET with 304 while the browser has the current
+    ``get_version()`` of the page; list it after the login / permission mixins.
+    """
+
+    def get_version(self, request, *args, **kwargs):
+        """``Version`` of the page; ``None`` (the default) renders it without conditional GET."""
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._conditional_dispatch(request, *args, **kwargs)
+        version = self.get_version(request, *args, **kwargs)
+        return not_modified(request, version) or set_validators(
+            request, super().dispatch(request, *args, **kwargs), version,
+        )
+
+    async def _conditional_dispatch(self, request, *args, **kwargs):
+        version = await sync_to_async(self.get_version)(request, *args, **kwargs)
+        response = await sync_to_async(not_modified)(request, version)
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+            await sync_to_async(set_validators)(request, response, version)
+        return response
+
+
+class DocumentConditionalGetMixin(ConditionalGetMixin):
+    """
+    For the detail / print views of a document: set ``document_type`` (a
+    ``printing.DOCUMENT_TYPES`` key) and, on detail pages with the first /
+    previous / next / last buttons, ``navigation``.
+    """
+    document_type = None
+    navigation = False
+
+    def get_version(self, request, *args, **kwargs):
+        return document_version(printing.DOCUMENT_TYPES[self.document_type], kwargs['pk'], self.navigation)
+
+
+def report_dates(request):
+    """``(start, end)`` dates of the ``start_date`` / ``end_date`` parameters; ``None`` when missing or invalid."""
+    def parse(name):
+        try:
+            return parse_date(request.GET.get(name) or '')
+        except ValueError:
+            return None
+    return parse('start_date'), parse('end_date')
+
+
+def report_version(sources, start, end):
+    """
+    ``Version`` of a report over the rows of ``sources`` (``(model, date
+    lookup)`` pairs) dated from ``start`` to ``end``, or ``None`` when the
+    range is not fully past. ``start=None`` reads from the beginning; a
+    ``None`` date lookup reads every row of the model.
+    """
+    if end is None or end >= timezone.localdate():
+        return None
+    parts, stamps = [], []
+    for model, date_lookup in sources:
+        rows = model._base_manager.all()
+        if date_lookup is not None:
+            rows = rows.filter(**{f'{date_lookup}__lte': end})
+            if start is not None:
+                rows = rows.filter(**{f'{date_lookup}__gte': start})
+        if _has_updated_at(model):
+            totals = rows.aggregate(latest=Max('updated_at'), count=Count('pk'))
+        else:
+            totals = rows.aggregate(count=Count('pk'))
+        parts.append((model._meta.model_name, totals.get('latest'), totals['count']))
+        stamps.append(totals.get('latest'))
+    return Version(parts, stamps)
+
+
+class PastReportConditionalGetMixin(ConditionalGetMixin):
+    """
+    For report views: ``report_sources`` are the ``(model, date lookup)``
+    pairs the report reads from the ``start_date`` / ``end_date`` range (from
+    the beginning without ``start_date``, unless ``report_requires_start``:
+    the report then reads everything).
+    """
+    report_sources = ()
+    report_requires_start = False
+
+    def get_version(self, request, *args, **kwargs):
+        start, end = report_dates(request)
+        if start is None and self.report_requires_start:
+            return None
+        return report_version(self.report_sources, start, end)
+
+
+# The sales, product-wise and customer-wise reports: the orders and their
+# lines by order date, the returns and their lines by return date, and the
+# customers, products and sales employees they name
+SALES_REPORT_SOURCES = (
+    (SalesOrder, 'order_date'),
+    (SalesOrderItem, 'sales_order__order_date'),
+    (ReturnSales, 'return_date'),
+    (ReturnSalesItem, 'return_sales__return_date'),
+    (CustomerVendor, None),
+    (Product, None),
+    (SalesEmployee, None),
+)
+
+STOCK_REPORT_SOURCES = (
+    (StockTransaction, 'transaction_date__date'),
+    (Product, None),
+)
@@ -0,0 +1,176 @@
+"""
+Read-replica routing for reporting traffic.
+
+With ``REPORTING_DATABASE_URL`` set, settings add a ``reporting`` database
+alias and ``ReportingRouter``. Reads made while a view runs under
+``reporting_reads()`` go to the replica: the report and export views, the
+dashboard and the detailed order item lists opt in with
+``ReportingReadsMixin`` / ``reporting_view``. Everything else, every write,
+and reads of the auth, session and content type tables stay on the primary.
+
+Read-your-writes: ``PrimaryAfterWriteMiddleware`` notes every request that
+writes and keeps that session on the primary for ``REPLICA_STICKY_SECONDS``
+afterwards, long enough for the replica to catch up. A request inside a
+transaction on the primary also reads from the primary.
+
+Trying it locally with two SQLite files (or two local PostgreSQL databases)::
+
+    DATABASE_URL=sqlite:///db.sqlite3 REPORTING_DATABASE_URL=sqlite:///reporting.sqlite3
+    python manage.py sync_reporting_database     # copy the primary, e.g. after migrate
+
+The copy then lags the primary until it is synced again, the way a replica
+under load does.
+"""
+
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPORTING_DB_ALIAS = 'reporting'
+
+# Always read from the primary: logins, permission changes and sessions must
+# be seen at once
+PRIMARY_ONLY_APPS = {'admin', 'auth', 'contenttypes', 'sessions', 'sites'}
+
+# Session key holding the time until which the session reads from the primary
+STICKY_SESSION_KEY = '_primary_reads_until'
+
+
+@dataclass
+class _Reads:
+    reporting: bool = False  # the view asked for the replica
+    primary: bool = False    # the session is inside its sticky window
+    wrote: bool = False      # this request wrote to the primary
+
+
+# One mutable state per request, shared by the threads of run_queries()
+_reads = contextvars.ContextVar('reporting_reads', default=None)
+
+
+def replica_configured():
+    return REPORTING_DB_ALIAS in connections.settings
+
+
+@contextmanager
+def reporting_reads():
+    """Send the reads made inside the block to the ``reporting`` database when it is configured."""
+    state = _reads.get()
+    if state is None:
+        token = _reads.set(_Reads(reporting=True))
+        try:
+            yield
+        finally:
+            _reads.reset(token)
+        return
+
+    previous, state.reporting = state.reporting, True
+    try:
+        yield
+    finally:
+        state.reporting = previous
+
+
+def _rendered(response):
+    # A TemplateResponse queries while it renders, which the handler would
+    # only do after the view has returned
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+def reporting_view(view):
+    """Decorator running a function view (sync or async) under ``reporting_reads()``."""
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            with reporting_reads():
+                return await sync_to_async(_rendered)(await view(request, *args, **kwargs))
+        markcoroutinefunction(wrapper)
+    else:
+        def wrapper(request, *args, **kwargs):
+            with reporting_reads():
+                return _rendered(view(request, *args, **kwargs))
+    return functools.wraps(view)(wrapper)
+
+
+class ReportingReadsMixin:
+    """Class-based view mixin running the whole view under ``reporting_reads()``; list it first."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._reporting_dispatch(request, *args, **kwargs)
+        with reporting_reads():
+            return _rendered(super().dispatch(request, *args, **kwargs))
+
+    async def _reporting_dispatch(self, request, *args, **kwargs):
+        with reporting_reads():
+            response = await super().dispatch(request, *args, **kwargs)
+            return await sync_to_async(_rendered)(response)
+
+
+class ReportingRouter:
+    """Database router sending opted-in reads to the ``reporting`` replica."""
+
+    def db_for_read(self, model, **hints):
+        state = _reads.get()
+        if state is None or not state.reporting or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects come from wherever their instance was read
+            return instance._state.db
+        if state.primary or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPORTING_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _reads.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, REPORTING_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        if db == REPORTING_DB_ALIAS:
+            return False
+        return None
+
+
+class PrimaryAfterWriteMiddleware:
+    """
+    Track the writes of each request and keep a session that wrote reading
+    from the primary for ``REPLICA_STICKY_SECONDS``. Must come after
+    ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        until = session.get(STICKY_SESSION_KEY, 0) if session is not None else 0
+        state = _Reads(primary=until > time.time())
+        token = _reads.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _reads.reset(token)
+
+        if state.wrote and session is not None:
+            session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+        return response
@@ -5,6 +5,7 @@ from django.conf import settings
 
 
 from django.core.exceptions import ValidationError
+from django.core.validators import FileExtensionValidator
 from django.utils import timezone
 from decimal import Decimal, InvalidOperation
 from django.db.models.functions import Concat
@@ -14,7 +15,7 @@ from django.utils.safestring import mark_safe
 
 from .models import (
     CustomerVendor, SalesEmployee, Product, SalesOrder, SalesOrderItem, ReturnSales, ReturnSalesItem,
-    ARInvoice, ARInvoiceItem, PurchaseOrder, PurchaseOrderItem,StockTransaction
+    ARInvoice, ARInvoiceItem, PurchaseOrder, PurchaseOrderItem,StockTransaction, ABC_CLASS_CHOICES
 )
 from decimal import Decimal, InvalidOperation
 
@@ -137,7 +138,6 @@ class SalesEmployeeForm(BaseStyleForm):
         widgets = {
             'date_of_joining': forms.DateInput(attrs={'type': 'date'}),
             'sales_target': forms.NumberInput(attrs={'step': '0.01'}),
-            'sales_achieved': forms.NumberInput(attrs={'step': '0.01'}),
             'notes': forms.Textarea(attrs={'rows': 4}),
         }
 
@@ -159,6 +159,10 @@ class ProductForm(BaseStyleForm):
         self.set_field_labels()
         if not self.instance.pk:
             self.fields['sku'].initial = self.generate_unique_sku()
+        elif self.instance.sharded_stock:
+            # Stock of a sharded product lives in its counters; change it with stock movements
+            self.fields['stock_quantity'].disabled = True
+            self.initial['stock_quantity'] = self.instance.available_stock
 
     def set_field_placeholders(self):
         placeholders = {
@@ -340,6 +344,8 @@ class ARInvoiceForm(BaseStyleForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['customer'].queryset = CustomerVendor.objects.filter(entity_type='customer')
+        # SalesOrder.__str__ shows the customer
+        self.fields['sales_order'].queryset = SalesOrder.objects.select_related('customer')
 
 class ARInvoiceItemForm(BaseOrderItemForm):
     class Meta:
@@ -417,6 +423,61 @@ AddStockFormSet = forms.modelformset_factory(
     can_delete=True
 )
 
+class MasterDataImportForm(forms.Form):
+    """Upload form for bulk product / customer imports (CSV or XLSX)"""
+    KIND_CHOICES = [
+        ('products', 'Products (with opening stock)'),
+        ('customers', 'Customers / Vendors'),
+    ]
+
+    kind = forms.ChoiceField(
+        choices=KIND_CHOICES,
+        widget=forms.Select(attrs={'class': BASE_FIELD_CLASSES}),
+        label="Import"
+    )
+    file = forms.FileField(
+        validators=[FileExtensionValidator(['csv', 'xlsx'])],
+        widget=forms.ClearableFileInput(attrs={'class': FILE_UPLOAD_CLASSES, 'accept': '.csv,.xlsx'}),
+        help_text="First row must contain the column names, e.g. sku, name, price, unit, barcode, opening_stock."
+    )
+    post_opening_stock = forms.BooleanField(
+        required=False,
+        initial=True,
+        label="Post opening_stock column as stock adjustments"
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Validate only (nothing is saved)"
+    )
+
+
+class StockTakeStartForm(forms.Form):
+    """Start a stock-take of every active product, or of one ABC revenue class"""
+    abc_class = forms.ChoiceField(
+        choices=[('', 'All Active Products')] + ABC_CLASS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': BASE_FIELD_CLASSES}),
+        label="Revenue Class"
+    )
+    notes = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={'class': BASE_FIELD_CLASSES, 'placeholder': 'e.g. Year-end count, aisle 1-4'}),
+        label="Notes"
+    )
+
+
+class StockTakeCountImportForm(forms.Form):
+    """Upload of counted quantities for a stock-take (CSV or XLSX)"""
+    file = forms.FileField(
+        validators=[FileExtensionValidator(['csv', 'xlsx'])],
+        widget=forms.ClearableFileInput(attrs={'class': FILE_UPLOAD_CLASSES, 'accept': '.csv,.xlsx'}),
+        help_text="First row must contain the column names sku and counted."
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Validate only (nothing is saved)"
+    )
+
 from .models import MaterialsPurchase, MaterialsPurchaseItem
 
 class MaterialsPurchaseForm(forms.ModelForm):
@@ -515,12 +576,11 @@ class ReturnSalesItemForm(forms.ModelForm):
         if quantity == 0:
             return quantity
             
-        # Calculate max returnable quantity
-        previously_returned = ReturnSalesItem.objects.filter(
-            sales_order_item=sales_order_item
-        ).exclude(id=self.instance.id if self.instance.id else None).aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
+        # Calculate max returnable quantity (the line's maintained total
+        # without this return line's saved quantity)
+        previously_returned = sales_order_item.returned_quantity
+        if self.instance.pk:
+            previously_returned -= self.instance.quantity
         
         max_returnable = sales_order_item.quantity - previously_returned
         
@@ -624,6 +684,14 @@ class StockReportForm(forms.Form):
         input_formats=['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'],
         label="End Date"
     )
+
+    # Revenue class of the nightly ABC classification (uniworlderp/abc_analysis.py)
+    abc_class = forms.ChoiceField(
+        choices=[('', 'All Classes')] + ABC_CLASS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': BASE_FIELD_CLASSES}),
+        label="Revenue Class"
+    )
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -0,0 +1,356 @@
+"""
+Bulk import of master data (products, customers/vendors and opening stock)
+from CSV or XLSX files.
+
+Files are streamed (csv reader / openpyxl ``read_only``) and processed in
+chunks: every chunk is validated with the model field validators, upserted
+with a handful of bulk queries and committed on its own, so one bad row never
+rejects the whole file. Rows that fail validation are collected in
+``ImportResult.errors`` with their spreadsheet row number.
+
+The first row of the file is the header. Column names match the model field
+names (case-insensitive); products additionally accept ``opening_stock``.
+Columns present in the header are written on update, so a blank optional cell
+resets that field to its default.
+"""
+
+import csv
+import io
+import itertools
+import os
+import zipfile
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from uniworlderp import cache as erp_cache, change_log, stock_counters
+from uniworlderp.models import CustomerVendor, Product, StockTransaction
+
+
+DEFAULT_CHUNK_SIZE = 1000
+OPENING_STOCK_REFERENCE = 'OPENING-STOCK'
+
+PRODUCT_FIELDS = [
+    'sku', 'name', 'description', 'category', 'price', 'unit', 'barcode',
+    'reorder_level', 'discount_amount', 'is_active',
+]
+PRODUCT_REQUIRED = ['sku', 'name']
+
+CUSTOMER_FIELDS = [
+    'name', 'phone_number', 'email', 'whatsapp_number', 'address',
+    'business_type', 'entity_type',
+]
+CUSTOMER_REQUIRED = ['name', 'phone_number']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f'}
+
+
+class ImportResult:
+    """Counters and per-row errors collected during an import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.stock_posted = 0
+        self.errors = []
+
+    def add_error(self, row_number, key, message):
+        self.errors.append({'row': row_number, 'key': key or '', 'error': message})
+
+    def write_error_report(self, fileobj):
+        writer = csv.DictWriter(fileobj, fieldnames=['row', 'key', 'error'])
+        writer.writeheader()
+        writer.writerows(self.errors)
+
+
+def iter_rows(fileobj, filename):
+    """
+    Yield ``(row_number, {column: value})`` from a CSV or XLSX file without
+    loading it into memory. Column names are lower-cased and stripped.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.xlsx':
+        from openpyxl import load_workbook  # heavy; only needed for XLSX uploads
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        try:
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile) as e:
+            raise ValidationError(f'Not a readable .xlsx file: {e}')
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(c).strip().lower() if c is not None else '' for c in next(rows, [])]
+            for row_number, values in enumerate(rows, start=2):
+                if values is None or all(v is None or v == '' for v in values):
+                    continue
+                yield row_number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    elif extension == '.csv':
+        if not isinstance(fileobj, io.TextIOBase):
+            fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        reader = csv.reader(fileobj)
+        header = [c.strip().lower() for c in next(reader, [])]
+        for row_number, values in enumerate(reader, start=2):
+            if not any(v.strip() for v in values):
+                continue
+            yield row_number, dict(zip(header, values))
+    else:
+        raise ValidationError(f'Unsupported file type "{extension}". Upload a .csv or .xlsx file.')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and value.strip() == '')
+
+
+def clean_row(model, row, fields, required):
+    """
+    Validate the given columns of ``row`` with the model field validators.
+    Returns ``(values, errors)``; only columns present in the row are returned.
+    """
+    values = {}
+    errors = []
+    for name in fields:
+        if name not in row:
+            if name in required:
+                errors.append(f'{name}: column is missing')
+            continue
+        raw = row[name]
+        field = model._meta.get_field(name)
+        if _is_blank(raw):
+            if name in required:
+                errors.append(f'{name}: this field is required')
+            else:
+                values[name] = None if field.null else field.get_default()
+            continue
+        if isinstance(raw, str):
+            raw = raw.strip()
+            if field.get_internal_type() == 'BooleanField' and raw.lower() in TRUE_VALUES | FALSE_VALUES:
+                raw = raw.lower() in TRUE_VALUES
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as e:
+            errors.append(f'{name}: {"; ".join(e.messages)}')
+    return values, errors
+
+
+def clean_quantity(raw):
+    """A stock quantity cell as a whole number >= 0; raises ``ValidationError``."""
+    if isinstance(raw, str):
+        raw = raw.strip()
+    try:
+        quantity = int(float(raw))
+    except (TypeError, ValueError):
+        raise ValidationError(f'"{raw}" is not a whole number')
+    if quantity < 0 or quantity != float(raw):
+        raise ValidationError(f'"{raw}" is not a whole number >= 0')
+    return quantity
+
+
+def import_products(rows, owner, chunk_size=DEFAULT_CHUNK_SIZE, post_opening_stock=True, dry_run=False):
+    """
+    Upsert products on ``sku`` and optionally post ``opening_stock`` as ADJ
+    stock transactions. ``rows`` is an iterable from ``iter_rows``.
+    """
+    result = ImportResult()
+    seen_skus = set()
+    seen_barcodes = set()
+
+    for chunk in chunked(rows, chunk_size):
+        valid = []
+        for row_number, row in chunk:
+            result.rows += 1
+            values, errors = clean_row(Product, row, PRODUCT_FIELDS, PRODUCT_REQUIRED)
+            sku = values.get('sku')
+
+            opening_stock = None
+            if post_opening_stock and not _is_blank(row.get('opening_stock')):
+                try:
+                    opening_stock = clean_quantity(row['opening_stock'])
+                except ValidationError as e:
+                    errors.append(f'opening_stock: {"; ".join(e.messages)}')
+
+            if sku in seen_skus:
+                errors.append('sku: duplicate of an earlier row')
+            barcode = values.get('barcode')
+            if barcode and barcode in seen_barcodes:
+                errors.append('barcode: duplicate of an earlier row')
+
+            if errors:
+                result.add_error(row_number, sku, '; '.join(errors))
+                continue
+            seen_skus.add(sku)
+            if barcode:
+                seen_barcodes.add(barcode)
+            valid.append((row_number, values, opening_stock))
+
+        if not valid:
+            continue
+
+        with transaction.atomic():
+            # Lock the existing rows so their stock cannot change under us
+            skus = [values['sku'] for _, values, _ in valid]
+            existing = {}
+            sharded = set()
+            for sku, pk, stock, is_sharded in (
+                Product.objects.select_for_update()
+                .filter(sku__in=skus)
+                .values_list('sku', 'id', 'stock_quantity', 'sharded_stock')
+            ):
+                existing[sku] = (pk, stock)
+                if is_sharded:
+                    sharded.add(pk)
+            if sharded:
+                # Their stock is in the counter shards, not in the row
+                on_hand = stock_counters.totals(sharded)
+                existing.update({
+                    sku: (pk, on_hand.get(pk, 0)) for sku, (pk, _) in existing.items() if pk in sharded
+                })
+
+            # A barcode may only move with its own SKU
+            barcodes = [values['barcode'] for _, values, _ in valid if values.get('barcode')]
+            barcode_owners = dict(
+                Product.objects.filter(barcode__in=barcodes).values_list('barcode', 'sku')
+            )
+
+            products = []
+            movements = []
+            shard_totals = []
+            update_fields = {'stock_quantity', 'updated_at'}
+            for row_number, values, opening_stock in valid:
+                sku = values['sku']
+                barcode = values.get('barcode')
+                if barcode and barcode_owners.get(barcode, sku) != sku:
+                    result.add_error(row_number, sku, f'barcode: already used by product {barcode_owners[barcode]}')
+                    continue
+                update_fields.update(k for k in values if k != 'sku')
+
+                product = Product(owner_id=owner.pk, **values)
+                # On conflict the existing row keeps its id, not the one generated here
+                product_id, stock = existing.get(sku, (product.id, 0))
+                product.stock_quantity = stock
+                if opening_stock is not None:
+                    movements.append(build_adjustment(product_id, stock, opening_stock, owner, OPENING_STOCK_REFERENCE))
+                    product.stock_quantity = opening_stock
+                    if product_id in sharded:
+                        shard_totals.append((product_id, opening_stock))
+                products.append(product)
+
+            if products:
+                Product.objects.bulk_create(
+                    products,
+                    batch_size=chunk_size,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=sorted(update_fields),
+                )
+                StockTransaction.objects.bulk_create(movements, batch_size=chunk_size)
+                change_log.record_changes(
+                    [(Product, existing[p.sku][0], change_log.UPDATED) if p.sku in existing
+                     else (Product, p.id, change_log.CREATED) for p in products]
+                    + [(StockTransaction, movement.pk, change_log.CREATED) for movement in movements]
+                )
+                for product_id, stock in shard_totals:
+                    stock_counters.set_total(Product(pk=product_id), stock)
+                result.created += sum(1 for p in products if p.sku not in existing)
+                result.updated += sum(1 for p in products if p.sku in existing)
+                result.stock_posted += len(movements)
+
+            if dry_run:
+                transaction.set_rollback(True)
+
+    if not dry_run:
+        # bulk_create bypasses the post_save signals
+        erp_cache.invalidate_tags(erp_cache.PRODUCT, erp_cache.STOCK_TRANSACTION)
+    return result
+
+
+def build_adjustment(product_id, previous_stock, quantity, owner, reference):
+    """
+    Unsaved ADJ StockTransaction setting a product's stock to ``quantity``,
+    for use with ``bulk_create`` (which skips ``StockTransaction.save``).
+    The caller is responsible for writing ``quantity`` to the product.
+    """
+    return StockTransaction(
+        product_id=product_id,
+        transaction_type='ADJ',
+        quantity=quantity,
+        previous_stock=previous_stock,
+        current_stock=quantity,
+        reference=reference,
+        owner_id=owner.pk,
+    )
+
+
+def import_customers(rows, owner, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Upsert customers/vendors. ``CustomerVendor`` has no unique business key,
+    so existing records are matched on name (case-insensitive) + phone number.
+    """
+    result = ImportResult()
+    seen = set()
+
+    for chunk in chunked(rows, chunk_size):
+        valid = []
+        for row_number, row in chunk:
+            result.rows += 1
+            values, errors = clean_row(CustomerVendor, row, CUSTOMER_FIELDS, CUSTOMER_REQUIRED)
+            match_key = (str(values.get('name', '')).lower(), values.get('phone_number'))
+            if not errors and match_key in seen:
+                errors.append('duplicate of an earlier row (same name and phone number)')
+            if errors:
+                result.add_error(row_number, values.get('name'), '; '.join(errors))
+                continue
+            seen.add(match_key)
+            valid.append((match_key, values))
+
+        if not valid:
+            continue
+
+        with transaction.atomic():
+            phones = {match_key[1] for match_key, _ in valid}
+            existing = {
+                (c.name.lower(), c.phone_number): c
+                for c in CustomerVendor.objects.filter(phone_number__in=phones)
+            }
+            to_create = []
+            to_update = []
+            update_fields = {'updated_at'}
+            now = timezone.now()
+            for match_key, values in valid:
+                customer = existing.get(match_key)
+                if customer is None:
+                    to_create.append(CustomerVendor(owner=owner, **values))
+                    continue
+                for name, value in values.items():
+                    setattr(customer, name, value)
+                customer.updated_at = now
+                update_fields.update(values)
+                to_update.append(customer)
+
+            CustomerVendor.objects.bulk_create(to_create, batch_size=chunk_size)
+            if to_update:
+                CustomerVendor.objects.bulk_update(to_update, sorted(update_fields), batch_size=chunk_size)
+            change_log.record_changes(
+                [(CustomerVendor, c.pk, change_log.CREATED) for c in to_create]
+                + [(CustomerVendor, c.pk, change_log.UPDATED) for c in to_update]
+            )
+            result.created += len(to_create)
+            result.updated += len(to_update)
+
+            if dry_run:
+                transaction.set_rollback(True)
+
+    return result
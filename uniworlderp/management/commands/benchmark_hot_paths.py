@@ -0,0 +1,99 @@
+"""
+Django management command to benchmark the ERP hot paths (see
+uniworlderp/benchmarks.py): latency, query count and peak memory of the
+reports, the dashboard, the sales order form and the list views, compared
+with the JSON baseline of an earlier run (BENCHMARK_BASELINE).
+
+The first run writes the baseline; later runs flag each case that got slower,
+heavier or ran more queries than it. Run it on a database seeded with
+seed_benchmark_data, the same one every time.
+
+Usage:
+    python manage.py seed_benchmark_data --customers 2000 --products 5000 --orders 100000
+    python manage.py benchmark_hot_paths
+    python manage.py benchmark_hot_paths --check                 # exit non-zero on a regression (CI)
+    python manage.py benchmark_hot_paths --only dashboard stock_report --repeat 50
+    python manage.py benchmark_hot_paths --save                  # accept the current numbers as the baseline
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Measure the hot-path views and flag regressions against a JSON baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to log in as (defaults to the first superuser)')
+        parser.add_argument('--only', nargs='+', choices=[case.name for case in benchmarks.CASES],
+                            metavar='CASE', help='Only these cases')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per case')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per case before measuring')
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE,
+                            help='Baseline JSON file (default BENCHMARK_BASELINE)')
+        parser.add_argument('--tolerance', type=float, default=settings.BENCHMARK_TOLERANCE,
+                            help='Relative p50 / memory increase flagged as a regression '
+                                 f'(default {settings.BENCHMARK_TOLERANCE})')
+        parser.add_argument('--save', action='store_true', help='Write this run as the new baseline')
+        parser.add_argument('--check', action='store_true', help='Fail when any case regressed')
+        parser.add_argument('--output', help='Also write this run to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        cases = [case for case in benchmarks.CASES if not options['only'] or case.name in options['only']]
+        baseline = benchmarks.load_baseline(options['baseline'])
+
+        self.stdout.write(f'{"case":32s} {"p50 ms":>9s} {"p95 ms":>9s} {"queries":>8s} {"peak KiB":>9s}')
+        try:
+            current = benchmarks.run(
+                self.get_user(options['username']), cases,
+                repeat=options['repeat'], warmup=options['warmup'], progress=self.progress,
+            )
+        except (AssertionError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            benchmarks.save_baseline(options['output'], current)
+        if baseline is None or options['save']:
+            if baseline is not None and options['only']:
+                # Keep the numbers of the cases not run this time
+                current['results'] = {**baseline['results'], **current['results']}
+            benchmarks.save_baseline(options['baseline'], current)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+            return
+
+        if baseline.get('dataset') != current['dataset']:
+            self.stdout.write(self.style.WARNING(
+                f'The baseline was measured on other data: {baseline.get("dataset")} '
+                f'(now {current["dataset"]}); the comparison may not mean much.'
+            ))
+        regressions = benchmarks.compare(current, baseline, options['tolerance'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'No regression against {options["baseline"]}.'))
+            return
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(f'REGRESSION {regression}'))
+        if options['check']:
+            raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+
+    def progress(self, name, result):
+        self.stdout.write(
+            f'{name:32s} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f} '
+            f'{result["queries"]:8d} {result["peak_kib"]:9d}'
+        )
+
+    def get_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No superuser found, pass --username')
+        return user
@@ -0,0 +1,111 @@
+"""
+Django management command to benchmark read API pulls (uniworlderp/read_api.py):
+time, rows per second and peak Python memory of one page per size.
+
+The page is streamed, so the peak memory should stay about the same whether
+a page has 1,000 or 10,000 rows. With --seed the products are created in a
+transaction that is rolled back afterwards.
+
+Usage:
+    python manage.py benchmark_read_api --seed 10000
+    python manage.py benchmark_read_api --endpoint stock-transactions --sizes 1000 5000 10000
+    python manage.py benchmark_read_api --seed 10000 --fields id,sku,stock_quantity --gzip
+"""
+
+import time
+import tracemalloc
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from uniworlderp import read_api
+from uniworlderp.models import Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time read API pages of several sizes and report their peak memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to pull as (defaults to the first superuser)')
+        parser.add_argument('--endpoint', default='products', choices=sorted(read_api.ENDPOINTS))
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000], help='Page sizes to pull')
+        parser.add_argument('--fields', help='?fields= of the pulls (default: the endpoint default)')
+        parser.add_argument('--gzip', action='store_true', help='Ask for gzip-compressed responses')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Create this many products first, rolled back at the end')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(user, options['seed'])
+                self.pull(user, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def get_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No superuser found, pass --username')
+        return user
+
+    def seed(self, user, count):
+        prefix = uuid.uuid4().hex[:8]
+        Product.objects.bulk_create(
+            [
+                Product(name=f'Benchmark product {i}', sku=f'BENCH-{prefix}-{i}', price=i % 500,
+                        stock_quantity=i % 1000, owner=user)
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        self.stdout.write(f'Seeded {count} products (rolled back at the end)')
+
+    def pull(self, user, options):
+        client = Client()
+        client.force_login(user)
+        url = reverse('customer_vendor:read_api_endpoint', args=[options['endpoint']])
+        headers = {'HTTP_ACCEPT_ENCODING': 'gzip'} if options['gzip'] else {}
+
+        self.stdout.write(f'{"rows":>8} {"bytes":>12} {"seconds":>9} {"rows/s":>9} {"peak KiB":>9}')
+        for size in options['sizes']:
+            params = {'limit': size}
+            if options['fields']:
+                params['fields'] = options['fields']
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get(url, params, **headers)
+            if response.status_code != 200:
+                tracemalloc.stop()
+                raise CommandError(f'{url} answered {response.status_code}: {response.content[:200]!r}')
+            # Counted as it arrives, the way a client writing to disk would
+            received = sum(len(piece) for piece in response.streaming_content)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            rows = min(size, self.count(options['endpoint']))
+            self.stdout.write(
+                f'{rows:>8} {received:>12} {elapsed:>9.2f} {rows / elapsed if elapsed else 0:>9.0f} '
+                f'{peak / 1024:>9.0f}'
+            )
+
+    def count(self, name):
+        return read_api.ENDPOINTS[name].model._default_manager.count()
@@ -0,0 +1,64 @@
+"""
+Django management command to stream the change feed (see
+uniworlderp/change_log.py) as JSON lines, one change per line, or to
+compact it.
+
+Usage:
+    python manage.py change_feed --since 0 > changes.jsonl     # everything still kept
+    python manage.py change_feed --since 18250 --models product stocktransaction
+    python manage.py change_feed --since 18250 --follow        # keep polling for new changes
+    python manage.py change_feed --compact                     # daily, drops changes past the retention window
+
+The cursor to resume from is written to stderr when the command stops.
+"""
+
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import change_log
+
+
+class Command(BaseCommand):
+    help = 'Print the changes after a sequence number as JSON lines, or compact the change log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=int, default=0, help='Last sequence number already consumed (default 0)')
+        parser.add_argument('--models', nargs='+', metavar='MODEL', choices=sorted(change_log.MODELS_BY_NAME),
+                            help='Only changes of these models')
+        parser.add_argument('--limit', type=int, default=change_log.DEFAULT_LIMIT,
+                            help=f'Changes read per query (default {change_log.DEFAULT_LIMIT})')
+        parser.add_argument('--follow', action='store_true', help='Keep polling for new changes until interrupted')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --follow')
+        parser.add_argument('--compact', action='store_true',
+                            help='Delete the changes older than CHANGE_LOG_RETENTION_DAYS instead')
+        parser.add_argument('--days', type=int, help='Retention for --compact (default CHANGE_LOG_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        if options['compact']:
+            deleted = change_log.compact(options['days'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change(s).'))
+            return
+        if options['since'] < 0:
+            raise CommandError('--since must not be negative')
+
+        since = options['since']
+        try:
+            while True:
+                try:
+                    feed = change_log.changes_since(since, options['limit'], options['models'])
+                except change_log.FeedExpired as e:
+                    raise CommandError(f'{e}; then continue from --since {e.newest}')
+                for change in feed['changes']:
+                    self.stdout.write(json.dumps(change, cls=DjangoJSONEncoder))
+                since = feed['next']
+                if not feed['has_more']:
+                    if not options['follow']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stderr.write(f'next --since {since}')
@@ -0,0 +1,59 @@
+"""
+Django management command to backfill the resized copies of uploaded images
+(product images, employee / profile pictures, company logos).
+
+Usage:
+    python manage.py generate_thumbnails
+    python manage.py generate_thumbnails --models uniworlderp.Product --sizes thumb
+    python manage.py generate_thumbnails --force      # re-encode existing derivatives
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from PIL import Image, UnidentifiedImageError
+
+from myproject import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Create the resized thumbnails of every uploaded product, employee, profile and company image'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models', nargs='+',
+            help=f'Limit to these models ({", ".join(label for label, _, _ in thumbnails.IMAGE_FIELDS)})',
+        )
+        parser.add_argument(
+            '--sizes', nargs='+', choices=list(thumbnails.SIZES),
+            help='Sizes to make (default: the sizes configured for each field)',
+        )
+        parser.add_argument('--force', action='store_true', help='Re-encode derivatives that already exist')
+
+    def handle(self, *args, **options):
+        labels = {label.lower() for label in options['models'] or []}
+        known = {label.lower() for label, _, _ in thumbnails.IMAGE_FIELDS}
+        if labels - known:
+            raise CommandError(f'Unknown model(s): {", ".join(sorted(labels - known))}')
+
+        started = time.perf_counter()
+        made = failed = 0
+        for model, field, sizes in thumbnails.image_fields():
+            if labels and model._meta.label_lower not in labels:
+                continue
+            sizes = options['sizes'] or sizes
+            queryset = model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            self.stdout.write(f'{model._meta.label}.{field}: {queryset.count()} image(s), sizes {", ".join(sizes)}')
+
+            for instance in queryset.only('pk', field).iterator(chunk_size=500):
+                try:
+                    made += thumbnails.generate_for_instance(instance, field, sizes, force=options['force'])
+                except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+                    failed += 1
+                    self.stderr.write(f'  {getattr(instance, field).name}: {e}')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{made} thumbnail(s) ready, {failed} image(s) failed in {elapsed:.1f}s'
+        ))
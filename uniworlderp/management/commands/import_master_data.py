@@ -0,0 +1,90 @@
+"""
+Django management command to bulk import products (with opening stock) or
+customers/vendors from a CSV or XLSX file.
+
+Usage:
+    # Products, upserted on SKU; an opening_stock column is posted as ADJ movements:
+    python manage.py import_master_data products catalog.xlsx --username admin
+
+    # Customers/vendors, matched on name + phone number:
+    python manage.py import_master_data customers customers.csv --username admin
+
+    # Validate only and write the rejected rows to a CSV report:
+    python manage.py import_master_data products catalog.csv --dry-run --error-report errors.csv
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import importers
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products (with opening stock) or customers/vendors from CSV/XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['products', 'customers'])
+        parser.add_argument('path', help='Path to a .csv or .xlsx file')
+        parser.add_argument('--username', help='Owner of the imported records (defaults to the first superuser)')
+        parser.add_argument('--chunk-size', type=int, default=importers.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--no-opening-stock', action='store_true', help='Ignore the opening_stock column')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and roll back every chunk')
+        parser.add_argument('--error-report', help='Write rejected rows to this CSV file')
+
+    def handle(self, *args, **options):
+        owner = self.get_owner(options['username'])
+        started = time.perf_counter()
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                rows = importers.iter_rows(fileobj, options['path'])
+                if options['kind'] == 'products':
+                    result = importers.import_products(
+                        rows, owner,
+                        chunk_size=options['chunk_size'],
+                        post_opening_stock=not options['no_opening_stock'],
+                        dry_run=options['dry_run'],
+                    )
+                else:
+                    result = importers.import_customers(
+                        rows, owner,
+                        chunk_size=options['chunk_size'],
+                        dry_run=options['dry_run'],
+                    )
+        except (OSError, ValidationError) as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN — nothing was saved.'))
+        self.stdout.write(
+            f'{result.rows} row(s) read in {elapsed:.2f}s: '
+            f'{result.created} created, {result.updated} updated, '
+            f'{result.stock_posted} opening stock movement(s), {len(result.errors)} rejected.'
+        )
+
+        if result.errors:
+            if options['error_report']:
+                with open(options['error_report'], 'w', newline='', encoding='utf-8') as report:
+                    result.write_error_report(report)
+                self.stdout.write(self.style.WARNING(f'Rejected rows written to {options["error_report"]}'))
+            else:
+                for error in result.errors[:50]:
+                    self.stdout.write(self.style.ERROR(f'  row {error["row"]} {error["key"]}: {error["error"]}'))
+                if len(result.errors) > 50:
+                    self.stdout.write(f'  ... {len(result.errors) - 50} more, use --error-report to see all')
+
+    def get_owner(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No superuser found, pass --username')
+        return user
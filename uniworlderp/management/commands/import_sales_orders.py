@@ -0,0 +1,76 @@
+"""
+Django management command to bulk create sales orders from a JSON file, the
+same batch format accepted by ``POST sales-orders/import/``.
+
+Usage:
+    python manage.py import_sales_orders orders.json --username admin
+    python manage.py import_sales_orders orders.json --dry-run --results results.json
+"""
+
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import order_import
+
+
+class Command(BaseCommand):
+    help = 'Bulk create sales orders (items and stock movements) from a JSON batch file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON file: a list of orders or {"orders": [...]}')
+        parser.add_argument('--username', help='Owner of the created orders (defaults to the first superuser)')
+        parser.add_argument('--chunk-size', type=int, default=order_import.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and roll back every chunk')
+        parser.add_argument('--results', help='Write the per-order results to this JSON file')
+
+    def handle(self, *args, **options):
+        owner = self.get_owner(options['username'])
+        try:
+            with open(options['path'], encoding='utf-8') as fileobj:
+                payload = json.load(fileobj)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        orders = payload.get('orders') if isinstance(payload, dict) else payload
+        if not isinstance(orders, list):
+            raise CommandError('Expected a list of orders or {"orders": [...]}')
+
+        started = time.perf_counter()
+        result = order_import.import_sales_orders(
+            orders, owner, chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+        )
+        elapsed = time.perf_counter() - started
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN — nothing was saved.'))
+        self.stdout.write(
+            f'{len(orders)} order(s) processed in {elapsed:.2f}s: '
+            f'{result.created} created, {result.rejected} rejected.'
+        )
+
+        if options['results']:
+            with open(options['results'], 'w', encoding='utf-8') as fileobj:
+                json.dump(result.as_dict(), fileobj, indent=2)
+            self.stdout.write(f'Per-order results written to {options["results"]}')
+        else:
+            rejected = [r for r in result.results if r['status'] == 'rejected']
+            for entry in rejected[:50]:
+                label = entry['ref'] or f'#{entry["index"]}'
+                self.stdout.write(self.style.ERROR(f'  order {label}: {"; ".join(entry["errors"])}'))
+            if len(rejected) > 50:
+                self.stdout.write(f'  ... {len(rejected) - 50} more, use --results to see all')
+
+    def get_owner(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No superuser found, pass --username')
+        return user
@@ -0,0 +1,106 @@
+"""
+Django management command to measure list view latency (p50/p99) with and
+without persistent database connections.
+
+The requests go through the in-process test client. The test client
+disconnects close_old_connections() from the request_started /
+request_finished signals (so that tests keep their transaction), so each
+request is wrapped in close_old_connections() calls here, the way the
+handler of a real server runs them: with CONN_MAX_AGE=0 every request opens a
+new connection, with a positive value it reuses the open one, exactly like in
+production.
+
+Usage:
+    # Compare CONN_MAX_AGE=0 against the configured value:
+    python manage.py loadtest_list_views --username admin --requests 200
+
+    # Only run with the configured settings:
+    python manage.py loadtest_list_views --username admin --no-compare
+"""
+
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+from uniworlderp.benchmarks import LIST_VIEWS, percentile
+
+
+class Command(BaseCommand):
+    help = 'Load-test the list views and report p50/p99 latency per CONN_MAX_AGE setting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to log in as (defaults to the first superuser)')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per view per run')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per view before measuring')
+        parser.add_argument(
+            '--no-compare',
+            action='store_true',
+            help='Only run with the configured CONN_MAX_AGE instead of also running with 0',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        configured = connections['default'].settings_dict['CONN_MAX_AGE']
+
+        runs = [configured] if options['no_compare'] else [0, configured]
+        for conn_max_age in dict.fromkeys(runs):
+            self.run(user, conn_max_age, options['requests'], options['warmup'])
+
+    def get_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No superuser found, pass --username')
+        return user
+
+    def run(self, user, conn_max_age, n_requests, warmup):
+        # Reconnect so the new CONN_MAX_AGE takes effect for the next connection
+        connection = connections['default']
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+        client = Client()
+        client.force_login(user)
+
+        self.stdout.write('=' * 70)
+        self.stdout.write(f'CONN_MAX_AGE = {conn_max_age}  ({connection.vendor})')
+        self.stdout.write('=' * 70)
+        self.stdout.write(f'{"view":45s} {"p50 ms":>8s} {"p99 ms":>8s} {"mean ms":>8s}')
+
+        for view_name in LIST_VIEWS:
+            url = reverse(view_name)
+            for _ in range(warmup):
+                self.get(client, url)
+
+            samples = []
+            for _ in range(n_requests):
+                started = time.perf_counter()
+                response = self.get(client, url)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned HTTP {response.status_code}')
+
+            self.stdout.write(
+                f'{view_name:45s} '
+                f'{percentile(samples, 50):8.2f} '
+                f'{percentile(samples, 99):8.2f} '
+                f'{statistics.mean(samples):8.2f}'
+            )
+
+    def get(self, client, url):
+        # What request_started / request_finished do around a request in a server
+        close_old_connections()
+        try:
+            return client.get(url)
+        finally:
+            close_old_connections()
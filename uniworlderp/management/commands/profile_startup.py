@@ -0,0 +1,182 @@
+"""
+Django management command to measure how long a fresh worker takes to boot
+and what it imports.
+
+Each run starts a new interpreter that loads the WSGI application and the
+URLconf, as a gunicorn worker does, and reports its boot time and peak RSS.
+One extra run under ``python -X importtime`` is parsed into the modules that
+cost the most.
+
+Usage:
+    python manage.py profile_startup
+    python manage.py profile_startup --runs 10 --warmup --top 30
+    python manage.py profile_startup --json startup.json     # keep for comparison
+"""
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+BOOT_SCRIPT = r'''
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', %(settings)r)
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+booted = time.perf_counter()
+if %(warmup)r:
+    from uniworlderp.warmup import warmup
+    warmup()
+warmed = time.perf_counter()
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss = rss / 1024 if sys.platform != 'darwin' else rss / 1024 / 1024
+except ImportError:
+    rss = None
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'warmup_ms': (warmed - booted) * 1000,
+    'rss_mb': rss,
+    'modules': len(sys.modules),
+}))
+'''
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|(?P<indent> +)(?P<module>\S+)$')
+
+
+def parse_importtime(stderr):
+    """
+    ``[(module, self_us, cumulative_us, depth), ...]`` from the stderr of
+    ``python -X importtime``; depth 1 is a module imported by the script itself.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((
+                match.group('module'),
+                int(match.group('self')),
+                int(match.group('cumulative')),
+                (len(match.group('indent')) - 1) // 2,
+            ))
+    return entries
+
+
+def import_report(entries, top):
+    """Slowest modules by cumulative and by own time, and own time summed per top-level package."""
+    by_package = {}
+    for module, self_us, _, _ in entries:
+        package = module.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    return {
+        'total_ms': sum(e[1] for e in entries) / 1000,
+        'modules': len(entries),
+        'cumulative': [
+            {'module': m, 'ms': c / 1000} for m, _, c, _ in sorted(entries, key=lambda e: -e[2])[:top]
+        ],
+        'self': [
+            {'module': m, 'ms': s / 1000} for m, s, _, _ in sorted(entries, key=lambda e: -e[1])[:top]
+        ],
+        'packages': [
+            {'package': p, 'ms': us / 1000} for p, us in sorted(by_package.items(), key=lambda i: -i[1])[:top]
+        ],
+    }
+
+
+def summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+
+
+class Command(BaseCommand):
+    help = 'Measure worker boot time, peak RSS and import-time hot spots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time (default 5)')
+        parser.add_argument('--warmup', action='store_true', help='Also run uniworlderp.warmup after booting')
+        parser.add_argument('--top', type=int, default=20, help='Modules to list in the import report')
+        parser.add_argument('--no-importtime', action='store_true', help='Skip the -X importtime report')
+        parser.add_argument('--json', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        script = BOOT_SCRIPT % {
+            'settings': os.environ.get('DJANGO_SETTINGS_MODULE', 'myproject.settings'),
+            'warmup': options['warmup'],
+        }
+
+        runs = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = self.run([sys.executable, '-c', script])
+            run = json.loads(result.stdout.strip().splitlines()[-1])
+            run['process_ms'] = (time.perf_counter() - started) * 1000
+            runs.append(run)
+
+        report = {
+            'runs': runs,
+            'boot_ms': summarize([r['boot_ms'] for r in runs]),
+            'process_ms': summarize([r['process_ms'] for r in runs]),
+            'warmup_ms': summarize([r['warmup_ms'] for r in runs]) if options['warmup'] else None,
+            'rss_mb': summarize([r['rss_mb'] for r in runs]),
+            'modules': runs[-1]['modules'],
+        }
+        if not options['no_importtime']:
+            result = self.run([sys.executable, '-X', 'importtime', '-c', script])
+            report['imports'] = import_report(parse_importtime(result.stderr), options['top'])
+
+        self.print_report(report, options)
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Wrote {options["json"]}')
+
+    def run(self, command):
+        result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f'Boot failed:\n{result.stderr[-2000:]}')
+        return result
+
+    def print_report(self, report, options):
+        def line(label, stats, unit):
+            if stats:
+                self.stdout.write(
+                    f'{label:<22} median {stats["median"]:8.1f} {unit}   '
+                    f'min {stats["min"]:8.1f}   max {stats["max"]:8.1f}'
+                )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Worker boot ({options["runs"]} runs)'))
+        line('Django + URLconf', report['boot_ms'], 'ms')
+        line('Whole process', report['process_ms'], 'ms')
+        line('Warmup', report['warmup_ms'], 'ms')
+        line('Peak RSS', report['rss_mb'], 'MB')
+        self.stdout.write(f'{"Modules loaded":<22} {report["modules"]}')
+
+        imports = report.get('imports')
+        if not imports:
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nImports: {imports["modules"]} modules, {imports["total_ms"]:.1f} ms'
+        ))
+        for title, key, name in (
+            ('Slowest, including what they import', 'cumulative', 'module'),
+            ('Slowest, own time', 'self', 'module'),
+            ('Own time by top-level package', 'packages', 'package'),
+        ):
+            self.stdout.write(f'\n{title}:')
+            for entry in imports[key]:
+                self.stdout.write(f'  {entry["ms"]:8.1f} ms  {entry[name]}')
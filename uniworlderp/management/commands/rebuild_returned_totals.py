@@ -0,0 +1,45 @@
+"""
+Django management command to recompute SalesOrderItem.returned_quantity and
+returned_amount from the return lines (see uniworlderp/sales_returns.py),
+e.g. after return lines were changed with QuerySet.update() or raw SQL.
+
+Usage:
+    python manage.py rebuild_returned_totals
+    python manage.py rebuild_returned_totals --dry-run
+    python manage.py rebuild_returned_totals --check          # exit non-zero on drift (CI, cron)
+    python manage.py rebuild_returned_totals --orders 12 15
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import sales_returns
+
+
+class Command(BaseCommand):
+    help = 'Recompute the returned quantity and amount of sales order lines from the return lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', nargs='+', type=int, metavar='ORDER_ID',
+                            help='Only the lines of these sales orders')
+        parser.add_argument('--dry-run', action='store_true', help='Report the drifted lines without writing')
+        parser.add_argument('--check', action='store_true',
+                            help='Like --dry-run, but fail when any line has drifted')
+        parser.add_argument('--batch-size', type=int, default=sales_returns.DEFAULT_BATCH_SIZE,
+                            help=f'Lines read and written per batch (default {sales_returns.DEFAULT_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        dry_run = options['dry_run'] or options['check']
+
+        changes = sales_returns.rebuild(options['orders'], dry_run=dry_run, batch_size=options['batch_size'])
+        for line, (quantity, amount), (new_quantity, new_amount) in changes:
+            self.stdout.write(
+                f'Order {line.sales_order_id} line {line.pk}: '
+                f'returned {quantity} / {amount} -> {new_quantity} / {new_amount}'
+            )
+
+        if options['check'] and changes:
+            raise CommandError(f'{len(changes)} sales order line(s) have drifted returned totals')
+        verb = 'would be updated' if dry_run else 'updated'
+        self.stdout.write(self.style.SUCCESS(f'{len(changes)} sales order line(s) {verb}.'))
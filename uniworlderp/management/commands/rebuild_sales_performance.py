@@ -0,0 +1,47 @@
+"""
+Django management command to recompute the monthly sales employee
+performance rows from the sales orders and returns (see
+uniworlderp/sales_performance.py), e.g. after orders or returns were changed
+with QuerySet.update() or raw SQL.
+
+Usage:
+    python manage.py rebuild_sales_performance
+    python manage.py rebuild_sales_performance --dry-run
+    python manage.py rebuild_sales_performance --check          # exit non-zero on drift (CI, cron)
+    python manage.py rebuild_sales_performance --employees 3 7
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import sales_performance
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly sales employee performance from the sales orders and returns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', nargs='+', type=int, metavar='EMPLOYEE_ID',
+                            help='Only the rows of these sales employees')
+        parser.add_argument('--dry-run', action='store_true', help='Report the drifted rows without writing')
+        parser.add_argument('--check', action='store_true',
+                            help='Like --dry-run, but fail when any row has drifted')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run'] or options['check']
+
+        changes = sales_performance.rebuild(options['employees'], dry_run=dry_run)
+        for (employee_id, month), before, after in changes:
+            self.stdout.write(
+                f'Employee {employee_id} {month:%Y-%m}: {self.describe(before)} -> {self.describe(after)}'
+            )
+
+        if options['check'] and changes:
+            raise CommandError(f'{len(changes)} performance row(s) have drifted')
+        verb = 'would be updated' if dry_run else 'updated'
+        self.stdout.write(self.style.SUCCESS(f'{len(changes)} performance row(s) {verb}.'))
+
+    def describe(self, values):
+        if values is None:
+            return 'none'
+        gross, returned, orders, customers = values
+        return f'gross {gross} / returned {returned} / {orders} orders / {customers} customers'
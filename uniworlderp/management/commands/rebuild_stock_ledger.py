@@ -0,0 +1,137 @@
+"""
+Django management command to rebuild or verify the running balances
+(previous_stock / current_stock) of the stock ledger.
+
+Usage:
+    # Nightly consistency check over the full table, exits non-zero on drift:
+    python manage.py rebuild_stock_ledger --check
+
+    # Preview the rows that would change from a date onwards:
+    python manage.py rebuild_stock_ledger --since 2026-03-07 --dry-run
+
+    # Rebuild some products and set Product.stock_quantity to the ledger balance:
+    python manage.py rebuild_stock_ledger --products SKU-1 SKU-2 --fix-product-stock
+
+    # Full rebuild across 4 worker processes (PostgreSQL; SQLite only parallelises dry runs):
+    python manage.py rebuild_stock_ledger --workers 4
+"""
+
+import json
+import time
+from datetime import datetime, time as dt_time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from uniworlderp import stock_ledger
+from uniworlderp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recompute previous_stock/current_stock of stock transactions and check them against product stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Replay from this date or ISO datetime (default: the whole ledger)')
+        parser.add_argument('--products', nargs='+', metavar='SKU_OR_ID', help='Only these products (SKU or id)')
+        parser.add_argument(
+            '--opening', choices=[stock_ledger.OPENING_RECORDED, stock_ledger.OPENING_ZERO],
+            default=stock_ledger.OPENING_RECORDED,
+            help='Balance of a product with no rows before --since: the recorded previous_stock '
+                 'of its first row (default) or 0',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument('--check', action='store_true',
+                            help='Dry run that fails when the ledger or product stock has drifted')
+        parser.add_argument('--fix-product-stock', action='store_true',
+                            help='Set Product.stock_quantity to the ledger balance where they differ')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (default 1)')
+        parser.add_argument('--chunk-size', type=int, default=stock_ledger.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--batch-size', type=int, default=stock_ledger.DEFAULT_PRODUCTS_PER_BATCH,
+                            help='Products per transaction / worker task')
+        parser.add_argument('--max-diffs', type=int, default=50, help='Changed rows to print')
+        parser.add_argument('--report', help='Write the diffs and mismatches to this JSON file')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run'] or options['check']
+        since = self.parse_since(options['since'])
+        product_ids = self.resolve_products(options['products']) if options['products'] else None
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN — no changes will be saved.'))
+
+        started = time.perf_counter()
+        report = stock_ledger.rebuild(
+            product_ids=product_ids,
+            since=since,
+            opening=options['opening'],
+            dry_run=dry_run,
+            fix_product_stock=options['fix_product_stock'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            products_per_batch=options['batch_size'],
+            max_diffs=options['max_diffs'],
+            progress=lambda r: self.stdout.write(f'  batch: {r.products} product(s), {r.transactions} row(s), {r.changed} changed'),
+        )
+        elapsed = time.perf_counter() - started
+        if report.workers < options['workers']:
+            self.stdout.write(self.style.WARNING('SQLite allows a single writer, the rebuild ran in one process.'))
+
+        for diff in report.diffs:
+            self.stdout.write(
+                f'  {diff["sku"]} [{diff["date"][:16]}] {diff["type"]:3s} qty={diff["quantity"]:<5d} '
+                f'prev: {diff["previous_stock"][0]} -> {diff["previous_stock"][1]} | '
+                f'curr: {diff["current_stock"][0]} -> {diff["current_stock"][1]} ref={diff["reference"] or "-"}'
+            )
+        if report.changed > len(report.diffs):
+            self.stdout.write(f'  ... {report.changed - len(report.diffs)} more changed row(s)')
+        for mismatch in report.mismatches:
+            self.stdout.write(self.style.ERROR(
+                f'  {mismatch["sku"]} {mismatch["name"]}: stock_quantity={mismatch["stock_quantity"]}, '
+                f'ledger balance={mismatch["ledger"]}'
+            ))
+
+        verb = 'would change' if dry_run else 'changed'
+        self.stdout.write(
+            f'{report.products} product(s), {report.transactions} row(s) replayed in {elapsed:.2f}s: '
+            f'{report.changed} {verb}, {len(report.mismatches)} product stock mismatch(es), '
+            f'{report.clamped} OUT movement(s) clamped at 0.'
+        )
+        if report.products_fixed:
+            self.stdout.write(self.style.SUCCESS(f'Product stock_quantity set from the ledger for {report.products_fixed} product(s).'))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as fileobj:
+                json.dump({'diffs': report.diffs, 'mismatches': report.mismatches}, fileobj, indent=2)
+
+        if options['check'] and not report.consistent:
+            raise CommandError('Stock ledger is inconsistent, see above.')
+        if report.consistent:
+            self.stdout.write(self.style.SUCCESS('Stock ledger is consistent.'))
+
+    def parse_since(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f'Invalid --since "{value}", use YYYY-MM-DD or an ISO datetime')
+            parsed = datetime.combine(day, dt_time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def resolve_products(self, keys):
+        ids = {}
+        for product in Product.objects.filter(sku__in=keys).only('pk', 'sku'):
+            ids[product.sku] = product.pk
+        for key in keys:
+            if key in ids:
+                continue
+            try:
+                ids[key] = Product.objects.only('pk').get(pk=key).pk
+            except (Product.DoesNotExist, ValidationError):
+                raise CommandError(f'Product "{key}" not found')
+        return list(ids.values())
@@ -0,0 +1,77 @@
+"""
+Django management command to fill a database with synthetic customers,
+products, sales orders, returns and stock movements at realistic volume and
+skew (see uniworlderp/synthetic_data.py), for benchmark_hot_paths and load
+tests. Run it against a scratch database, not production.
+
+Usage:
+    python manage.py seed_benchmark_data --customers 2000 --products 5000 --orders 100000
+    python manage.py seed_benchmark_data --customers 50 --products 200 --orders 1000 --seed 7 --days 90
+
+    # Then classify and suggest reorders so the product list shows them:
+    python manage.py classify_abc && python manage.py suggest_reorders
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import synthetic_data
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic customers, products, orders, returns and stock movements for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=500)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--employees', type=int, default=10, help='Sales employees the orders are spread over')
+        parser.add_argument('--days', type=int, default=synthetic_data.DEFAULT_DAYS,
+                            help=f'Days of history ending today (default {synthetic_data.DEFAULT_DAYS})')
+        parser.add_argument('--return-rate', type=float, default=synthetic_data.DEFAULT_RETURN_RATE,
+                            help=f'Share of the orders with a return (default {synthetic_data.DEFAULT_RETURN_RATE})')
+        parser.add_argument('--skew', type=float, default=synthetic_data.DEFAULT_SKEW,
+                            help=f'Zipf exponent of product and customer popularity (default {synthetic_data.DEFAULT_SKEW})')
+        parser.add_argument('--seed', type=int, help='Random seed, for the same distributions run after run')
+        parser.add_argument('--chunk-size', type=int, default=synthetic_data.DEFAULT_CHUNK_SIZE,
+                            help='Orders generated and written per chunk')
+        parser.add_argument('--username', help='Owner of the rows (defaults to the first superuser)')
+
+    def handle(self, *args, **options):
+        for name in ('customers', 'products', 'days', 'chunk_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be at least 1')
+        if options['orders'] < 0 or options['employees'] < 0:
+            raise CommandError('--orders and --employees cannot be negative')
+        if not 0 <= options['return_rate'] <= 1:
+            raise CommandError('--return-rate must be between 0 and 1')
+
+        started = time.perf_counter()
+        summary = synthetic_data.generate(
+            self.get_owner(options['username']),
+            options['customers'], options['products'], options['orders'],
+            employees=options['employees'], days=options['days'], return_rate=options['return_rate'],
+            skew=options['skew'], seed=options['seed'], chunk_size=options['chunk_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Run {summary.run}: {summary.customers} customer(s), {summary.employees} employee(s), '
+            f'{summary.products} product(s), {summary.orders} order(s) with {summary.items} line(s), '
+            f'{summary.returns} return(s), {summary.movements} stock movement(s) '
+            f'({summary.receipts} receipt(s)) in {elapsed:.1f}s.'
+        ))
+        self.stdout.write(f'SKUs start with BENCH-{summary.run}-.')
+
+    def get_owner(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No superuser found, pass --username')
+        return user
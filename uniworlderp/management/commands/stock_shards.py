@@ -0,0 +1,69 @@
+"""
+Django management command to manage the sharded stock counters of
+fast-moving products (see uniworlderp/stock_counters.py).
+
+Usage:
+    python manage.py stock_shards                          # list the sharded products
+    python manage.py stock_shards --enable SKU-1 SKU-2 --shards 16
+    python manage.py stock_shards --disable SKU-1
+    python manage.py stock_shards --reconcile              # cron, every few minutes
+"""
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from uniworlderp import stock_counters
+from uniworlderp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Enable, disable, reconcile or list the sharded stock counters of products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enable', nargs='+', metavar='SKU_OR_ID', help='Shard the stock of these products')
+        parser.add_argument('--disable', nargs='+', metavar='SKU_OR_ID',
+                            help='Fold the shards of these products back into stock_quantity')
+        parser.add_argument('--shards', type=int, help='Counter rows per product for --enable '
+                                                       '(default STOCK_COUNTER_SHARDS)')
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Even out the shards and refresh Product.stock_quantity from them')
+
+    def handle(self, *args, **options):
+        if options['shards'] is not None and options['shards'] < 1:
+            raise CommandError('--shards must be at least 1')
+
+        for product in self.resolve_products(options['enable'] or []):
+            stock_counters.enable(product, options['shards'])
+            self.stdout.write(f'Sharded {product.sku} {product.name}')
+        for product in self.resolve_products(options['disable'] or []):
+            product = stock_counters.disable(product)
+            self.stdout.write(f'Unsharded {product.sku} {product.name}: stock_quantity={product.stock_quantity}')
+        if options['reconcile']:
+            changed = stock_counters.reconcile()
+            self.stdout.write(self.style.SUCCESS(f'Reconciled, stock_quantity refreshed for {changed} product(s).'))
+
+        if not (options['enable'] or options['disable'] or options['reconcile']):
+            products = (
+                Product.objects.filter(sharded_stock=True)
+                .annotate(shards=Count('stock_shards'), on_hand=Sum('stock_shards__quantity'))
+                .order_by('sku')
+            )
+            for product in products:
+                self.stdout.write(
+                    f'{product.sku:<20} {product.shards:>3} shard(s)  on hand {product.on_hand or 0:>8}  '
+                    f'stock_quantity {product.stock_quantity:>8}  {product.name}'
+                )
+            self.stdout.write(f'{len(products)} sharded product(s).')
+
+    def resolve_products(self, keys):
+        products = []
+        for key in keys:
+            product = Product.objects.filter(sku=key).first()
+            if product is None:
+                try:
+                    product = Product.objects.get(pk=key)
+                except (Product.DoesNotExist, ValidationError):
+                    raise CommandError(f'Product "{key}" not found')
+            products.append(product)
+        return products
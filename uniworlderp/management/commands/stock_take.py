@@ -0,0 +1,122 @@
+"""
+Django management command to run a physical stock-take from the command line
+(see uniworlderp/stock_take.py), e.g. with the export of a handheld scanner.
+
+Usage:
+    # Freeze the expected quantities of every active product (or one ABC class):
+    python manage.py stock_take start --username admin
+    python manage.py stock_take start --abc-class A --notes "Monthly A count"
+
+    # Import the counted quantities (columns sku, counted):
+    python manage.py stock_take import 12 counts.csv --error-report errors.csv
+
+    # Write the variance report, then post the differences as ADJ movements:
+    python manage.py stock_take report 12 variances.csv
+    python manage.py stock_take post 12 --username admin
+"""
+
+import csv
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import importers, stock_take as stock_takes
+from uniworlderp.models import ABC_CLASS_CHOICES, StockTake
+
+
+class Command(BaseCommand):
+    help = 'Start, import counts into, report on and post a physical stock-take'
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        start = actions.add_parser('start', help='Freeze the expected quantities of a new stock-take')
+        start.add_argument('--abc-class', choices=[value for value, _ in ABC_CLASS_CHOICES], default='',
+                           help='Only the products of this revenue class')
+        start.add_argument('--notes', default='')
+        start.add_argument('--username', help='Owner of the stock-take (defaults to the first superuser)')
+
+        counts = actions.add_parser('import', help='Import counted quantities from a CSV or XLSX file')
+        counts.add_argument('stock_take_id', type=int)
+        counts.add_argument('path', help='Path to a .csv or .xlsx file with sku and counted columns')
+        counts.add_argument('--chunk-size', type=int, default=stock_takes.DEFAULT_CHUNK_SIZE)
+        counts.add_argument('--dry-run', action='store_true', help='Validate without saving')
+        counts.add_argument('--error-report', help='Write rejected rows to this CSV file')
+
+        report = actions.add_parser('report', help='Write the variance report to a CSV file')
+        report.add_argument('stock_take_id', type=int)
+        report.add_argument('path')
+
+        post = actions.add_parser('post', help='Post the differences as ADJ stock movements')
+        post.add_argument('stock_take_id', type=int)
+        post.add_argument('--username', help='Owner of the movements (defaults to the first superuser)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        action = options['action']
+        if action == 'start':
+            stock_take = stock_takes.start(self.get_owner(options['username']), options['abc_class'], options['notes'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{stock_take.reference} started with {stock_take.lines.count()} line(s) '
+                f'in {time.perf_counter() - started:.2f}s.'
+            ))
+            return
+
+        try:
+            stock_take = StockTake.objects.get(pk=options['stock_take_id'])
+        except StockTake.DoesNotExist:
+            raise CommandError(f'Stock take {options["stock_take_id"]} does not exist')
+
+        try:
+            if action == 'import':
+                self.import_counts(stock_take, options)
+            elif action == 'report':
+                with open(options['path'], 'w', newline='', encoding='utf-8') as fileobj:
+                    csv.writer(fileobj).writerows(stock_takes.csv_rows(stock_take))
+                self.stdout.write(self.style.SUCCESS(f'Variance report written to {options["path"]}'))
+            else:
+                movements = stock_takes.post(stock_take, self.get_owner(options['username']))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{stock_take.reference} posted: {len(movements)} stock adjustment(s) '
+                    f'in {time.perf_counter() - started:.2f}s.'
+                ))
+        except (OSError, ValidationError) as e:
+            raise CommandError('; '.join(e.messages) if isinstance(e, ValidationError) else str(e))
+
+    def import_counts(self, stock_take, options):
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as fileobj:
+            result = stock_takes.import_counts(
+                stock_take, importers.iter_rows(fileobj, options['path']),
+                chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+            )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN — nothing was saved.'))
+        self.stdout.write(
+            f'{result.rows} row(s) read in {time.perf_counter() - started:.2f}s: '
+            f'{result.updated} line(s) counted, {len(result.errors)} rejected.'
+        )
+        if result.errors:
+            if options['error_report']:
+                with open(options['error_report'], 'w', newline='', encoding='utf-8') as report:
+                    result.write_error_report(report)
+                self.stdout.write(self.style.WARNING(f'Rejected rows written to {options["error_report"]}'))
+            else:
+                for error in result.errors[:50]:
+                    self.stdout.write(self.style.ERROR(f'  row {error["row"]} {error["key"]}: {error["error"]}'))
+                if len(result.errors) > 50:
+                    self.stdout.write(f'  ... {len(result.errors) - 50} more, use --error-report to see all')
+
+    def get_owner(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No superuser found, pass --username')
+        return user
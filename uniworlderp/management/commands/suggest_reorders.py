@@ -0,0 +1,65 @@
+"""
+Django management command to recompute the reorder suggestions of the whole
+catalogue from the stock movement history (see uniworlderp/reorder.py).
+Schedule it nightly; the product list and the stock report read its results.
+
+Usage:
+    python manage.py suggest_reorders
+    python manage.py suggest_reorders --dry-run --show 20
+    python manage.py suggest_reorders --history-days 180 --lead-time 14 --cover-days 45
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from uniworlderp import reorder
+from uniworlderp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recompute the reorder point and suggested order quantity of every active product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, help='Days of demand history (default REORDER_HISTORY_DAYS)')
+        parser.add_argument('--lead-time', type=int, help='Supplier lead time in days (default REORDER_LEAD_TIME_DAYS)')
+        parser.add_argument('--cover-days', type=int, help='Days of demand an order covers (default REORDER_COVER_DAYS)')
+        parser.add_argument('--service-level-z', type=float,
+                            help='Safety stock z-score (default REORDER_SERVICE_LEVEL_Z)')
+        parser.add_argument('--dry-run', action='store_true', help='Compute without saving')
+        parser.add_argument('--show', type=int, default=0, metavar='N',
+                            help='List the N products with the largest suggested orders')
+
+    def handle(self, *args, **options):
+        for name in ('history_days', 'lead_time', 'cover_days', 'service_level_z'):
+            if options[name] is not None and options[name] < 0:
+                raise CommandError(f'--{name.replace("_", "-")} cannot be negative')
+        policy = reorder.Policy.from_settings(
+            history_days=options['history_days'],
+            lead_time_days=options['lead_time'],
+            cover_days=options['cover_days'],
+            service_level_z=options['service_level_z'],
+        )
+
+        started = time.perf_counter()
+        try:
+            suggestions = reorder.suggest(policy, dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if options['show']:
+            names = dict(Product.objects.values_list('pk', 'name'))
+            largest = sorted(suggestions, key=lambda suggestion: -suggestion.order_quantity)[:options['show']]
+            for suggestion in largest:
+                self.stdout.write(
+                    f'{names.get(suggestion.product_id, suggestion.product_id)}: '
+                    f'{suggestion.daily_demand}/day, on hand {suggestion.stock_on_hand}, '
+                    f'reorder at {suggestion.reorder_point}, order {suggestion.order_quantity}'
+                )
+
+        to_order = sum(1 for suggestion in suggestions if suggestion.order_quantity)
+        verb = 'computed (dry run)' if options['dry_run'] else 'saved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(suggestions)} suggestion(s) {verb} in {elapsed:.2f}s; {to_order} product(s) to reorder.'
+        ))
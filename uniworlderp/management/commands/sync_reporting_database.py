@@ -0,0 +1,69 @@
+"""
+Django management command to refresh a local ``reporting`` database from the
+primary, for trying the read-replica routing (uniworlderp/db_routing.py)
+without a real replica.
+
+SQLite files are copied with SQLite's online backup. A PostgreSQL replica is
+recreated with ``CREATE DATABASE ... TEMPLATE <primary>``, which needs no
+other sessions on the primary while it runs. Production replicas are kept
+up to date by the database's own replication instead.
+
+Usage:
+    python manage.py sync_reporting_database
+"""
+
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from uniworlderp.db_routing import REPORTING_DB_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database over the local reporting replica'
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('No reporting database: set REPORTING_DATABASE_URL')
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[REPORTING_DB_ALIAS]
+        if primary.vendor != replica.vendor:
+            raise CommandError(f'Cannot copy {primary.vendor} to {replica.vendor}')
+        if primary.settings_dict['NAME'] == replica.settings_dict['NAME']:
+            raise CommandError('The reporting database is the primary database')
+
+        started = time.perf_counter()
+        primary.close()
+        replica.close()
+        if primary.vendor == 'sqlite':
+            self.copy_sqlite(primary.settings_dict['NAME'], replica.settings_dict['NAME'])
+        elif primary.vendor == 'postgresql':
+            self.copy_postgresql(primary, replica)
+        else:
+            raise CommandError(f'Copying {primary.vendor} databases is not supported')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Copied {primary.settings_dict["NAME"]} to {replica.settings_dict["NAME"]} '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def copy_sqlite(self, source, target):
+        source, target = sqlite3.connect(str(source)), sqlite3.connect(str(target))
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    def copy_postgresql(self, primary, replica):
+        quote = replica.ops.quote_name
+        try:
+            with replica._nodb_cursor() as cursor:
+                cursor.execute(f'DROP DATABASE IF EXISTS {quote(replica.settings_dict["NAME"])}')
+                cursor.execute(
+                    f'CREATE DATABASE {quote(replica.settings_dict["NAME"])} '
+                    f'TEMPLATE {quote(primary.settings_dict["NAME"])}'
+                )
+        except DatabaseError as e:
+            raise CommandError(f'{e}\nClose other connections to the primary (runserver, shells) and retry.')
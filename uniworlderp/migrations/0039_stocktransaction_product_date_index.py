@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-19 04:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0038_make_phone_number_required'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['product', 'transaction_date'], name='uniworlderp_product_c2d63e_idx'),
+        ),
+    ]
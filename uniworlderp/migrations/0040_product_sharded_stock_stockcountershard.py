@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-19 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0039_stocktransaction_product_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sharded_stock',
+            field=models.BooleanField(default=False, help_text='Keep the stock of this fast-moving product in sharded counters (see uniworlderp/stock_counters.py).'),
+        ),
+        migrations.CreateModel(
+            name='StockCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='uniworlderp.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Counter Shard',
+                'verbose_name_plural': 'Stock Counter Shards',
+                'constraints': [models.UniqueConstraint(fields=('product', 'shard'), name='unique_stock_counter_shard')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-19 04:35
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_returned_totals(apps, schema_editor):
+    """Sum the existing return lines into the new columns"""
+    SalesOrderItem = apps.get_model('uniworlderp', 'SalesOrderItem')
+    ReturnSalesItem = apps.get_model('uniworlderp', 'ReturnSalesItem')
+
+    returns = ReturnSalesItem.objects.filter(sales_order_item=OuterRef('pk')).values('sales_order_item')
+    SalesOrderItem.objects.filter(pk__in=ReturnSalesItem.objects.values('sales_order_item')).update(
+        returned_quantity=Coalesce(
+            Subquery(returns.annotate(total=Sum('quantity')).values('total')),
+            Value(0), output_field=IntegerField(),
+        ),
+        returned_amount=Coalesce(
+            Subquery(returns.annotate(total=Sum('total')).values('total')),
+            Value(Decimal('0.00')), output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0040_product_sharded_stock_stockcountershard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='returned_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='returned_quantity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_returned_totals, migrations.RunPython.noop),
+    ]
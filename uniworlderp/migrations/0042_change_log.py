@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-19 04:44
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_stock_transaction_updated_at(apps, schema_editor):
+    """Existing movements were last written when they were made"""
+    StockTransaction = apps.get_model('uniworlderp', 'StockTransaction')
+    StockTransaction.objects.update(updated_at=F('transaction_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0041_salesorderitem_returned_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_stock_transaction_updated_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=64)),
+                ('action', models.CharField(choices=[('C', 'Created'), ('U', 'Updated'), ('D', 'Deleted')], max_length=1)),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Change Log Entry',
+                'verbose_name_plural': 'Change Log',
+                'indexes': [models.Index(fields=['model', 'id'], name='uniworlderp_model_46f499_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-19 09:12
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_item_updated_at(apps, schema_editor):
+    """Existing lines were last written with their document"""
+    for item_model, document_model, parent in [
+        ('SalesOrderItem', 'SalesOrder', 'sales_order'),
+        ('PurchaseOrderItem', 'PurchaseOrder', 'purchase_order'),
+        ('ARInvoiceItem', 'ARInvoice', 'ar_invoice'),
+    ]:
+        Item = apps.get_model('uniworlderp', item_model)
+        Document = apps.get_model('uniworlderp', document_model)
+        Item.objects.update(updated_at=Subquery(
+            Document.objects.filter(pk=OuterRef(f'{parent}_id')).values('updated_at')[:1]
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0042_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='arinvoiceitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_item_updated_at, migrations.RunPython.noop),
+    ]
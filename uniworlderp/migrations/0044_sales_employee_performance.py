@@ -0,0 +1,70 @@
+# Generated by Django 5.1.4 on 2026-10-19 05:01
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_performance(apps, schema_editor):
+    """Roll up the existing orders and returns (rebuild_sales_performance does the same)"""
+    SalesOrder = apps.get_model('uniworlderp', 'SalesOrder')
+    ReturnSales = apps.get_model('uniworlderp', 'ReturnSales')
+    Performance = apps.get_model('uniworlderp', 'SalesEmployeePerformance')
+
+    rows = {}
+    for row in (
+        SalesOrder.objects.filter(sales_employee__isnull=False)
+        .annotate(month=TruncMonth('order_date')).order_by()
+        .values('sales_employee_id', 'month')
+        .annotate(gross=Sum('total_amount'), orders=Count('pk'), customers=Count('customer', distinct=True))
+    ):
+        rows[(row['sales_employee_id'], row['month'])] = Performance(
+            employee_id=row['sales_employee_id'], month=row['month'], gross_amount=row['gross'],
+            order_count=row['orders'], customer_count=row['customers'],
+        )
+    for row in (
+        ReturnSales.objects.filter(sales_order__sales_employee__isnull=False)
+        .annotate(month=TruncMonth('return_date')).order_by()
+        .values('sales_order__sales_employee_id', 'month')
+        .annotate(returned=Sum('total_amount'))
+    ):
+        key = (row['sales_order__sales_employee_id'], row['month'])
+        rows.setdefault(key, Performance(employee_id=key[0], month=key[1])).returned_amount = row['returned']
+    Performance.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0043_item_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='salesemployee',
+            name='sales_achieved',
+        ),
+        migrations.CreateModel(
+            name='SalesEmployeePerformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('returned_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('customer_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performance', to='uniworlderp.salesemployee')),
+            ],
+            options={
+                'verbose_name': 'Sales Employee Performance',
+                'verbose_name_plural': 'Sales Employee Performance',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['month'], name='uniworlderp_month_5b6924_idx')],
+                'constraints': [models.UniqueConstraint(fields=('employee', 'month'), name='unique_sales_employee_month')],
+            },
+        ),
+        migrations.RunPython(fill_performance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 05:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0044_sales_employee_performance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_demand', models.DecimalField(decimal_places=3, help_text='Average units sold per day', max_digits=12)),
+                ('demand_deviation', models.DecimalField(decimal_places=3, help_text='Standard deviation of the daily demand', max_digits=12)),
+                ('stock_on_hand', models.IntegerField(help_text='Stock when the suggestion was computed')),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, help_text='Days the stock lasts at the average demand; empty without demand', max_digits=10, null=True)),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('order_quantity', models.PositiveIntegerField(help_text='Suggested order, 0 while the stock is above the reorder point')),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_suggestion', to='uniworlderp.product')),
+            ],
+            options={
+                'verbose_name': 'Reorder Suggestion',
+                'verbose_name_plural': 'Reorder Suggestions',
+            },
+        ),
+    ]
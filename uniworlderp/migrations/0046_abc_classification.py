@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-19 05:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0045_reorder_suggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerClassification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('net_sales', models.DecimalField(decimal_places=2, help_text='Net sales over the ranked period', max_digits=14)),
+                ('sales_class', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1)),
+                ('computed_at', models.DateTimeField()),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='classification', to='uniworlderp.customervendor')),
+            ],
+            options={
+                'verbose_name': 'Customer Classification',
+                'verbose_name_plural': 'Customer Classifications',
+                'indexes': [models.Index(fields=['sales_class', '-net_sales'], name='uniworlderp_sales_c_86d8cc_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductClassification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, help_text='Net sales revenue over the ranked period', max_digits=14)),
+                ('revenue_class', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1)),
+                ('movement_count', models.PositiveIntegerField(help_text='Sales lines over the ranked period')),
+                ('movement_class', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='classification', to='uniworlderp.product')),
+            ],
+            options={
+                'verbose_name': 'Product Classification',
+                'verbose_name_plural': 'Product Classifications',
+                'indexes': [models.Index(fields=['revenue_class', '-revenue'], name='uniworlderp_revenue_bbbbdd_idx'), models.Index(fields=['movement_class', '-movement_count'], name='uniworlderp_movemen_ee0973_idx')],
+            },
+        ),
+    ]
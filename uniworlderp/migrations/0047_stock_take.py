@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-19 05:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uniworlderp', '0046_abc_classification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockTake',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('O', 'Open'), ('P', 'Posted')], default='O', max_length=1)),
+                ('abc_class', models.CharField(blank=True, choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], help_text='Only the products of this revenue class; every active product when empty', max_length=1)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the expected quantities were frozen')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('posted_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_takes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Take',
+                'verbose_name_plural': 'Stock Takes',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTakeLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_quantity', models.PositiveIntegerField(help_text='Stock on hand when the stock-take was started')),
+                ('counted_quantity', models.PositiveIntegerField(blank=True, help_text='Empty until counted', null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_take_lines', to='uniworlderp.product')),
+                ('stock_take', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='uniworlderp.stocktake')),
+            ],
+            options={
+                'verbose_name': 'Stock Take Line',
+                'verbose_name_plural': 'Stock Take Lines',
+                'constraints': [models.UniqueConstraint(fields=('stock_take', 'product'), name='unique_stock_take_product')],
+            },
+        ),
+    ]
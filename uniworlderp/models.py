@@ -89,7 +89,6 @@ class SalesEmployee(models.Model):
 
     date_of_joining = models.DateField(blank=True, null=True)  # Joining date
     sales_target = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # Monthly sales target
-    sales_achieved = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # Sales achieved
 
     # Administrative fields
     is_active = models.BooleanField(default=True)  # Employee active/inactive status
@@ -114,6 +113,34 @@ class SalesEmployee(models.Model):
         verbose_name = ' Sales Employee'
         verbose_name_plural = 'Sales Employees'
 
+
+class SalesEmployeePerformance(models.Model):
+    """
+    Sales of an employee in one month, maintained from their sales orders and
+    the returns of those orders (uniworlderp/sales_performance.py).
+    """
+    employee = models.ForeignKey(SalesEmployee, on_delete=models.CASCADE, related_name='performance')
+    month = models.DateField()  # First day of the month
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    returned_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    order_count = models.PositiveIntegerField(default=0)
+    customer_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.employee} {self.month:%Y-%m}"
+
+    class Meta:
+        verbose_name = 'Sales Employee Performance'
+        verbose_name_plural = 'Sales Employee Performance'
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'month'], name='unique_sales_employee_month'),
+        ]
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
 class Product(models.Model):
     CATEGORY_CHOICES = [
         ('Chemical', 'Chemical'),
@@ -162,10 +189,22 @@ class Product(models.Model):
         blank=True,
         help_text="Discount amount for the product."
         )
+    sharded_stock = models.BooleanField(
+        default=False,
+        help_text="Keep the stock of this fast-moving product in sharded counters (see uniworlderp/stock_counters.py).",
+    )
 
     def __str__(self):
         return self.name
 
+    @property
+    def available_stock(self):
+        """Units on hand: ``stock_quantity``, or the sum of the counter shards of a sharded product."""
+        if not self.sharded_stock:
+            return self.stock_quantity
+        from uniworlderp import stock_counters
+        return stock_counters.total(self)
+
     class Meta:
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
@@ -189,6 +228,7 @@ class StockTransaction(models.Model):
     previous_stock = models.PositiveIntegerField(default=0, help_text="Stock quantity before the transaction")
     current_stock = models.PositiveIntegerField(default=0, help_text="Stock quantity after the transaction")
     transaction_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     reference = models.CharField(max_length=50, blank=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stock_transactions')
 
@@ -200,7 +240,14 @@ class StockTransaction(models.Model):
             # Check if this is a new transaction (not an update)
             is_new = self._state.adding  # True only when inserting into DB for first time
             
-            if is_new:
+            if is_new and self.product.sharded_stock:
+                # Counter shards instead of the contended product row
+                from uniworlderp import stock_counters
+                self.previous_stock, self.current_stock = stock_counters.apply(
+                    self.product, self.transaction_type, self.quantity,
+                )
+                super().save(*args, **kwargs)
+            elif is_new:
                 # Only update stock for new transactions
                 # Capture previous stock before the transaction
                 self.previous_stock = self.product.stock_quantity
@@ -230,6 +277,152 @@ class StockTransaction(models.Model):
         verbose_name_plural = 'Stock Transactions'
         indexes = [
             models.Index(fields=['product', 'transaction_type', 'transaction_date']),
+            models.Index(fields=['product', 'transaction_date']),
+        ]
+
+
+class StockCounterShard(models.Model):
+    """One of the counters holding the stock of a product with ``sharded_stock`` set."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product} #{self.shard}: {self.quantity}"
+
+    class Meta:
+        verbose_name = 'Stock Counter Shard'
+        verbose_name_plural = 'Stock Counter Shards'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='unique_stock_counter_shard'),
+        ]
+
+
+class ReorderSuggestion(models.Model):
+    """
+    Reorder point and quantity of a product computed from its recent demand
+    (uniworlderp/reorder.py, refreshed nightly by ``suggest_reorders``).
+    """
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='reorder_suggestion')
+    daily_demand = models.DecimalField(max_digits=12, decimal_places=3, help_text="Average units sold per day")
+    demand_deviation = models.DecimalField(max_digits=12, decimal_places=3, help_text="Standard deviation of the daily demand")
+    stock_on_hand = models.IntegerField(help_text="Stock when the suggestion was computed")
+    days_of_cover = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True,
+                                        help_text="Days the stock lasts at the average demand; empty without demand")
+    reorder_point = models.PositiveIntegerField()
+    order_quantity = models.PositiveIntegerField(help_text="Suggested order, 0 while the stock is above the reorder point")
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product}: reorder at {self.reorder_point}, order {self.order_quantity}"
+
+    class Meta:
+        verbose_name = 'Reorder Suggestion'
+        verbose_name_plural = 'Reorder Suggestions'
+
+ABC_CLASS_CHOICES = [
+    ('A', 'A'),
+    ('B', 'B'),
+    ('C', 'C'),
+]
+
+
+class ProductClassification(models.Model):
+    """
+    ABC class of a product by net sales revenue and by number of sales lines
+    (uniworlderp/abc_analysis.py, refreshed nightly by ``classify_abc``).
+    """
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='classification')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, help_text="Net sales revenue over the ranked period")
+    revenue_class = models.CharField(max_length=1, choices=ABC_CLASS_CHOICES)
+    movement_count = models.PositiveIntegerField(help_text="Sales lines over the ranked period")
+    movement_class = models.CharField(max_length=1, choices=ABC_CLASS_CHOICES)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product}: {self.revenue_class} by revenue, {self.movement_class} by movement"
+
+    class Meta:
+        verbose_name = 'Product Classification'
+        verbose_name_plural = 'Product Classifications'
+        indexes = [
+            models.Index(fields=['revenue_class', '-revenue']),
+            models.Index(fields=['movement_class', '-movement_count']),
+        ]
+
+
+class CustomerClassification(models.Model):
+    """ABC class of a customer by net sales (uniworlderp/abc_analysis.py)."""
+
+    customer = models.OneToOneField(CustomerVendor, on_delete=models.CASCADE, related_name='classification')
+    net_sales = models.DecimalField(max_digits=14, decimal_places=2, help_text="Net sales over the ranked period")
+    sales_class = models.CharField(max_length=1, choices=ABC_CLASS_CHOICES)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.customer}: {self.sales_class}"
+
+    class Meta:
+        verbose_name = 'Customer Classification'
+        verbose_name_plural = 'Customer Classifications'
+        indexes = [
+            models.Index(fields=['sales_class', '-net_sales']),
+        ]
+
+
+class StockTake(models.Model):
+    """
+    A physical stock count: the stock on hand of each product frozen when it
+    is started, the counted quantities imported while it is open and, once
+    posted, one ADJ movement per difference (uniworlderp/stock_take.py).
+    """
+    OPEN = 'O'
+    POSTED = 'P'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (POSTED, 'Posted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=OPEN)
+    abc_class = models.CharField(max_length=1, choices=ABC_CLASS_CHOICES, blank=True,
+                                 help_text="Only the products of this revenue class; every active product when empty")
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the expected quantities were frozen")
+    updated_at = models.DateTimeField(auto_now=True)
+    posted_at = models.DateTimeField(null=True, blank=True)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stock_takes')
+
+    @property
+    def reference(self):
+        """Reference of the stock-take and of the ADJ movements it posts."""
+        return f"ST-{self.pk}"
+
+    def __str__(self):
+        return f"Stock Take #{self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Stock Take'
+        verbose_name_plural = 'Stock Takes'
+
+
+class StockTakeLine(models.Model):
+    stock_take = models.ForeignKey(StockTake, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_take_lines')
+    expected_quantity = models.PositiveIntegerField(help_text="Stock on hand when the stock-take was started")
+    counted_quantity = models.PositiveIntegerField(null=True, blank=True, help_text="Empty until counted")
+
+    def __str__(self):
+        return f"{self.product}: expected {self.expected_quantity}, counted {self.counted_quantity}"
+
+    class Meta:
+        verbose_name = 'Stock Take Line'
+        verbose_name_plural = 'Stock Take Lines'
+        constraints = [
+            models.UniqueConstraint(fields=['stock_take', 'product'], name='unique_stock_take_product'),
         ]
 
 class SalesOrder(models.Model):
@@ -258,7 +451,7 @@ class SalesOrder(models.Model):
         subtotal = sum(item.total for item in self.order_items.all())
         # Calculate final total: subtotal - discount + shipping
         self.total_amount = subtotal - self.discount + self.shipping
-        self.save(update_fields=['total_amount'])
+        self.save(update_fields=['total_amount', 'updated_at'])
 
     def save(self, *args, **kwargs):
         request = kwargs.pop('request', None)
@@ -311,6 +504,10 @@ class SalesOrderItem(models.Model):
         blank=True,
         help_text="Discount amount for the product."
         )
+    # Sum of the return lines booked against this line (uniworlderp/sales_returns.py)
+    returned_quantity = models.PositiveIntegerField(default=0, editable=False)
+    returned_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity} x {self.unit_price}"
@@ -338,13 +535,14 @@ class SalesOrderItem(models.Model):
         
         # Only validate stock availability for new items or when increasing quantity
         is_new = self.pk is None
+        available = self.product.available_stock
         if is_new:
             # For new items, check if there's enough stock
-            if self.product.stock_quantity < self.quantity:
+            if available < self.quantity:
                 raise ValidationError({
                     'quantity': _("Insufficient stock for %(product)s. Available: %(available)d, requested: %(requested)d") % {
                         'product': self.product.name,
-                        'available': self.product.stock_quantity,
+                        'available': available,
                         'requested': self.quantity
                     }
                 })
@@ -352,21 +550,21 @@ class SalesOrderItem(models.Model):
             # For existing items, only validate if quantity is being increased
             try:
                 old_item = SalesOrderItem.objects.get(pk=self.pk)
-                if old_item.quantity < self.quantity and self.product.stock_quantity < (self.quantity - old_item.quantity):
+                if old_item.quantity < self.quantity and available < (self.quantity - old_item.quantity):
                     raise ValidationError({
                         'quantity': _("Insufficient stock for %(product)s. Available: %(available)d, requested: %(requested)d") % {
                             'product': self.product.name,
-                            'available': self.product.stock_quantity,
+                            'available': available,
                             'requested': self.quantity - old_item.quantity
                         }
                     })
             except SalesOrderItem.DoesNotExist:
                 # If the item doesn't exist, treat it as a new item
-                if self.product.stock_quantity < self.quantity:
+                if available < self.quantity:
                     raise ValidationError({
                         'quantity': _("Insufficient stock for %(product)s. Available: %(available)d, requested: %(requested)d") % {
                             'product': self.product.name,
-                            'available': self.product.stock_quantity,
+                            'available': available,
                             'requested': self.quantity
                         }
                     })
@@ -461,7 +659,7 @@ class PurchaseOrder(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='purchase_orders')
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
 
-    objects = models.Manager()
+    objects = PurchaseOrderManager()
 
     def __str__(self):
         return f"PurchaseOrder #{self.id} - {self.supplier.name}"
@@ -496,6 +694,7 @@ class PurchaseOrderItem(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
     total = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity} x {self.unit_price}"
@@ -547,7 +746,7 @@ class ARInvoice(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ar_invoices')
 
-    objects = models.Manager()
+    objects = ARInvoiceManager()
 
     def __str__(self):
         return f"ARInvoice #{self.id} - {self.customer.name}"
@@ -574,6 +773,7 @@ class ARInvoiceItem(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         self.total_amount = self.unit_price * self.quantity
@@ -637,7 +837,7 @@ class ReturnSales(models.Model):
     
     def update_total_amount(self):
         self.total_amount = sum(item.total for item in self.return_items.all())
-        self.save(update_fields=['total_amount'])
+        self.save(update_fields=['total_amount', 'updated_at'])
         
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -675,11 +875,13 @@ class ReturnSalesItem(models.Model):
             raise ValidationError(_("Sales order item must be selected."))
         
         # Check if return quantity doesn't exceed original quantity
-        previously_returned = ReturnSalesItem.objects.filter(
-            sales_order_item=self.sales_order_item
-        ).exclude(id=self.id).aggregate(total=Sum('quantity'))['total'] or 0
+        sold, previously_returned = SalesOrderItem.objects.filter(
+            pk=self.sales_order_item_id
+        ).values_list('quantity', 'returned_quantity').get()
+        if self.pk:
+            previously_returned -= ReturnSalesItem.objects.filter(pk=self.pk).values_list('quantity', flat=True).first() or 0
         
-        max_returnable = self.sales_order_item.quantity - previously_returned
+        max_returnable = sold - previously_returned
         if self.quantity > max_returnable:
             raise ValidationError({
                 'quantity': _("Return quantity exceeds available quantity. Maximum returnable: %(max)d") % {
@@ -704,10 +906,15 @@ class ReturnSalesItem(models.Model):
                 if not is_new:
                     old_item = ReturnSalesItem.objects.get(pk=self.pk)
                     quantity_diff = self.quantity - old_item.quantity
+                    amount_diff = self.total - old_item.total
                 else:
                     quantity_diff = self.quantity
+                    amount_diff = self.total
                 
                 super().save(*args, **kwargs)
+
+                from uniworlderp import sales_returns
+                sales_returns.record(self.sales_order_item_id, quantity_diff, amount_diff)
                 
                 if quantity_diff != 0:
                     # Create stock transaction for the return
@@ -729,4 +936,33 @@ class ReturnSalesItem(models.Model):
         except ValidationError as e:
             raise e
         except Exception as e:
-            raise ValidationError(_("Unexpected error saving ReturnSalesItem: %(error)s") % {'error': str(e)})
\ No newline at end of file
+            raise ValidationError(_("Unexpected error saving ReturnSalesItem: %(error)s") % {'error': str(e)})
+
+
+class ChangeLog(models.Model):
+    """
+    One created, updated or deleted row of a synced model, written in the
+    same transaction as the change (uniworlderp/change_log.py). The id is the
+    sequence number downstream consumers page through.
+    """
+    ACTION_CHOICES = [
+        ('C', 'Created'),
+        ('U', 'Updated'),
+        ('D', 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=1, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.get_action_display()} {self.model} {self.object_id}"
+
+    class Meta:
+        verbose_name = 'Change Log Entry'
+        verbose_name_plural = 'Change Log'
+        indexes = [
+            models.Index(fields=['model', 'id']),
+        ]
@@ -0,0 +1,162 @@
+"""
+N+1 query detector.
+
+``QueryAudit`` records the queries a block of code runs and fingerprints
+them: the SQL with its parameters, literals and ``IN (...)`` lists blanked
+out. A fingerprint run ``threshold`` times or more with different
+parameters is the shape of an N+1 (a related object or a count loaded per
+row of a list), and is reported together with the template line and the
+project code that caused it. Identical queries repeated (e.g. the choices of
+a select rendered once per formset form) are not reported::
+
+    with QueryAudit() as audit:
+        client.get('/erp/invoices/')
+    assert not audit.repeats(), audit.report()
+
+Under the development server set ``NPLUSONE_WARNINGS`` and
+``NPlusOneMiddleware`` logs a warning for every request that repeats a query.
+Only queries made on the request's own thread are seen, not those of the
+``run_queries()`` worker threads.
+"""
+
+import logging
+import os
+import re
+import sys
+from collections import defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 3
+
+_IN_LIST = re.compile(r'\bIN \(\s*%s(?:\s*,\s*%s)*\s*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+_PROJECT_DIR = os.path.join(str(settings.BASE_DIR), '')
+_SKIPPED_DIRS = ('site-packages', 'dist-packages', os.path.join('django', ''))
+
+
+def fingerprint(sql):
+    """``sql`` with its parameters, literals and ``IN`` lists blanked out."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    return _NUMBER.sub('?', sql.replace('%s', '?'))
+
+
+def _project_frame(frame):
+    filename = frame.f_code.co_filename
+    return (
+        filename.startswith(_PROJECT_DIR)
+        and filename != __file__
+        and not any(part in filename[len(_PROJECT_DIR):] for part in _SKIPPED_DIRS)
+    )
+
+
+def caller():
+    """Where the running query comes from: the template line and/or project code, innermost first."""
+    template = code = None
+    frame = sys._getframe(1)
+    # Stops at the innermost template node: the code outside it is the view
+    # or middleware that rendered the template
+    while frame is not None and template is None:
+        if frame.f_code.co_name == 'render_annotated':
+            # Node.render_annotated() of the template node being rendered
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        elif code is None and _project_frame(frame):
+            code = (
+                f'{os.path.relpath(frame.f_code.co_filename, _PROJECT_DIR)}:{frame.f_lineno} '
+                f'in {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return ', '.join(place for place in (template, code) if place) or 'unknown'
+
+
+@dataclass
+class Repeat:
+    """One query shape run ``count`` times with different parameters."""
+
+    alias: str
+    fingerprint: str
+    count: int
+    locations: list = field(default_factory=list)
+
+    def __str__(self):
+        return (
+            f'{self.count} x [{self.alias}] {self.fingerprint}\n'
+            + '\n'.join(f'    from {location}' for location in self.locations)
+        )
+
+
+class QueryAudit:
+    """
+    Context manager recording the queries run on this thread's database
+    connections inside the block.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.queries = defaultdict(list)  # (alias, fingerprint) -> [(params, location)]
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._wrapper(connection.alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            if not many:
+                self.queries[(alias, fingerprint(sql))].append((repr(params), caller()))
+            return execute(sql, params, many, context)
+        return record
+
+    @property
+    def count(self):
+        return sum(len(runs) for runs in self.queries.values())
+
+    def repeats(self):
+        """The query shapes run ``threshold`` times or more with different parameters, most frequent first."""
+        repeats = []
+        for (alias, shape), runs in self.queries.items():
+            if len(runs) < self.threshold or len({params for params, _ in runs}) < 2:
+                continue
+            locations = list(dict.fromkeys(location for _, location in runs))
+            repeats.append(Repeat(alias, shape, len(runs), locations))
+        return sorted(repeats, key=lambda repeat: -repeat.count)
+
+    def report(self):
+        return '\n'.join(str(repeat) for repeat in self.repeats())
+
+
+class NPlusOneMiddleware:
+    """Log a warning for each request that repeats a query shape (``NPLUSONE_WARNINGS``)."""
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_WARNINGS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryAudit() as audit:
+            response = self.get_response(request)
+        if audit.repeats():
+            logger.warning(
+                'Possible N+1 queries in %s %s (%d queries):\n%s',
+                request.method, request.get_full_path(), audit.count, audit.report(),
+            )
+        return response
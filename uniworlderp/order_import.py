@@ -0,0 +1,320 @@
+"""
+Bulk intake of sales orders, e.g. a day's worth of orders synced from the
+field-sales app.
+
+Each batch is processed in chunks. Within a chunk the referenced product rows
+are locked with ``select_for_update`` and stock is allocated in memory, order
+by order, in the order received. An order is accepted only when every item
+can be served; otherwise it is rejected as a whole and its stock stays
+available to the orders after it. The counter shards of a ``sharded_stock``
+product are not behind its row lock, so an accepted order takes from them
+at once, in a savepoint: when concurrent sales emptied them in the meantime
+only that order is rejected. Accepted orders, their items and the OUT
+stock movements are then written with ``bulk_create`` and the product stock
+with one ``bulk_update``, instead of the per-item ``clean()`` / ``save()`` /
+``update_total_amount()`` round trips of ``SalesOrderItem.save``.
+
+An order looks like::
+
+    {
+        "ref": "TAB-7-000123",          # optional, echoed back in the result
+        "customer": "<uuid>",
+        "sales_employee": 3,            # optional
+        "order_date": "2025-07-15",     # optional, defaults to today
+        "discount": "0.00", "shipping": "0.00", "notes": "",
+        "items": [
+            {"sku": "P-001", "quantity": 5, "unit_price": "12.50"},
+            {"product": "<uuid>", "quantity": 1}   # unit_price defaults to the product price
+        ]
+    }
+"""
+
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from uniworlderp import cache as erp_cache, change_log, sales_performance, stock_counters
+from uniworlderp.importers import chunked, clean_row
+from uniworlderp.models import CustomerVendor, Product, SalesEmployee, SalesOrder, SalesOrderItem, StockTransaction
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+ORDER_FIELDS = ['order_date', 'delivery_status', 'discount', 'shipping', 'notes']
+ITEM_FIELDS = ['quantity', 'unit_price']
+
+
+class OrderImportResult:
+    """Per-order outcome of a batch, in the order the orders were received."""
+
+    def __init__(self):
+        self.results = []
+
+    @property
+    def created(self):
+        return sum(1 for r in self.results if r['status'] == 'created')
+
+    @property
+    def rejected(self):
+        return sum(1 for r in self.results if r['status'] == 'rejected')
+
+    def as_dict(self):
+        return {'created': self.created, 'rejected': self.rejected, 'results': self.results}
+
+
+def _pk_or_none(value):
+    """Normalise a JSON id so it can be used as a dict key against ``values_list``."""
+    if value is None or value == '':
+        return None
+    return str(value).strip()
+
+
+def _parse_order(data):
+    """
+    Validate the shape and scalar values of one order. Returns
+    ``(order, errors)`` where ``order`` holds the cleaned values and the raw
+    references (customer, employee, products) still to be resolved.
+    """
+    if not isinstance(data, dict):
+        return None, ['order must be an object']
+
+    values, errors = clean_row(SalesOrder, {k: v for k, v in data.items() if k in ORDER_FIELDS}, ORDER_FIELDS, [])
+    if 'order_date' not in values or values['order_date'] is None:
+        values['order_date'] = timezone.localdate()
+    for name in ('discount', 'shipping'):
+        values.setdefault(name, Decimal('0.00'))
+    values.setdefault('delivery_status', 'P')
+
+    order = {
+        'ref': data.get('ref'),
+        'customer': _pk_or_none(data.get('customer')),
+        'sales_employee': _pk_or_none(data.get('sales_employee')),
+        'values': values,
+        'items': [],
+    }
+    if order['customer'] is None:
+        errors.append('customer: this field is required')
+
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        errors.append('items: at least one item is required')
+        items = []
+
+    for number, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            errors.append(f'item {number}: must be an object')
+            continue
+        item_values, item_errors = clean_row(SalesOrderItem, item, ITEM_FIELDS, ['quantity'])
+        if not item_errors and item_values['quantity'] < 1:
+            item_errors.append('quantity: must be at least 1')
+        product_ref = _pk_or_none(item.get('product'))
+        sku = _pk_or_none(item.get('sku'))
+        if product_ref is None and sku is None:
+            item_errors.append('product: give a product id or a sku')
+        errors.extend(f'item {number} {message}' for message in item_errors)
+        order['items'].append({'product': product_ref, 'sku': sku, **item_values})
+
+    return order, errors
+
+
+def _resolve(orders):
+    """Look up every customer, employee and product referenced by a chunk in three queries."""
+    customer_ids = _pk_keys(CustomerVendor, (o['customer'] for o in orders))
+    employee_ids = _pk_keys(SalesEmployee, (o['sales_employee'] for o in orders))
+    product_ids = _pk_keys(Product, (i['product'] for o in orders for i in o['items']))
+    skus = {i['sku'] for o in orders for i in o['items'] if i['sku']}
+
+    customers = {str(pk) for pk in CustomerVendor.objects.filter(pk__in=customer_ids).values_list('pk', flat=True)}
+    employees = {str(pk) for pk in SalesEmployee.objects.filter(pk__in=employee_ids).values_list('pk', flat=True)}
+
+    # Lock the rows: stock is checked and written in this transaction
+    products = Product.objects.select_for_update().filter(Q(pk__in=product_ids) | Q(sku__in=skus))
+    by_id = {}
+    by_sku = {}
+    for product in products.order_by('pk'):
+        by_id[str(product.pk)] = product
+        by_sku[product.sku] = product
+    return customers, employees, by_id, by_sku
+
+
+def _pk_key(model, value):
+    """Canonical string form of a primary key, or None if ``value`` is not a valid one."""
+    if value is None:
+        return None
+    try:
+        return str(model._meta.pk.to_python(value))
+    except ValidationError:
+        return None
+
+
+def _pk_keys(model, values):
+    return {key for key in (_pk_key(model, v) for v in values) if key}
+
+
+def import_sales_orders(orders, owner, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Create sales orders in bulk. ``orders`` is a list of dicts as described
+    in the module docstring. Returns an ``OrderImportResult`` with one entry
+    per order: ``{"index", "ref", "status": "created"|"rejected", "id",
+    "total_amount", "errors"}``.
+    """
+    result = OrderImportResult()
+
+    for chunk in chunked(enumerate(orders), chunk_size):
+        parsed = []
+        for index, data in chunk:
+            order, errors = _parse_order(data)
+            entry = {
+                'index': index,
+                'ref': order['ref'] if order else None,
+                'status': 'rejected',
+                'id': None,
+                'total_amount': None,
+                'errors': errors,
+            }
+            result.results.append(entry)
+            if not errors:
+                parsed.append((entry, order))
+
+        if not parsed:
+            continue
+
+        with transaction.atomic():
+            customers, employees, by_id, by_sku = _resolve([order for _, order in parsed])
+            stock = {pk: product.stock_quantity for pk, product in by_id.items()}
+            sharded = [pk for pk, product in by_id.items() if product.sharded_stock]
+            if sharded:
+                stock.update((str(pk), on_hand) for pk, on_hand in stock_counters.totals(sharded).items())
+            opening = dict(stock)
+
+            accepted = []
+            for entry, order in parsed:
+                errors = entry['errors']
+                if _pk_key(CustomerVendor, order['customer']) not in customers:
+                    errors.append(f'customer: {order["customer"]} does not exist')
+                if order['sales_employee'] and _pk_key(SalesEmployee, order['sales_employee']) not in employees:
+                    errors.append(f'sales_employee: {order["sales_employee"]} does not exist')
+
+                # Quantity wanted per product across the whole order
+                wanted = {}
+                for number, item in enumerate(order['items'], start=1):
+                    product = by_id.get(_pk_key(Product, item['product'])) if item['product'] else by_sku.get(item['sku'])
+                    if product is None:
+                        errors.append(f'item {number} product: {item["product"] or item["sku"]} does not exist')
+                        continue
+                    item['product'] = product
+                    wanted[str(product.pk)] = wanted.get(str(product.pk), 0) + item['quantity']
+
+                for pk, quantity in wanted.items():
+                    if stock[pk] < quantity:
+                        errors.append(
+                            f'Insufficient stock for {by_id[pk].name}. Available: {stock[pk]}, requested: {quantity}'
+                        )
+                if errors:
+                    continue
+
+                try:
+                    _take_sharded(wanted, by_id)
+                except ValidationError as e:
+                    errors.extend(e.messages)
+                    continue
+
+                for pk, quantity in wanted.items():
+                    stock[pk] -= quantity
+                accepted.append((entry, order))
+
+            if accepted:
+                _write_orders(accepted, owner, opening)
+
+            if dry_run:
+                transaction.set_rollback(True)
+
+    if not dry_run:
+        # bulk_create / bulk_update bypass the post_save signals
+        erp_cache.invalidate_tags(erp_cache.SALES_ORDER, erp_cache.PRODUCT, erp_cache.STOCK_TRANSACTION)
+    return result
+
+
+def _take_sharded(wanted, products):
+    """Take an order's quantities from the shards of its sharded products, all or none."""
+    with transaction.atomic():
+        for pk, quantity in wanted.items():
+            if products[pk].sharded_stock:
+                stock_counters.take(products[pk], quantity)
+
+
+def _write_orders(accepted, owner, opening):
+    sales_orders = []
+    for entry, order in accepted:
+        sales_order = SalesOrder(
+            customer_id=_pk_key(CustomerVendor, order['customer']),
+            sales_employee_id=_pk_key(SalesEmployee, order['sales_employee']),
+            owner_id=owner.pk,
+            **order['values'],
+        )
+        items = []
+        for item in order['items']:
+            product = item['product']
+            unit_price = item.get('unit_price')
+            line = SalesOrderItem(
+                product=product,
+                quantity=item['quantity'],
+                unit_price=product.price if unit_price is None else unit_price,
+                Unit_discount=product.discount_amount,
+            )
+            line.total = line.calculate_total_price()
+            items.append(line)
+        subtotal = sum((line.total for line in items), Decimal('0.00'))
+        sales_order.total_amount = subtotal - sales_order.discount + sales_order.shipping
+        sales_orders.append((entry, sales_order, items))
+
+    # Needs a backend that returns ids from bulk inserts (PostgreSQL, SQLite >= 3.35)
+    SalesOrder.objects.bulk_create([so for _, so, _ in sales_orders])
+
+    lines = []
+    movements = []
+    seen = set()
+    for entry, sales_order, items in sales_orders:
+        for line in items:
+            line.sales_order = sales_order
+            lines.append(line)
+            product = line.product
+            if product.sharded_stock and product.pk not in seen:
+                # Running balance of the movements from the chunk's opening stock; the shards were taken from already
+                product.stock_quantity = opening[str(product.pk)]
+                seen.add(product.pk)
+            previous_stock = product.stock_quantity
+            product.stock_quantity -= line.quantity
+            movements.append(StockTransaction(
+                product=product,
+                transaction_type='OUT',
+                quantity=line.quantity,
+                previous_stock=previous_stock,
+                current_stock=product.stock_quantity,
+                reference=f'SO-{sales_order.id}',
+                owner_id=owner.pk,
+            ))
+        entry.update(status='created', id=sales_order.id, total_amount=str(sales_order.total_amount))
+
+    SalesOrderItem.objects.bulk_create(lines)
+    StockTransaction.objects.bulk_create(movements)
+
+    now = timezone.now()
+    touched = [product for product in {line.product.pk: line.product for line in lines}.values()
+               if not product.sharded_stock]
+    for product in touched:
+        product.updated_at = now
+    Product.objects.bulk_update(touched, ['stock_quantity', 'updated_at'])
+
+    change_log.record_changes(
+        [(SalesOrder, sales_order.pk, change_log.CREATED) for _, sales_order, _ in sales_orders]
+        + [(SalesOrderItem, line.pk, change_log.CREATED) for line in lines]
+        + [(StockTransaction, movement.pk, change_log.CREATED) for movement in movements]
+        + [(Product, product.pk, change_log.UPDATED) for product in touched]
+    )
+    sales_performance.schedule(
+        (sales_order.sales_employee_id, sales_order.order_date) for _, sales_order, _ in sales_orders
+    )
@@ -0,0 +1,199 @@
+"""
+Rendering of printable documents (invoices, sales orders, purchase orders),
+one at a time or in batches.
+
+Every document is rendered from ``<kind>/_document.html`` and wrapped by
+``<kind>/print.html``. A batch costs one query for the documents (with their
+customer/supplier joined) and one for all their items (with the products
+joined). The company record and the rendered company block are cached until
+the company is edited. Posted documents (paid invoices, delivered sales
+orders, received purchase orders) no longer change, so their rendered HTML is
+cached too, keyed on the ``updated_at`` of everything printed: the document,
+its customer / supplier / sales employee, its lines and their products (one
+aggregate query per batch), so a renamed customer or product is reprinted.
+"""
+
+import hashlib
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Max, Prefetch, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from company.models import Company
+from uniworlderp import cache as erp_cache
+from uniworlderp.models import (
+    ARInvoice, ARInvoiceItem, PurchaseOrder, PurchaseOrderItem, SalesOrder, SalesOrderItem,
+)
+
+
+DOCUMENT_TIMEOUT = 60 * 60 * 24 * 7  # rendered posted documents are kept a week
+
+
+def get_company():
+    """The (single) company shown on printed documents, cached until it is edited."""
+    return erp_cache.get_or_set('print:company', lambda: Company.objects.first(), tags=(erp_cache.COMPANY,))
+
+
+def company_block(template_name):
+    """The rendered company address block of a print template, cached like ``get_company``."""
+    return erp_cache.get_or_set(
+        f'print:fragment:{template_name}',
+        lambda: mark_safe(render_to_string(template_name, {'company': get_company()})),
+        tags=(erp_cache.COMPANY,),
+    )
+
+
+def _invoice_totals(invoice, items):
+    subtotal = sum(item.total_amount for item in items)
+    tax = subtotal * Decimal('0.0')
+    return {'subtotal': subtotal, 'tax': tax, 'total': subtotal + tax}
+
+
+def _sales_order_totals(sales_order, items):
+    subtotal = sum(item.total for item in items)
+    tax = subtotal * Decimal('0.0')
+    return {
+        'subtotal': subtotal,
+        'discount': sales_order.discount,
+        'shipping': sales_order.shipping,
+        'tax': tax,
+        'total': subtotal - sales_order.discount + sales_order.shipping + tax,
+    }
+
+
+def _purchase_order_totals(purchase_order, items):
+    subtotal = sum(item.total for item in items)
+    tax = subtotal * Decimal('0.0')
+    return {'subtotal': subtotal, 'tax': tax, 'total': subtotal + tax}
+
+
+class DocumentType:
+    def __init__(self, kind, model, context_name, items, item_model, related, date_field,
+                 is_posted, totals, permission):
+        self.kind = kind
+        self.model = model
+        self.context_name = context_name
+        self.items = items
+        self.item_model = item_model
+        self.related = related
+        self.date_field = date_field
+        self.is_posted = is_posted
+        self.totals = totals
+        self.permission = permission
+
+    @property
+    def document_template(self):
+        return f'{self.kind}/_document.html'
+
+    @property
+    def page_template(self):
+        return f'{self.kind}/print.html'
+
+    @property
+    def company_template(self):
+        return f'{self.kind}/_company.html'
+
+    def queryset(self):
+        return self.model._default_manager.select_related(*self.related)
+
+
+DOCUMENT_TYPES = {
+    'invoice': DocumentType(
+        'invoice', ARInvoice, 'invoice', 'invoice_items', ARInvoiceItem,
+        related=('customer',), date_field='invoice_date',
+        is_posted=lambda invoice: invoice.payment_status == 'C',
+        totals=_invoice_totals, permission='uniworlderp.view_arinvoice',
+    ),
+    'sales_order': DocumentType(
+        'sales_order', SalesOrder, 'sales_order', 'order_items', SalesOrderItem,
+        related=('customer', 'sales_employee'), date_field='order_date',
+        is_posted=lambda sales_order: sales_order.delivery_status == 'D',
+        totals=_sales_order_totals, permission='uniworlderp.view_salesorder',
+    ),
+    'purchase_order': DocumentType(
+        'purchase_order', PurchaseOrder, 'purchase_order', 'order_items', PurchaseOrderItem,
+        related=('supplier',), date_field='order_date',
+        is_posted=lambda purchase_order: purchase_order.delivery_status == 'R',
+        totals=_purchase_order_totals, permission='uniworlderp.view_purchaseorder',
+    ),
+}
+
+
+def _line_stamps(doc_type, documents):
+    """``{document pk: (newest updated_at of its lines, of their products)}``, in one query."""
+    parent = doc_type.model._meta.get_field(doc_type.items).field.name
+    rows = (
+        doc_type.item_model.objects.filter(**{f'{parent}__in': [document.pk for document in documents]})
+        .order_by().values(parent).annotate(lines=Max('updated_at'), products=Max('product__updated_at'))
+    )
+    return {row[parent]: (row['lines'], row['products']) for row in rows}
+
+
+def _document_key(doc_type, document, line_stamps):
+    related = [getattr(document, name) for name in doc_type.related]
+    stamps = [document.updated_at, *(getattr(obj, 'updated_at', None) for obj in related), *line_stamps]
+    version = hashlib.md5(
+        '|'.join(stamp.isoformat() if stamp else '' for stamp in stamps).encode(), usedforsecurity=False,
+    ).hexdigest()
+    return erp_cache.make_key(f'print:document:{doc_type.kind}:{document.pk}:{version}', tags=(erp_cache.COMPANY,))
+
+
+def render_documents(doc_type, documents):
+    """
+    Render each document of ``documents`` (instances of ``doc_type.model``)
+    and return the HTML fragments in the same order.
+    """
+    documents = list(documents)
+    posted = [document for document in documents if doc_type.is_posted(document)]
+    line_stamps = _line_stamps(doc_type, posted) if posted else {}
+    keys = {
+        document.pk: _document_key(doc_type, document, line_stamps.get(document.pk, ()))
+        for document in posted
+    }
+    rendered = cache.get_many(list(keys.values())) if keys else {}
+
+    missing = [document for document in documents if keys.get(document.pk) not in rendered]
+    prefetch_related_objects(missing, Prefetch(
+        doc_type.items,
+        queryset=doc_type.item_model.objects.select_related('product').order_by('pk'),
+        to_attr='print_items',
+    ))
+
+    company = get_company()
+    block = company_block(doc_type.company_template)
+    fresh = {}
+    fragments = []
+    for document in documents:
+        key = keys.get(document.pk)
+        html = rendered.get(key) if key else None
+        if html is None:
+            items = document.print_items
+            context = {
+                'company': company,
+                'company_block': block,
+                doc_type.context_name: document,
+                'items': items,
+                **doc_type.totals(document, items),
+            }
+            html = render_to_string(doc_type.document_template, context)
+            if key:
+                fresh[key] = html
+        fragments.append(mark_safe(html))
+
+    if fresh:
+        cache.set_many(fresh, timeout=DOCUMENT_TIMEOUT)
+    return fragments
+
+
+def print_context(doc_type, documents):
+    """Context for ``doc_type.page_template`` printing ``documents``."""
+    documents = list(documents)
+    context = {
+        'company': get_company(),
+        'documents': render_documents(doc_type, documents),
+    }
+    if len(documents) == 1:
+        context[doc_type.context_name] = documents[0]
+    return context
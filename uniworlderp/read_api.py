@@ -0,0 +1,326 @@
+"""
+Read-only JSON API over the ERP data, for integrations (uniworlderp/views/api_views.py).
+
+Each ``Endpoint`` names the fields it serves as ORM lookups. A request picks
+the fields it wants (``?fields=id,sku,stock_quantity``) and only those are
+selected, so a relation is joined only when one of its fields is asked for
+(``customer_name`` joins the customer; ``customer`` reads the key). Nested
+lines (``items`` of an order) are loaded with one query per chunk of rows.
+
+Pages are cursor-based: rows come in primary key order, and ``next`` is an
+opaque cursor to pass as ``?cursor=``. A page is streamed as it is read, in
+keyset-paginated chunks of ``CHUNK_SIZE`` rows (separate short queries
+rather than one server-side cursor, which pgbouncer in transaction mode does
+not allow), so even ``READ_API_MAX_PAGE_SIZE`` rows take bounded memory.
+
+The version of an endpoint is the newest change-log entry of every model
+it reads from, joined ones included (uniworlderp/change_log.py): it gives the ETag and Last-Modified of every
+response, so an unchanged pull is answered with 304 Not Modified.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from uniworlderp import cache as erp_cache, change_log, stock_counters
+from uniworlderp.models import (
+    ARInvoice, ARInvoiceItem, ChangeLog, CustomerVendor, Product, SalesEmployee, SalesOrder, SalesOrderItem,
+    StockTransaction,
+)
+
+
+CHUNK_SIZE = 1000
+
+
+class BadRequest(ValueError):
+    """A query parameter the endpoint cannot serve."""
+
+
+@dataclass(frozen=True)
+class Nested:
+    """Lines loaded for each row: ``model`` rows whose ``parent`` lookup is the row's pk."""
+
+    model: type
+    parent: str
+    fields: dict
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str
+    model: type
+    permission: str
+    fields: dict                     # API field -> ORM lookup
+    default_fields: tuple
+    filters: dict = field(default_factory=dict)   # query parameter -> ORM lookup
+    nested: dict = field(default_factory=dict)    # API field -> Nested
+    tracked: tuple = ()              # every model read, joins included: their changes make a new version
+
+    def select(self, names):
+        """``(row fields, nested fields)`` for ``?fields=``; raises ``BadRequest`` for unknown names."""
+        names = [name for name in names.split(',') if name] if names else list(self.default_fields)
+        unknown = [name for name in names if name not in self.fields and name not in self.nested]
+        if unknown:
+            raise BadRequest(f'Unknown fields: {", ".join(unknown)}')
+        row_fields = [name for name in dict.fromkeys(names) if name in self.fields]
+        return row_fields, [name for name in dict.fromkeys(names) if name in self.nested]
+
+
+SALES_ORDER_ITEM_FIELDS = {
+    'id': 'id',
+    'product': 'product_id',
+    'sku': 'product__sku',
+    'product_name': 'product__name',
+    'quantity': 'quantity',
+    'unit_price': 'unit_price',
+    'unit_discount': 'Unit_discount',
+    'total': 'total',
+    'returned_quantity': 'returned_quantity',
+    'returned_amount': 'returned_amount',
+    'updated_at': 'updated_at',
+}
+
+AR_INVOICE_ITEM_FIELDS = {
+    'id': 'id',
+    'product': 'product_id',
+    'sku': 'product__sku',
+    'product_name': 'product__name',
+    'quantity': 'quantity',
+    'unit_price': 'unit_price',
+    'total_amount': 'total_amount',
+    'updated_at': 'updated_at',
+}
+
+ENDPOINTS = {endpoint.name: endpoint for endpoint in [
+    Endpoint(
+        name='products',
+        model=Product,
+        permission='uniworlderp.view_product',
+        fields={
+            'id': 'id', 'sku': 'sku', 'barcode': 'barcode', 'name': 'name', 'description': 'description',
+            'category': 'category', 'unit': 'unit', 'price': 'price', 'discount_amount': 'discount_amount',
+            'stock_quantity': 'stock_quantity', 'reorder_level': 'reorder_level', 'is_active': 'is_active',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'sku', 'name', 'category', 'unit', 'price', 'stock_quantity', 'is_active', 'updated_at'),
+        filters={'sku': 'sku', 'category': 'category', 'is_active': 'is_active', 'updated_since': 'updated_at__gte'},
+        tracked=(Product, StockTransaction),
+    ),
+    Endpoint(
+        name='stock-transactions',
+        model=StockTransaction,
+        permission='uniworlderp.view_stocktransaction',
+        fields={
+            'id': 'id', 'product': 'product_id', 'sku': 'product__sku', 'transaction_type': 'transaction_type',
+            'quantity': 'quantity', 'previous_stock': 'previous_stock', 'current_stock': 'current_stock',
+            'reference': 'reference', 'transaction_date': 'transaction_date', 'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'product', 'sku', 'transaction_type', 'quantity', 'previous_stock', 'current_stock',
+                        'reference', 'transaction_date'),
+        filters={'product': 'product_id', 'transaction_type': 'transaction_type',
+                 'since': 'transaction_date__gte', 'updated_since': 'updated_at__gte'},
+        tracked=(StockTransaction, Product),
+    ),
+    Endpoint(
+        name='sales-orders',
+        model=SalesOrder,
+        permission='uniworlderp.view_salesorder',
+        fields={
+            'id': 'id', 'customer': 'customer_id', 'customer_name': 'customer__name',
+            'sales_employee': 'sales_employee_id', 'sales_employee_name': 'sales_employee__full_name',
+            'order_date': 'order_date', 'delivery_status': 'delivery_status', 'total_amount': 'total_amount',
+            'discount': 'discount', 'shipping': 'shipping', 'notes': 'notes',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'customer', 'customer_name', 'order_date', 'delivery_status', 'total_amount',
+                        'updated_at'),
+        filters={'customer': 'customer_id', 'delivery_status': 'delivery_status',
+                 'order_date_from': 'order_date__gte', 'order_date_to': 'order_date__lte',
+                 'updated_since': 'updated_at__gte'},
+        nested={'items': Nested(SalesOrderItem, 'sales_order_id', SALES_ORDER_ITEM_FIELDS)},
+        tracked=(SalesOrder, SalesOrderItem, CustomerVendor, SalesEmployee, Product),
+    ),
+    Endpoint(
+        name='invoices',
+        model=ARInvoice,
+        permission='uniworlderp.view_arinvoice',
+        fields={
+            'id': 'id', 'customer': 'customer_id', 'customer_name': 'customer__name',
+            'sales_employee': 'sales_employee_id', 'sales_order': 'sales_order_id',
+            'invoice_date': 'invoice_date', 'due_date': 'due_date', 'total_amount': 'total_amount',
+            'payment_status': 'payment_status', 'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'customer', 'customer_name', 'sales_order', 'invoice_date', 'due_date',
+                        'total_amount', 'payment_status', 'updated_at'),
+        filters={'customer': 'customer_id', 'payment_status': 'payment_status',
+                 'invoice_date_from': 'invoice_date__gte', 'invoice_date_to': 'invoice_date__lte',
+                 'updated_since': 'updated_at__gte'},
+        nested={'items': Nested(ARInvoiceItem, 'ar_invoice_id', AR_INVOICE_ITEM_FIELDS)},
+        # Deleting an item does not re-save its invoice
+        tracked=(ARInvoice, ARInvoiceItem, CustomerVendor, Product),
+    ),
+    Endpoint(
+        name='customers',
+        model=CustomerVendor,
+        permission='uniworlderp.view_customervendor',
+        fields={
+            'id': 'id', 'name': 'name', 'email': 'email', 'phone_number': 'phone_number',
+            'whatsapp_number': 'whatsapp_number', 'address': 'address', 'business_type': 'business_type',
+            'entity_type': 'entity_type', 'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'name', 'email', 'phone_number', 'business_type', 'entity_type', 'updated_at'),
+        filters={'entity_type': 'entity_type', 'business_type': 'business_type', 'updated_since': 'updated_at__gte'},
+        tracked=(CustomerVendor,),
+    ),
+]}
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def decode_cursor(endpoint, cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        return endpoint.model._meta.pk.to_python(value)
+    except (binascii.Error, UnicodeDecodeError, ValidationError):
+        raise BadRequest('Invalid cursor')
+
+
+def _filter_value(model, lookup, value):
+    model_field = model._meta.get_field(lookup.split('__')[0])
+    try:
+        if isinstance(model_field, models.DateTimeField):
+            parsed = parse_datetime(value) or (parse_date(value) and datetime.combine(parse_date(value), time.min))
+            if parsed and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+        elif isinstance(model_field, models.DateField):
+            parsed = parse_date(value)
+        elif isinstance(model_field, models.BooleanField):
+            parsed = {'true': True, '1': True, 'false': False, '0': False}.get(value.lower())
+        else:
+            parsed = model_field.to_python(value)
+    except (ValueError, ValidationError):
+        parsed = None
+    if parsed is None:
+        raise BadRequest(f'Invalid value for {lookup.split("__")[0]}: "{value}"')
+    return parsed
+
+
+def queryset(endpoint, params):
+    """The rows matching the endpoint's filters in ``params`` (a QueryDict), in pk order."""
+    matching = endpoint.model._default_manager.all()
+    for name, lookup in endpoint.filters.items():
+        if params.get(name):
+            matching = matching.filter(**{lookup: _filter_value(endpoint.model, lookup, params[name])})
+    return matching.order_by('pk')
+
+
+def version(endpoint):
+    """
+    ``(version, last modified)`` of the endpoint's data: the newest change of
+    its models in the change log, and their commit tags
+    (``change_log.commit_tag``), which move when a change whose transaction
+    commits after a higher-numbered one becomes visible. One indexed lookup
+    and one cache read, however long the log.
+    """
+    names = [model._meta.model_name for model in endpoint.tracked]
+    newest = ChangeLog.objects.filter(model__in=names).order_by('-id').values_list('id', 'changed_at').first()
+    newest_id, changed_at = newest or (0, None)
+    commits = erp_cache.get_tag_versions([change_log.commit_tag(name) for name in names])
+    digest = hashlib.sha1(repr(sorted(commits.items())).encode()).hexdigest()[:12]
+    return f'{newest_id}.{digest}', changed_at
+
+
+def etag(endpoint, params, data_version):
+    """ETag of one response: the endpoint, its data version and the query string."""
+    query = '&'.join(f'{key}={value}' for key, values in sorted(params.lists()) for value in values)
+    digest = hashlib.sha1(f'{endpoint.name}:{data_version}:{query}'.encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _available_stock(page):
+    # Sharded products keep their stock in counter rows
+    sharded = [row['_pk'] for row in page if row.pop('_sharded')]
+    if sharded:
+        on_hand = stock_counters.totals(sharded)
+        for row in page:
+            if row['_pk'] in on_hand:
+                row['stock_quantity'] = on_hand[row['_pk']]
+
+
+def rows(endpoint, rows_queryset, names, nested_names, limit, after=None):
+    """
+    Yield the rows of one page (at most ``limit`` dicts of ``names`` and
+    ``nested_names``), then ``None`` followed by the cursor of the next page
+    (``None`` on the last one).
+    """
+    stock = endpoint.model is Product and 'stock_quantity' in names
+    lookups = [endpoint.fields[name] for name in names] + ['pk'] + (['sharded_stock'] if stock else [])
+
+    sent = 0
+    last = after
+    while sent < limit:
+        chunk = rows_queryset if last is None else rows_queryset.filter(pk__gt=last)
+        page = []
+        for values in chunk.values_list(*lookups)[:min(CHUNK_SIZE, limit - sent)]:
+            row = dict(zip(names, values))
+            row['_pk'] = values[len(names)]
+            if stock:
+                row['_sharded'] = values[-1]
+            page.append(row)
+        if not page:
+            break
+        if stock:
+            _available_stock(page)
+        for name in nested_names:
+            _attach(endpoint.nested[name], name, page)
+        last = page[-1]['_pk']
+        for row in page:
+            del row['_pk']
+            yield row
+        sent += len(page)
+
+    more = sent >= limit and last is not None and rows_queryset.filter(pk__gt=last).exists()
+    yield None
+    yield encode_cursor(last) if more else None
+
+
+def _attach(nested, name, page):
+    lookups = list(nested.fields.values())
+    lines = {}
+    for values in (
+        nested.model._default_manager.filter(**{f'{nested.parent}__in': [row['_pk'] for row in page]})
+        .order_by(nested.parent, 'pk').values_list(nested.parent, *lookups)
+    ):
+        lines.setdefault(values[0], []).append(dict(zip(nested.fields, values[1:])))
+    for row in page:
+        row[name] = lines.get(row['_pk'], [])
+
+
+def stream(endpoint, rows_queryset, names, nested_names, limit, after=None):
+    """The JSON document of one page, ``{"results": [...], "next": cursor}``, in pieces."""
+    encoder = DjangoJSONEncoder()
+    yield '{"results": ['
+    produced = rows(endpoint, rows_queryset, names, nested_names, limit, after)
+    buffer = []
+    first = True
+    for row in produced:
+        if row is None:
+            break
+        buffer.append(encoder.encode(row))
+        if len(buffer) >= CHUNK_SIZE:
+            yield ('' if first else ',') + ','.join(buffer)
+            buffer, first = [], False
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield '], "next": ' + json.dumps(next(produced)) + '}'
@@ -0,0 +1,128 @@
+"""
+Receivables aging of the pending AR invoices.
+
+``aging()`` sums the pending invoices of each customer into the current /
+1-30 / 31-60 / 61-90 / 90+ days overdue buckets in one grouped query, with
+one conditional ``Sum`` per bucket, so its cost grows with the number of
+open invoices but not the number of customers. An invoice is current until
+its due date has passed; it is then as many days overdue as there are days
+between its due date and the report date.
+
+The result is cached for the day under the ``arinvoice`` tag: a saved or
+deleted invoice invalidates it, and the next day builds a new one. The
+customer statement (``statement()``) is the same aging filtered to one
+customer, plus the list of its open invoices.
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, Min, Q, Sum, Value, When
+from django.utils import timezone
+
+from uniworlderp import cache as erp_cache
+from uniworlderp.models import ARInvoice
+
+
+# (key, label, first day overdue, last day overdue or None)
+BUCKETS = [
+    ('current', 'Current', None, 0),
+    ('days_1_30', '1-30 days', 1, 30),
+    ('days_31_60', '31-60 days', 31, 60),
+    ('days_61_90', '61-90 days', 61, 90),
+    ('days_over_90', '90+ days', 91, None),
+]
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def bucket_conditions(as_of):
+    """``[(key, Q)]`` of the buckets on ``due_date`` for a report dated ``as_of``."""
+    conditions = []
+    for key, _, first, last in BUCKETS:
+        condition = Q()
+        if first is not None:
+            # Due before the start of the day ``first`` days ago
+            condition &= Q(due_date__lt=_day_start(as_of - datetime.timedelta(days=first - 1)))
+        if last is not None:
+            condition &= Q(due_date__gte=_day_start(as_of - datetime.timedelta(days=last)))
+        conditions.append((key, condition))
+    return conditions
+
+
+def open_invoices(as_of=None, customer_id=None):
+    """The pending invoices (of ``customer_id``), each with the ``aging_bucket`` key it falls in."""
+    as_of = as_of or timezone.localdate()
+    invoices = ARInvoice.objects.filter(payment_status='P')
+    if customer_id is not None:
+        invoices = invoices.filter(customer_id=customer_id)
+    return invoices.annotate(aging_bucket=Case(
+        *[When(condition, then=Value(key)) for key, condition in bucket_conditions(as_of)],
+        output_field=CharField(),
+    ))
+
+
+def _compute(as_of, customer_id):
+    sums = {
+        key: Sum('total_amount', filter=condition, default=Decimal('0.00'))
+        for key, condition in bucket_conditions(as_of)
+    }
+    rows = list(
+        open_invoices(as_of, customer_id).order_by()
+        .values('customer_id', 'customer__name', 'customer__phone_number')
+        .annotate(**sums, total=Sum('total_amount'), invoice_count=Count('pk'), oldest_due_date=Min('due_date'))
+        .order_by('customer__name', 'customer_id')
+    )
+    totals = {key: sum((row[key] for row in rows), Decimal('0.00')) for key in [*sums, 'total']}
+    totals['invoice_count'] = sum(row['invoice_count'] for row in rows)
+    return {'as_of': as_of, 'rows': rows, 'totals': totals}
+
+
+def aging(as_of=None, customer_id=None):
+    """
+    ``{'as_of', 'rows', 'totals'}``: one row per customer with pending invoices
+    (of ``customer_id`` only when given), holding ``customer_id``,
+    ``customer__name``, ``customer__phone_number``, the amount of each
+    ``BUCKETS`` key, ``total``, ``invoice_count`` and ``oldest_due_date``;
+    ``totals`` sums the amounts and counts over the rows.
+    """
+    as_of = as_of or timezone.localdate()
+    return erp_cache.get_or_set(
+        f'ar-aging:{as_of.isoformat()}:{customer_id or ""}',
+        lambda: _compute(as_of, customer_id),
+        timeout=CACHE_TIMEOUT,
+        tags=(erp_cache.AR_INVOICE,),
+    )
+
+
+def statement(customer_id, as_of=None):
+    """The aging of one customer (``row`` is ``None`` without pending invoices) and its open invoices."""
+    as_of = as_of or timezone.localdate()
+    report = aging(as_of, customer_id)
+    labels = {key: label for key, label, _, _ in BUCKETS}
+    invoices = list(open_invoices(as_of, customer_id).order_by('due_date', 'pk'))
+    for invoice in invoices:
+        invoice.days_overdue = max((as_of - timezone.localdate(invoice.due_date)).days, 0)
+        invoice.aging_label = labels[invoice.aging_bucket]
+    return {
+        'as_of': as_of,
+        'row': report['rows'][0] if report['rows'] else None,
+        'invoices': invoices,
+    }
+
+
+def csv_rows(report):
+    """The rows of an ``aging()`` report for a CSV export, header and totals included."""
+    yield ['Customer', 'Phone', 'Invoices', 'Oldest Due Date', *[label for _, label, _, _ in BUCKETS], 'Total']
+    for row in report['rows']:
+        yield [
+            row['customer__name'], row['customer__phone_number'] or '', row['invoice_count'],
+            timezone.localdate(row['oldest_due_date']).isoformat(),
+            *[row[key] for key, _, _, _ in BUCKETS], row['total'],
+        ]
+    totals = report['totals']
+    yield ['Total', '', totals['invoice_count'], '', *[totals[key] for key, _, _, _ in BUCKETS], totals['total']]
@@ -0,0 +1,159 @@
+"""
+Reorder suggestions computed from the stock movement history.
+
+The static ``Product.reorder_level`` ignores how fast a product sells.
+``suggest()`` measures the daily demand of every active product over the
+last ``REORDER_HISTORY_DAYS`` complete days: units out (OUT) less units
+returned (RET) per day, never below zero, and days without movement count
+as zero demand. From the average ``d`` and standard deviation ``s`` of that
+daily demand, with the supplier lead time ``L`` and the safety z-score ``z``:
+
+- safety stock = z * s * sqrt(L)
+- reorder point = d * L + safety stock
+- order quantity = reorder point + d * ``REORDER_COVER_DAYS`` - stock on hand,
+  suggested once the stock is at or below the reorder point
+- days of cover = stock on hand / d
+
+The movements are read in one query, summed per product and day by the
+database; the statistics are then computed for the whole catalogue in one
+pass over those sums. The results replace the ``ReorderSuggestion`` rows,
+read by the product list and the stock report. ``python manage.py suggest_reorders``
+runs it, nightly from cron.
+"""
+
+import datetime
+import math
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from uniworlderp import stock_counters
+from uniworlderp.models import Product, ReorderSuggestion, StockTransaction
+
+
+BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class Policy:
+    history_days: int
+    lead_time_days: int
+    cover_days: int
+    service_level_z: float
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        values = {
+            'history_days': settings.REORDER_HISTORY_DAYS,
+            'lead_time_days': settings.REORDER_LEAD_TIME_DAYS,
+            'cover_days': settings.REORDER_COVER_DAYS,
+            'service_level_z': settings.REORDER_SERVICE_LEVEL_Z,
+        }
+        values.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(**values)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def daily_demand(product_index, history_days):
+    """
+    ``(product positions, units)``: the net demand of each product and day
+    with movements in the ``history_days`` days before today, in one query.
+    """
+    today = timezone.localdate()
+    rows = (
+        StockTransaction.objects
+        .filter(
+            transaction_type__in=['OUT', 'RET'],
+            transaction_date__gte=_day_start(today - datetime.timedelta(days=history_days)),
+            transaction_date__lt=_day_start(today),
+        )
+        .annotate(day=TruncDate('transaction_date'))
+        .values_list('product_id', 'day')
+        .annotate(units=Sum(Case(
+            When(transaction_type='OUT', then=F('quantity')),
+            default=-F('quantity'),
+            output_field=IntegerField(),
+        )))
+        .order_by()
+    )
+    positions, units = [], []
+    for product_id, _, quantity in rows:
+        position = product_index.get(product_id)
+        if position is not None and quantity > 0:
+            positions.append(position)
+            units.append(quantity)
+    return positions, units
+
+
+def _statistics(count, positions, units, on_hand, policy):
+    total, squares = [0.0] * count, [0.0] * count
+    for position, quantity in zip(positions, units):
+        total[position] += quantity
+        squares[position] += quantity * quantity
+    for i in range(count):
+        mean = total[i] / policy.history_days
+        deviation = math.sqrt(max(squares[i] / policy.history_days - mean * mean, 0))
+        reorder_point = math.ceil(mean * policy.lead_time_days
+                                  + policy.service_level_z * deviation * math.sqrt(policy.lead_time_days))
+        order_up_to = reorder_point + math.ceil(mean * policy.cover_days)
+        order = max(order_up_to - on_hand[i], 0) if mean > 0 and on_hand[i] <= reorder_point else 0
+        yield mean, deviation, reorder_point, int(order), on_hand[i] / mean if mean > 0 else None
+
+
+def suggest(policy=None, dry_run=False):
+    """
+    Compute the suggestion of every active product and, unless ``dry_run``,
+    replace the ``ReorderSuggestion`` rows with them; returns the (unsaved
+    when ``dry_run``) suggestions.
+    """
+    policy = policy or Policy.from_settings()
+    if policy.history_days < 1:
+        raise ValueError('The demand history must cover at least one day')
+    products = list(
+        Product.objects.filter(is_active=True).order_by().values_list('pk', 'stock_quantity', 'sharded_stock')
+    )
+    sharded = stock_counters.totals([pk for pk, _, is_sharded in products if is_sharded])
+    ids = [pk for pk, _, _ in products]
+    on_hand = [sharded.get(pk, 0) if is_sharded else stock for pk, stock, is_sharded in products]
+
+    positions, units = daily_demand({pk: i for i, pk in enumerate(ids)}, policy.history_days)
+    now = timezone.now()
+    suggestions = [
+        ReorderSuggestion(
+            product_id=pk,
+            daily_demand=Decimal(f'{mean:.3f}'),
+            demand_deviation=Decimal(f'{deviation:.3f}'),
+            stock_on_hand=stock,
+            days_of_cover=None if cover is None else Decimal(f'{min(cover, 999999999):.1f}'),
+            reorder_point=reorder_point,
+            order_quantity=order,
+            computed_at=now,
+        )
+        for pk, stock, (mean, deviation, reorder_point, order, cover) in zip(
+            ids, on_hand, _statistics(len(ids), positions, units, on_hand, policy),
+        )
+    ]
+    if dry_run:
+        return suggestions
+
+    with transaction.atomic():
+        ReorderSuggestion.objects.exclude(product_id__in=Product.objects.filter(is_active=True).values('pk')).delete()
+        ReorderSuggestion.objects.bulk_create(
+            suggestions,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=[
+                'daily_demand', 'demand_deviation', 'stock_on_hand', 'days_of_cover',
+                'reorder_point', 'order_quantity', 'computed_at',
+            ],
+        )
+    return suggestions
@@ -0,0 +1,199 @@
+"""
+Monthly performance of each sales employee.
+
+``SalesEmployeePerformance`` holds one row per employee and month: gross sales
+(the total of their orders dated in the month), returns (the total of the
+returns of their orders dated in the month), the number of orders and of
+distinct customers. Net sales are gross minus returns. The dashboard
+leaderboard and the sales employee pages read these rows instead of the
+hand-entered ``sales_achieved`` they used to show.
+
+A saved or deleted sales order or return ``schedule()``s the (employee,
+month) buckets it touches; they are recomputed from the orders and returns
+once the transaction commits, each bucket once however many lines were
+saved. The bulk paths that bypass the signals (order import) schedule their
+buckets themselves. ``rebuild_sales_performance`` recomputes every bucket,
+e.g. after orders were changed with ``QuerySet.update()`` or raw SQL.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from uniworlderp.models import ReturnSales, SalesEmployee, SalesEmployeePerformance, SalesOrder
+
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def schedule(buckets):
+    """
+    Recompute the ``(employee id, date)`` buckets (the date's month) when the
+    current transaction commits, or now outside a transaction.
+    """
+    buckets = {(employee_id, month_start(day)) for employee_id, day in buckets if employee_id and day}
+    if not buckets:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        refresh(buckets)
+        return
+    pending = getattr(connection, '_sales_performance_pending', None)
+    # A rolled-back transaction or savepoint discards the flush, not the set
+    if pending is None or not any(entry[1] is pending[0] for entry in connection.run_on_commit):
+        def flush():
+            connection._sales_performance_pending = None
+            refresh(queued)
+        queued = set()
+        pending = connection._sales_performance_pending = (flush, queued)
+        transaction.on_commit(flush)
+    pending[1].update(buckets)
+
+
+def _totals(employee_ids=None, start=None, end=None):
+    """``{(employee id, month): (gross, returned, orders, customers)}`` computed from the orders and returns."""
+    orders = SalesOrder.objects.filter(sales_employee__isnull=False)
+    returns = ReturnSales.objects.filter(sales_order__sales_employee__isnull=False)
+    if employee_ids is not None:
+        orders = orders.filter(sales_employee_id__in=employee_ids)
+        returns = returns.filter(sales_order__sales_employee_id__in=employee_ids)
+    if start is not None:
+        orders = orders.filter(order_date__gte=start, order_date__lt=end)
+        returns = returns.filter(return_date__gte=start, return_date__lt=end)
+
+    totals = {}
+    for row in (
+        orders.annotate(month=TruncMonth('order_date')).order_by()
+        .values('sales_employee_id', 'month')
+        .annotate(gross=Sum('total_amount'), orders=Count('pk'), customers=Count('customer', distinct=True))
+    ):
+        totals[(row['sales_employee_id'], row['month'])] = [row['gross'], Decimal('0.00'), row['orders'], row['customers']]
+    for row in (
+        returns.annotate(month=TruncMonth('return_date')).order_by()
+        .values('sales_order__sales_employee_id', 'month')
+        .annotate(returned=Sum('total_amount'))
+    ):
+        key = (row['sales_order__sales_employee_id'], row['month'])
+        totals.setdefault(key, [Decimal('0.00'), Decimal('0.00'), 0, 0])[1] = row['returned']
+    return {key: tuple(values) for key, values in totals.items()}
+
+
+def _values(row):
+    return (row.gross_amount, row.returned_amount, row.order_count, row.customer_count)
+
+
+def _set_values(row, values):
+    row.gross_amount, row.returned_amount, row.order_count, row.customer_count = values
+
+
+def refresh(buckets):
+    """Recompute the ``(employee id, first of month)`` buckets from the orders and returns."""
+    for employee_id, month in sorted(buckets):
+        with transaction.atomic():
+            # Locking the employee serialises concurrent refreshes of its buckets
+            if not SalesEmployee.objects.select_for_update().filter(pk=employee_id).exists():
+                continue
+            values = _totals([employee_id], month, next_month(month)).get((employee_id, month))
+            row = SalesEmployeePerformance.objects.filter(employee_id=employee_id, month=month).first()
+            if values is None:
+                if row is not None:
+                    row.delete()
+            elif row is None:
+                row = SalesEmployeePerformance(employee_id=employee_id, month=month)
+                _set_values(row, values)
+                row.save()
+            elif _values(row) != values:
+                _set_values(row, values)
+                row.save()
+
+
+def rebuild(employee_ids=None, dry_run=False):
+    """
+    Recompute every bucket (or those of ``employee_ids``) and write the ones
+    that differ; returns ``[((employee id, month), values before, values
+    after)]`` with ``None`` for a missing or deleted row.
+    """
+    changes = []
+    with transaction.atomic():
+        rows = SalesEmployeePerformance.objects.select_for_update()
+        if employee_ids is not None:
+            rows = rows.filter(employee_id__in=employee_ids)
+        existing = {(row.employee_id, row.month): row for row in rows}
+        totals = _totals(employee_ids)
+
+        created, updated = [], []
+        for key, values in totals.items():
+            row = existing.get(key)
+            if row is None:
+                row = SalesEmployeePerformance(employee_id=key[0], month=key[1])
+                changes.append((key, None, values))
+                _set_values(row, values)
+                created.append(row)
+            elif _values(row) != values:
+                changes.append((key, _values(row), values))
+                _set_values(row, values)
+                updated.append(row)
+        stale = [row for key, row in existing.items() if key not in totals]
+        changes.extend(((row.employee_id, row.month), _values(row), None) for row in stale)
+
+        if not dry_run:
+            now = timezone.now()
+            for row in created + updated:
+                row.updated_at = now
+            SalesEmployeePerformance.objects.bulk_create(created)
+            SalesEmployeePerformance.objects.bulk_update(
+                updated, ['gross_amount', 'returned_amount', 'order_count', 'customer_count', 'updated_at'],
+            )
+            SalesEmployeePerformance.objects.filter(pk__in=[row.pk for row in stale]).delete()
+    return sorted(changes, key=lambda change: change[0])
+
+
+def with_achievement(queryset):
+    """
+    Annotate performance rows with ``net_amount`` and ``achievement_percentage``
+    (net sales against the employee's monthly target; ``None`` without a target).
+    """
+    net = ExpressionWrapper(F('gross_amount') - F('returned_amount'), output_field=AMOUNT)
+    return queryset.annotate(
+        net_amount=net,
+        achievement_percentage=Case(
+            When(employee__sales_target__gt=0, then=net * 100 / F('employee__sales_target')),
+            default=None,
+            output_field=AMOUNT,
+        ),
+    )
+
+
+def leaderboard(month=None, limit=5):
+    """The ``limit`` best performance rows of ``month`` (this month by default) with their employees."""
+    month = month_start(month or timezone.localdate())
+    return list(
+        with_achievement(SalesEmployeePerformance.objects.filter(month=month).select_related('employee'))
+        .order_by(F('achievement_percentage').desc(nulls_last=True), '-net_amount')[:limit]
+    )
+
+
+def history(employee, months=12):
+    """The performance rows of ``employee`` over the last ``months`` months, newest first."""
+    today = timezone.localdate()
+    index = today.year * 12 + today.month - months
+    start = date(index // 12, index % 12 + 1, 1)
+    return list(with_achievement(employee.performance.filter(month__gte=start).select_related('employee')))
+
+
+def current_net_amount():
+    """Subquery of an employee's net sales this month, to annotate ``SalesEmployee`` rows with."""
+    rows = SalesEmployeePerformance.objects.filter(employee=OuterRef('pk'), month=month_start(timezone.localdate()))
+    return Subquery(with_achievement(rows).values('net_amount')[:1], output_field=AMOUNT)
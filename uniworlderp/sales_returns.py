@@ -0,0 +1,238 @@
+"""
+Returned quantity / amount maintained on each sales order line.
+
+``SalesOrderItem.returned_quantity`` and ``returned_amount`` hold the sum of
+the ``ReturnSalesItem`` rows booked against the line. ``ReturnSalesItem.save``
+adds the change of each saved return line and a ``post_delete`` signal takes a
+deleted one off, both with an ``F()`` update in the caller's transaction, so
+the return form, the return validation and the reports read them instead of
+aggregating the return lines. ``rebuild_returned_totals`` recomputes them.
+
+``post_return()`` books all the lines of a return at once, in a fixed number
+of queries however many lines it has, instead of the per-line ``clean()`` /
+``StockTransaction`` / ``update_total_amount()`` round trips of
+``ReturnSalesItem.save``.
+"""
+
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from uniworlderp import cache as erp_cache, change_log, stock_counters
+from uniworlderp.models import Product, ReturnSalesItem, SalesOrderItem, StockTransaction
+
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def record(sales_order_item_id, quantity, amount):
+    """Add ``quantity`` / ``amount`` (negative to take off) to the returned totals of a line."""
+    if not quantity and not amount:
+        return
+    SalesOrderItem.objects.filter(pk=sales_order_item_id).update(
+        returned_quantity=F('returned_quantity') + quantity,
+        returned_amount=F('returned_amount') + amount,
+        updated_at=timezone.now(),
+    )
+    change_log.record_many(SalesOrderItem, [sales_order_item_id], change_log.UPDATED)
+
+
+def post_return(return_sales, lines):
+    """
+    Book ``lines`` (unsaved ``ReturnSalesItem``s with ``sales_order_item``,
+    ``quantity`` and ``unit_price``; zero quantities are skipped) on the saved
+    ``return_sales``: the return lines, the returned totals of the sales order
+    lines, one RET stock movement per line and the return total. The sales
+    order lines and their products are read and locked in one query; raises
+    ``ValidationError`` when a line is not on the return's sales order or
+    returns more than is left returnable. Returns the saved lines.
+    """
+    lines = [line for line in lines if line.quantity]
+    wanted = {}
+    for line in lines:
+        wanted[line.sales_order_item_id] = wanted.get(line.sales_order_item_id, 0) + line.quantity
+
+    with transaction.atomic():
+        sold = (
+            SalesOrderItem.objects.select_for_update().select_related('product')
+            .filter(sales_order_id=return_sales.sales_order_id).in_bulk(list(wanted))
+        )
+        errors = []
+        for item_id, quantity in wanted.items():
+            item = sold.get(item_id)
+            if item is None:
+                errors.append(f'Item {item_id} is not on sales order #{return_sales.sales_order_id}.')
+            elif quantity > item.quantity - item.returned_quantity:
+                errors.append(
+                    f'Return quantity of {item.product.name} exceeds available quantity. '
+                    f'Maximum returnable: {item.quantity - item.returned_quantity}'
+                )
+        if errors:
+            raise ValidationError(errors)
+
+        for line in lines:
+            line.return_sales = return_sales
+            line.total = line.calculate_total_price()
+        ReturnSalesItem.objects.bulk_create(lines)
+
+        products = {item.product_id: item.product for item in sold.values()}
+        sharded = [pk for pk, product in products.items() if product.sharded_stock]
+        if sharded:
+            # Running balance of the movements; the shards are updated below
+            for pk, on_hand in stock_counters.totals(sharded).items():
+                products[pk].stock_quantity = on_hand
+
+        now = timezone.now()
+        movements = []
+        returned = {}
+        for line in lines:
+            item = sold[line.sales_order_item_id]
+            item.returned_quantity += line.quantity
+            item.returned_amount += line.total
+            item.updated_at = now
+            product = products[item.product_id]
+            previous_stock = product.stock_quantity
+            product.stock_quantity += line.quantity
+            returned[product.pk] = returned.get(product.pk, 0) + line.quantity
+            movements.append(StockTransaction(
+                product=product,
+                transaction_type='RET',
+                quantity=line.quantity,
+                previous_stock=previous_stock,
+                current_stock=product.stock_quantity,
+                reference=f'RET-{return_sales.id}',
+                owner_id=return_sales.sales_order.owner_id,
+            ))
+        SalesOrderItem.objects.bulk_update(sold.values(), ['returned_quantity', 'returned_amount', 'updated_at'])
+        StockTransaction.objects.bulk_create(movements)
+
+        for pk in sharded:
+            stock_counters.add(products[pk], returned[pk])
+        touched = [product for pk, product in products.items() if pk not in sharded]
+        for product in touched:
+            product.updated_at = now
+        Product.objects.bulk_update(touched, ['stock_quantity', 'updated_at'])
+        change_log.record_changes(
+            [(SalesOrderItem, pk, change_log.UPDATED) for pk in sold]
+            + [(StockTransaction, movement.pk, change_log.CREATED) for movement in movements]
+            + [(Product, product.pk, change_log.UPDATED) for product in touched]
+        )
+
+        return_sales.total_amount += sum((line.total for line in lines), Decimal('0.00'))
+        return_sales.save(update_fields=['total_amount', 'updated_at'])
+
+        # bulk_create / bulk_update bypass the post_save signals
+        transaction.on_commit(lambda: erp_cache.invalidate_tags(erp_cache.PRODUCT, erp_cache.STOCK_TRANSACTION))
+    return lines
+
+
+def counters_cover(end_date):
+    """
+    Whether the maintained totals equal the returns a report window counts:
+    returns of a line are never dated before its order, so a window that is
+    open-ended or runs to today includes every return of the lines it shows.
+    ``end_date`` is a date, an ISO date string or empty.
+    """
+    if isinstance(end_date, str):
+        end_date = parse_date(end_date) if end_date else None
+    return end_date is None or end_date >= timezone.localdate()
+
+
+def returns_by_line(returns, end_date):
+    """
+    Returned ``{'qty', 'amount'}`` per sales order line id, summed from
+    ``returns`` (return lines already filtered to the report window), or
+    ``None`` when ``counters_cover(end_date)``: read ``line_returned()`` then.
+    """
+    if counters_cover(end_date):
+        return None
+    return {
+        row['sales_order_item_id']: {'qty': row['qty'] or 0, 'amount': row['amount'] or 0}
+        for row in returns.values('sales_order_item_id').annotate(qty=Sum('quantity'), amount=Sum('total'))
+    }
+
+
+def line_returned(line, returns):
+    """``{'qty', 'amount'}`` returned of a sales order line, from ``returns_by_line()`` or its own totals."""
+    if returns is None:
+        return {'qty': line.returned_quantity, 'amount': line.returned_amount}
+    return returns.get(line.pk, {'qty': 0, 'amount': Decimal('0.00')})
+
+
+def returns_by_order(returns, end_date):
+    """``returns_by_line()`` summed per sales order id."""
+    if counters_cover(end_date):
+        return None
+    return {
+        row['sales_order_item__sales_order_id']: {'qty': row['qty'] or 0, 'amount': row['amount'] or 0}
+        for row in returns.values('sales_order_item__sales_order_id').annotate(qty=Sum('quantity'), amount=Sum('total'))
+    }
+
+
+def order_returned(order, returns):
+    """
+    ``{'qty', 'amount'}`` returned of a sales order, from ``returns_by_order()``
+    or the totals of its lines (prefetch ``order_items`` to avoid a query).
+    """
+    if returns is not None:
+        return returns.get(order.pk, {'qty': 0, 'amount': Decimal('0.00')})
+    lines = order.order_items.all()
+    return {
+        'qty': sum(line.returned_quantity for line in lines),
+        'amount': sum((line.returned_amount for line in lines), Decimal('0.00')),
+    }
+
+
+def _actual_totals(queryset):
+    returns = ReturnSalesItem.objects.filter(sales_order_item=OuterRef('pk')).values('sales_order_item')
+    return queryset.annotate(
+        actual_quantity=Coalesce(
+            Subquery(returns.annotate(total=Sum('quantity')).values('total')),
+            Value(0), output_field=IntegerField(),
+        ),
+        actual_amount=Coalesce(
+            Subquery(returns.annotate(total=Sum('total')).values('total')),
+            Value(Decimal('0.00')), output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+def rebuild(sales_order_ids=None, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recompute the returned totals of every line (or of the lines of
+    ``sales_order_ids``) from the return lines and write the ones that
+    differ; returns ``[(line, (quantity, amount) before, (quantity, amount) after)]``.
+    """
+    queryset = SalesOrderItem.objects.all()
+    if sales_order_ids is not None:
+        queryset = queryset.filter(sales_order_id__in=sales_order_ids)
+    drifted = (
+        _actual_totals(queryset)
+        .exclude(returned_quantity=F('actual_quantity'), returned_amount=F('actual_amount'))
+        .only('pk', 'sales_order_id', 'returned_quantity', 'returned_amount', 'updated_at')
+        .order_by('pk')
+    )
+
+    changes = []
+    now = timezone.now()
+    with transaction.atomic():
+        for line in drifted.iterator(chunk_size=batch_size):
+            changes.append((
+                line,
+                (line.returned_quantity, line.returned_amount),
+                (line.actual_quantity, line.actual_amount),
+            ))
+            line.returned_quantity, line.returned_amount = line.actual_quantity, line.actual_amount
+            line.updated_at = now
+        if not dry_run:
+            SalesOrderItem.objects.bulk_update(
+                [line for line, _, _ in changes], ['returned_quantity', 'returned_amount', 'updated_at'],
+                batch_size=batch_size,
+            )
+            change_log.record_many(SalesOrderItem, [line.pk for line, _, _ in changes], change_log.UPDATED)
+    return changes
@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from company.models import Company
+from myproject import thumbnails
+from uniworlderp import cache as erp_cache
+from uniworlderp import change_log, sales_performance, sales_returns
+from uniworlderp.models import Product, SalesOrder, ARInvoice, ReturnSales, ReturnSalesItem, StockTransaction
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply WAL / synchronous / busy_timeout pragmas to every new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE};')
+        cursor.execute(f'PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS};')
+        cursor.execute(f'PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)};')
+
+
+# Cache tag invalidated whenever a row of the model is saved or deleted
+CACHE_TAGS = {
+    Product: erp_cache.PRODUCT,
+    SalesOrder: erp_cache.SALES_ORDER,
+    ARInvoice: erp_cache.AR_INVOICE,
+    StockTransaction: erp_cache.STOCK_TRANSACTION,
+    Company: erp_cache.COMPANY,
+}
+
+
+def invalidate_model_cache(sender, **kwargs):
+    # Wait for the commit so a concurrent reader cannot re-cache the old rows
+    tag = CACHE_TAGS[sender]
+    transaction.on_commit(lambda: erp_cache.invalidate_tags(tag))
+
+
+for model in CACHE_TAGS:
+    post_save.connect(invalidate_model_cache, sender=model, dispatch_uid=f'cache-save-{model.__name__}')
+    post_delete.connect(invalidate_model_cache, sender=model, dispatch_uid=f'cache-delete-{model.__name__}')
+
+
+def log_saved_change(sender, instance, created, **kwargs):
+    change_log.record(instance, change_log.CREATED if created else change_log.UPDATED)
+
+
+def log_deleted_change(sender, instance, **kwargs):
+    change_log.record(instance, change_log.DELETED)
+
+
+for model in change_log.TRACKED_MODELS:
+    post_save.connect(log_saved_change, sender=model, dispatch_uid=f'change-log-save-{model.__name__}')
+    post_delete.connect(log_deleted_change, sender=model, dispatch_uid=f'change-log-delete-{model.__name__}')
+
+
+@receiver(post_delete, sender=ReturnSalesItem)
+def take_off_returned_totals(sender, instance, **kwargs):
+    # Also runs for the lines of a deleted return or sales order
+    sales_returns.record(instance.sales_order_item_id, -instance.quantity, -instance.total)
+
+
+def _order_employee(sales_order_id):
+    return SalesOrder.objects.filter(pk=sales_order_id).values_list('sales_employee_id', flat=True).first()
+
+
+@receiver(post_init, sender=SalesOrder)
+def note_performance_bucket(sender, instance, **kwargs):
+    # Read from __dict__: deferred fields must not cost a query per loaded order
+    instance._performance_bucket = (instance.__dict__.get('sales_employee_id'), instance.__dict__.get('order_date'))
+
+
+@receiver(post_save, sender=SalesOrder)
+def schedule_order_performance(sender, instance, created, **kwargs):
+    previous = instance._performance_bucket
+    instance._performance_bucket = current = (instance.sales_employee_id, instance.order_date)
+    buckets = [current]
+    if not created and previous != current and previous[1] is not None:
+        buckets.append(previous)
+        if previous[0] != current[0]:
+            # The order's returns move to the new employee with it
+            for return_date in instance.returns.values_list('return_date', flat=True):
+                buckets += [(previous[0], return_date), (current[0], return_date)]
+    sales_performance.schedule(buckets)
+
+
+@receiver(post_delete, sender=SalesOrder)
+def schedule_deleted_order_performance(sender, instance, **kwargs):
+    # Its returns are deleted first and schedule their own buckets
+    sales_performance.schedule([(instance.sales_employee_id, instance.order_date)])
+
+
+@receiver(post_init, sender=ReturnSales)
+def note_return_bucket(sender, instance, **kwargs):
+    instance._performance_bucket = (instance.__dict__.get('sales_order_id'), instance.__dict__.get('return_date'))
+
+
+def _return_employee(instance):
+    if ReturnSales.sales_order.is_cached(instance):
+        return instance.sales_order.sales_employee_id
+    return _order_employee(instance.sales_order_id)
+
+
+@receiver(post_save, sender=ReturnSales)
+def schedule_return_performance(sender, instance, created, **kwargs):
+    previous = instance._performance_bucket
+    instance._performance_bucket = current = (instance.sales_order_id, instance.return_date)
+    buckets = [(_return_employee(instance), instance.return_date)]
+    if not created and previous != current and previous[1] is not None:
+        buckets.append((_order_employee(previous[0]), previous[1]))
+    sales_performance.schedule(buckets)
+
+
+@receiver(post_delete, sender=ReturnSales)
+def schedule_deleted_return_performance(sender, instance, **kwargs):
+    sales_performance.schedule([(_return_employee(instance), instance.return_date)])
+
+
+def note_uploaded_images(sender, instance, **kwargs):
+    # A freshly uploaded file is still uncommitted until the model is saved
+    instance._uploaded_images = [
+        (field, sizes) for field, sizes in THUMBNAIL_FIELDS[sender]
+        if getattr(instance, field) and not getattr(instance, field)._committed
+    ]
+    instance._replaced_images = []
+    if instance._uploaded_images and not instance._state.adding:
+        previous = sender._base_manager.filter(pk=instance.pk).values(
+            *(field for field, _ in instance._uploaded_images)
+        ).first() or {}
+        instance._replaced_images = [
+            (field, previous[field], sizes) for field, sizes in instance._uploaded_images if previous.get(field)
+        ]
+
+
+def make_thumbnails(sender, instance, **kwargs):
+    uploaded = getattr(instance, '_uploaded_images', None)
+    if not uploaded:
+        return
+    replaced = instance._replaced_images
+    instance._uploaded_images = instance._replaced_images = []
+
+    def generate():
+        for field, sizes in uploaded:
+            try:
+                thumbnails.generate_for_instance(instance, field, sizes)
+            except Exception:
+                # The page falls back to the original; generate_thumbnails can retry
+                thumbnails.logger.exception('Cannot make thumbnails of %s.%s', sender.__name__, field)
+        for field, name, sizes in replaced:
+            if sender._base_manager.filter(**{field: name}).exists():
+                continue  # still the image of another row
+            try:
+                thumbnails.delete_derivatives(getattr(instance, field).storage, name, sizes)
+            except Exception:
+                thumbnails.logger.exception('Cannot delete the thumbnails of %s', name)
+
+    transaction.on_commit(generate)
+
+
+THUMBNAIL_FIELDS = {}
+for model, field, sizes in thumbnails.image_fields():
+    THUMBNAIL_FIELDS.setdefault(model, []).append((field, sizes))
+
+for model in THUMBNAIL_FIELDS:
+    pre_save.connect(note_uploaded_images, sender=model, dispatch_uid=f'thumbnails-pre-{model.__name__}')
+    post_save.connect(make_thumbnails, sender=model, dispatch_uid=f'thumbnails-post-{model.__name__}')
@@ -0,0 +1,233 @@
+"""
+Sharded stock counters for fast-moving products.
+
+Every movement of a product normally rewrites its ``Product`` row
+(``StockTransaction.save``), so concurrent sales of one best seller queue up
+on that row's lock. A product with ``sharded_stock`` set keeps its stock in
+``StockCounterShard`` rows instead: the stock on hand is the sum of the
+shards, and each movement updates a single shard picked at random, so
+concurrent movements of the product rarely touch the same row.
+
+Non-negative stock: a shard never goes below zero (a conditional ``UPDATE``
+acts as that shard's allowance). A sale that no single shard can cover locks
+all shards of the product and takes from several; only when the shards
+together hold too little is it refused. ``reconcile()`` (the
+``stock_shards --reconcile`` command, run every few minutes) evens the shards
+out again and copies their sum into ``Product.stock_quantity``. Database-side
+filters such as the low-stock counts annotate ``on_hand()`` instead, which
+reads the shards.
+
+The ``previous_stock`` / ``current_stock`` recorded for a sharded movement
+are read without locking the product, so concurrent movements may record
+slightly off running balances; ``rebuild_stock_ledger`` recomputes them.
+
+A product flagged without ``enable()`` (a plain ``save()``) has no shards
+yet: its stock on hand is still ``stock_quantity``, and its first movement
+creates the shards from it.
+"""
+
+import random
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from uniworlderp import cache as erp_cache, change_log
+from uniworlderp.models import Product, StockCounterShard
+
+
+def spread(quantity, shards):
+    """``quantity`` split as evenly as possible over ``shards`` shards."""
+    share, extra = divmod(quantity, shards)
+    return [share + (1 if number < extra else 0) for number in range(shards)]
+
+
+def on_hand():
+    """
+    Expression of the stock on hand of each ``Product`` row, for
+    ``annotate()``: the sum of its shards, or ``stock_quantity`` while it has
+    none (every unsharded product).
+    """
+    shards = (
+        StockCounterShard.objects.filter(product=OuterRef('pk')).order_by()
+        .values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    return Coalesce(Subquery(shards), F('stock_quantity'))
+
+
+def _on_hand(product_ids):
+    return Product.objects.filter(pk__in=product_ids).order_by().annotate(on_hand=on_hand()).values_list('pk', 'on_hand')
+
+
+def total(product):
+    """Stock on hand of a sharded product: the sum of its shards."""
+    return dict(_on_hand([product.pk])).get(product.pk, 0)
+
+
+def totals(product_ids):
+    """``{product id: stock on hand}`` of sharded products, in one query."""
+    return dict(_on_hand(product_ids))
+
+
+def with_available_stock(rows):
+    """
+    Put the stock on hand of sharded products into ``rows`` (dicts from
+    ``Product.objects.values()`` with ``id``, ``stock_quantity`` and
+    ``sharded_stock``) in place, dropping ``sharded_stock``; returns ``rows``.
+    """
+    sharded = [row['id'] for row in rows if row.pop('sharded_stock')]
+    if sharded:
+        on_hand = totals(sharded)
+        for row in rows:
+            if row['id'] in on_hand:
+                row['stock_quantity'] = on_hand[row['id']]
+    return rows
+
+
+def _create_shards(product, shards):
+    # Under the product's row lock, so that only one caller creates them
+    stock = Product.objects.select_for_update().filter(pk=product.pk).values_list('stock_quantity', flat=True).get()
+    if not StockCounterShard.objects.filter(product_id=product.pk).exists():
+        StockCounterShard.objects.bulk_create([
+            StockCounterShard(product_id=product.pk, shard=number, quantity=share)
+            for number, share in enumerate(spread(stock, shards))
+        ])
+
+
+def _shard_numbers(product):
+    numbers = list(StockCounterShard.objects.filter(product=product).values_list('shard', flat=True))
+    if not numbers:
+        # Flagged without enable()
+        with transaction.atomic():
+            _create_shards(product, settings.STOCK_COUNTER_SHARDS)
+        numbers = list(StockCounterShard.objects.filter(product=product).values_list('shard', flat=True))
+    random.shuffle(numbers)
+    return numbers
+
+
+def add(product, quantity):
+    """Add ``quantity`` units to one random shard of ``product``."""
+    numbers = _shard_numbers(product)
+    StockCounterShard.objects.filter(product=product, shard=numbers[0]).update(quantity=F('quantity') + quantity)
+
+
+def take(product, quantity):
+    """
+    Remove ``quantity`` units from the shards of ``product``. Raises
+    ``ValidationError`` when the product has fewer units on hand.
+    """
+    for number in _shard_numbers(product):
+        # Only touches the shard when it covers the whole quantity by itself
+        if StockCounterShard.objects.filter(
+            product=product, shard=number, quantity__gte=quantity,
+        ).update(quantity=F('quantity') - quantity):
+            return
+
+    with transaction.atomic():
+        shards = list(StockCounterShard.objects.select_for_update().filter(product=product).order_by('shard'))
+        available = sum(shard.quantity for shard in shards)
+        if available < quantity:
+            raise ValidationError({
+                'quantity': f'Insufficient stock for {product.name}. '
+                            f'Available: {available}, requested: {quantity}',
+            })
+        remaining = quantity
+        for shard in sorted(shards, key=lambda s: -s.quantity):
+            used = min(shard.quantity, remaining)
+            shard.quantity -= used
+            remaining -= used
+            if not remaining:
+                break
+        StockCounterShard.objects.bulk_update(shards, ['quantity'])
+
+
+def set_total(product, quantity):
+    """Set the stock on hand of ``product`` (an adjustment), spread over its shards."""
+    _shard_numbers(product)
+    with transaction.atomic():
+        shards = list(StockCounterShard.objects.select_for_update().filter(product=product).order_by('shard'))
+        for shard, share in zip(shards, spread(quantity, len(shards))):
+            shard.quantity = share
+        StockCounterShard.objects.bulk_update(shards, ['quantity'])
+
+
+def apply(product, transaction_type, quantity):
+    """
+    Post one movement of a sharded product, with the rules of
+    ``StockTransaction.save``; returns ``(previous_stock, current_stock)``.
+    """
+    if transaction_type in ('IN', 'RET'):
+        add(product, quantity)
+        current = total(product)
+        return current - quantity, current
+    if transaction_type == 'OUT':
+        take(product, quantity)
+        current = total(product)
+        return current + quantity, current
+    if transaction_type == 'ADJ':
+        previous = total(product)
+        set_total(product, quantity)
+        return previous, quantity
+    current = total(product)
+    return current, current
+
+
+def enable(product, shards=None):
+    """Move the stock of ``product`` into ``shards`` counter rows (default ``STOCK_COUNTER_SHARDS``)."""
+    shards = shards or settings.STOCK_COUNTER_SHARDS
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        if product.sharded_stock and product.stock_shards.exists():
+            return product
+        _create_shards(product, shards)
+        product.sharded_stock = True
+        product.save(update_fields=['sharded_stock', 'updated_at'])
+    return product
+
+
+def disable(product):
+    """Fold the shards of ``product`` back into ``Product.stock_quantity`` and drop them."""
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        if not product.sharded_stock:
+            return product
+        shards = StockCounterShard.objects.select_for_update().filter(product=product)
+        quantities = [shard.quantity for shard in shards]
+        if quantities:
+            # Without shards the stock never left stock_quantity
+            product.stock_quantity = sum(quantities)
+        product.sharded_stock = False
+        product.save(update_fields=['stock_quantity', 'sharded_stock', 'updated_at'])
+        shards.delete()
+    return product
+
+
+def reconcile(product_ids=None):
+    """
+    Even out the shards of the sharded products (all, or ``product_ids``) and
+    copy their sum into ``Product.stock_quantity``; returns the number of
+    products whose snapshot changed.
+    """
+    products = Product.objects.filter(sharded_stock=True)
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    changed = []
+    for product in products.only('pk', 'stock_quantity'):
+        with transaction.atomic():
+            shards = list(StockCounterShard.objects.select_for_update().filter(product=product).order_by('shard'))
+            on_hand = sum(shard.quantity for shard in shards)
+            for shard, share in zip(shards, spread(on_hand, len(shards))):
+                shard.quantity = share
+            StockCounterShard.objects.bulk_update(shards, ['quantity'])
+            if product.stock_quantity != on_hand:
+                Product.objects.filter(pk=product.pk).update(stock_quantity=on_hand)
+                change_log.record_many(Product, [product.pk], change_log.UPDATED)
+                changed.append(product.pk)
+
+    if changed:
+        # QuerySet.update() bypasses the post_save signals
+        erp_cache.invalidate_tags(erp_cache.PRODUCT)
+    return len(changed)
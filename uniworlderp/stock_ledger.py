@@ -0,0 +1,296 @@
+"""
+Rebuild / verify the running balances of the stock ledger.
+
+Every ``StockTransaction`` stores ``previous_stock`` and ``current_stock``.
+This module replays the transactions of a set of products in
+``(transaction_date, id)`` order from a given timestamp, recomputes both
+columns and writes back only the rows that differ. The ledger end balance is
+then compared with ``Product.stock_quantity`` (the counter shards of a sharded
+product, see ``stock_counters``). A selected product without rows to replay
+is compared too whenever its balance is known without them: the last
+``current_stock`` before ``since``, or 0 with ``opening='zero'``.
+
+Products are processed in batches. Each batch is one database transaction
+that locks its product rows and reads the ledger in keyset-paginated chunks;
+changed rows are written with ``bulk_update``. Batches can run in parallel
+across a process pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from uniworlderp import cache as erp_cache, change_log, stock_counters
+from uniworlderp.importers import chunked
+from uniworlderp.models import Product, StockTransaction
+
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_PRODUCTS_PER_BATCH = 200
+OPENING_RECORDED = 'recorded'
+OPENING_ZERO = 'zero'
+
+
+def apply_movement(stock, transaction_type, quantity):
+    """Stock after one movement, with the same rules as ``StockTransaction.save``."""
+    if transaction_type in ('IN', 'RET'):
+        return stock + quantity
+    if transaction_type == 'OUT':
+        # current_stock is a PositiveIntegerField
+        return max(0, stock - quantity)
+    if transaction_type == 'ADJ':
+        return quantity
+    return stock
+
+
+class LedgerReport:
+    """Counters, sample diffs and product mismatches of a rebuild run."""
+
+    def __init__(self, max_diffs=50):
+        self.max_diffs = max_diffs
+        self.products = 0
+        self.transactions = 0
+        self.changed = 0
+        self.clamped = 0
+        self.diffs = []
+        self.mismatches = []
+        self.products_fixed = 0
+        self.workers = 1
+
+    def add_diff(self, diff):
+        self.changed += 1
+        if len(self.diffs) < self.max_diffs:
+            self.diffs.append(diff)
+
+    def merge(self, other):
+        self.products += other.products
+        self.transactions += other.transactions
+        self.changed += other.changed
+        self.clamped += other.clamped
+        self.products_fixed += other.products_fixed
+        self.diffs.extend(other.diffs[:max(0, self.max_diffs - len(self.diffs))])
+        self.mismatches.extend(other.mismatches)
+
+    @property
+    def consistent(self):
+        return not self.changed and not self.mismatches
+
+
+def affected_product_ids(since=None, product_ids=None):
+    """Ids of the products that have ledger rows at or after ``since``."""
+    queryset = StockTransaction.objects.all()
+    if since is not None:
+        queryset = queryset.filter(transaction_date__gte=since)
+    if product_ids is not None:
+        queryset = queryset.filter(product_id__in=product_ids)
+    return sorted(set(queryset.values_list('product_id', flat=True)))
+
+
+def selected_product_ids(since=None, product_ids=None, opening=OPENING_RECORDED):
+    """
+    Ids of the products to replay and compare: all of ``product_ids``
+    (default: every product) when a product without rows has a known balance,
+    else only those with rows, whose first row records the opening balance.
+    """
+    if opening == OPENING_RECORDED and since is None:
+        return affected_product_ids(since, product_ids)
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    return sorted(products.values_list('pk', flat=True))
+
+
+def _opening_balances(product_ids, since, opening):
+    """
+    Balance before the first replayed row of each product: the last
+    ``current_stock`` before ``since``, or else the recorded
+    ``previous_stock`` of the first row (``opening='recorded'``) or 0.
+    Products without a known balance are left out.
+    """
+    balances = {}
+    if since is not None:
+        last_before = StockTransaction.objects.filter(
+            product_id=OuterRef('pk'), transaction_date__lt=since,
+        ).order_by('-transaction_date', '-id').values('current_stock')[:1]
+        balances = {
+            pk: balance
+            for pk, balance in Product.objects.filter(pk__in=product_ids)
+            .annotate(balance=Subquery(last_before))
+            .values_list('pk', 'balance')
+            if balance is not None
+        }
+
+    if opening == OPENING_RECORDED:
+        missing = [pk for pk in product_ids if pk not in balances]
+        first_row = StockTransaction.objects.filter(product_id=OuterRef('pk'))
+        if since is not None:
+            first_row = first_row.filter(transaction_date__gte=since)
+        first_row = first_row.order_by('transaction_date', 'id').values('previous_stock')[:1]
+        for pk, balance in (
+            Product.objects.filter(pk__in=missing)
+            .annotate(balance=Subquery(first_row))
+            .values_list('pk', 'balance')
+        ):
+            if balance is not None:
+                balances[pk] = balance
+    return balances
+
+
+def _ledger_chunks(product_ids, since, chunk_size):
+    """
+    Yield the ledger rows of ``product_ids`` ordered by product and time, one
+    materialised chunk at a time (keyset pagination, so writes between chunks
+    are safe on every backend).
+    """
+    queryset = StockTransaction.objects.filter(product_id__in=product_ids)
+    if since is not None:
+        queryset = queryset.filter(transaction_date__gte=since)
+    queryset = queryset.order_by('product_id', 'transaction_date', 'id').values_list(
+        'product_id', 'transaction_date', 'id',
+        'transaction_type', 'quantity', 'previous_stock', 'current_stock', 'reference',
+    )
+    after = None
+    while True:
+        page = queryset
+        if after is not None:
+            product_id, date, pk = after
+            page = page.filter(
+                Q(product_id__gt=product_id)
+                | Q(product_id=product_id, transaction_date__gt=date)
+                | Q(product_id=product_id, transaction_date=date, id__gt=pk)
+            )
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][:3]
+
+
+def rebuild_batch(product_ids, since=None, opening=OPENING_RECORDED, dry_run=False,
+                  fix_product_stock=False, chunk_size=DEFAULT_CHUNK_SIZE, max_diffs=50):
+    """Rebuild the ledger of one batch of products in a single transaction."""
+    report = LedgerReport(max_diffs=max_diffs)
+    now = timezone.now()
+    with transaction.atomic():
+        products = {
+            p.pk: p for p in Product.objects.select_for_update()
+            .filter(pk__in=product_ids).only('pk', 'sku', 'name', 'stock_quantity', 'sharded_stock')
+        }
+        # Sharded products: compare the ledger with the sum of their counters
+        on_hand = stock_counters.totals([pk for pk, p in products.items() if p.sharded_stock])
+        for pk, stock in on_hand.items():
+            products[pk].stock_quantity = stock
+        balances = _opening_balances(list(products), since, opening)
+        running = {}
+
+        for rows in _ledger_chunks(list(products), since, chunk_size):
+            updates = []
+            for product_id, date, pk, kind, quantity, previous, current, reference in rows:
+                report.transactions += 1
+                stock = running.get(product_id, balances.get(product_id, 0))
+                new_current = apply_movement(stock, kind, quantity)
+                if kind == 'OUT' and quantity > stock:
+                    report.clamped += 1
+                running[product_id] = new_current
+                if (previous, current) == (stock, new_current):
+                    continue
+                report.add_diff({
+                    'sku': products[product_id].sku,
+                    'transaction': str(pk),
+                    'date': date.isoformat(),
+                    'type': kind,
+                    'quantity': quantity,
+                    'reference': reference,
+                    'previous_stock': [previous, stock],
+                    'current_stock': [current, new_current],
+                })
+                updates.append(StockTransaction(pk=pk, previous_stock=stock, current_stock=new_current, updated_at=now))
+            if updates and not dry_run:
+                StockTransaction.objects.bulk_update(
+                    updates, ['previous_stock', 'current_stock', 'updated_at'], batch_size=chunk_size,
+                )
+                change_log.record_many(StockTransaction, [update.pk for update in updates], change_log.UPDATED)
+
+        # Products without rows to replay end at their opening balance, when it is known
+        ledger = dict(running)
+        for product_id in products:
+            if product_id not in ledger and (opening == OPENING_ZERO or product_id in balances):
+                ledger[product_id] = balances.get(product_id, 0)
+
+        report.products = len(ledger)
+        fixed = []
+        for product_id, balance in ledger.items():
+            product = products[product_id]
+            if product.stock_quantity == balance:
+                continue
+            report.mismatches.append({
+                'sku': product.sku,
+                'name': product.name,
+                'stock_quantity': product.stock_quantity,
+                'ledger': balance,
+            })
+            if fix_product_stock:
+                product.stock_quantity = balance
+                product.updated_at = now
+                fixed.append(product)
+        if fixed and not dry_run:
+            Product.objects.bulk_update(fixed, ['stock_quantity', 'updated_at'], batch_size=chunk_size)
+            change_log.record_many(Product, [product.pk for product in fixed], change_log.UPDATED)
+            for product in fixed:
+                if product.sharded_stock:
+                    stock_counters.set_total(product, product.stock_quantity)
+            report.products_fixed = len(fixed)
+    return report
+
+
+def _init_worker():
+    # Workers started with "spawn" import nothing from the parent
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+        django.setup()
+
+
+def rebuild(product_ids=None, since=None, opening=OPENING_RECORDED, dry_run=False,
+            fix_product_stock=False, workers=1, chunk_size=DEFAULT_CHUNK_SIZE,
+            products_per_batch=DEFAULT_PRODUCTS_PER_BATCH, max_diffs=50, progress=None):
+    """
+    Rebuild (or with ``dry_run`` only diff) the ledger of ``product_ids``
+    (default: every product, see ``selected_product_ids``). ``progress`` is
+    called with each batch report as it completes.
+    """
+    report = LedgerReport(max_diffs=max_diffs)
+    if not dry_run and connections['default'].vendor == 'sqlite':
+        # SQLite has a single writer: parallel write transactions deadlock on
+        # the read -> write lock upgrade, so only dry runs fan out there.
+        workers = 1
+    report.workers = workers
+    batches = list(chunked(selected_product_ids(since, product_ids, opening), products_per_batch))
+    options = dict(
+        since=since, opening=opening, dry_run=dry_run, fix_product_stock=fix_product_stock,
+        chunk_size=chunk_size, max_diffs=max_diffs,
+    )
+
+    if workers <= 1 or len(batches) <= 1:
+        results = (rebuild_batch(batch, **options) for batch in batches)
+        for batch_report in results:
+            report.merge(batch_report)
+            if progress:
+                progress(batch_report)
+    else:
+        # Children must open their own connections, never share the parent's socket
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(rebuild_batch, batch, **options) for batch in batches]
+            for future in futures:
+                batch_report = future.result()
+                report.merge(batch_report)
+                if progress:
+                    progress(batch_report)
+
+    if not dry_run and (report.changed or report.products_fixed):
+        # bulk_update bypasses the post_save signals
+        erp_cache.invalidate_tags(erp_cache.PRODUCT, erp_cache.STOCK_TRANSACTION)
+    return report
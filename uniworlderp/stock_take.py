@@ -0,0 +1,222 @@
+"""
+Physical stock-take.
+
+``start()`` freezes the stock on hand of the active products (of one ABC
+revenue class when given) into the lines of a new ``StockTake``: one read of
+the products and their counter shards, then one bulk insert. The counted
+quantities are imported from a CSV or XLSX file with ``sku`` and ``counted``
+columns (``import_counts()``), streamed and written in chunks with one lookup
+and one ``bulk_update`` each; a later count of a SKU replaces the earlier one.
+
+``variances()`` computes counted - expected, and its value at the sales
+price, for the counted lines in the database. ``post()`` books them in one
+transaction: it locks the products, writes one ADJ movement per difference
+with ``bulk_create`` and copies the new stock from them with one ``UPDATE``,
+in a fixed number of queries however many lines differ (plus the counter
+shards of each ``sharded_stock`` product). The difference is applied to the stock at posting
+time, which keeps the sales and receipts booked while counting: a line
+expected at 10 and counted at 8 takes 2 off the stock as it is when posting.
+Lines never counted are left alone.
+"""
+
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from uniworlderp import cache as erp_cache, change_log, importers, stock_counters
+from uniworlderp.models import Product, StockTake, StockTakeLine, StockTransaction
+
+
+DEFAULT_CHUNK_SIZE = 1000
+COUNT_COLUMNS = ['sku', 'counted']
+CENTS = Decimal('0.01')
+
+
+def start(owner, abc_class='', notes=''):
+    """Open a stock-take of the active products (of revenue class ``abc_class``) at their current stock."""
+    products = Product.objects.filter(is_active=True)
+    if abc_class:
+        products = products.filter(classification__revenue_class=abc_class)
+    products = list(products.order_by().values_list('pk', 'stock_quantity', 'sharded_stock'))
+    on_hand = stock_counters.totals([pk for pk, _, is_sharded in products if is_sharded])
+
+    with transaction.atomic():
+        stock_take = StockTake.objects.create(owner=owner, abc_class=abc_class, notes=notes)
+        StockTakeLine.objects.bulk_create(
+            [
+                StockTakeLine(
+                    stock_take=stock_take,
+                    product_id=pk,
+                    expected_quantity=on_hand.get(pk, 0) if is_sharded else stock,
+                )
+                for pk, stock, is_sharded in products
+            ],
+            batch_size=DEFAULT_CHUNK_SIZE,
+        )
+    return stock_take
+
+
+def _check_open(stock_take):
+    if stock_take.status != StockTake.OPEN:
+        raise ValidationError(f'{stock_take.reference} is already posted.')
+
+
+def import_counts(stock_take, rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Set the counted quantities of ``stock_take`` from ``rows`` (an iterable
+    from ``importers.iter_rows``). Returns an ``ImportResult`` whose
+    ``updated`` is the number of lines counted.
+    """
+    _check_open(stock_take)
+    result = importers.ImportResult()
+
+    for chunk in importers.chunked(rows, chunk_size):
+        counts = {}
+        for row_number, row in chunk:
+            result.rows += 1
+            sku = row.get('sku')
+            sku = str(sku).strip() if sku is not None else ''
+            errors = [f'{name}: column is missing' for name in COUNT_COLUMNS if name not in row]
+            if not errors and not sku:
+                errors.append('sku: this field is required')
+            if not errors:
+                try:
+                    counts[sku] = (row_number, importers.clean_quantity(row['counted']))
+                except ValidationError as e:
+                    errors.append(f'counted: {"; ".join(e.messages)}')
+            if errors:
+                result.add_error(row_number, sku, '; '.join(errors))
+
+        if not counts:
+            continue
+        lines = dict(
+            StockTakeLine.objects.filter(stock_take=stock_take, product__sku__in=list(counts))
+            .values_list('product__sku', 'pk')
+        )
+        updates = []
+        for sku, (row_number, quantity) in counts.items():
+            if sku not in lines:
+                result.add_error(row_number, sku, f'sku: not part of {stock_take.reference}')
+                continue
+            updates.append(StockTakeLine(pk=lines[sku], counted_quantity=quantity))
+        if updates and not dry_run:
+            StockTakeLine.objects.bulk_update(updates, ['counted_quantity'], batch_size=chunk_size)
+        result.updated += len(updates)
+    return result
+
+
+def variances(stock_take):
+    """The counted lines of ``stock_take`` that differ from the expected quantity, with ``variance`` and ``variance_value``."""
+    return (
+        StockTakeLine.objects
+        .filter(stock_take=stock_take, counted_quantity__isnull=False)
+        .exclude(counted_quantity=F('expected_quantity'))
+        .annotate(
+            variance=ExpressionWrapper(F('counted_quantity') - F('expected_quantity'), output_field=IntegerField()),
+            variance_value=ExpressionWrapper(
+                (F('counted_quantity') - F('expected_quantity')) * F('product__price'),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+    )
+
+
+def summary(stock_take):
+    """Line counts, units over / short and the net variance value of ``stock_take``, in one query."""
+    variance = F('counted_quantity') - F('expected_quantity')
+    totals = StockTakeLine.objects.filter(stock_take=stock_take).aggregate(
+        lines=Count('pk'),
+        counted=Count('counted_quantity'),
+        differences=Count('pk', filter=Q(counted_quantity__gt=F('expected_quantity'))
+                          | Q(counted_quantity__lt=F('expected_quantity'))),
+        units_over=Sum(variance, filter=Q(counted_quantity__gt=F('expected_quantity')), default=0),
+        units_short=Sum(-variance, filter=Q(counted_quantity__lt=F('expected_quantity')), default=0),
+        value=Sum(variance * F('product__price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    )
+    totals['not_counted'] = totals['lines'] - totals['counted']
+    return totals
+
+
+def post(stock_take, owner):
+    """
+    Book the differences of the open ``stock_take`` as ADJ movements and mark
+    it posted; returns the movements. Raises ``ValidationError`` when it is
+    already posted.
+    """
+    with transaction.atomic():
+        stock_take = StockTake.objects.select_for_update().get(pk=stock_take.pk)
+        _check_open(stock_take)
+        differences = dict(variances(stock_take).values_list('product_id', 'variance'))
+
+        stock = {}
+        sharded = []
+        for pk, quantity, is_sharded in (
+            Product.objects.select_for_update().filter(pk__in=list(differences)).order_by()
+            .values_list('pk', 'stock_quantity', 'sharded_stock')
+        ):
+            stock[pk] = quantity
+            if is_sharded:
+                sharded.append(pk)
+        # Their stock is in the counter shards, not in the row
+        stock.update(stock_counters.totals(sharded))
+
+        now = timezone.now()
+        movements = []
+        updated = []
+        for pk, variance in differences.items():
+            # current_stock is a PositiveIntegerField
+            counted = max(stock[pk] + variance, 0)
+            movements.append(importers.build_adjustment(pk, stock[pk], counted, owner, stock_take.reference))
+            if pk in sharded:
+                stock_counters.set_total(Product(pk=pk), counted)
+            else:
+                updated.append(pk)
+
+        StockTransaction.objects.bulk_create(movements, batch_size=DEFAULT_CHUNK_SIZE)
+        # One UPDATE copying each product's new stock from its movement; a
+        # bulk_update CASE over thousands of ids is far slower
+        Product.objects.filter(
+            pk__in=variances(stock_take).values('product_id'), sharded_stock=False,
+        ).update(
+            stock_quantity=Subquery(
+                StockTransaction.objects.filter(
+                    product_id=OuterRef('pk'), transaction_type='ADJ', reference=stock_take.reference,
+                ).values('current_stock')[:1]
+            ),
+            updated_at=now,
+        )
+        change_log.record_changes(
+            [(StockTransaction, movement.pk, change_log.CREATED) for movement in movements]
+            + [(Product, pk, change_log.UPDATED) for pk in updated]
+        )
+
+        stock_take.status = StockTake.POSTED
+        stock_take.posted_at = now
+        stock_take.save(update_fields=['status', 'posted_at', 'updated_at'])
+
+        # bulk_create / bulk_update bypass the post_save signals
+        transaction.on_commit(lambda: erp_cache.invalidate_tags(erp_cache.PRODUCT, erp_cache.STOCK_TRANSACTION))
+    return movements
+
+
+def _money(value):
+    # SQLite drops the scale of computed decimals
+    return Decimal(value).quantize(CENTS)
+
+
+def csv_rows(stock_take):
+    """The variance report of ``stock_take`` for a CSV export, header and totals included."""
+    yield ['SKU', 'Product', 'Expected', 'Counted', 'Variance', 'Unit Price', 'Variance Value']
+    lines = (
+        variances(stock_take).order_by('product__name', 'pk')
+        .values_list('product__sku', 'product__name', 'expected_quantity', 'counted_quantity',
+                     'variance', 'product__price', 'variance_value')
+    )
+    for *row, value in lines.iterator(chunk_size=2000):
+        yield [*row, _money(value)]
+    totals = summary(stock_take)
+    yield ['Total', f'{totals["differences"]} difference(s)', '', '', totals['units_over'] - totals['units_short'],
+           '', _money(totals['value'] or 0)]
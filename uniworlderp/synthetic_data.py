@@ -0,0 +1,350 @@
+"""
+Synthetic data at realistic volume, for benchmarks and load tests.
+
+``generate()`` creates customers, sales employees and products, then sales
+orders with their items, sales returns and the stock movements of all of
+them, written with ``bulk_create`` a chunk of orders at a time. The
+distributions are skewed the way real sales are: product, customer and
+employee popularity follow a Zipf law (a few SKUs and accounts make most of
+the lines), order sizes and quantities are mostly small with a long tail,
+weekends are quiet and a share of the orders has one line returned a few
+days later.
+
+Orders are generated in date order and the stock is kept in memory: each
+product gets an opening IN movement, one OUT per order line and one RET per
+return line, plus an IN receipt whenever a line would take the stock below
+zero. The movement ids are generated in sequence and the movements of a day
+share one timestamp, so the ledger read in ``(transaction_date, id)`` order
+replays exactly (``rebuild_stock_ledger --check`` passes) and the product
+stock is copied from the last movement of each product at the end. The
+returned totals of the order lines and the sales employee roll-ups are
+written too; the rows bypass the signals and are not recorded in the change
+log.
+
+Every row is tagged with a short run id (``BENCH-<run>-`` SKUs, customer and
+employee names) so several runs can coexist in one database.
+"""
+
+import heapq
+import itertools
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from uniworlderp import cache as erp_cache, sales_performance
+from uniworlderp.models import (
+    CustomerVendor, Product, ReturnSales, ReturnSalesItem, SalesEmployee, SalesOrder, SalesOrderItem,
+    StockTransaction,
+)
+
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_DAYS = 365
+DEFAULT_RETURN_RATE = 0.05
+# Zipf exponent of the product / customer / employee popularity
+DEFAULT_SKEW = 1.1
+CENTS = Decimal('0.01')
+
+
+@dataclass
+class Summary:
+    run: str
+    customers: int = 0
+    employees: int = 0
+    products: int = 0
+    orders: int = 0
+    items: int = 0
+    returns: int = 0
+    movements: int = 0
+    receipts: int = 0
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights of ``count`` ranks where rank r is chosen in proportion to 1 / r ** ``skew``."""
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+class _Ids:
+    """UUIDs in increasing order, so movements written together sort in the order they were generated."""
+
+    def __init__(self):
+        self.base = uuid.uuid4().int & ~((1 << 64) - 1)
+        self.counter = itertools.count(1)
+
+    def __call__(self):
+        return uuid.UUID(int=self.base | next(self.counter))
+
+
+class Generator:
+    def __init__(self, owner, customers, products, orders, employees=10, days=DEFAULT_DAYS,
+                 return_rate=DEFAULT_RETURN_RATE, skew=DEFAULT_SKEW, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.owner = owner
+        self.counts = {'customers': customers, 'products': products, 'orders': orders, 'employees': employees}
+        self.days = days
+        self.return_rate = return_rate
+        self.skew = skew
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.summary = Summary(run=uuid.uuid4().hex[:6].upper())
+        self.today = timezone.localdate()
+        self.first_day = self.today - timedelta(days=days - 1)
+        self.movement_id = _Ids()
+        self.stock = {}
+        # (return date, sequence, order, line) heap of the returns not written yet
+        self.pending_returns = []
+        self.return_sequence = itertools.count()
+
+    def run(self):
+        with transaction.atomic():
+            self.create_master_data()
+            self.create_orders()
+            self.copy_stock_from_ledger()
+            sales_performance.rebuild(employee_ids=[employee.pk for employee in self.employees])
+        # bulk_create bypasses the post_save signals
+        erp_cache.invalidate_tags(erp_cache.SALES_ORDER, erp_cache.PRODUCT, erp_cache.STOCK_TRANSACTION)
+        return self.summary
+
+    # Master data
+
+    def create_master_data(self):
+        run = self.summary.run
+        rng = self.rng
+        self.customers = CustomerVendor.objects.bulk_create(
+            [
+                CustomerVendor(
+                    name=f'Benchmark {run} customer {i:06d}',
+                    email=f'customer{i}@{run.lower()}.bench.invalid',
+                    phone_number=f'01{rng.randrange(10 ** 9):09d}',
+                    business_type=rng.choice(['retailer', 'retailer', 'wholesaler', 'others']),
+                    entity_type='customer',
+                    owner=self.owner,
+                )
+                for i in range(self.counts['customers'])
+            ],
+            batch_size=self.chunk_size,
+        )
+        self.employees = SalesEmployee.objects.bulk_create(
+            [
+                SalesEmployee(
+                    full_name=f'Benchmark {run} employee {i:03d}',
+                    sales_target=Decimal(rng.randrange(50, 500) * 1000),
+                    date_of_joining=self.first_day,
+                    owner=self.owner,
+                )
+                for i in range(self.counts['employees'])
+            ],
+            batch_size=self.chunk_size,
+        )
+        products = []
+        for i in range(self.counts['products']):
+            price = Decimal(max(rng.lognormvariate(3.5, 1.0), 1)).quantize(CENTS)
+            products.append(Product(
+                name=f'Benchmark {run} product {i:06d}',
+                sku=f'BENCH-{run}-{i:06d}',
+                category=rng.choice(['Chemical', 'RawMaterials', 'Others']),
+                unit=rng.choice(['PC', 'PC', 'CTN', 'TIN']),
+                price=price,
+                # One product in five sells at a per-unit discount
+                discount_amount=(price * Decimal('0.05')).quantize(CENTS) if rng.random() < 0.2 else Decimal('0.00'),
+                reorder_level=rng.choice([5, 10, 20, 50]),
+                owner=self.owner,
+            ))
+        self.products = Product.objects.bulk_create(products, batch_size=self.chunk_size)
+        self.summary.customers = len(self.customers)
+        self.summary.employees = len(self.employees)
+        self.summary.products = len(self.products)
+
+        # Opening stock, dated the first day
+        opening = []
+        for product in self.products:
+            quantity = rng.randrange(0, 500)
+            self.stock[product.pk] = quantity
+            opening.append(self.movement(product, 'IN', quantity, 0, quantity, f'BENCH-{run}-OPENING'))
+        self.write_movements({self.first_day: opening})
+
+    # Orders, returns and their movements
+
+    def order_dates(self):
+        """``orders`` dates over the last ``days`` days, weekdays three times as busy as weekends, in order."""
+        dates = []
+        while len(dates) < self.counts['orders']:
+            day = self.first_day + timedelta(days=self.rng.randrange(self.days))
+            if day.weekday() < 5 or self.rng.random() < 1 / 3:
+                dates.append(day)
+        return sorted(dates)
+
+    def create_orders(self):
+        rng = self.rng
+        product_weights = zipf_weights(len(self.products), self.skew)
+        customer_weights = zipf_weights(len(self.customers), self.skew)
+        employee_weights = zipf_weights(len(self.employees), self.skew) if self.employees else None
+
+        for chunk in _chunks(self.order_dates(), self.chunk_size):
+            entries = []
+            for order_date in chunk:
+                entries.extend(self.due_returns(order_date))
+                employee = rng.choices(self.employees, cum_weights=employee_weights)[0] if self.employees else None
+                order = SalesOrder(
+                    customer=rng.choices(self.customers, cum_weights=customer_weights)[0],
+                    sales_employee=employee,
+                    order_date=order_date,
+                    delivery_status='D' if (self.today - order_date).days > 7 or rng.random() < 0.5 else 'P',
+                    shipping=Decimal(rng.choice([0, 0, 0, 50, 100])),
+                    owner=self.owner,
+                )
+                lines = self.order_lines(rng.choices(self.products, cum_weights=product_weights, k=_line_count(rng)))
+                subtotal = sum((line.total for line in lines), Decimal('0.00'))
+                if rng.random() < 0.1:
+                    order.discount = (subtotal * Decimal('0.05')).quantize(CENTS)
+                order.total_amount = subtotal - order.discount + order.shipping
+                entries.append((order, lines))
+                self.maybe_return(order, lines)
+            self.write_chunk(entries)
+        self.write_chunk(self.due_returns())
+
+    def order_lines(self, products):
+        lines = []
+        for product in dict.fromkeys(products):
+            quantity = min(max(int(self.rng.lognormvariate(1.0, 0.9)), 1), 500)
+            line = SalesOrderItem(product=product, quantity=quantity, unit_price=product.price,
+                                  Unit_discount=product.discount_amount)
+            line.total = line.calculate_total_price()
+            lines.append(line)
+        return lines
+
+    def maybe_return(self, order, lines):
+        if self.rng.random() >= self.return_rate:
+            return
+        line = self.rng.choice(lines)
+        quantity = self.rng.randint(1, line.quantity)
+        return_date = min(order.order_date + timedelta(days=self.rng.randint(1, 14)), self.today)
+        line.returned_quantity = quantity
+        line.returned_amount = (Decimal(quantity) * line.unit_price).quantize(CENTS)
+        heapq.heappush(self.pending_returns, (return_date, next(self.return_sequence), order, line))
+
+    def due_returns(self, before=None):
+        """Pop the pending returns dated before ``before`` (all of them when None), in date order."""
+        due = []
+        while self.pending_returns and (before is None or self.pending_returns[0][0] < before):
+            return_date, _, order, line = heapq.heappop(self.pending_returns)
+            due.append((ReturnSales(sales_order=order, return_date=return_date,
+                                    return_employee=order.sales_employee, total_amount=line.returned_amount),
+                        line))
+        return due
+
+    def write_chunk(self, entries):
+        """Write a chunk of ``(order, lines)`` and ``(return, line)`` entries, in date order, and their movements."""
+        orders = [(order, lines) for order, lines in entries if isinstance(order, SalesOrder)]
+        returns = [(header, line) for header, line in entries if isinstance(header, ReturnSales)]
+
+        SalesOrder.objects.bulk_create([order for order, _ in orders], batch_size=self.chunk_size)
+        lines = []
+        for order, order_lines in orders:
+            for line in order_lines:
+                line.sales_order = order
+                lines.append(line)
+        SalesOrderItem.objects.bulk_create(lines, batch_size=self.chunk_size)
+        ReturnSales.objects.bulk_create([header for header, _ in returns], batch_size=self.chunk_size)
+        ReturnSalesItem.objects.bulk_create(
+            [
+                ReturnSalesItem(return_sales=header, sales_order_item=line, quantity=line.returned_quantity,
+                                unit_price=line.unit_price, total=line.returned_amount)
+                for header, line in returns
+            ],
+            batch_size=self.chunk_size,
+        )
+
+        # The stock moves in the order the orders and returns happened
+        movements = {}
+        for entry, detail in entries:
+            if isinstance(entry, SalesOrder):
+                for line in detail:
+                    self.take(line, entry, movements)
+            else:
+                product = detail.product
+                previous = self.stock[product.pk]
+                self.stock[product.pk] = previous + detail.returned_quantity
+                movements.setdefault(entry.return_date, []).append(self.movement(
+                    product, 'RET', detail.returned_quantity, previous, self.stock[product.pk], f'RET-{entry.id}',
+                ))
+
+        self.write_movements(movements)
+        self.summary.orders += len(orders)
+        self.summary.items += len(lines)
+        self.summary.returns += len(returns)
+
+    def take(self, line, order, movements):
+        day_movements = movements.setdefault(order.order_date, [])
+        product = line.product
+        if self.stock[product.pk] < line.quantity:
+            # A receipt before the sale, as a purchase order received in time would
+            previous = self.stock[product.pk]
+            received = line.quantity + self.rng.randrange(50, 500)
+            self.stock[product.pk] = previous + received
+            day_movements.append(self.movement(product, 'IN', received, previous, self.stock[product.pk],
+                                               f'BENCH-{self.summary.run}-RECEIPT'))
+            self.summary.receipts += 1
+        previous = self.stock[product.pk]
+        self.stock[product.pk] = previous - line.quantity
+        day_movements.append(self.movement(product, 'OUT', line.quantity, previous, self.stock[product.pk],
+                                           f'SO-{order.id}'))
+
+    def movement(self, product, transaction_type, quantity, previous, current, reference):
+        return StockTransaction(
+            id=self.movement_id(),
+            product=product,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            previous_stock=previous,
+            current_stock=current,
+            reference=reference,
+            owner=self.owner,
+        )
+
+    def write_movements(self, by_day):
+        movements = [movement for day in sorted(by_day) for movement in by_day[day]]
+        StockTransaction.objects.bulk_create(movements, batch_size=self.chunk_size)
+        # transaction_date is auto_now_add: date the movements of each day afterwards
+        for day in sorted(by_day):
+            moment = timezone.make_aware(datetime.combine(day, time(12)))
+            for ids in _chunks([movement.pk for movement in by_day[day]], self.chunk_size):
+                StockTransaction.objects.filter(pk__in=ids).update(transaction_date=moment)
+        self.summary.movements += len(movements)
+
+    def copy_stock_from_ledger(self):
+        """Set the stock of the generated products to the closing balance of their last movement."""
+        Product.objects.filter(sku__startswith=f'BENCH-{self.summary.run}-').update(
+            stock_quantity=Subquery(
+                StockTransaction.objects.filter(product_id=OuterRef('pk'))
+                .order_by('-transaction_date', '-id').values('current_stock')[:1]
+            ),
+        )
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _line_count(rng):
+    """Lines per order: 1 to 3 mostly, up to 20."""
+    return min(1 + int(rng.expovariate(1 / 1.5)), 20)
+
+
+def generate(owner, customers, products, orders, **options):
+    """
+    Create ``customers`` customers, ``products`` products and ``orders``
+    sales orders with their items, returns and stock movements for
+    ``owner``. Keyword options: ``employees``, ``days``, ``return_rate``,
+    ``skew``, ``seed`` (same seed, same distributions and volumes) and ``chunk_size``. Returns a
+    ``Summary`` of the rows written.
+    """
+    if customers < 1 or products < 1:
+        raise ValueError('At least one customer and one product are needed.')
+    return Generator(owner, customers, products, orders, **options).run()
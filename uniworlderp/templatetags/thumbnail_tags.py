@@ -0,0 +1,12 @@
+from django import template
+
+from myproject.thumbnails import thumbnail_url
+
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(field_file, size='thumb'):
+    """``{{ product.image|thumbnail:'small' }}``: URL of a resized copy of an image field."""
+    return thumbnail_url(field_file, size)
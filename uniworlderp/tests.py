@@ -1,3 +1,1466 @@
-from django.test import TestCase
-
-# Create your tests here.
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time as time_module
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+from PIL import Image
+
+from company.models import Company
+from myproject.thumbnails import thumbnail_url
+from uniworlderp import cache as erp_cache
+from uniworlderp import (
+    abc_analysis, benchmarks, change_log, checks, db_routing, importers, order_import, printing, read_api, receivables,
+    reorder, sales_performance, sales_returns, stock_counters, stock_ledger, stock_take, synthetic_data, warmup,
+    write_load,
+)
+from uniworlderp.models import (
+    ARInvoice, ARInvoiceItem, ChangeLog, CustomerClassification, CustomerVendor, MaterialsPurchase, MaterialsPurchaseItem, Product,
+    ProductClassification, PurchaseOrder, PurchaseOrderItem, ReorderSuggestion, ReturnSales, ReturnSalesItem, SalesEmployee, SalesEmployeePerformance, SalesOrder, SalesOrderItem,
+    StockCounterShard, StockTake, StockTransaction,
+)
+from uniworlderp.conditional_get import ConditionalGetMixin
+from uniworlderp.management.commands.loadtest_list_views import Command as LoadTestListViews
+from uniworlderp.nplusone import QueryAudit
+from uniworlderp.views.async_support import run_queries
+
+
+class OwnerTestCase(TestCase):
+    """Base of the test classes below: a superuser ``owner`` of the rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_superuser('owner', password='x')
+
+    @classmethod
+    def make_customer(cls, name, **fields):
+        return CustomerVendor.objects.create(name=name, owner=cls.owner, business_type='retailer', **fields)
+
+
+class CustomerTestCase(OwnerTestCase):
+    """An ``owner`` and a retail ``customer`` of theirs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.customer = cls.make_customer('Customer')
+
+
+class LoadTestListViewsTests(TransactionTestCase):
+    """loadtest_list_views closes or keeps the connection per CONN_MAX_AGE, like behind a server."""
+
+    def setUp(self):
+        self.owner = User.objects.create_superuser('owner', password='x')
+        settings_dict = connection.settings_dict
+        self.addCleanup(settings_dict.__setitem__, 'CONN_MAX_AGE', settings_dict['CONN_MAX_AGE'])
+        if connection.is_in_memory_db():
+            # The in-memory test database lives while a connection to it is open: hold one, so
+            # that the test connection can really be closed and reopened like a file database's
+            keeper = sqlite3.connect(settings_dict['NAME'], uri=True)
+            self.addCleanup(keeper.close)
+            patcher = mock.patch.object(type(connections['default']), 'is_in_memory_db', return_value=False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def connections_opened(self, conn_max_age):
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        try:
+            LoadTestListViews(stdout=io.StringIO()).run(self.owner, conn_max_age, n_requests=2, warmup=0)
+        finally:
+            connection_created.disconnect(count)
+        return len(opened)
+
+    @skipUnless(connection.vendor == 'sqlite', 'holds the in-memory SQLite test database open')
+    def test_connection_per_request_only_without_persistence(self):
+        requests = 2 * len(benchmarks.LIST_VIEWS)
+        self.assertGreaterEqual(self.connections_opened(0), requests)
+        self.assertLessEqual(self.connections_opened(60), 1)
+
+
+class CacheTests(OwnerTestCase):
+    """Tag invalidation on commit, and one recompute per missing key."""
+
+    def setUp(self):
+        cache.clear()
+
+    def version(self, tag):
+        return erp_cache.get_tag_versions([tag])[tag]
+
+    def test_saves_bump_their_tag_after_commit(self):
+        for tag, save in [
+            (erp_cache.PRODUCT, lambda: Product.objects.create(name='Widget', sku='W-1', owner=self.owner)),
+            (erp_cache.COMPANY, lambda: Company.objects.create(
+                name='Uniworld', registration_number='R-1', established_date=datetime(2020, 1, 1).date(),
+                email='office@example.com', phone='1', address='Dhaka',
+            )),
+        ]:
+            before = self.version(tag)
+            with self.captureOnCommitCallbacks(execute=True):
+                save()
+                self.assertEqual(self.version(tag), before)
+            self.assertNotEqual(self.version(tag), before)
+
+    def test_rolled_back_save_keeps_the_tag(self):
+        before = self.version(erp_cache.PRODUCT)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Product.objects.create(name='Widget', sku='W-1', owner=self.owner)
+                raise RuntimeError
+        self.assertEqual((callbacks, self.version(erp_cache.PRODUCT)), ([], before))
+
+    def test_concurrent_misses_compute_once(self):
+        computed = []
+        barrier = threading.Barrier(8)
+
+        def compute():
+            computed.append(1)
+            time_module.sleep(0.1)
+            return 42
+
+        def read(results):
+            barrier.wait()
+            results.append(erp_cache.get_or_set('answer', compute, tags=[erp_cache.PRODUCT]))
+
+        results = []
+        threads = [threading.Thread(target=read, args=(results,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(computed), results), (1, [42] * 8))
+
+    def test_waits_for_another_process_recomputing(self):
+        key = erp_cache.make_key('answer', [erp_cache.PRODUCT])
+        # Held by another process, which stores the value a moment later
+        cache.add(f'{key}:lock', 1)
+        threading.Timer(0.1, cache.set, (key, 42)).start()
+        self.assertEqual(erp_cache.get_or_set('answer', mock.Mock(side_effect=AssertionError), tags=[erp_cache.PRODUCT]), 42)
+
+
+class ThumbnailTests(OwnerTestCase):
+    """Thumbnails made when a product image is uploaded, and dropped when it is replaced."""
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.media = media.name
+
+    def png(self, name, colour):
+        out = io.BytesIO()
+        Image.new('RGB', (400, 300), colour).save(out, 'PNG')
+        return SimpleUploadedFile(name, out.getvalue(), content_type='image/png')
+
+    def derivatives(self):
+        root = os.path.join(self.media, 'thumbnails')
+        return sorted(os.path.relpath(os.path.join(path, name), root) for path, _, names in os.walk(root) for name in names)
+
+    def test_made_on_upload_and_dropped_on_replace(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Widget', sku='W-1', image=self.png('widget.png', 'red'), owner=self.owner)
+        first = self.derivatives()
+        self.assertEqual([name.split(os.sep)[0] for name in first], ['small', 'thumb'])
+        self.assertEqual(thumbnail_url(product.image), '/media/thumbnails/' + first[1].replace(os.sep, '/'))
+
+        product.image = self.png('widget-2.png', 'blue')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        second = self.derivatives()
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+
+
+class StaticReferenceCheckTests(SimpleTestCase):
+    """The deploy check on the {% static %} paths of the templates."""
+
+    def test_flags_a_missing_file(self):
+        templates = tempfile.TemporaryDirectory()
+        self.addCleanup(templates.cleanup)
+        with open(os.path.join(templates.name, 'page.html'), 'w') as f:
+            f.write("{% load static %}\n<img src=\"{% static 'images/logo.png' %}\">\n"
+                    "<script src=\"{% static 'js/missing.js' %}\"></script>\n")
+        with override_settings(TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIRS': [templates.name],
+        }]):
+            warnings = checks.check_static_references(None)
+        self.assertEqual([(warning.id, warning.obj.rsplit(os.sep, 1)[-1]) for warning in warnings],
+                         [('uniworlderp.W002', 'page.html:3')])
+        self.assertIn('js/missing.js', warnings[0].msg)
+
+
+class WarmupTests(SimpleTestCase):
+    """warmup() on a worker that cannot reach the database (SimpleTestCase refuses every query)."""
+
+    def test_runs_without_a_database(self):
+        cache.clear()  # or the company comes from the cache
+        with self.assertLogs('uniworlderp.warmup', 'ERROR') as logs:
+            results = warmup.warmup()
+        self.assertEqual(list(results), ['urls', 'templates', 'database', 'caches'])
+        self.assertGreater(results['urls'][0], 0)
+        self.assertGreater(results['templates'][0], 0)
+        self.assertEqual((results['database'][0], results['caches'][0]), (None, None))
+        self.assertEqual(len(logs.records), 2)
+
+
+class PostReturnTests(CustomerTestCase):
+    """sales_returns.post_return(): bulk posting of a sales return."""
+
+    def make_order(self, lines):
+        order = SalesOrder.objects.create(customer=self.customer, owner=self.owner)
+        for number in range(lines):
+            product = Product.objects.create(
+                name=f'Product {number}', sku=f'P-{order.pk}-{number}', stock_quantity=100, price=10,
+                owner=self.owner,
+            )
+            SalesOrderItem.objects.create(sales_order=order, product=product, unit_price=Decimal('10.00'), quantity=5)
+        return order
+
+    def post(self, order, quantity=2):
+        return_sales = ReturnSales.objects.create(sales_order=order)
+        lines = [
+            ReturnSalesItem(sales_order_item=item, quantity=quantity, unit_price=item.unit_price)
+            for item in order.order_items.all()
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            sales_returns.post_return(return_sales, lines)
+        return return_sales, len(queries)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        _, few = self.post(self.make_order(3))
+        _, many = self.post(self.make_order(40))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 10)
+
+    def test_books_lines_totals_and_stock(self):
+        order = self.make_order(3)
+        return_sales, _ = self.post(order)
+
+        return_sales.refresh_from_db()
+        self.assertEqual(return_sales.return_items.count(), 3)
+        self.assertEqual(return_sales.total_amount, Decimal('60.00'))
+        for item in order.order_items.select_related('product'):
+            self.assertEqual((item.returned_quantity, item.returned_amount), (2, Decimal('20.00')))
+            self.assertEqual(item.product.stock_quantity, 97)
+        movement = StockTransaction.objects.filter(transaction_type='RET').first()
+        self.assertEqual((movement.previous_stock, movement.current_stock), (95, 97))
+        self.assertEqual(sales_returns.rebuild(dry_run=True), [])
+
+    def test_refuses_more_than_returnable(self):
+        order = self.make_order(2)
+        self.post(order, quantity=4)
+        with self.assertRaises(ValidationError):
+            self.post(order, quantity=2)
+        self.assertEqual(ReturnSalesItem.objects.count(), 2)
+        self.assertEqual(sum(order.order_items.values_list('returned_quantity', flat=True)), 8)
+
+
+class MasterDataImportTests(OwnerTestCase):
+    """Product and customer upserts of uniworlderp.importers, and the upload view."""
+
+    def upload(self, name, content, **data):
+        self.client.force_login(self.owner)
+        return self.client.post(reverse('customer_vendor:product_import'), {
+            'kind': 'products', 'post_opening_stock': True, 'file': SimpleUploadedFile(name, content), **data,
+        })
+
+    def test_view_reports_unreadable_files_and_lets_database_errors_through(self):
+        response = self.upload('products.xlsx', b'not a zip file')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Not a readable .xlsx file', [str(message) for message in response.context['messages']][0])
+        response = self.upload('products.csv', b'sku,name\n\xff\xfe,Widget\n')
+        self.assertIn('Could not read the file', [str(message) for message in response.context['messages']][0])
+
+        with mock.patch.object(importers, 'import_products', side_effect=OperationalError('database is locked')), \
+                self.assertRaises(OperationalError):
+            self.upload('products.csv', b'sku,name\nW-1,Widget\n')
+
+    def rows(self, text):
+        return importers.iter_rows(io.StringIO(text), 'rows.csv')
+
+    def test_products_upsert_on_sku(self):
+        widget = Product.objects.create(name='Widget', sku='W-1', price=5, owner=self.owner)
+        result = importers.import_products(self.rows('sku,name,price\nW-1,Widget v2,7\nG-1,Gadget,3\n'), self.owner)
+        self.assertEqual((result.rows, result.created, result.updated, result.errors), (2, 1, 1, []))
+        widget.refresh_from_db()
+        self.assertEqual((widget.name, widget.price), ('Widget v2', Decimal('7.00')))
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_barcode_of_another_product_is_a_row_error(self):
+        Product.objects.create(name='Widget', sku='W-1', barcode='111', owner=self.owner)
+        result = importers.import_products(self.rows('sku,name,barcode\nG-1,Gadget,111\nH-1,Handle,222\n'), self.owner)
+        self.assertEqual(result.errors, [{'row': 2, 'key': 'G-1', 'error': 'barcode: already used by product W-1'}])
+        self.assertEqual((result.created, list(Product.objects.order_by('sku').values_list('sku', flat=True))),
+                         (1, ['H-1', 'W-1']))
+
+    def test_opening_stock_posts_an_adjustment(self):
+        widget = Product.objects.create(name='Widget', sku='W-1', stock_quantity=3, owner=self.owner)
+        result = importers.import_products(self.rows('sku,name,opening_stock\nW-1,Widget,7\nG-1,Gadget,2.5\n'), self.owner)
+        self.assertEqual((result.stock_posted, [error['row'] for error in result.errors]), (1, [3]))
+        movement = StockTransaction.objects.get(product=widget)
+        self.assertEqual(
+            (movement.transaction_type, movement.previous_stock, movement.current_stock, movement.reference),
+            ('ADJ', 3, 7, importers.OPENING_STOCK_REFERENCE),
+        )
+        widget.refresh_from_db()
+        self.assertEqual(widget.stock_quantity, 7)
+
+    def test_dry_run_writes_nothing(self):
+        result = importers.import_products(self.rows('sku,name,opening_stock\nW-1,Widget,7\n'), self.owner, dry_run=True)
+        self.assertEqual((result.created, result.stock_posted), (1, 1))
+        result = importers.import_customers(self.rows('name,phone_number\nCustomer,0170\n'), self.owner, dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(
+            (Product.objects.count(), StockTransaction.objects.count(), CustomerVendor.objects.count(), ChangeLog.objects.count()),
+            (0, 0, 0, 0),
+        )
+
+    def test_customers_match_on_name_and_phone(self):
+        customer = self.make_customer('Customer', phone_number='0170')
+        result = importers.import_customers(
+            self.rows('name,phone_number,address\ncustomer,0170,Dhaka\nCustomer,0180,Khulna\nOther,0170,x\nOther,0170,y\n'),
+            self.owner,
+        )
+        self.assertEqual((result.created, result.updated, [error['row'] for error in result.errors]), (2, 1, [5]))
+        customer.refresh_from_db()
+        self.assertEqual(customer.address, 'Dhaka')
+
+
+class OrderImportTests(CustomerTestCase):
+    """Bulk sales order intake: each order created or rejected as a whole."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.products = {
+            sku: Product.objects.create(name=f'Product {sku}', sku=sku, stock_quantity=stock, price=10,
+                                        owner=cls.owner)
+            for sku, stock in [('A', 5), ('B', 3)]
+        }
+
+    def order(self, *lines, ref=None):
+        return {'ref': ref, 'customer': str(self.customer.pk),
+                'items': [{'sku': sku, 'quantity': quantity} for sku, quantity in lines]}
+
+    def stock(self, sku):
+        return Product.objects.get(sku=sku).stock_quantity
+
+    def test_orders_are_all_or_nothing(self):
+        result = order_import.import_sales_orders([
+            self.order(('A', 2), ('B', 2), ref='first'),
+            # B has 1 left: the whole order is rejected and its A stays available
+            self.order(('A', 2), ('B', 2), ref='short'),
+            self.order(('A', 3), ref='rest'),
+            self.order(('A', 1), ('X', 1), ref='unknown'),
+        ], self.owner, chunk_size=2)
+
+        self.assertEqual([(r['ref'], r['status']) for r in result.results],
+                         [('first', 'created'), ('short', 'rejected'), ('rest', 'created'), ('unknown', 'rejected')])
+        self.assertIn('Insufficient stock for Product B. Available: 1, requested: 2', result.results[1]['errors'])
+        self.assertEqual((self.stock('A'), self.stock('B')), (0, 1))
+        self.assertEqual(SalesOrder.objects.count(), 2)
+        self.assertEqual(
+            list(StockTransaction.objects.filter(product__sku='A').order_by('current_stock')
+                 .values_list('previous_stock', 'current_stock')),
+            [(3, 0), (5, 3)],
+        )
+
+        dry = order_import.import_sales_orders([self.order(('B', 1))], self.owner, dry_run=True)
+        self.assertEqual(dry.created, 1)
+        self.assertEqual((self.stock('B'), SalesOrder.objects.count()), (1, 2))
+
+    def test_sharded_stock_gone_meanwhile_rejects_only_that_order(self):
+        product = stock_counters.enable(Product.objects.create(name='Seller', sku='S', stock_quantity=5,
+                                                               owner=self.owner), shards=2)
+        # Concurrent sales emptied the shards after the stock was read
+        with mock.patch.object(order_import.stock_counters, 'totals', return_value={product.pk: 100}):
+            result = order_import.import_sales_orders(
+                [self.order(('S', 4)), self.order(('S', 4)), self.order(('A', 1))], self.owner,
+            )
+        self.assertEqual([r['status'] for r in result.results], ['created', 'rejected', 'created'])
+        self.assertEqual(result.results[1]['errors'], ['Insufficient stock for Seller. Available: 1, requested: 4'])
+        self.assertEqual(product.available_stock, 1)
+
+    @override_settings(SALES_ORDER_IMPORT_MAX_BYTES=200)
+    def test_endpoint_body_limit(self):
+        self.client.force_login(self.owner)
+        url = reverse('customer_vendor:sales_order_import')
+        response = self.client.post(url, json.dumps({'orders': [self.order(('A', 1))]}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['created'], 1)
+        response = self.client.post(url, json.dumps({'orders': [self.order(('A', 1))] * 5}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        # A declared length over the limit is refused before the body is read
+        response = self.client.post(url, json.dumps({'orders': [self.order(('A', 1))]}),
+                                    content_type='application/json', CONTENT_LENGTH='201')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(SalesOrder.objects.count(), 1)
+
+    def test_endpoint_takes_a_session_and_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('customer_vendor:sales_order_import')
+        batch = json.dumps({'orders': [self.order(('A', 1))]})
+        self.assertEqual(client.post(url, batch, content_type='application/json').status_code, 403)
+
+        # What the field app does: sign in through the login page, then send the CSRF cookie back
+        self.owner.set_password('field-app')
+        self.owner.save()
+        client.get(reverse('permission:login'))
+        client.post(reverse('permission:login'), {'username': 'owner', 'password': 'field-app',
+                                                  'csrfmiddlewaretoken': client.cookies['csrftoken'].value})
+        self.assertEqual(client.post(url, batch, content_type='application/json').status_code, 403)
+        response = client.post(url, batch, content_type='application/json',
+                               headers={'X-CSRFToken': client.cookies['csrftoken'].value})
+        self.assertEqual(response.json()['created'], 1)
+
+
+class NPlusOneTests(TestCase):
+    """Every list and detail page runs a fixed number of queries, whatever the number of rows."""
+
+    ROWS = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='x')
+        cls.customers, cls.vendors, cls.employees = [], [], []
+        for number in range(cls.ROWS):
+            employee_user = User.objects.create_user(f'employee{number}', password='x')
+            cls.employees.append(SalesEmployee.objects.create(user=employee_user, full_name=f'Employee {number}'))
+            cls.customers.append(CustomerVendor.objects.create(
+                name=f'Customer {number}', owner=cls.user, business_type='retailer',
+            ))
+            cls.vendors.append(CustomerVendor.objects.create(
+                name=f'Vendor {number}', owner=cls.user, business_type='wholesaler', entity_type='vendor',
+            ))
+        cls.products = [
+            Product.objects.create(name=f'Product {number}', sku=f'P-{number}', stock_quantity=1000, price=10,
+                                   owner=cls.user)
+            for number in range(cls.ROWS)
+        ]
+
+        for customer, employee in zip(cls.customers, cls.employees):
+            for _ in range(2):
+                order = SalesOrder.objects.create(customer=customer, sales_employee=employee, owner=cls.user)
+                for product in cls.products:
+                    SalesOrderItem.objects.create(sales_order=order, product=product, unit_price=10, quantity=3)
+                return_sales = ReturnSales.objects.create(sales_order=order, return_employee=employee)
+                sales_returns.post_return(return_sales, [
+                    ReturnSalesItem(sales_order_item=item, quantity=1, unit_price=item.unit_price)
+                    for item in order.order_items.all()
+                ])
+                invoice = ARInvoice(customer=customer, sales_employee=employee, sales_order=order, owner=cls.user)
+                invoice.save()
+                for product in cls.products:
+                    ARInvoiceItem(ar_invoice=invoice, product=product, unit_price=10, quantity=3).save()
+
+        for vendor in cls.vendors:
+            order = PurchaseOrder.objects.create(supplier=vendor, owner=cls.user)
+            # PurchaseOrderItem.save() posts against a sales order
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(purchase_order=order, product=product, unit_price=5, quantity=2, total=10)
+                for product in cls.products
+            ])
+            purchase = MaterialsPurchase.objects.create(vendor_name=vendor.name, purchase_date=order.order_date)
+            for number in range(cls.ROWS):
+                MaterialsPurchaseItem.objects.create(purchase=purchase, product_name=f'Material {number}',
+                                                     quantity=1, unit_price=2)
+
+    def urls(self):
+        customer, vendor, employee, product = self.customers[0], self.vendors[0], self.employees[0], self.products[0]
+        order = SalesOrder.objects.filter(customer=customer).first()
+        return [
+            reverse('customer_vendor:customer_list'),
+            reverse('customer_vendor:customer_view', args=[customer.pk]),
+            reverse('customer_vendor:sales_order_list', args=[customer.pk]),
+            reverse('customer_vendor:purchase_order_list', args=[vendor.pk]),
+            reverse('customer_vendor:invoice_list', args=[customer.pk]),
+            reverse('customer_vendor:sales_employee_list'),
+            reverse('customer_vendor:sales_employee_view', args=[employee.pk]),
+            reverse('customer_vendor:product_list'),
+            reverse('customer_vendor:product_view', args=[product.pk]),
+            reverse('customer_vendor:stock_transfer_detailed_list'),
+            reverse('customer_vendor:sales_order_list'),
+            reverse('customer_vendor:sales_order_view', args=[order.pk]),
+            reverse('customer_vendor:sales_order_detailed_list'),
+            reverse('customer_vendor:sales_order_view_return', args=[order.pk]),
+            reverse('customer_vendor:invoice_list'),
+            reverse('customer_vendor:invoice_view', args=[order.invoice.pk]),
+            reverse('customer_vendor:purchase_order_list'),
+            reverse('customer_vendor:purchase_order_detail', args=[PurchaseOrder.objects.first().pk]),
+            reverse('customer_vendor:purchase_order_detailed_list'),
+            reverse('customer_vendor:materials_purchase_list'),
+            reverse('customer_vendor:materials_purchase_view', args=[MaterialsPurchase.objects.first().pk]),
+        ]
+
+    def test_list_and_detail_pages(self):
+        self.client.force_login(self.user)
+        problems = []
+        for url in self.urls():
+            with self.subTest(url=url), QueryAudit() as audit:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+            if audit.repeats():
+                problems.append(f'{url}\n{audit.report()}')
+        self.assertFalse(problems, '\n\n'.join(problems))
+
+
+class StockLedgerTests(OwnerTestCase):
+    """Ledger replay: diff, fix and check of the running balances and the product stock."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.moved = Product.objects.create(name='Moved', sku='M-1', stock_quantity=0, owner=cls.owner)
+        for kind, quantity in [('IN', 10), ('OUT', 3), ('RET', 1)]:
+            StockTransaction.objects.create(product=cls.moved, transaction_type=kind, quantity=quantity,
+                                            owner=cls.owner)
+        cls.unmoved = Product.objects.create(name='Unmoved', sku='U-1', stock_quantity=5, owner=cls.owner)
+
+    def ledger(self, product):
+        return list(StockTransaction.objects.filter(product=product).order_by('transaction_date', 'id')
+                    .values_list('previous_stock', 'current_stock'))
+
+    def test_diff_fix_and_check(self):
+        self.assertTrue(stock_ledger.rebuild(dry_run=True).consistent)
+        movements = StockTransaction.objects.filter(product=self.moved).order_by('transaction_date', 'id')
+        StockTransaction.objects.filter(pk=movements[1].pk).update(previous_stock=9, current_stock=6)
+        Product.objects.filter(pk=self.moved.pk).update(stock_quantity=2)
+
+        report = stock_ledger.rebuild(dry_run=True)
+        self.assertEqual((report.products, report.transactions, report.changed), (1, 3, 1))
+        self.assertEqual((report.diffs[0]['previous_stock'], report.diffs[0]['current_stock']), ([9, 10], [6, 7]))
+        self.assertEqual([(m['sku'], m['stock_quantity'], m['ledger']) for m in report.mismatches], [('M-1', 2, 8)])
+        self.assertEqual(self.ledger(self.moved)[1], (9, 6))
+        with self.assertRaises(CommandError):
+            call_command('rebuild_stock_ledger', '--check', stdout=io.StringIO())
+
+        report = stock_ledger.rebuild(fix_product_stock=True)
+        self.assertEqual((report.changed, report.products_fixed), (1, 1))
+        self.assertEqual(self.ledger(self.moved), [(0, 10), (10, 7), (7, 8)])
+        self.moved.refresh_from_db()
+        self.assertEqual(self.moved.stock_quantity, 8)
+        call_command('rebuild_stock_ledger', '--check', stdout=io.StringIO())
+
+    def test_products_without_rows(self):
+        # Their opening balance is unknown: only the products with rows are replayed
+        self.assertEqual(stock_ledger.rebuild(dry_run=True).products, 1)
+
+        report = stock_ledger.rebuild(opening=stock_ledger.OPENING_ZERO, dry_run=True)
+        self.assertEqual(report.products, 2)
+        self.assertEqual([(m['sku'], m['stock_quantity'], m['ledger']) for m in report.mismatches], [('U-1', 5, 0)])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_stock_ledger', '--check', '--opening', 'zero', stdout=io.StringIO())
+
+        # No rows since a date: the balance before it
+        since = timezone.now() + timedelta(minutes=1)
+        Product.objects.filter(pk=self.moved.pk).update(stock_quantity=4)
+        report = stock_ledger.rebuild(product_ids=[self.moved.pk], since=since, dry_run=True)
+        self.assertEqual((report.products, report.transactions), (1, 0))
+        self.assertEqual([(m['sku'], m['stock_quantity'], m['ledger']) for m in report.mismatches], [('M-1', 4, 8)])
+
+
+class PrintingTests(CustomerTestCase):
+    """Rendered posted documents are cached until anything printed on them changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.product = Product.objects.create(name='Widget', sku='W-1', stock_quantity=50, price=10, owner=cls.owner)
+        cls.order = SalesOrder.objects.create(customer=cls.customer, owner=cls.owner, delivery_status='D')
+        SalesOrderItem.objects.create(sales_order=cls.order, product=cls.product, unit_price=10, quantity=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def printed(self):
+        return self.client.get(reverse('customer_vendor:sales_order_print', args=[self.order.pk])).content.decode()
+
+    def test_posted_document_reprinted_when_customer_or_product_change(self):
+        self.assertIn('Customer', self.printed())
+        with mock.patch('uniworlderp.printing.render_to_string', wraps=printing.render_to_string) as render:
+            self.printed()
+        self.assertNotIn('sales_order/_document.html', [call.args[0] for call in render.call_args_list])
+
+        self.customer.name = 'Renamed Customer'
+        self.customer.save()
+        self.assertIn('Renamed Customer', self.printed())
+
+        self.product.name = 'Renamed Widget'
+        self.product.save()
+        self.assertIn('Renamed Widget', self.printed())
+
+
+class StockCounterTests(OwnerTestCase):
+    """Sharded stock counters: enable, movements over the shards, non-negative stock, disable."""
+
+    def move(self, product, kind, quantity):
+        return StockTransaction.objects.create(product=product, transaction_type=kind, quantity=quantity,
+                                               owner=self.owner)
+
+    def shards(self, product):
+        return list(StockCounterShard.objects.filter(product=product).order_by('shard').values_list('quantity', flat=True))
+
+    def test_enable_move_disable(self):
+        product = Product.objects.create(name='Seller', sku='S-1', stock_quantity=10, owner=self.owner)
+        product = stock_counters.enable(product, shards=4)
+        self.assertTrue(product.sharded_stock)
+        self.assertEqual(self.shards(product), [3, 3, 2, 2])
+
+        movement = self.move(product, 'IN', 5)
+        self.assertEqual((movement.previous_stock, movement.current_stock), (10, 15))
+        # No single shard holds 12: taken from several
+        movement = self.move(product, 'OUT', 12)
+        self.assertEqual((movement.previous_stock, movement.current_stock), (15, 3))
+        self.assertEqual(product.available_stock, 3)
+        self.assertTrue(all(quantity >= 0 for quantity in self.shards(product)))
+
+        with self.assertRaises(ValidationError):
+            self.move(product, 'OUT', 4)
+        self.assertEqual(product.available_stock, 3)
+        self.assertEqual(StockTransaction.objects.filter(product=product).count(), 2)
+
+        self.move(product, 'ADJ', 8)
+        self.assertEqual(sum(self.shards(product)), 8)
+        # The snapshot lags until reconciled
+        self.assertEqual(stock_counters.reconcile([product.pk]), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 8)
+
+        product = stock_counters.disable(product)
+        self.assertEqual((product.sharded_stock, product.stock_quantity, self.shards(product)), (False, 8, []))
+        self.move(product, 'OUT', 2)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 6)
+
+    def test_flagged_without_enable(self):
+        product = Product.objects.create(name='Flagged', sku='F-1', stock_quantity=7, sharded_stock=True,
+                                         owner=self.owner)
+        self.assertEqual(product.available_stock, 7)
+        self.assertEqual(stock_counters.totals([product.pk]), {product.pk: 7})
+
+        # The first movement creates the shards from stock_quantity
+        movement = self.move(product, 'IN', 3)
+        self.assertEqual((movement.previous_stock, movement.current_stock), (7, 10))
+        self.assertEqual(sum(self.shards(product)), 10)
+        with self.assertRaises(ValidationError):
+            self.move(product, 'OUT', 11)
+
+        other = Product.objects.create(name='Adjusted', sku='F-2', stock_quantity=4, sharded_stock=True,
+                                       owner=self.owner)
+        stock_counters.set_total(other, 9)
+        self.assertEqual(other.available_stock, 9)
+
+        # Unflagging one that never got shards keeps its stock
+        kept = Product.objects.create(name='Kept', sku='F-3', stock_quantity=5, sharded_stock=True, owner=self.owner)
+        self.assertEqual(stock_counters.disable(kept).stock_quantity, 5)
+
+    def test_admin_changes_the_flag_through_actions(self):
+        product = Product.objects.create(name='Seller', sku='S-1', stock_quantity=6, owner=self.owner)
+        self.client.force_login(self.owner)
+        url = reverse('admin:uniworlderp_product_changelist')
+
+        self.client.post(url, {'action': 'enable_sharded_stock', '_selected_action': [product.pk]})
+        product.refresh_from_db()
+        self.assertTrue(product.sharded_stock)
+        self.assertEqual(sum(self.shards(product)), 6)
+        response = self.client.get(reverse('admin:uniworlderp_product_change', args=[product.pk]))
+        self.assertNotContains(response, 'name="sharded_stock"')
+
+        self.client.post(url, {'action': 'disable_sharded_stock', '_selected_action': [product.pk]})
+        product.refresh_from_db()
+        self.assertEqual((product.sharded_stock, product.stock_quantity, self.shards(product)), (False, 6, []))
+
+    def test_list_and_dashboard_read_the_shards(self):
+        self.client.force_login(self.owner)
+        url = reverse('customer_vendor:product_list')
+        products = [
+            Product.objects.create(name=f'Seller {i}', sku=f'S-{i}', stock_quantity=20, reorder_level=10, owner=self.owner)
+            for i in range(3)
+        ]
+        products[0] = stock_counters.enable(products[0], shards=2)
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(url)
+        products[1:] = [stock_counters.enable(product, shards=2) for product in products[1:]]
+        # Sold down on the shards; stock_quantity is the unreconciled snapshot
+        self.move(products[0], 'OUT', 15)
+        self.move(products[1], 'OUT', 20)
+        with CaptureQueriesContext(connection) as three:
+            response = self.client.get(url)
+        self.assertEqual(len(three), len(one))
+        rows = {product.sku: product for product in response.context['products']}
+        self.assertEqual([rows[p.sku].on_hand for p in products], [5, 0, 20])
+        self.assertEqual([rows[p.sku].need_reorder for p in products], [True, True, False])
+
+        response = self.client.get(reverse('permission:dashboard'))
+        self.assertEqual((response.context['low_stock_products'], response.context['out_of_stock_products']), (2, 1))
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(CustomerTestCase):
+    """The change log written by saves, deletes and bulk posting, and the feed over it."""
+
+    def feed(self, since=0, **params):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('customer_vendor:change_feed'), {'since': since, **params})
+        return response.status_code, response.json()
+
+    def test_save_update_delete(self):
+        start = ChangeLog.objects.latest('id').id
+        product = Product.objects.create(name='Product', sku='P-1', stock_quantity=5, price=10, owner=self.owner)
+        product.price = 12
+        product.save()
+        product_id = str(product.pk)
+        product.delete()
+
+        status, feed = self.feed(start, models='product')
+        self.assertEqual(status, 200)
+        self.assertEqual([(c['id'], c['action']) for c in feed['changes']],
+                         [(product_id, 'C'), (product_id, 'U'), (product_id, 'D')])
+        self.assertIsNone(feed['changes'][0]['data'])
+        self.assertFalse(feed['has_more'])
+        self.assertEqual(self.feed(feed['next'])[1]['changes'], [])
+
+    def test_bulk_posting_and_paging(self):
+        order = SalesOrder.objects.create(customer=self.customer, owner=self.owner)
+        product = Product.objects.create(name='Product', sku='P-1', stock_quantity=5, price=10, owner=self.owner)
+        item = SalesOrderItem.objects.create(sales_order=order, product=product, unit_price=10, quantity=3)
+        start = ChangeLog.objects.latest('id').id
+        return_sales = ReturnSales.objects.create(sales_order=order)
+        sales_returns.post_return(return_sales, [ReturnSalesItem(sales_order_item=item, quantity=1, unit_price=10)])
+
+        changes, since, pages = [], start, 0
+        while True:
+            status, feed = self.feed(since, limit=2)
+            changes += feed['changes']
+            since, pages = feed['next'], pages + 1
+            if not feed['has_more']:
+                break
+        self.assertGreater(pages, 1)
+        self.assertEqual([change['seq'] for change in changes], sorted(change['seq'] for change in changes))
+        logged = {(change['model'], change['action']) for change in changes}
+        self.assertLessEqual(
+            {('returnsales', 'C'), ('salesorderitem', 'U'), ('stocktransaction', 'C'), ('product', 'U')}, logged,
+        )
+        line = next(change for change in changes if change['model'] == 'salesorderitem')
+        self.assertEqual(line['data']['returned_quantity'], 1)
+
+    def test_compacted_cursor_expires(self):
+        Product.objects.create(name='Product', sku='P-1', stock_quantity=5, price=10, owner=self.owner)
+        Product.objects.create(name='Product 2', sku='P-2', stock_quantity=5, price=10, owner=self.owner)
+        oldest = ChangeLog.objects.earliest('id').id
+        ChangeLog.objects.filter(id__lt=ChangeLog.objects.latest('id').id).update(changed_at='2000-01-01T00:00Z')
+        self.assertGreater(change_log.compact(), 0)
+
+        status, body = self.feed(oldest)
+        self.assertEqual(status, 410)
+        self.assertEqual(body['newest'], ChangeLog.objects.latest('id').id)
+        self.assertEqual(self.feed(0)[0], 200)
+
+
+class ReadApiTests(CustomerTestCase):
+    """Sparse fields, cursor paging and conditional GET of the read API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.products = [
+            Product.objects.create(name=f'Product {i}', sku=f'P-{i}', stock_quantity=i, price=10, owner=cls.owner)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def get(self, resource, **params):
+        headers = {'HTTP_IF_NONE_MATCH': params.pop('etag')} if 'etag' in params else {}
+        return self.client.get(
+            reverse('customer_vendor:read_api_endpoint', args=[resource]), params, **headers,
+        )
+
+    def body(self, response):
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_sparse_fields_and_cursor_paging(self):
+        rows, cursor, pages = [], None, 0
+        while True:
+            params = {'fields': 'sku,stock_quantity', 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.get('products', **params)
+            self.assertEqual(response.status_code, 200)
+            page = self.body(response)
+            rows += page['results']
+            cursor, pages = page['next'], pages + 1
+            if cursor is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(rows, key=lambda row: row['sku']),
+                         [{'sku': f'P-{i}', 'stock_quantity': i} for i in range(5)])
+
+    def test_nested_lines_and_joined_fields(self):
+        order = SalesOrder.objects.create(customer=self.customer, owner=self.owner)
+        SalesOrderItem.objects.create(sales_order=order, product=self.products[3], unit_price=10, quantity=2)
+        with CaptureQueriesContext(connection) as queries:
+            page = self.body(self.get('sales-orders', fields='id,customer_name,items'))
+        self.assertEqual(page['results'][0]['customer_name'], 'Customer')
+        self.assertEqual([(line['sku'], line['quantity']) for line in page['results'][0]['items']], [('P-3', 2)])
+        self.assertLessEqual(len(queries), 8, [query['sql'] for query in queries])
+
+    def test_etag_and_not_modified(self):
+        response = self.get('products')
+        etag = response['ETag']
+        self.body(response)
+        self.assertEqual(self.get('products', etag=etag).status_code, 304)
+
+        Product.objects.filter(pk=self.products[0].pk).update(price=11)
+        change_log.record(self.products[0], change_log.UPDATED)
+        self.assertEqual(self.get('products', etag=etag).status_code, 200)
+
+    def test_joined_models_make_a_new_version(self):
+        order = SalesOrder.objects.create(customer=self.customer, owner=self.owner)
+        invoice = ARInvoice(customer=self.customer, sales_order=order, owner=self.owner)
+        invoice.save()
+        item = ARInvoiceItem.objects.create(ar_invoice=invoice, product=self.products[1], quantity=1, unit_price=10)
+        etags = {resource: self.get(resource)['ETag'] for resource in ('sales-orders', 'invoices')}
+
+        self.customer.name = 'Renamed'
+        self.customer.save()
+        response = self.get('sales-orders', etag=etags['sales-orders'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response)['results'][0]['customer_name'], 'Renamed')
+
+        etags['invoices'] = self.get('invoices')['ETag']
+        item.delete()
+        self.assertEqual(self.get('invoices', etag=etags['invoices']).status_code, 200)
+
+    def test_version_moves_when_a_change_commits(self):
+        endpoint = read_api.ENDPOINTS['products']
+        with self.assertNumQueries(1):
+            before = read_api.version(endpoint)
+        with self.captureOnCommitCallbacks() as callbacks:
+            change_log.record(self.products[0], change_log.UPDATED)
+        written = read_api.version(endpoint)
+        self.assertNotEqual(written, before)
+
+        # A lower-numbered change committing late: no new newest row, a new version all the same
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(read_api.version(endpoint)[0], written[0])
+
+    def test_bad_requests_and_permissions(self):
+        self.assertEqual(self.get('products', fields='sku,cost').status_code, 400)
+        self.assertEqual(self.get('products', cursor='!!').status_code, 400)
+        self.assertEqual(self.get('products', updated_since='yesterday').status_code, 400)
+        self.assertEqual(self.get('stock-transactions', product='not-a-uuid').status_code, 400)
+        self.assertEqual(self.get('products', limit=0).status_code, 400)
+        self.assertEqual(self.get('ledgers').status_code, 404)
+
+        clerk = User.objects.create_user('clerk', password='x')
+        self.client.force_login(clerk)
+        self.assertEqual(
+            self.client.get(reverse('customer_vendor:read_api_endpoint', args=['products'])).status_code, 403,
+        )
+
+
+class ConditionalGetTests(CustomerTestCase):
+    """304 Not Modified for unchanged documents and past report ranges."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.product = Product.objects.create(name='Product', sku='P-1', stock_quantity=50, price=10, owner=cls.owner)
+        cls.order = SalesOrder.objects.create(
+            customer=cls.customer, owner=cls.owner, order_date=timezone.localdate() - timedelta(days=30),
+        )
+        cls.item = SalesOrderItem.objects.create(sales_order=cls.order, product=cls.product, unit_price=10, quantity=4)
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def revalidate(self, url, params=None):
+        etag = self.client.get(url, params)['ETag']
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_document_pages(self):
+        detail = reverse('customer_vendor:sales_order_view', args=[self.order.pk])
+        printed = reverse('customer_vendor:sales_order_print', args=[self.order.pk])
+        for url in (detail, printed):
+            self.assertEqual(self.revalidate(url), 304)
+
+        etag = self.client.get(printed)['ETag']
+        self.item.quantity = 3
+        self.item.save()
+        self.assertEqual(self.client.get(printed, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # A new order changes the navigation bar of the detail page only
+        etags = [self.client.get(url)['ETag'] for url in (detail, printed)]
+        SalesOrder.objects.create(customer=self.customer, owner=self.owner)
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+        self.assertEqual(self.client.get(printed, HTTP_IF_NONE_MATCH=etags[1]).status_code, 304)
+
+    def test_past_report_ranges(self):
+        url = reverse('customer_vendor:sales_order_report_print')
+        past = {
+            'start_date': (timezone.localdate() - timedelta(days=60)).isoformat(),
+            'end_date': (timezone.localdate() - timedelta(days=1)).isoformat(),
+        }
+        self.assertEqual(self.revalidate(url, past), 304)
+
+        etag = self.client.get(url, past)['ETag']
+        return_sales = ReturnSales.objects.create(sales_order=self.order, return_date=self.order.order_date)
+        sales_returns.post_return(return_sales, [ReturnSalesItem(sales_order_item=self.item, quantity=1, unit_price=10)])
+        self.assertEqual(self.client.get(url, past, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # The report names the customer: renaming it is a new version too
+        etag = self.client.get(url, past)['ETag']
+        self.customer.name = 'Renamed'
+        self.customer.save()
+        self.assertEqual(self.client.get(url, past, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.assertFalse(self.client.get(url, {**past, 'end_date': timezone.localdate().isoformat()}).has_header('ETag'))
+
+
+    def test_without_a_version(self):
+        page = type('Page', (ConditionalGetMixin, View), {'get': lambda self, request: HttpResponse('page')})
+        response = page.as_view()(RequestFactory().get('/'))
+        self.assertEqual((response.content, response.has_header('ETag')), (b'page', False))
+
+class SalesPerformanceTests(CustomerTestCase):
+    """Monthly sales employee roll-ups maintained from orders and returns."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.employee = SalesEmployee.objects.create(full_name='Target 1000', sales_target=1000)
+        cls.untargeted = SalesEmployee.objects.create(full_name='Target 0', sales_target=0)
+
+    def performance(self, employee):
+        return SalesEmployeePerformance.objects.get(employee=employee, month=sales_performance.month_start(timezone.localdate()))
+
+    def order(self, total, employee=None):
+        return SalesOrder.objects.create(
+            customer=self.customer, sales_employee=employee or self.employee, total_amount=total, owner=self.owner,
+        )
+
+    def test_maintained_on_commit(self):
+        refresh = mock.patch.object(sales_performance, 'refresh', wraps=sales_performance.refresh)
+        with refresh as refreshed, self.captureOnCommitCallbacks(execute=True):
+            first = self.order(600)
+            second = self.order(300)
+            ReturnSales.objects.create(sales_order=first, total_amount=100)
+        # One refresh of the bucket for the whole transaction
+        refreshed.assert_called_once_with({(self.employee.pk, sales_performance.month_start(timezone.localdate()))})
+        row = self.performance(self.employee)
+        self.assertEqual(
+            (row.gross_amount, row.returned_amount, row.order_count, row.customer_count), (900, 100, 2, 1),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.sales_employee = self.untargeted
+            second.save()
+        self.assertEqual(self.performance(self.employee).gross_amount, 600)
+        self.assertEqual(self.performance(self.untargeted).gross_amount, 300)
+
+        # Achievement is net sales against the target; none for a zero target
+        board = sales_performance.leaderboard()
+        self.assertEqual([row.employee for row in board], [self.employee, self.untargeted])
+        self.assertEqual(board[0].achievement_percentage, 50)
+        self.assertIsNone(board[1].achievement_percentage)
+
+        self.client.force_login(self.owner)
+        self.assertContains(self.client.get(reverse('permission:dashboard')), 'Target 1000')
+        self.assertContains(
+            self.client.get(reverse('customer_vendor:sales_employee_view', args=[self.employee.pk])), '500.00',
+        )
+
+    def test_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.order(600)
+        SalesOrder.objects.filter(pk=order.pk).update(total_amount=700)
+        self.assertEqual(len(sales_performance.rebuild(dry_run=True)), 1)
+        self.assertEqual(self.performance(self.employee).gross_amount, 600)
+
+        changes = sales_performance.rebuild()
+        self.assertEqual(changes[0][2][0], 700)
+        self.assertEqual(self.performance(self.employee).gross_amount, 700)
+        self.assertEqual(sales_performance.rebuild(), [])
+
+
+class ReceivablesAgingTests(CustomerTestCase):
+    """Aging buckets of the pending invoices, per customer and per statement."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = cls.make_customer('Other')
+        now = timezone.now()
+        cls.invoices = []
+        for customer, days_overdue, amount, status in [
+            (cls.customer, -5, 10, 'P'), (cls.customer, 0, 20, 'P'), (cls.customer, 1, 30, 'P'),
+            (cls.customer, 31, 40, 'P'), (cls.customer, 90, 50, 'P'), (cls.customer, 91, 60, 'P'),
+            (cls.customer, 200, 70, 'C'), (cls.other, 45, 100, 'P'),
+        ]:
+            invoice = ARInvoice(
+                customer=customer, owner=cls.owner, payment_status=status,
+                due_date=now - timedelta(days=days_overdue),
+            )
+            invoice.save()
+            ARInvoice.objects.filter(pk=invoice.pk).update(total_amount=amount)
+            cls.invoices.append(invoice)
+
+    def setUp(self):
+        # Cached reports outlive the rolled-back test transactions
+        cache.clear()
+
+    def test_aging(self):
+        report = receivables.aging()
+        row = report['rows'][0]
+        self.assertEqual([r['customer__name'] for r in report['rows']], ['Customer', 'Other'])
+        self.assertEqual(
+            [row[key] for key, _, _, _ in receivables.BUCKETS] + [row['total'], row['invoice_count']],
+            [30, 30, 40, 50, 60, 210, 6],
+        )
+        self.assertEqual(report['totals']['days_31_60'], 140)
+
+        # Cached for the day until an invoice is saved
+        paid = self.invoices[5]
+        paid.payment_status = 'C'
+        with self.assertNumQueries(0):
+            receivables.aging()
+        with self.captureOnCommitCallbacks(execute=True):
+            paid.save()
+        self.assertEqual(receivables.aging()['rows'][0]['days_over_90'], 0)
+
+        statement = receivables.statement(self.customer.pk)
+        self.assertEqual(statement['row']['total'], 150)
+        self.assertEqual([invoice.days_overdue for invoice in statement['invoices']], [90, 31, 1, 0, 0])
+
+    def test_pages(self):
+        self.client.force_login(self.owner)
+        self.assertContains(self.client.get(reverse('customer_vendor:ar_aging_report')), 'Other')
+        self.assertContains(
+            self.client.get(reverse('customer_vendor:customer_statement', args=[self.customer.pk])), '90+ days',
+        )
+        response = self.client.get(reverse('customer_vendor:ar_aging_export'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'Customer')
+        self.assertEqual(lines[-1].split(',')[-1], '310.00')
+
+
+class ReorderSuggestionTests(OwnerTestCase):
+    """Reorder points and quantities from the daily demand of the movement history."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.selling = Product.objects.create(name='Selling', sku='S-1', stock_quantity=10, owner=cls.owner)
+        cls.idle = Product.objects.create(name='Idle', sku='I-1', stock_quantity=3, owner=cls.owner)
+        today = timezone.localdate()
+        movements = [(1, 'OUT', 10), (1, 'RET', 4), (2, 'OUT', 10), (3, 'OUT', 10), (4, 'OUT', 10), (5, 'OUT', 10),
+                     (0, 'OUT', 50), (11, 'OUT', 50)]
+        created = StockTransaction.objects.bulk_create([
+            StockTransaction(product=cls.selling, transaction_type=kind, quantity=quantity, owner=cls.owner)
+            for _, kind, quantity in movements
+        ])
+        for movement, (days_ago, _, _) in zip(created, movements):
+            noon = timezone.make_aware(datetime.combine(today - timedelta(days=days_ago), time(12)))
+            StockTransaction.objects.filter(pk=movement.pk).update(transaction_date=noon)
+
+    def test_suggest(self):
+        policy = reorder.Policy(history_days=10, lead_time_days=2, cover_days=5, service_level_z=1.0)
+        # Products, movements, then the delete and upsert in a savepoint
+        with self.assertNumQueries(6):
+            reorder.suggest(policy)
+        # Daily demand 6, 10, 10, 10, 10 and five idle days: today and older days are left out
+        selling = ReorderSuggestion.objects.get(product=self.selling)
+        self.assertEqual(selling.daily_demand, Decimal('4.600'))
+        self.assertEqual(selling.demand_deviation, Decimal('4.737'))
+        self.assertEqual((selling.reorder_point, selling.order_quantity), (16, 29))
+        self.assertEqual(selling.days_of_cover, Decimal('2.2'))
+
+        idle = ReorderSuggestion.objects.get(product=self.idle)
+        self.assertEqual((idle.reorder_point, idle.order_quantity, idle.days_of_cover), (0, 0, None))
+
+        self.client.force_login(self.owner)
+        products = self.client.get(reverse('customer_vendor:product_list')).context['products']
+        self.assertEqual({p.name: p.need_reorder for p in products}, {'Selling': True, 'Idle': True})
+
+
+class ABCClassificationTests(OwnerTestCase):
+    """ABC classes of the products and customers from the recent sales lines."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.big = cls.make_customer('Big')
+        cls.small = cls.make_customer('Small')
+        cls.idle = cls.make_customer('Idle')
+        cls.make_customer('Vendor', entity_type='vendor')
+        cls.products = {
+            name: Product.objects.create(name=name, sku=name, stock_quantity=100, owner=cls.owner)
+            for name in ['Star', 'Runner', 'Tail', 'Unsold', 'Old']
+        }
+
+        def sell(customer, name, unit_price, quantity, days_ago=0):
+            order = SalesOrder.objects.create(
+                customer=customer, owner=cls.owner, order_date=timezone.localdate() - timedelta(days=days_ago),
+            )
+            return SalesOrderItem.objects.create(
+                sales_order=order, product=cls.products[name], unit_price=unit_price, quantity=quantity,
+            )
+
+        # Net revenue Star 800 (1000 less 200 returned), Runner 150 over 3 lines, Tail 50
+        star = sell(cls.big, 'Star', 100, 10)
+        SalesOrderItem.objects.filter(pk=star.pk).update(returned_amount=Decimal('200.00'))
+        for _ in range(3):
+            sell(cls.small, 'Runner', 50, 1)
+        sell(cls.small, 'Tail', 50, 1)
+        sell(cls.big, 'Old', 1000, 1, days_ago=400)
+
+    def test_classify(self):
+        policy = abc_analysis.Policy(history_days=365, a_share=0.8, b_share=0.95)
+        # Products, customers, sales lines, then two deletes and upserts in a savepoint
+        with self.assertNumQueries(9):
+            abc_analysis.classify(policy)
+
+        classes = {
+            c.product.name: (c.revenue, c.revenue_class, c.movement_count, c.movement_class)
+            for c in ProductClassification.objects.select_related('product')
+        }
+        self.assertEqual(classes, {
+            'Star': (Decimal('800.00'), 'A', 1, 'A'),
+            'Runner': (Decimal('150.00'), 'B', 3, 'A'),
+            'Tail': (Decimal('50.00'), 'C', 1, 'B'),
+            'Unsold': (Decimal('0.00'), 'C', 0, 'C'),
+            'Old': (Decimal('0.00'), 'C', 0, 'C'),
+        })
+        customers = {c.customer.name: (c.net_sales, c.sales_class)
+                     for c in CustomerClassification.objects.select_related('customer')}
+        self.assertEqual(customers, {
+            'Big': (Decimal('800.00'), 'A'), 'Small': (Decimal('200.00'), 'B'), 'Idle': (Decimal('0.00'), 'C'),
+        })
+
+        self.client.force_login(self.owner)
+        products = self.client.get(reverse('customer_vendor:product_list'), {'abc': 'C', 'sort': 'abc'})
+        self.assertEqual([p.name for p in products.context['products']], ['Tail', 'Old', 'Unsold'])
+        customers = self.client.get(reverse('customer_vendor:customer_list'), {'abc': 'B'})
+        self.assertEqual([c.name for c in customers.context['customers']], ['Small'])
+
+    def test_rank(self):
+        policy = abc_analysis.Policy(history_days=1, a_share=0.5, b_share=0.9)
+        values = [10.0, 0.0, 50.0, 30.0, 10.0]
+        self.assertEqual(abc_analysis.rank(values, policy), ['B', 'C', 'A', 'B', 'C'])
+        self.assertEqual(abc_analysis.rank([0.0, 0.0], policy), ['C', 'C'])
+
+    def test_invalid_shares(self):
+        with self.assertRaises(ValueError):
+            abc_analysis.classify(abc_analysis.Policy(history_days=30, a_share=0.9, b_share=0.8), dry_run=True)
+
+
+class StockTakeTests(OwnerTestCase):
+    """Stock-take: frozen expected quantities, count import, variances and bulk ADJ posting."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.products = {
+            sku: Product.objects.create(name=f'Product {sku}', sku=sku, stock_quantity=stock, price=price,
+                                        owner=cls.owner)
+            for sku, stock, price in [('P1', 10, 4), ('P2', 5, 10), ('P3', 7, 1)]
+        }
+        Product.objects.create(name='Retired', sku='P4', stock_quantity=3, is_active=False, owner=cls.owner)
+
+    def test_count_and_post(self):
+        take = stock_take.start(self.owner)
+        self.assertEqual(
+            dict(take.lines.values_list('product__sku', 'expected_quantity')), {'P1': 10, 'P2': 5, 'P3': 7},
+        )
+        # Sold while counting: the posted difference applies on top of it
+        StockTransaction.objects.create(product=self.products['P1'], transaction_type='OUT', quantity=2,
+                                        owner=self.owner)
+
+        counts = io.BytesIO(b'sku,counted\nP1,7\nP2,5\nP2,6\nNOPE,3\nP3,x\n')
+        result = stock_take.import_counts(take, importers.iter_rows(counts, 'counts.csv'))
+        self.assertEqual((result.rows, result.updated), (5, 2))
+        self.assertEqual([(error['row'], error['key']) for error in result.errors], [(6, 'P3'), (5, 'NOPE')])
+
+        summary = stock_take.summary(take)
+        self.assertEqual(
+            {key: summary[key] for key in ['lines', 'counted', 'not_counted', 'differences', 'units_over', 'units_short']},
+            {'lines': 3, 'counted': 2, 'not_counted': 1, 'differences': 2, 'units_over': 1, 'units_short': 3},
+        )
+        self.assertEqual(summary['value'], Decimal('-2'))
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('customer_vendor:stock_take_export', args=[take.pk]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1:], ['P1,Product P1,10,7,-3,4.00,-12.00', 'P2,Product P2,5,6,1,10.00,10.00',
+                                     'Total,2 difference(s),,,-2,,-2.00'])
+
+        # Stock-take, differences, products, movements, stock, change log and status in a savepoint
+        with self.assertNumQueries(9):
+            movements = stock_take.post(take, self.owner)
+        self.assertEqual(len(movements), 2)
+        adjustments = StockTransaction.objects.filter(reference=take.reference).order_by('product__sku')
+        self.assertEqual(
+            [(a.product.sku, a.transaction_type, a.previous_stock, a.current_stock) for a in adjustments],
+            [('P1', 'ADJ', 8, 5), ('P2', 'ADJ', 5, 6)],
+        )
+        self.assertEqual(
+            dict(Product.objects.values_list('sku', 'stock_quantity')), {'P1': 5, 'P2': 6, 'P3': 7, 'P4': 3},
+        )
+        take.refresh_from_db()
+        self.assertEqual(take.status, StockTake.POSTED)
+        with self.assertRaises(ValidationError):
+            stock_take.post(take, self.owner)
+        with self.assertRaises(ValidationError):
+            stock_take.import_counts(take, [])
+
+    def test_views(self):
+        self.client.force_login(self.owner)
+        response = self.client.post(reverse('customer_vendor:stock_take_start'), {'abc_class': '', 'notes': 'Year end'})
+        take = StockTake.objects.get()
+        self.assertRedirects(response, reverse('customer_vendor:stock_take_detail', args=[take.pk]))
+
+        upload = io.BytesIO(b'sku,counted\nP3,9\n')
+        upload.name = 'counts.csv'
+        response = self.client.post(reverse('customer_vendor:stock_take_detail', args=[take.pk]), {'file': upload})
+        self.assertEqual([line.product.sku for line in response.context['page_obj']], ['P3'])
+
+        self.client.post(reverse('customer_vendor:stock_take_post', args=[take.pk]))
+        self.assertEqual(Product.objects.get(sku='P3').stock_quantity, 9)
+
+
+class BenchmarkTests(OwnerTestCase):
+    """Synthetic data generator and hot-path benchmark suite."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.summary = synthetic_data.generate(cls.owner, customers=8, products=30, orders=120, employees=3,
+                                              days=60, return_rate=0.2, seed=7, chunk_size=50)
+
+    def test_generated_data_is_consistent(self):
+        summary = self.summary
+        self.assertEqual(
+            (SalesOrder.objects.count(), SalesOrderItem.objects.count(), ReturnSales.objects.count()),
+            (120, summary.items, summary.returns),
+        )
+        self.assertEqual(StockTransaction.objects.count(), summary.movements)
+        self.assertEqual(summary.movements, 30 + summary.items + summary.returns + summary.receipts)
+        self.assertGreater(summary.returns, 0)
+
+        # Skewed: the first product sells far more than the median one
+        lines = sorted(SalesOrderItem.objects.values('product').annotate(n=Count('pk')).values_list('n', flat=True))
+        self.assertGreater(lines[-1], 3 * lines[len(lines) // 2])
+
+        # The ledger replays, the stock is its closing balance and the maintained totals agree
+        report = stock_ledger.rebuild(dry_run=True)
+        self.assertEqual((report.products, report.changed, report.mismatches), (30, 0, []))
+        self.assertEqual(sales_returns.rebuild(dry_run=True), [])
+        self.assertEqual(sales_performance.rebuild(dry_run=True), [])
+
+    def test_suite_and_regressions(self):
+        cases = [case for case in benchmarks.CASES if case.name in ('sales_report', 'sales_order_create', 'product_list')]
+        current = benchmarks.run(self.owner, cases, repeat=2, warmup=0)
+        self.assertEqual(set(current['results']), {'sales_report', 'sales_order_create', 'product_list'})
+        self.assertEqual(current['dataset']['salesorder'], 120)
+        self.assertGreater(current['results']['product_list']['queries'], 0)
+        # The order created by the benchmark was rolled back
+        self.assertEqual(SalesOrder.objects.count(), 120)
+
+        baseline = json.loads(json.dumps(current))
+        self.assertEqual(benchmarks.compare(current, baseline, 0.25), [])
+        baseline['results']['product_list']['queries'] -= 1
+        baseline['results']['sales_report']['p50_ms'] = 0
+        self.assertEqual(
+            [(r.case, r.metric) for r in benchmarks.compare(current, baseline, 0.25)],
+            [('sales_report', 'p50_ms'), ('product_list', 'queries')],
+        )
+
+
+class WriteLoadTests(OwnerTestCase):
+    """Concurrent write-path load harness, run by a single clerk."""
+
+    def test_sequential_run_keeps_the_ledger(self):
+        report = write_load.run(self.owner, workers=1, operations=40, products=2, opening_stock=500, seed=5)
+        self.assertEqual(report.requests, 40)
+        self.assertEqual({outcome for _, _, outcome in report.samples}, {'ok'})
+        self.assertGreater(report.statements, 0)
+        # One clerk never races itself: stock_quantity is the sum of the ledger
+        self.assertTrue(report.consistent)
+        self.assertEqual((report.ledger.products, report.ledger.changed), (2, 0))
+        self.assertTrue(SalesOrder.objects.filter(notes__startswith=f'LOAD-{report.run}-').exists())
+
+    def test_mix_and_error_kinds(self):
+        self.assertEqual(write_load.parse_mix('create=3,add_stock=1'), {'create': 3, 'add_stock': 1})
+        with self.assertRaises(ValueError):
+            write_load.parse_mix('create=3,delete=1')
+        self.assertEqual(write_load.classify(OperationalError('database is locked')), 'locked')
+        self.assertEqual(write_load.classify(OperationalError('deadlock detected')), 'deadlock')
+        self.assertEqual(write_load.classify(OperationalError('no such table: foo')), 'OperationalError')
+
+
+class AsyncViewTests(CustomerTestCase):
+    """The async dashboard and reports through the test client, and run_queries() itself."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.product = Product.objects.create(name='Widget', sku='W-1', stock_quantity=5, owner=cls.owner)
+        order = SalesOrder.objects.create(customer=cls.customer, owner=cls.owner)
+        # Sells the widget out
+        SalesOrderItem.objects.create(sales_order=order, product=cls.product, unit_price=Decimal('10.00'), quantity=5)
+        cls.clerk = User.objects.create_user('clerk', password='x')
+
+    def test_run_queries(self):
+        queries = {'customers': CustomerVendor.objects.count, 'skus': lambda: list(Product.objects.values_list('sku', flat=True))}
+        self.assertEqual(async_to_sync(run_queries)(**queries), {'customers': 1, 'skus': ['W-1']})
+
+        # Outside a transaction each callable runs on the pool, in the caller's context
+        def state():
+            return threading.current_thread().name, db_routing._reads.get().reporting
+
+        with mock.patch('uniworlderp.views.async_support._in_transaction', return_value=False), \
+                db_routing.reporting_reads():
+            (thread, reporting), = async_to_sync(run_queries)(state=state).values()
+        self.assertTrue(thread.startswith('erp-query'))
+        self.assertTrue(reporting)
+
+    def test_dashboard(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('permission:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('error', response.context)
+        self.assertEqual(
+            [response.context[name] for name in ('total_customers', 'total_products', 'out_of_stock_products', 'total_sales_orders')],
+            [1, 1, 1, 1],
+        )
+
+    def test_sales_report(self):
+        self.client.force_login(self.owner)
+        url = reverse('customer_vendor:sales_report')
+        response = self.client.get(url)
+        self.assertEqual((list(response.context['customers']), list(response.context['products'])), ([self.customer], [self.product]))
+
+        today = timezone.localdate().isoformat()
+        response = self.client.post(url, {'start_date': today, 'end_date': today})
+        self.assertEqual([row['sales_order__customer__name'] for row in response.context['customer_summary']], ['Customer'])
+        self.assertEqual([row['product__name'] for row in response.context['product_summary']], ['Widget'])
+
+    def test_sales_order_report(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('customer_vendor:sales_order_report'), {'customer': self.customer.pk})
+        self.assertEqual(response.context['customer_info'], self.customer)
+        self.assertEqual((response.context['total_orders'], response.context['total_gross_qty']), (1, 5))
+
+    def test_anonymous_and_unauthorized_users_are_rejected(self):
+        urls = [reverse('permission:dashboard'), reverse('customer_vendor:sales_report'),
+                reverse('customer_vendor:sales_order_report')]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 302, url)
+            self.assertIn(settings.LOGIN_URL, response.url)
+
+        # Signed in without view_salesorder
+        self.client.force_login(self.clerk)
+        self.assertEqual(self.client.get(reverse('customer_vendor:sales_order_report')).status_code, 403)
+
+
+@override_settings(DATABASE_ROUTERS=['uniworlderp.db_routing.ReportingRouter'])
+class ReportingRouterTests(TransactionTestCase):
+    """Reads of the report views go to a second SQLite database standing in for the replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added once the runner has checked the configured databases
+        replica = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        replica.close()
+        cls.addClassCleanup(os.remove, replica.name)
+        connections.settings[db_routing.REPORTING_DB_ALIAS] = {**connections['default'].settings_dict, 'NAME': replica.name}
+        cls.addClassCleanup(connections.settings.pop, db_routing.REPORTING_DB_ALIAS)
+        cls.addClassCleanup(connections.__delitem__, db_routing.REPORTING_DB_ALIAS)
+        cls.addClassCleanup(lambda: connections[db_routing.REPORTING_DB_ALIAS].close())
+        cls.databases = cls.databases | {db_routing.REPORTING_DB_ALIAS}
+
+    def setUp(self):
+        self.owner = User.objects.create_superuser('owner', password='x')
+        Product.objects.create(name='Copied Product', sku='C-1', owner=self.owner)
+        # The replica: a copy of the primary taken now, which then lags it
+        for alias in self.databases:
+            connections[alias].ensure_connection()
+        connections['default'].connection.backup(connections[db_routing.REPORTING_DB_ALIAS].connection)
+
+        Product.objects.create(name='Fresh Product', sku='F-1', owner=self.owner)
+        self.client.force_login(self.owner)
+
+    def test_report_reads_go_to_the_replica(self):
+        self.assertTrue(db_routing.replica_configured())
+        with db_routing.reporting_reads():
+            self.assertEqual(Product.objects.all().db, db_routing.REPORTING_DB_ALIAS)
+            self.assertEqual(User.objects.all().db, 'default')
+        self.assertEqual(Product.objects.all().db, 'default')
+
+        response = self.client.get(reverse('customer_vendor:stock_report'))
+        self.assertContains(response, 'Copied Product')
+        self.assertNotContains(response, 'Fresh Product')
+
+    def test_session_that_wrote_reads_the_primary(self):
+        def view(request):
+            Product.objects.create(name='Written', sku='W-1', owner=self.owner)
+            with db_routing.reporting_reads():
+                return HttpResponse(Product.objects.all().db)
+
+        request = RequestFactory().post('/')
+        request.session = {}
+        response = db_routing.PrimaryAfterWriteMiddleware(view)(request)
+        self.assertEqual(response.content.decode(), 'default')
+        self.assertGreater(request.session[db_routing.STICKY_SESSION_KEY], time_module.time())
+
+        session = self.client.session
+        session[db_routing.STICKY_SESSION_KEY] = time_module.time() + 60
+        session.save()
+        self.assertContains(self.client.get(reverse('customer_vendor:stock_report')), 'Fresh Product')
+
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        with db_routing.reporting_reads(), transaction.atomic():
+            self.assertEqual(Product.objects.all().db, 'default')
+            self.assertTrue(Product.objects.filter(sku='F-1').exists())
+
+    def test_writes_go_to_the_primary(self):
+        with db_routing.reporting_reads():
+            product = Product.objects.create(name='Written', sku='W-1', owner=self.owner)
+            self.assertEqual(product._state.db, 'default')
+            # Then the rest of the request reads its own write
+            self.assertEqual(Product.objects.all().db, 'default')
+        self.assertTrue(Product.objects.using('default').filter(sku='W-1').exists())
+        self.assertFalse(Product.objects.using(db_routing.REPORTING_DB_ALIAS).filter(sku='W-1').exists())
@@ -1,6 +1,6 @@
 from django.urls import path
 from uniworlderp.views import customer_views, sales_employee_views,product_views,sales_order_views,invoice_views,purchase_views,materials_purchase_views,report_views
-from uniworlderp.views import sales_order_report_views
+from uniworlderp.views import sales_order_report_views, print_views, change_feed_views, api_views, receivables_views, stock_take_views
 from . import views
 
 app_name = 'customer_vendor'
@@ -34,6 +34,12 @@ urlpatterns = [
     path('product-search/', product_views.product_search, name='product_search'),
     path('get-product-info/', product_views.get_product_info, name='get_product_info'),   
     path('add-stock/', product_views.AddStockView.as_view(), name='add_stock'),
+    path('products/import/', product_views.MasterDataImportView.as_view(), name='product_import'),
+    path('stock-takes/', stock_take_views.StockTakeListView.as_view(), name='stock_take_list'),
+    path('stock-takes/start/', stock_take_views.StockTakeStartView.as_view(), name='stock_take_start'),
+    path('stock-takes/<int:pk>/', stock_take_views.StockTakeDetailView.as_view(), name='stock_take_detail'),
+    path('stock-takes/<int:pk>/post/', stock_take_views.StockTakePostView.as_view(), name='stock_take_post'),
+    path('stock-takes/<int:pk>/export/', stock_take_views.StockTakeVarianceExportView.as_view(), name='stock_take_export'),
     
     # Sales Order URLs
     path('sales-orders/', sales_order_views.SalesOrderListView.as_view(), name='sales_order_list'),
@@ -43,6 +49,7 @@ urlpatterns = [
     path('sales-orders/delete/<int:pk>/', sales_order_views.SalesOrderDeleteView.as_view(), name='sales_order_delete'),    
     path('sales-orders/print/<int:pk>/', sales_order_views.SalesOrderPrintView.as_view(), name='sales_order_print'),     
     path('sales-orders/detailed/', sales_order_views.SalesOrderItemDetailedListView.as_view(), name='sales_order_detailed_list'),
+    path('sales-orders/import/', sales_order_views.SalesOrderBatchImportView.as_view(), name='sales_order_import'),
     
     #return
     path('sales-orders/return/<int:sales_order_id>/', sales_order_views.ReturnSalesCreateView.as_view(), name='sales_order_return'),
@@ -69,6 +76,7 @@ urlpatterns = [
     path('purchase-orders/<int:pk>/receive/', purchase_views.PurchaseOrderReceiveView.as_view(), name='purchase_order_receive'),
     path('purchase-orders/detailed-list/', purchase_views.PurchaseOrderItemDetailedListView.as_view(), name='purchase_order_detailed_list'),
     path('purchase-orders/<int:pk>/print/', purchase_views.PurchaseOrderPrintView.as_view(), name='purchase_order_print'),    
+    path('print/<str:kind>/', print_views.BatchPrintView.as_view(), name='batch_print'),
 
 
     # MaterialsPurchase URLs
@@ -113,4 +121,16 @@ urlpatterns = [
     path('reports/customer-wise/print/', report_views.CustomerWiseReportPrintView.as_view(), name='customer_wise_report_print'),
     path('reports/customer-wise/excel/', report_views.CustomerWiseReportExcelView.as_view(), name='customer_wise_report_excel'),
 
+    # Receivables aging and customer statements
+    path('reports/ar-aging/', receivables_views.ARAgingReportView.as_view(), name='ar_aging_report'),
+    path('reports/ar-aging/export/', receivables_views.ARAgingExportView.as_view(), name='ar_aging_export'),
+    path('reports/ar-aging/<uuid:customer_id>/', receivables_views.CustomerStatementView.as_view(), name='customer_statement'),
+
+    # Change feed for downstream sync
+    path('changes/', change_feed_views.ChangeFeedView.as_view(), name='change_feed'),
+
+    # Read API for integrations
+    path('api/', api_views.ReadApiIndexView.as_view(), name='read_api'),
+    path('api/<slug:resource>/', api_views.ReadApiView.as_view(), name='read_api_endpoint'),
+
 ]
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.gzip import gzip_page
+from .common_imports import *
+from uniworlderp import read_api
+
+
+@method_decorator(gzip_page, name='dispatch')
+class ReadApiIndexView(LoginRequiredMixin, View):
+    """GET the read API endpoints the user may read, with their fields and filters."""
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            endpoint.name: {
+                'url': reverse('customer_vendor:read_api_endpoint', args=[endpoint.name]),
+                'fields': list(endpoint.fields) + list(endpoint.nested),
+                'default_fields': list(endpoint.default_fields),
+                'filters': list(endpoint.filters),
+            }
+            for endpoint in read_api.ENDPOINTS.values()
+            if request.user.has_perm(endpoint.permission)
+        })
+
+
+@method_decorator(gzip_page, name='dispatch')
+class ReadApiView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    GET one page of an endpoint (see uniworlderp/read_api.py):
+    ``?fields=id,sku,stock_quantity&limit=1000&cursor=<next>&updated_since=2025-01-01``.
+    Returns ``{"results": [...], "next": <cursor or null>}``, streamed; call
+    again with ``cursor=next`` until it is null. Send the ``ETag`` back as
+    ``If-None-Match`` to get 304 while nothing changed.
+    """
+    raise_exception = True
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.endpoint = read_api.ENDPOINTS.get(kwargs.get('resource'))
+        if self.endpoint is None:
+            raise Http404('Unknown endpoint')
+
+    def get_permission_required(self):
+        return [self.endpoint.permission]
+
+    def get(self, request, *args, **kwargs):
+        endpoint = self.endpoint
+        try:
+            limit = int(request.GET.get('limit', settings.READ_API_PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
+        if not 1 <= limit <= settings.READ_API_MAX_PAGE_SIZE:
+            return JsonResponse({'error': f'limit must be 1 to {settings.READ_API_MAX_PAGE_SIZE}'}, status=400)
+        try:
+            names, nested_names = endpoint.select(request.GET.get('fields'))
+            cursor = request.GET.get('cursor')
+            after = read_api.decode_cursor(endpoint, cursor) if cursor else None
+            rows = read_api.queryset(endpoint, request.GET)
+        except read_api.BadRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        data_version, changed_at = read_api.version(endpoint)
+        etag = read_api.etag(endpoint, request.GET, data_version)
+        last_modified = int(changed_at.timestamp()) if changed_at else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = StreamingHttpResponse(
+                read_api.stream(endpoint, rows, names, nested_names, limit, after),
+                content_type='application/json',
+            )
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,105 @@
+"""
+Helpers for the async views (dashboard, sales report, sales order report).
+
+Django's async ORM methods (``acount()``, ``aaggregate()`` ...) all run on
+the single thread that serves sync code, so awaiting several of them at once
+still runs the queries one after another. ``run_queries`` runs independent,
+read-only queries on a small thread pool instead: every pool thread has its
+own database connection, so the queries overlap and the view waits about as
+long as its slowest query. The pool size (``ASYNC_QUERY_CONCURRENCY``)
+bounds both the concurrent queries and the extra connections a process
+opens; set ``DB_CONN_MAX_AGE`` so those connections are reused.
+
+The views stay servable by gunicorn (WSGI), where Django runs each async view
+in an event loop of its own, and by an ASGI server (``myproject.asgi``).
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import AccessMixin, PermissionRequiredMixin
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.shortcuts import render
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_QUERY_CONCURRENCY, thread_name_prefix='erp-query',
+            )
+        return _executor
+
+
+def _run(query):
+    # The connection lifecycle of a request: drop connections that are broken
+    # or older than CONN_MAX_AGE before and after using them
+    close_old_connections()
+    try:
+        return query()
+    finally:
+        close_old_connections()
+
+
+def _in_transaction():
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+async def run_queries(**queries):
+    """
+    Run every zero-argument callable of ``queries`` (returning a list, a
+    count, an aggregate ...) and return ``{name: result}``.
+
+    The callables must be independent and read-only: each may run on its own
+    connection. Inside a transaction (a test case, ``ATOMIC_REQUESTS``) they
+    run one after another on the caller's connection so they see its rows.
+    """
+    if settings.ASYNC_QUERY_CONCURRENCY <= 1 or await sync_to_async(_in_transaction)():
+        return await sync_to_async(lambda: {name: query() for name, query in queries.items()})()
+
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    names = list(queries)
+    # Each query runs in a copy of the caller's context, so it is routed like
+    # the view's own reads (uniworlderp.db_routing)
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, contextvars.copy_context().run, _run, queries[name]) for name in names
+    ))
+    return dict(zip(names, results))
+
+
+async def arender(request, template_name, context):
+    """``render()`` off the event loop: templates and context processors may query the database."""
+    return await sync_to_async(render)(request, template_name, context)
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    """``LoginRequiredMixin`` for class-based views whose handlers are coroutines."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Load the user without blocking the loop; sync code that reads
+        # request.user later (templates, context processors) reuses it
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncPermissionRequiredMixin(PermissionRequiredMixin):
+    """``PermissionRequiredMixin`` for class-based views whose handlers are coroutines."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not await sync_to_async(request.user.has_perms)(self.get_permission_required()):
+            return self.handle_no_permission()
+        # Skip PermissionRequiredMixin.dispatch, whose check is synchronous
+        return await super(PermissionRequiredMixin, self).dispatch(request, *args, **kwargs)
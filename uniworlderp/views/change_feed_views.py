@@ -0,0 +1,37 @@
+from django.http import JsonResponse
+from .common_imports import *
+from uniworlderp import change_log
+
+
+class ChangeFeedView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    GET the changes after a sequence number, for downstream sync:
+    ``?since=<seq>&limit=500&models=product,salesorder``. Returns
+    ``{"changes": [...], "next": <seq>, "has_more": bool}``; call again with
+    ``since=next`` until ``has_more`` is false (see uniworlderp/change_log.py).
+    """
+    permission_required = 'uniworlderp.view_changelog'
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.GET.get('since', 0))
+            limit = int(request.GET.get('limit', change_log.DEFAULT_LIMIT))
+        except ValueError:
+            return JsonResponse({'error': 'since and limit must be integers'}, status=400)
+        if since < 0:
+            return JsonResponse({'error': 'since must not be negative'}, status=400)
+
+        models = [name for name in request.GET.get('models', '').split(',') if name]
+        unknown = [name for name in models if name not in change_log.MODELS_BY_NAME]
+        if unknown:
+            return JsonResponse({
+                'error': f'Unknown models: {", ".join(unknown)}',
+                'models': sorted(change_log.MODELS_BY_NAME),
+            }, status=400)
+
+        try:
+            feed = change_log.changes_since(since, limit, models)
+        except change_log.FeedExpired as e:
+            return JsonResponse({'error': str(e), 'oldest': e.oldest, 'newest': e.newest}, status=410)
+        return JsonResponse(feed)
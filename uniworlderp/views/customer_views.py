@@ -3,13 +3,14 @@
 
 
 from .common_imports import *
+from uniworlderp import printing
 
 from django.db.models import Sum, F, Value, DecimalField
 
 from company.models import Company
 from django.db.models.functions import Coalesce
 
-from uniworlderp.models import CustomerVendor, SalesOrder, ARInvoice,PurchaseOrder
+from uniworlderp.models import ABC_CLASS_CHOICES, CustomerVendor, SalesOrder, ARInvoice,PurchaseOrder
 from uniworlderp.forms import CustomerVendorForm
 class CustomerVendorListView(ListView):
     model = CustomerVendor
@@ -40,6 +41,14 @@ class CustomerVendorListView(ListView):
         if business_type:
             queryset = queryset.filter(business_type=business_type)
 
+        # ABC class of the nightly classification (uniworlderp/abc_analysis.py)
+        sales_class = self.request.GET.get('abc', '')
+        if sales_class:
+            queryset = queryset.filter(classification__sales_class=sales_class)
+        if self.request.GET.get('sort') == 'abc':
+            queryset = queryset.order_by('classification__sales_class', '-classification__net_sales', 'name')
+        queryset = queryset.select_related('classification')
+
         # Annotate with total sales and total invoices
         queryset = queryset.annotate(
             total_sales=Coalesce(Sum('sales_orders__total_amount', output_field=DecimalField(max_digits=10, decimal_places=2)), Value(0, output_field=DecimalField(max_digits=10, decimal_places=2))),
@@ -54,6 +63,7 @@ class CustomerVendorListView(ListView):
         context['entity_type'] = self.request.GET.get('entity_type', '')
         context['business_type'] = self.request.GET.get('business_type', '')
         context['business_type_choices'] = CustomerVendor.BUSINESS_TYPE_CHOICES
+        context['abc_choices'] = ABC_CLASS_CHOICES
         return context
 class CustomerVendorCreateView(PermissionRequiredMixin, SuccessMessageMixin, CreateView):
     model = CustomerVendor
@@ -208,7 +218,7 @@ class CustomerVendorPrintView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        company = Company.objects.first()  # Assuming you have only one company
+        company = printing.get_company()
         context.update({
             'company': company,
         })
@@ -0,0 +1,27 @@
+"""
+Helpers for the CSV exports of the report views (receivables aging,
+stock-take variances).
+
+``csv_response`` streams the rows as they are produced instead of building
+the whole file in memory first: ``csv.writer`` writes each line to ``Echo``,
+which hands it straight back to ``StreamingHttpResponse``.
+"""
+
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+class Echo:
+    """File-like object handing each CSV line written to it back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(rows, filename):
+    """A response streaming ``rows`` (lists of cells) as the CSV attachment ``filename``."""
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
@@ -1,4 +1,6 @@
 from .common_imports import *
+from uniworlderp import printing
+from uniworlderp.conditional_get import DocumentConditionalGetMixin
 from uniworlderp.models import ARInvoice, ARInvoiceItem, Product, StockTransaction, SalesEmployee, SalesOrder
 from uniworlderp.forms import ARInvoiceForm, ARInvoiceItemFormSet,ARInvoiceItemForm,get_ar_invoice_item_formset
 from company.models import Company, Branch, ContactPerson
@@ -11,7 +13,7 @@ class ARInvoiceListView(ListView):
 
     def get_queryset(self):
         search_query = self.request.GET.get('search', '')
-        queryset = ARInvoice.objects.all().order_by('-invoice_date')
+        queryset = ARInvoice.objects.select_related('sales_order').order_by('-invoice_date')
 
         if search_query:
             queryset = queryset.filter(
@@ -257,10 +259,12 @@ class ARInvoiceUpdateView(PermissionRequiredMixin, SuccessMessageMixin, UpdateVi
             'current_id': None,
         }
 
-class ARInvoiceDetailView(PermissionRequiredMixin, DetailView):
+class ARInvoiceDetailView(PermissionRequiredMixin, DocumentConditionalGetMixin, DetailView):
     model = ARInvoice
     template_name = 'invoice/form.html'
     permission_required = 'uniworlderp.view_arinvoice'
+    document_type = 'invoice'
+    navigation = True
 
     def handle_no_permission(self):
         messages.error(self.request, "You do not have permission to view this invoice.")
@@ -320,26 +324,18 @@ class ARInvoiceDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteVie
         context['cancel_url'] = reverse_lazy('customer_vendor:invoice_list')
         return context
 
-class ARInvoicePrintView(LoginRequiredMixin, DetailView):
+class ARInvoicePrintView(LoginRequiredMixin, DocumentConditionalGetMixin, DetailView):
     model = ARInvoice
     template_name = 'invoice/print.html'
     context_object_name = 'invoice'
+    document_type = 'invoice'
+
+    def get_queryset(self):
+        return printing.DOCUMENT_TYPES['invoice'].queryset()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        company = Company.objects.first()  # Assuming you have only one company
-        items = self.object.invoice_items.all()
-        subtotal = sum(item.total_amount for item in items)
-        tax = subtotal * Decimal('0.0')  # 12% tax
-        total = subtotal + tax
-
-        context.update({
-            'company': company,
-            'items': items,
-            'subtotal': subtotal,
-            'tax': tax,
-            'total': total,
-        })
+        context.update(printing.print_context(printing.DOCUMENT_TYPES['invoice'], [self.object]))
         return context
 
 class ARInvoiceSearchView(ListView):
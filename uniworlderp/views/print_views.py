@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponseBadRequest
+from django.utils.dateparse import parse_date
+
+from .common_imports import *
+from uniworlderp import printing
+
+
+class BatchPrintView(LoginRequiredMixin, View):
+    """
+    Print many documents of one kind in a single page, one A4 sheet each.
+
+    ``/print/invoice/?ids=12,13,14`` or
+    ``/print/invoice/?date_from=2025-07-01&date_to=2025-07-01`` (the kind is
+    ``invoice``, ``sales_order`` or ``purchase_order``).
+    """
+
+    def get(self, request, kind):
+        doc_type = printing.DOCUMENT_TYPES.get(kind)
+        if doc_type is None:
+            raise Http404(f'Unknown document type "{kind}"')
+        if not request.user.has_perm(doc_type.permission):
+            raise PermissionDenied
+
+        queryset = doc_type.queryset()
+        ids = [pk for value in request.GET.getlist('ids') for pk in value.split(',') if pk.strip()]
+        date_from = parse_date(request.GET.get('date_from', '') or '')
+        date_to = parse_date(request.GET.get('date_to', '') or '')
+
+        if ids:
+            if not all(pk.strip().isdigit() for pk in ids):
+                return HttpResponseBadRequest('ids must be a comma separated list of numbers')
+            queryset = queryset.filter(pk__in=[int(pk) for pk in ids])
+        elif date_from or date_to:
+            if date_from:
+                queryset = queryset.filter(**{f'{doc_type.date_field}__gte': date_from})
+            if date_to:
+                queryset = queryset.filter(**{f'{doc_type.date_field}__lte': date_to})
+        else:
+            return HttpResponseBadRequest('Pass ids=1,2,3 or date_from/date_to (YYYY-MM-DD)')
+
+        limit = settings.PRINT_BATCH_MAX_DOCUMENTS
+        documents = list(queryset.order_by(doc_type.date_field, 'pk')[:limit + 1])
+        if len(documents) > limit:
+            return HttpResponseBadRequest(f'More than {limit} documents match, narrow the selection')
+        if not documents:
+            raise Http404('No documents match the selection')
+
+        return render(request, doc_type.page_template, printing.print_context(doc_type, documents))
@@ -1,7 +1,8 @@
 from .common_imports import *
+from uniworlderp import importers, printing, stock_counters
 from company.models import Company
-from uniworlderp.models import StockTransaction, Product, SalesOrder, CustomerVendor, SalesEmployee
-from uniworlderp.forms import ProductForm
+from uniworlderp.models import ABC_CLASS_CHOICES, StockTransaction, Product, SalesOrder, CustomerVendor, SalesEmployee
+from uniworlderp.forms import MasterDataImportForm, ProductForm
 from uuid import UUID
 
 class ProductListView(ListView):
@@ -20,10 +21,24 @@ class ProductListView(ListView):
                 Q(description__istartswith=search_query)
             ).order_by('name')  # Maintain alphabetical ordering after search
 
-        # Annotate stock status
-        queryset = queryset.annotate(
+        # ABC classes of the nightly classification (uniworlderp/abc_analysis.py)
+        revenue_class = self.request.GET.get('abc', '')
+        if revenue_class:
+            queryset = queryset.filter(classification__revenue_class=revenue_class)
+        movement_class = self.request.GET.get('movement', '')
+        if movement_class:
+            queryset = queryset.filter(classification__movement_class=movement_class)
+        if self.request.GET.get('sort') == 'abc':
+            queryset = queryset.order_by('classification__revenue_class', '-classification__revenue', 'name')
+
+        # Annotate stock status: the nightly suggestion (uniworlderp/reorder.py)
+        # once the product has demand, else the static reorder level; on_hand
+        # sums the shards of sharded products in the same query
+        queryset = queryset.select_related('reorder_suggestion', 'classification').annotate(
+            on_hand=stock_counters.on_hand(),
             need_reorder=Case(
-                When(stock_quantity__lt=F('reorder_level'), then=Value(True)),
+                When(reorder_suggestion__daily_demand__gt=0, then=Q(reorder_suggestion__order_quantity__gt=0)),
+                When(on_hand__lt=F('reorder_level'), then=Value(True)),
                 default=Value(False)
             ),
         )
@@ -34,6 +49,7 @@ class ProductListView(ListView):
         context['search_query'] = self.request.GET.get('search', '')
         context['entity_type'] = self.request.GET.get('entity_type', '')
         context['verbose_name'] = self.model._meta.verbose_name_plural
+        context['abc_choices'] = ABC_CLASS_CHOICES
         context['urls'] = {
             'add': 'customer_vendor:product_create',
             'add_stock': 'customer_vendor:add_stock',
@@ -193,7 +209,7 @@ class ProductPrintView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        company = Company.objects.first()  # Assuming you have only one company
+        company = printing.get_company()
         context.update({
             'company': company,
             'model_name': self.model._meta.verbose_name.title(),
@@ -230,9 +246,10 @@ def product_search(request):
             product_id = uuid.UUID(query)
             # If it's a UUID, fetch the specific product
             product = Product.objects.filter(id=product_id).values(
-                'id', 'name', 'description', 'price', 'stock_quantity', 'reorder_level', 'discount_amount'
+                'id', 'name', 'description', 'price', 'stock_quantity', 'reorder_level', 'discount_amount', 'sharded_stock'
             ).first()
             if product:
+                stock_counters.with_available_stock([product])
                 # Minimal fix: handle None discount_amount
                 if product['discount_amount'] is None:
                     product['discount_amount'] = 0.0
@@ -242,10 +259,10 @@ def product_search(request):
             products = Product.objects.filter(
                 Q(name__istartswith=query) | Q(sku__istartswith=query)
             ).values(
-                'id', 'name', 'description', 'price', 'stock_quantity', 'reorder_level', 'discount_amount'
+                'id', 'name', 'description', 'price', 'stock_quantity', 'reorder_level', 'discount_amount', 'sharded_stock'
             )[:10]  # Limit to 10 results for performance
             # Minimal fix: handle None discount_amount in list
-            products_list = list(products)
+            products_list = stock_counters.with_available_stock(list(products))
             for product in products_list:
                 if product['discount_amount'] is None:
                     product['discount_amount'] = 0.0
@@ -275,7 +292,7 @@ def get_product_info(request):
             'name': product.name,
             'description': product.description,
             'price': float(product.price),
-            'stock_quantity': product.stock_quantity,
+            'stock_quantity': product.available_stock,
             'reorder_level': product.reorder_level,
             'discount_amount': float(product.discount_amount) if product.discount_amount is not None else 0.0,
 
@@ -340,4 +357,57 @@ class AddStockView(PermissionRequiredMixin, SuccessMessageMixin,FormView):
                 for field, errors in form.errors.items():
                     for error in errors:
                         messages.error(self.request, f"{field}: {error}")
-        return super().form_invalid(formset)    
\ No newline at end of file
+        return super().form_invalid(formset)    
+
+class MasterDataImportView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+    """Bulk upload of products (with opening stock) or customers from CSV/XLSX."""
+    template_name = 'product/import.html'
+    form_class = MasterDataImportForm
+    permission_required = 'uniworlderp.add_product'
+
+    def handle_no_permission(self):
+        messages.error(self.request, "You do not have permission to import products.")
+        return redirect('customer_vendor:product_list')
+
+    def form_valid(self, form):
+        kind = form.cleaned_data['kind']
+        if kind == 'customers' and not self.request.user.has_perm('uniworlderp.add_customervendor'):
+            messages.error(self.request, "You do not have permission to import customers.")
+            return self.form_invalid(form)
+
+        upload = form.cleaned_data['file']
+        dry_run = form.cleaned_data['dry_run']
+        try:
+            rows = importers.iter_rows(upload, upload.name)
+            if kind == 'products':
+                result = importers.import_products(
+                    rows, self.request.user,
+                    post_opening_stock=form.cleaned_data['post_opening_stock'],
+                    dry_run=dry_run,
+                )
+            else:
+                result = importers.import_customers(rows, self.request.user, dry_run=dry_run)
+        except ValidationError as e:
+            messages.error(self.request, "; ".join(e.messages))
+            return self.form_invalid(form)
+        except (ValueError, KeyError) as e:
+            # An undecodable or malformed file; database errors propagate
+            messages.error(self.request, f"Could not read the file: {str(e)}")
+            return self.form_invalid(form)
+
+        summary = (
+            f"{result.rows} row(s) read: {result.created} created, {result.updated} updated, "
+            f"{result.stock_posted} opening stock movement(s), {len(result.errors)} rejected."
+        )
+        if dry_run:
+            summary = f"Validation only, nothing was saved. {summary}"
+        if result.errors:
+            messages.warning(self.request, summary)
+        else:
+            messages.success(self.request, summary)
+
+        return self.render_to_response(self.get_context_data(
+            form=form,
+            result=result,
+            import_errors=result.errors[:500],
+        ))
@@ -1,5 +1,8 @@
 from django.urls import reverse
 from .common_imports import *
+from uniworlderp import printing
+from uniworlderp.conditional_get import DocumentConditionalGetMixin
+from uniworlderp.db_routing import ReportingReadsMixin
 from uniworlderp.models import PurchaseOrder, PurchaseOrderItem, Product, StockTransaction
 from uniworlderp.forms import PurchaseOrderForm, PurchaseOrderItemFormSet
 from company.models import Company, Branch, ContactPerson
@@ -28,7 +31,7 @@ class PurchaseOrderListView(ListView):
         context['search_query'] = self.request.GET.get('search', '')
         return context
 
-class PurchaseOrderItemDetailedListView(ListView):
+class PurchaseOrderItemDetailedListView(ReportingReadsMixin, ListView):
     model = PurchaseOrderItem
     template_name = 'purchase_order/detailed_list.html'
     context_object_name = 'order_items'
@@ -201,10 +204,12 @@ class PurchaseOrderUpdateView(PermissionRequiredMixin, SuccessMessageMixin, Upda
             'next_id': purchase_orders.filter(id__gt=current_order.id).first().id if purchase_orders.filter(id__gt=current_order.id).exists() else None,
             'current_id': current_order.id,
         }
-class PurchaseOrderDetailView(PermissionRequiredMixin, DetailView):
+class PurchaseOrderDetailView(PermissionRequiredMixin, DocumentConditionalGetMixin, DetailView):
     model = PurchaseOrder
     template_name = 'purchase_order/form.html'
     permission_required = 'uniworlderp.view_purchaseorder'
+    document_type = 'purchase_order'
+    navigation = True
 
     def handle_no_permission(self):
         messages.error(self.request, "You do not have permission to view this purchase order.")
@@ -276,26 +281,18 @@ class PurchaseOrderDeleteView(LoginRequiredMixin, PermissionRequiredMixin, Delet
         context['cancel_url'] = reverse_lazy('customer_vendor:purchase_order_list')
         return context
 
-class PurchaseOrderPrintView(LoginRequiredMixin, DetailView):
+class PurchaseOrderPrintView(LoginRequiredMixin, DocumentConditionalGetMixin, DetailView):
     model = PurchaseOrder
     template_name = 'purchase_order/print.html'
     context_object_name = 'purchase_order'
+    document_type = 'purchase_order'
+
+    def get_queryset(self):
+        return printing.DOCUMENT_TYPES['purchase_order'].queryset()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        company = Company.objects.first()  # Assuming you have only one company
-        items = self.object.order_items.all()
-        subtotal = sum(item.total for item in items)
-        tax = subtotal * Decimal('0.0')  # 0% tax
-        total = subtotal + tax
-
-        context.update({
-            'company': company,
-            'items': items,
-            'subtotal': subtotal,
-            'tax': tax,
-            'total': total,
-        })
+        context.update(printing.print_context(printing.DOCUMENT_TYPES['purchase_order'], [self.object]))
         return context
 
 class PurchaseOrderReceiveView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
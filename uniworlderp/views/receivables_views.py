@@ -0,0 +1,53 @@
+from django.utils import timezone
+from .common_imports import *
+from .exports import csv_response
+from uniworlderp import printing, receivables
+from uniworlderp.db_routing import ReportingReadsMixin
+from uniworlderp.models import CustomerVendor
+
+
+def bucket_amounts(row):
+    return [row[key] for key, _, _, _ in receivables.BUCKETS]
+
+
+class ARAgingReportView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Receivables aging of the pending invoices, per customer (see uniworlderp/receivables.py)."""
+    template_name = 'reports/ar_aging_report.html'
+    permission_required = 'uniworlderp.view_arinvoice'
+
+    def get(self, request, *args, **kwargs):
+        report = receivables.aging()
+        return render(request, self.template_name, {
+            'report': report,
+            'rows': [(row, bucket_amounts(row)) for row in report['rows']],
+            'total_amounts': bucket_amounts(report['totals']),
+            'buckets': receivables.BUCKETS,
+            'report_generated_at_formatted': timezone.localtime().strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+
+class ARAgingExportView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
+    """The aging report as CSV, streamed row by row."""
+    permission_required = 'uniworlderp.view_arinvoice'
+
+    def get(self, request, *args, **kwargs):
+        report = receivables.aging()
+        return csv_response(receivables.csv_rows(report), f'ar_aging_{report["as_of"].isoformat()}.csv')
+
+
+class CustomerStatementView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Statement of a customer: its aging and its open invoices."""
+    template_name = 'reports/customer_statement.html'
+    permission_required = 'uniworlderp.view_arinvoice'
+
+    def get(self, request, customer_id, *args, **kwargs):
+        customer = get_object_or_404(CustomerVendor, pk=customer_id)
+        statement = receivables.statement(customer.pk)
+        return render(request, self.template_name, {
+            'customer': customer,
+            'statement': statement,
+            'amounts': bucket_amounts(statement['row']) if statement['row'] else [],
+            'buckets': receivables.BUCKETS,
+            'company': printing.get_company(),
+            'report_generated_at_formatted': timezone.localtime().strftime('%Y-%m-%d %H:%M:%S'),
+        })
@@ -7,27 +7,49 @@ from django.db.models.functions import Coalesce
 from datetime import datetime, timedelta, time
 from django.utils import timezone
 from django.utils.dateparse import parse_date
-import pytz
 from uniworlderp.forms import StockReportForm
 from django.db import transaction
 from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
 import io
 from decimal import Decimal
 
+from uniworlderp import sales_returns
+from uniworlderp.conditional_get import (
+    SALES_REPORT_SOURCES, STOCK_REPORT_SOURCES, PastReportConditionalGetMixin,
+)
+from uniworlderp.db_routing import ReportingReadsMixin
+from uniworlderp.views.async_support import AsyncLoginRequiredMixin, arender, run_queries
+
 
 # Minimum allowed date for any stock report queries
 MIN_STOCK_DATE = timezone.make_aware(datetime(2025, 7, 27))
 
-class ReportView(LoginRequiredMixin, View):
+
+def dhaka_timezone():
+    # pytz (like openpyxl in the Excel exports) is imported on first use, not
+    # when the URLconf loads this module in every worker
+    import pytz
+    return pytz.timezone('Asia/Dhaka')
+
+class ReportView(ReportingReadsMixin, AsyncLoginRequiredMixin, View):
+    """
+    Sales report. Async: the filter lists, the sales items and the return
+    aggregates are independent queries and run concurrently (see
+    ``async_support.run_queries``).
+    """
     template_name = 'reports/report.html'
 
-    def get(self, request):
+    def filter_choices(self):
+        """Queries for the customer / product / employee filter dropdowns."""
+        return {
+            'customers': lambda: list(CustomerVendor.objects.filter(entity_type='customer').order_by('name')),
+            'products': lambda: list(Product.objects.all().order_by('name')),
+            'sales_employees': lambda: list(SalesEmployee.objects.all().order_by('full_name')),
+        }
+
+    async def get(self, request):
         # Fetch data for filters
-        customers = CustomerVendor.objects.filter(entity_type='customer').order_by('name')
-        products = Product.objects.all().order_by('name')
-        sales_employees = SalesEmployee.objects.all().order_by('full_name')
+        choices = await run_queries(**self.filter_choices())
 
         # Initialize empty summaries for tabs
         customer_summary = []
@@ -36,17 +58,15 @@ class ReportView(LoginRequiredMixin, View):
         date_summary = []
 
         # Render the template with context
-        return render(request, self.template_name, {
-            'customers': customers,
-            'products': products,
-            'sales_employees': sales_employees,
+        return await arender(request, self.template_name, {
+            **choices,
             'customer_summary': customer_summary,
             'product_summary': product_summary,
             'sales_employee_summary': sales_employee_summary,
             'date_summary': date_summary,
         })
 
-    def post(self, request):
+    async def post(self, request):
         # Handle form submission and filter data
         customer_id = request.POST.get('customer')
         product_id = request.POST.get('product')
@@ -68,10 +88,8 @@ class ReportView(LoginRequiredMixin, View):
                 
                 if end_date_obj < start_date_obj:
                     error_message = "End date must be after start date."
-                    return render(request, self.template_name, {
-                        'customers': CustomerVendor.objects.filter(entity_type='customer').order_by('name'),
-                        'products': Product.objects.all().order_by('name'),
-                        'sales_employees': SalesEmployee.objects.all().order_by('full_name'),
+                    return await arender(request, self.template_name, {
+                        **await run_queries(**self.filter_choices()),
                         'customer_summary': [],
                         'product_summary': [],
                         'sales_employee_summary': [],
@@ -80,10 +98,8 @@ class ReportView(LoginRequiredMixin, View):
                     })
             except (ValueError, TypeError):
                 error_message = "Invalid date format."
-                return render(request, self.template_name, {
-                    'customers': CustomerVendor.objects.filter(entity_type='customer').order_by('name'),
-                    'products': Product.objects.all().order_by('name'),
-                    'sales_employees': SalesEmployee.objects.all().order_by('full_name'),
+                return await arender(request, self.template_name, {
+                    **await run_queries(**self.filter_choices()),
                     'customer_summary': [],
                     'product_summary': [],
                     'sales_employee_summary': [],
@@ -138,26 +154,24 @@ class ReportView(LoginRequiredMixin, View):
                 return_sales__return_date__range=[start_date, end_date]
             )
         
-        # Group returns by sales_order_item_id
-        returns_by_item = returns_qs.values('sales_order_item_id').annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
+        # Items, returns grouped by sales_order_item_id, return totals and the
+        # filter lists do not depend on each other: fetch them concurrently
+        window_end = end_date if start_date and end_date else None
+        results = await run_queries(
+            items=lambda: list(items),
+            returns_by_item=lambda: sales_returns.returns_by_line(returns_qs, window_end),
+            returns_aggregated=lambda: returns_qs.aggregate(
+                total_returned_qty=Sum('quantity'),
+                total_returned_amount=Sum('total')
+            ),
+            **self.filter_choices(),
         )
         
-        # Build dictionary for quick lookup
-        returns_dict = {
-            r['sales_order_item_id']: {
-                'qty': r['returned_qty'] or 0,
-                'amount': r['returned_amount'] or 0
-            }
-            for r in returns_by_item
-        }
-        
         # Attach return data and calculate net values for each item
         items_with_data = []
-        for item in items:
+        for item in results['items']:
             # Attach return data for this specific item
-            returns = returns_dict.get(item.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.line_returned(item, results['returns_by_item'])
             item.returned_qty = returns['qty']
             item.returned_amount = returns['amount']
             
@@ -171,11 +185,8 @@ class ReportView(LoginRequiredMixin, View):
             
             items_with_data.append(item)
         
-        # Aggregate total returned quantity and amount using Sum()
-        returns_aggregated = returns_qs.aggregate(
-            total_returned_qty=Sum('quantity'),
-            total_returned_amount=Sum('total')
-        )
+        # Total returned quantity and amount
+        returns_aggregated = results['returns_aggregated']
         
         # Handle None values from aggregate (default to 0)
         returned_qty = returns_aggregated['total_returned_qty'] or 0
@@ -303,11 +314,11 @@ class ReportView(LoginRequiredMixin, View):
         ]
 
         # Render the template with filtered item-level data and summaries
-        return render(request, self.template_name, {
+        return await arender(request, self.template_name, {
             'report_items': items_with_data,
-            'customers': CustomerVendor.objects.filter(entity_type='customer').order_by('name'),
-            'products': Product.objects.all().order_by('name'),
-            'sales_employees': SalesEmployee.objects.all().order_by('full_name'),
+            'customers': results['customers'],
+            'products': results['products'],
+            'sales_employees': results['sales_employees'],
             'customer_summary': customer_summary,
             'product_summary': product_summary,
             'sales_employee_summary': sales_employee_summary,
@@ -392,7 +403,7 @@ class ReportView(LoginRequiredMixin, View):
         }
 
 
-class StockReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class StockReportView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
     """View for generating and displaying stock reports."""
     template_name = 'reports/stock_report.html'
     permission_required = 'uniworlderp.view_product'
@@ -465,7 +476,7 @@ class StockReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         end_date = form.cleaned_data.get('end_date')
 
         now = timezone.now()
-        bdt = pytz.timezone('Asia/Dhaka')
+        bdt = dhaka_timezone()
         now_bdt = now.astimezone(bdt)
         
         # --- Date Handling ---
@@ -485,12 +496,16 @@ class StockReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             else:
                 report_date_display = f"{start_date.strftime('%d/%m/%Y')} to {end_date.strftime('%d/%m/%Y')}"
 
-        products = Product.objects.filter(is_active=True)
+        products = Product.objects.filter(is_active=True).select_related('reorder_suggestion')
         if product_id:
             products = products.filter(pk=product_id.pk)
+        abc_class = form.cleaned_data.get('abc_class')
+        if abc_class:
+            products = products.filter(classification__revenue_class=abc_class)
 
         report_results = []
-        with transaction.atomic():
+        # One snapshot of the database the report reads (the replica when routed)
+        with transaction.atomic(using=products.db):
             for i, product in enumerate(products, 1):
                 # --- Stock Calculation Logic ---
                 
@@ -508,13 +523,18 @@ class StockReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 
                 # 2. Determine Closing Stock
                 # Start with the product's current stock as the most reliable value
-                closing_stock = product.stock_quantity or 0
+                closing_stock = product.available_stock or 0
 
                 # 3. Determine Opening Stock
                 # Opening Stock = Closing Stock - Received Qty + Issued Qty
                 opening_stock = closing_stock - received_qty + issued_qty
 
-                remarks = "Order Required" if closing_stock <= product.reorder_level else ""
+                # The nightly suggestion (uniworlderp/reorder.py) once the product has demand
+                suggestion = getattr(product, 'reorder_suggestion', None)
+                if suggestion is not None and suggestion.daily_demand > 0:
+                    remarks = f"Order {suggestion.order_quantity}" if suggestion.order_quantity else ""
+                else:
+                    remarks = "Order Required" if closing_stock <= product.reorder_level else ""
 
                 report_results.append({
                     'sl': i,
@@ -542,9 +562,11 @@ class StockReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         return report_results, context
 
 
-class SingleProductReportPrintView(LoginRequiredMixin, View):
+class SingleProductReportPrintView(ReportingReadsMixin, LoginRequiredMixin, PastReportConditionalGetMixin, View):
     """View for printing single product transaction reports."""
     template_name = 'reports/single_product_transaction_report.html'
+    report_sources = STOCK_REPORT_SOURCES
+    report_requires_start = True
 
     def get(self, request, *args, **kwargs):
         product_id = request.GET.get('product_id')
@@ -589,9 +611,11 @@ class SingleProductReportPrintView(LoginRequiredMixin, View):
             return render(request, self.template_name, {'error': 'Product not found or inactive.'})
 
 
-class SingleProductStockReportPrintView(LoginRequiredMixin, View):
+class SingleProductStockReportPrintView(ReportingReadsMixin, LoginRequiredMixin, PastReportConditionalGetMixin, View):
     """View for printing single product stock reports with proper format."""
     template_name = 'reports/single_product_stock_report_print.html'
+    report_sources = STOCK_REPORT_SOURCES
+    report_requires_start = True
 
     def get(self, request, *args, **kwargs):
         product_id = request.GET.get('product_id')
@@ -613,7 +637,7 @@ class SingleProductStockReportPrintView(LoginRequiredMixin, View):
             
             # Format dates for display
             now = timezone.now()
-            bdt = pytz.timezone('Asia/Dhaka')
+            bdt = dhaka_timezone()
             now_bdt = now.astimezone(bdt)
             
             if start_date and end_date:
@@ -646,7 +670,7 @@ class SingleProductStockReportPrintView(LoginRequiredMixin, View):
             return render(request, self.template_name, {'error': 'Product not found or inactive.'})
 
 
-class StockReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class StockReportPrintView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
     """View for printing stock reports."""
     template_name = 'reports/stock_report_print.html'
     permission_required = 'uniworlderp.view_product'
@@ -661,7 +685,7 @@ class StockReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, View):
         return render(request, 'reports/stock_report_print.html', {'error': 'Invalid parameters for print view.'})
 
 
-class CustomerReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class CustomerReportView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
     """View for generating and displaying customer reports."""
     template_name = 'reports/customer_report.html'
     permission_required = 'uniworlderp.view_customervendor'
@@ -688,7 +712,7 @@ class CustomerReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         return render(request, self.template_name, context)
 
 
-class CustomerReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class CustomerReportPrintView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
     """View for printing customer reports."""
     template_name = 'reports/customer_report_print.html'
     permission_required = 'uniworlderp.view_customervendor'
@@ -713,12 +737,15 @@ class CustomerReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, View)
         return render(request, self.template_name, context)
 
 
-class CustomerReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class CustomerReportExcelView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
     """View for exporting customer reports to Excel."""
     permission_required = 'uniworlderp.view_customervendor'
 
     def get(self, request, *args, **kwargs):
         """Export full customer report to Excel (all customers)."""
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Font
+
         customers = (
             CustomerVendor.objects
             .filter(entity_type='customer')
@@ -789,7 +816,7 @@ class CustomerReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, View)
 # CURRENTLY DISABLED: This view is disabled in favor of using the main ReportView with product filter
 # The functionality is redundant - users can get the same results by using Generate Report
 # with a specific product selected and leaving customer/employee filters empty
-class ProductWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class ProductWiseReportView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
     """View for generating product-wise sales reports."""
     template_name = 'reports/product_wise_report.html'
     permission_required = 'uniworlderp.view_product'
@@ -893,23 +920,11 @@ class ProductWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 return render(request, 'reports/product_wise_report_partial.html', context)
             return render(request, self.template_name, context)
         
-        # Query return data grouped by sales_order_item
-        returns_by_item = ReturnSalesItem.objects.filter(
+        # Returns per sales_order_item (None: read each item's maintained totals)
+        returns_dict = sales_returns.returns_by_line(ReturnSalesItem.objects.filter(
             sales_order_item__product=product,
             return_sales__return_date__range=[start_date, end_date]
-        ).values('sales_order_item_id').annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
-        )
-        
-        # Build dictionary for quick lookup
-        returns_dict = {
-            r['sales_order_item_id']: {
-                'qty': r['returned_qty'] or 0,
-                'amount': r['returned_amount'] or 0
-            }
-            for r in returns_by_item
-        }
+        ), end_date)
         
         # Attach return data to each item and calculate net values
         gross_qty = 0
@@ -919,7 +934,7 @@ class ProductWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         
         for item in sales_data:
             # Get return data for this specific item
-            returns = returns_dict.get(item.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.line_returned(item, returns_dict)
             item.returned_qty = returns['qty']
             item.returned_amount = returns['amount']
             
@@ -942,7 +957,7 @@ class ProductWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         
         # Format dates for display
         now = timezone.now()
-        bdt = pytz.timezone('Asia/Dhaka')
+        bdt = dhaka_timezone()
         now_bdt = now.astimezone(bdt)
         
         context = {
@@ -970,10 +985,11 @@ class ProductWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
 
 
 # CURRENTLY DISABLED: This view is disabled in favor of using the main ReportView with product filter
-class ProductWiseReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class ProductWiseReportPrintView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, PastReportConditionalGetMixin, View):
     """View for printing product-wise sales reports."""
     template_name = 'reports/product_wise_report_print.html'
     permission_required = 'uniworlderp.view_product'
+    report_sources = SALES_REPORT_SOURCES
 
     def get(self, request, *args, **kwargs):
         product_id = request.GET.get('product')
@@ -1004,7 +1020,7 @@ class ProductWiseReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, Vi
         
         # Format dates
         now = timezone.now()
-        bdt = pytz.timezone('Asia/Dhaka')
+        bdt = dhaka_timezone()
         now_bdt = now.astimezone(bdt)
         
         context = {
@@ -1023,11 +1039,15 @@ class ProductWiseReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, Vi
 
 
 # CURRENTLY DISABLED: This view is disabled in favor of using the main ReportView with product filter
-class ProductWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class ProductWiseReportExcelView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, PastReportConditionalGetMixin, View):
     """View for exporting product-wise sales reports to Excel."""
     permission_required = 'uniworlderp.view_product'
+    report_sources = SALES_REPORT_SOURCES
 
     def get(self, request, *args, **kwargs):
+            from openpyxl import Workbook
+            from openpyxl.styles import Alignment, Font
+
             product_id = request.GET.get('product')
             start_date = request.GET.get('start_date')
             end_date = request.GET.get('end_date')
@@ -1049,23 +1069,11 @@ class ProductWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, Vi
                 'sales_order__sales_employee'
             ).order_by('-sales_order__order_date')
 
-            # Query return data grouped by sales_order_item
-            returns_by_item = ReturnSalesItem.objects.filter(
+            # Returns per sales_order_item (None: read each item's maintained totals)
+            returns_dict = sales_returns.returns_by_line(ReturnSalesItem.objects.filter(
                 sales_order_item__product=product,
                 return_sales__return_date__range=[start_date, end_date]
-            ).values('sales_order_item_id').annotate(
-                returned_qty=Sum('quantity'),
-                returned_amount=Sum('total')
-            )
-            
-            # Build dictionary for quick lookup
-            returns_dict = {
-                r['sales_order_item_id']: {
-                    'qty': r['returned_qty'] or 0,
-                    'amount': r['returned_amount'] or 0
-                }
-                for r in returns_by_item
-            }
+            ), end_date)
             
             # Attach return data to each item and calculate totals
             gross_qty = 0
@@ -1075,7 +1083,7 @@ class ProductWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, Vi
             
             for item in sales_data:
                 # Get return data for this specific item
-                returns = returns_dict.get(item.id, {'qty': 0, 'amount': 0})
+                returns = sales_returns.line_returned(item, returns_dict)
                 item.returned_qty = returns['qty']
                 item.returned_amount = returns['amount']
                 
@@ -1192,7 +1200,7 @@ class ProductWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, Vi
 # CURRENTLY DISABLED: This view is disabled in favor of using the main ReportView with customer filter
 # The functionality is redundant - users can get the same results by using Generate Report
 # with a specific customer selected and leaving product/employee filters empty
-class CustomerWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class CustomerWiseReportView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, View):
     """View for generating customer-wise sales reports."""
     template_name = 'reports/customer_wise_report.html'
     permission_required = 'uniworlderp.view_customervendor'
@@ -1295,24 +1303,13 @@ class CustomerWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 return render(request, 'reports/customer_wise_report_partial.html', context)
             return render(request, self.template_name, context)
         
-        # Query return data for this customer and group by order
+        # Query return data for this customer and group by order (None: sum
+        # the maintained totals of each order's items)
         order_ids = sales_orders.values_list('id', flat=True)
-        returns_by_order = ReturnSalesItem.objects.filter(
+        returns_dict = sales_returns.returns_by_order(ReturnSalesItem.objects.filter(
             sales_order_item__sales_order__id__in=order_ids,
             return_sales__return_date__range=[start_date, end_date]
-        ).values('sales_order_item__sales_order_id').annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
-        )
-        
-        # Build dictionary for quick lookup
-        returns_dict = {
-            r['sales_order_item__sales_order_id']: {
-                'qty': r['returned_qty'] or 0,
-                'amount': r['returned_amount'] or 0
-            }
-            for r in returns_by_order
-        }
+        ), end_date)
         
         # Calculate aggregates and attach data to each order
         gross_qty = 0
@@ -1329,7 +1326,7 @@ class CustomerWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             order.discount_amount = sum(item.total_discount or Decimal('0.00') for item in order.order_items.all())
             
             # Get return data for this order
-            returns = returns_dict.get(order.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.order_returned(order, returns_dict)
             order.returned_qty = returns['qty']
             order.returned_amount = returns['amount']
             
@@ -1350,7 +1347,7 @@ class CustomerWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         
         # Format dates for display
         now = timezone.now()
-        bdt = pytz.timezone('Asia/Dhaka')
+        bdt = dhaka_timezone()
         now_bdt = now.astimezone(bdt)
         
         context = {
@@ -1378,10 +1375,11 @@ class CustomerWiseReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
 
 
 # CURRENTLY DISABLED: This view is disabled in favor of using the main ReportView with customer filter
-class CustomerWiseReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class CustomerWiseReportPrintView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, PastReportConditionalGetMixin, View):
     """View for printing customer-wise sales reports."""
     template_name = 'reports/customer_wise_report_print.html'
     permission_required = 'uniworlderp.view_customervendor'
+    report_sources = SALES_REPORT_SOURCES
 
     def get(self, request, *args, **kwargs):
         customer_id = request.GET.get('customer')
@@ -1412,7 +1410,7 @@ class CustomerWiseReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, V
         
         # Format dates
         now = timezone.now()
-        bdt = pytz.timezone('Asia/Dhaka')
+        bdt = dhaka_timezone()
         now_bdt = now.astimezone(bdt)
         
         context = {
@@ -1432,11 +1430,15 @@ class CustomerWiseReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, V
 
 
 # CURRENTLY DISABLED: This view is disabled in favor of using the main ReportView with customer filter
-class CustomerWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class CustomerWiseReportExcelView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, PastReportConditionalGetMixin, View):
     """View for exporting customer-wise sales reports to Excel."""
     permission_required = 'uniworlderp.view_customervendor'
+    report_sources = SALES_REPORT_SOURCES
 
     def get(self, request, *args, **kwargs):
+            from openpyxl import Workbook
+            from openpyxl.styles import Alignment, Font
+
             customer_id = request.GET.get('customer')
             start_date = request.GET.get('start_date')
             end_date = request.GET.get('end_date')
@@ -1457,15 +1459,14 @@ class CustomerWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, V
                 'order_items__product'
             ).order_by('-order_date')
 
-            # Query return data for this customer
+            # Query return data for this customer, per order (None: sum the
+            # maintained totals of each order's items)
             order_ids = sales_orders.values_list('id', flat=True)
-            returns_data = ReturnSalesItem.objects.filter(
+            returns_dict = sales_returns.returns_by_order(ReturnSalesItem.objects.filter(
                 sales_order_item__sales_order__id__in=order_ids,
                 return_sales__return_date__range=[start_date, end_date]
-            ).aggregate(
-                total_returned_qty=Sum('quantity'),
-                total_returned_amount=Sum('total')
-            )
+            ), end_date)
+            order_returns = {order.id: sales_returns.order_returned(order, returns_dict) for order in sales_orders}
 
             # Calculate gross sales aggregates
             gross_qty = sum(
@@ -1474,9 +1475,8 @@ class CustomerWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, V
             )
             gross_amount = sum(order.total_amount for order in sales_orders)
 
-            # Extract return values with default to 0
-            returned_qty = returns_data['total_returned_qty'] or 0
-            returned_amount = returns_data['total_returned_amount'] or 0
+            returned_qty = sum(returns['qty'] for returns in order_returns.values())
+            returned_amount = sum(returns['amount'] for returns in order_returns.values())
 
             # Calculate net values
             net_qty = gross_qty - returned_qty
@@ -1531,18 +1531,9 @@ class CustomerWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, V
                 # Calculate order-level gross amount
                 order_gross_amount = order.total_amount
 
-                # Query returns for this specific order
-                order_returns = ReturnSalesItem.objects.filter(
-                    sales_order_item__sales_order__id=order.id,
-                    return_sales__return_date__range=[start_date, end_date]
-                ).aggregate(
-                    returned_qty=Sum('quantity'),
-                    returned_amount=Sum('total')
-                )
-
-                # Extract return values with default to 0
-                order_returned_qty = order_returns['returned_qty'] or 0
-                order_returned_amount = order_returns['returned_amount'] or 0
+                # Returns of this order
+                order_returned_qty = order_returns[order.id]['qty']
+                order_returned_amount = order_returns[order.id]['amount']
 
                 # Calculate net values for this order
                 order_net_qty = order_gross_qty - order_returned_qty
@@ -1609,11 +1600,14 @@ class CustomerWiseReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, V
 
 
 
-class ReportExcelView(LoginRequiredMixin, View):
+class ReportExcelView(ReportingReadsMixin, LoginRequiredMixin, View):
     """View for exporting general sales reports to Excel."""
     
     def post(self, request, *args, **kwargs):
         """Export general sales report to Excel."""
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Font
+
         # Get filter parameters
         customer_id = request.POST.get('customer')
         product_id = request.POST.get('product')
@@ -1682,26 +1676,14 @@ class ReportExcelView(LoginRequiredMixin, View):
         returned_qty = returns_aggregated['total_returned_qty'] or 0
         returned_amount = returns_aggregated['total_returned_amount'] or 0
         
-        # Group returns by sales_order_item_id
-        returns_by_item = returns_qs.values('sales_order_item_id').annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
-        )
-        
-        # Build dictionary for quick lookup
-        returns_dict = {
-            r['sales_order_item_id']: {
-                'qty': r['returned_qty'] or 0,
-                'amount': r['returned_amount'] or 0
-            }
-            for r in returns_by_item
-        }
+        # Returns per sales_order_item (None: read each item's maintained totals)
+        returns_dict = sales_returns.returns_by_line(returns_qs, end_date if start_date and end_date else None)
         
         # Attach return data and calculate net values for each item
         items_with_data = []
         for item in items:
             # Attach return data for this specific item
-            returns = returns_dict.get(item.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.line_returned(item, returns_dict)
             item.returned_qty = returns['qty']
             item.returned_amount = returns['amount']
             
@@ -1843,7 +1825,7 @@ class ReportExcelView(LoginRequiredMixin, View):
         return response
 
 
-class ReportPrintView(LoginRequiredMixin, View):
+class ReportPrintView(ReportingReadsMixin, LoginRequiredMixin, View):
     """View for printing general sales reports."""
     template_name = 'reports/report_print.html'
     
@@ -1917,26 +1899,14 @@ class ReportPrintView(LoginRequiredMixin, View):
         returned_qty = returns_aggregated['total_returned_qty'] or 0
         returned_amount = returns_aggregated['total_returned_amount'] or 0
         
-        # Group returns by sales_order_item_id
-        returns_by_item = returns_qs.values('sales_order_item_id').annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
-        )
-        
-        # Build dictionary for quick lookup
-        returns_dict = {
-            r['sales_order_item_id']: {
-                'qty': r['returned_qty'] or 0,
-                'amount': r['returned_amount'] or 0
-            }
-            for r in returns_by_item
-        }
+        # Returns per sales_order_item (None: read each item's maintained totals)
+        returns_dict = sales_returns.returns_by_line(returns_qs, end_date if start_date and end_date else None)
         
         # Attach return data and calculate net values for each item
         items_with_data = []
         for item in items:
             # Attach return data for this specific item
-            returns = returns_dict.get(item.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.line_returned(item, returns_dict)
             item.returned_qty = returns['qty']
             item.returned_amount = returns['amount']
             
@@ -1990,7 +1960,7 @@ class ReportPrintView(LoginRequiredMixin, View):
         
         # Format dates for display
         now = timezone.now()
-        bdt = pytz.timezone('Asia/Dhaka')
+        bdt = dhaka_timezone()
         now_bdt = now.astimezone(bdt)
         
         context = {
@@ -1,4 +1,5 @@
 from .common_imports import *
+from uniworlderp import printing, sales_performance
 from company.models import Company
 from uniworlderp.models import SalesEmployee
 from uniworlderp.forms import SalesEmployeeForm
@@ -11,7 +12,7 @@ class SalesEmployeeListView(ListView):
 
     def get_queryset(self):
         search_query = self.request.GET.get('search', '')
-        queryset = SalesEmployee.objects.all()
+        queryset = SalesEmployee.objects.annotate(net_this_month=sales_performance.current_net_amount())
 
         if search_query:
             queryset = queryset.filter(
@@ -111,7 +112,7 @@ class SalesEmployeeUpdateView(PermissionRequiredMixin, SuccessMessageMixin, Upda
 
 class SalesEmployeeDetailView(PermissionRequiredMixin, DetailView):
     model = SalesEmployee
-    template_name = 'common/form.html'
+    template_name = 'sales_employee/detail.html'
     permission_required = 'uniworlderp.view_salesemployee'
 
     def handle_no_permission(self):
@@ -127,6 +128,7 @@ class SalesEmployeeDetailView(PermissionRequiredMixin, DetailView):
         context['form'] = SalesEmployeeForm(instance=self.object)
         for field in context['form'].fields.values():
             field.widget.attrs['disabled'] = 'disabled'
+        context['performance'] = sales_performance.history(self.object)
         return context
 
     def get_common_context(self):
@@ -178,7 +180,7 @@ class SalesEmployeePrintView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        company = Company.objects.first()  # Assuming you have only one company
+        company = printing.get_company()
         context.update({
             'company': company,
             'model_name': self.model._meta.verbose_name.title(),
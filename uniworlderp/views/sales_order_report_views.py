@@ -6,16 +6,28 @@ from django.db.models import Sum, F, Q
 from datetime import datetime, date
 from django.utils import timezone
 from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
 import io
 
-class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
-    """View for generating and displaying sales order reports with customer-wise analysis."""
+from asgiref.sync import sync_to_async
+
+from uniworlderp import sales_returns
+from uniworlderp.conditional_get import SALES_REPORT_SOURCES, PastReportConditionalGetMixin
+from uniworlderp.db_routing import ReportingReadsMixin
+from uniworlderp.views.async_support import (
+    AsyncLoginRequiredMixin, AsyncPermissionRequiredMixin, arender, run_queries,
+)
+
+class SalesOrderReportView(ReportingReadsMixin, AsyncLoginRequiredMixin, AsyncPermissionRequiredMixin, PastReportConditionalGetMixin, View):
+    """
+    View for generating and displaying sales order reports with customer-wise analysis.
+    Async: the customer list, the orders with their items, the return totals
+    and the selected customer are fetched concurrently.
+    """
     template_name = 'reports/sales_order_report.html'
     permission_required = 'uniworlderp.view_salesorder'
+    report_sources = SALES_REPORT_SOURCES
     
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         """Display sales order report form and results."""
         # Get filter parameters
         customer_id = request.GET.get('customer', '')
@@ -31,8 +43,10 @@ class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 
                 if end_date_obj < start_date_obj:
                     error_message = "End date must be after start date."
-                    customers = CustomerVendor.objects.filter(entity_type='customer', owner=request.user).order_by('name')
-                    return render(request, self.template_name, {
+                    customers = await sync_to_async(list)(
+                        CustomerVendor.objects.filter(entity_type='customer', owner=request.user).order_by('name')
+                    )
+                    return await arender(request, self.template_name, {
                         'customers': customers,
                         'selected_customer': customer_id,
                         'start_date': start_date,
@@ -49,8 +63,10 @@ class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                     })
             except (ValueError, TypeError):
                 error_message = "Invalid date format."
-                customers = CustomerVendor.objects.filter(entity_type='customer', owner=request.user).order_by('name')
-                return render(request, self.template_name, {
+                customers = await sync_to_async(list)(
+                    CustomerVendor.objects.filter(entity_type='customer', owner=request.user).order_by('name')
+                )
+                return await arender(request, self.template_name, {
                     'customers': customers,
                     'selected_customer': customer_id,
                     'start_date': start_date,
@@ -84,12 +100,10 @@ class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         if end_date:
             sales_orders = sales_orders.filter(order_date__lte=end_date)
         
-        # Get order IDs for return data query
-        order_ids = list(sales_orders.values_list('id', flat=True))
-        
-        # Query return data grouped by sales order
+        # Query return data grouped by sales order (the orders as a subquery,
+        # so it does not wait for them)
         returns_qs = ReturnSalesItem.objects.filter(
-            sales_order_item__sales_order__id__in=order_ids
+            sales_order_item__sales_order__id__in=sales_orders.values('id')
         )
         
         # Apply date range filter to returns using return_date
@@ -106,22 +120,25 @@ class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
                 return_sales__return_date__lte=end_date
             )
         
-        # Aggregate returns by sales order
-        returns_aggregated = returns_qs.values(
-            'sales_order_item__sales_order__id'
-        ).annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
+        # Get customer information for header if customer is selected
+        def get_customer_info():
+            if not customer_id:
+                return None
+            try:
+                return CustomerVendor.objects.get(id=customer_id, owner=request.user)
+            except CustomerVendor.DoesNotExist:
+                return None
+
+        # The customer list, the orders (and their items), the returns
+        # by sales order and the header customer are independent
+        results = await run_queries(
+            customers=lambda: list(customers),
+            sales_orders=lambda: list(sales_orders),
+            returns_by_order=lambda: sales_returns.returns_by_order(returns_qs, end_date),
+            customer_info=get_customer_info,
         )
-        
-        # Build returns_by_order dictionary
-        returns_by_order = {}
-        for item in returns_aggregated:
-            order_id = item['sales_order_item__sales_order__id']
-            returns_by_order[order_id] = {
-                'qty': item['returned_qty'] or 0,
-                'amount': item['returned_amount'] or 0
-            }
+        sales_orders = results['sales_orders']
+        returns_by_order = results['returns_by_order']
         
         # Attach return data to each order and calculate net values
         total_gross_qty = 0
@@ -133,7 +150,7 @@ class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
         
         for order in sales_orders:
             # Get return data for this order
-            returns = returns_by_order.get(order.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.order_returned(order, returns_by_order)
             order.returned_qty = returns['qty']
             order.returned_amount = returns['amount']
             
@@ -158,20 +175,12 @@ class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             total_net_amount += order.net_amount
         
         # Calculate summary data
-        total_orders = sales_orders.count()
-        
-        # Get customer information for header if customer is selected
-        customer_info = None
-        if customer_id:
-            try:
-                customer_info = CustomerVendor.objects.get(id=customer_id, owner=request.user)
-            except CustomerVendor.DoesNotExist:
-                pass
+        total_orders = len(sales_orders)
         
         # Prepare context
         context = {
             'sales_orders': sales_orders,
-            'customers': customers,
+            'customers': results['customers'],
             'selected_customer': customer_id,
             'start_date': start_date,
             'end_date': end_date,
@@ -182,15 +191,16 @@ class SalesOrderReportView(LoginRequiredMixin, PermissionRequiredMixin, View):
             'total_gross_amount': total_gross_amount,
             'total_returned_amount': total_returned_amount,
             'total_net_amount': total_net_amount,
-            'customer_info': customer_info,
+            'customer_info': results['customer_info'],
         }
         
-        return render(request, self.template_name, context)
+        return await arender(request, self.template_name, context)
 
-class SalesOrderReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class SalesOrderReportPrintView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, PastReportConditionalGetMixin, View):
     """View for printing sales order reports."""
     template_name = 'reports/sales_order_report_print.html'
     permission_required = 'uniworlderp.view_salesorder'
+    report_sources = SALES_REPORT_SOURCES
     
     def get(self, request, *args, **kwargs):
         """Display printable sales order report."""
@@ -242,22 +252,8 @@ class SalesOrderReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, Vie
                 return_sales__return_date__lte=end_date
             )
         
-        # Aggregate returns by sales order
-        returns_aggregated = returns_qs.values(
-            'sales_order_item__sales_order__id'
-        ).annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
-        )
-        
-        # Build returns_by_order dictionary
-        returns_by_order = {}
-        for item in returns_aggregated:
-            order_id = item['sales_order_item__sales_order__id']
-            returns_by_order[order_id] = {
-                'qty': item['returned_qty'] or 0,
-                'amount': item['returned_amount'] or 0
-            }
+        # Returns by sales order (None: read the lines' returned totals)
+        returns_by_order = sales_returns.returns_by_order(returns_qs, end_date)
         
         # Attach return data to each order and calculate net values
         total_gross_qty = 0
@@ -269,7 +265,7 @@ class SalesOrderReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, Vie
         
         for order in sales_orders:
             # Get return data for this order
-            returns = returns_by_order.get(order.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.order_returned(order, returns_by_order)
             order.returned_qty = returns['qty']
             order.returned_amount = returns['amount']
             
@@ -312,12 +308,17 @@ class SalesOrderReportPrintView(LoginRequiredMixin, PermissionRequiredMixin, Vie
         
         return render(request, self.template_name, context)
 
-class SalesOrderReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, View):
+class SalesOrderReportExcelView(ReportingReadsMixin, LoginRequiredMixin, PermissionRequiredMixin, PastReportConditionalGetMixin, View):
     """View for exporting sales order reports to Excel."""
     permission_required = 'uniworlderp.view_salesorder'
+    report_sources = SALES_REPORT_SOURCES
     
     def get(self, request, *args, **kwargs):
         """Export sales order report to Excel."""
+        # openpyxl is only needed here; keep it out of every worker's boot
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Font
+
         # Get filter parameters
         customer_id = request.GET.get('customer', '')
         start_date = request.GET.get('start_date', '')
@@ -366,27 +367,13 @@ class SalesOrderReportExcelView(LoginRequiredMixin, PermissionRequiredMixin, Vie
                 return_sales__return_date__lte=end_date
             )
         
-        # Aggregate returns by sales order
-        returns_aggregated = returns_qs.values(
-            'sales_order_item__sales_order__id'
-        ).annotate(
-            returned_qty=Sum('quantity'),
-            returned_amount=Sum('total')
-        )
-        
-        # Build returns_by_order dictionary
-        returns_by_order = {}
-        for item in returns_aggregated:
-            order_id = item['sales_order_item__sales_order__id']
-            returns_by_order[order_id] = {
-                'qty': item['returned_qty'] or 0,
-                'amount': item['returned_amount'] or 0
-            }
+        # Returns by sales order (None: read the lines' returned totals)
+        returns_by_order = sales_returns.returns_by_order(returns_qs, end_date)
         
         # Attach return data to each order and calculate net values
         for order in sales_orders:
             # Get return data for this order
-            returns = returns_by_order.get(order.id, {'qty': 0, 'amount': 0})
+            returns = sales_returns.order_returned(order, returns_by_order)
             order.returned_qty = returns['qty']
             order.returned_amount = returns['amount']
             
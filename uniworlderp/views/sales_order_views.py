@@ -2,11 +2,18 @@
 # customer_views.py
 
 
+import json
+
 from django import forms
+from django.conf import settings
+from django.http import JsonResponse
 from django.urls import reverse
 
 from uniworlderp import models
 from .common_imports import *
+from uniworlderp import order_import, printing, sales_returns
+from uniworlderp.conditional_get import DocumentConditionalGetMixin
+from uniworlderp.db_routing import ReportingReadsMixin
 from uniworlderp.models import ReturnSales, ReturnSalesItem, SalesOrder, SalesOrderItem, Product,StockTransaction,SalesEmployee
 from uniworlderp.forms import ReturnSalesForm, ReturnSalesItemFormSet, SalesOrderForm, SalesOrderItemFormSet, get_return_sales_item_formset
 from company.models import Company, Branch, ContactPerson
@@ -22,7 +29,7 @@ class SalesOrderListView(ListView):
         search_query = self.request.GET.get('search', '')
 
         # Fetch all records and order them by the latest order_date
-        queryset = SalesOrder.objects.all().order_by('-id')
+        queryset = SalesOrder.objects.select_related('customer', 'invoice').prefetch_related('returns').order_by('-id')
 
         # Apply search filters if a search query is present
         if search_query:
@@ -45,7 +52,7 @@ class SalesOrderListView(ListView):
         context = super().get_context_data(**kwargs)
         context['search_query'] = self.request.GET.get('search', '')
         return context
-class SalesOrderItemDetailedListView(ListView):
+class SalesOrderItemDetailedListView(ReportingReadsMixin, ListView):
     model = SalesOrderItem
     template_name = 'sales_order/detailed_list.html'
     context_object_name = 'order_items'
@@ -214,10 +221,12 @@ class SalesOrderUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateVi
             'next_id': sales_orders.filter(id__gt=current_order.id).first().id if sales_orders.filter(id__gt=current_order.id).exists() else None,
             'current_id': current_order.id,
         }
-class SalesOrderDetailView(PermissionRequiredMixin, DetailView):
+class SalesOrderDetailView(PermissionRequiredMixin, DocumentConditionalGetMixin, DetailView):
     model = SalesOrder
     template_name = 'sales_order/form.html'
     permission_required = 'uniworlderp.view_salesorder'
+    document_type = 'sales_order'
+    navigation = True
 
     def handle_no_permission(self):
         messages.error(self.request, "You do not have permission to view this sales order.")
@@ -288,30 +297,18 @@ class SalesOrderDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteVi
         context['cancel_url'] = reverse_lazy('customer_vendor:sales_order_list')
         return context
 
-class SalesOrderPrintView(LoginRequiredMixin, DetailView):
+class SalesOrderPrintView(LoginRequiredMixin, DocumentConditionalGetMixin, DetailView):
     model = SalesOrder
     template_name = 'sales_order/print.html'
     context_object_name = 'sales_order'
+    document_type = 'sales_order'
+
+    def get_queryset(self):
+        return printing.DOCUMENT_TYPES['sales_order'].queryset()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        company = Company.objects.first()  # Assuming you have only one company
-        items = self.object.order_items.all()
-        subtotal = sum(item.total for item in items)
-        discount = self.object.discount
-        shipping = self.object.shipping
-        tax = subtotal * Decimal('0.0')  # 12% tax
-        total = subtotal - discount + shipping + tax
-
-        context.update({
-            'company': company,
-            'items': items,
-            'subtotal': subtotal,
-            'discount': discount,
-            'shipping': shipping,
-            'tax': tax,
-            'total': total,
-        })
+        context.update(printing.print_context(printing.DOCUMENT_TYPES['sales_order'], [self.object]))
         return context
 
 
@@ -337,13 +334,9 @@ class ReturnSalesCreateView(LoginRequiredMixin,PermissionRequiredMixin, CreateVi
         else:
             # Initialize formset with sales order items
             initial_data = []
-            for item in self.sales_order.order_items.all():
+            for item in self.sales_order.order_items.select_related('product'):
                 # Calculate max returnable quantity
-                previously_returned = ReturnSalesItem.objects.filter(
-                    sales_order_item=item
-                ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-                max_returnable = item.quantity - previously_returned
+                max_returnable = item.quantity - item.returned_quantity
             
                 # Add all items to initial data, even if max_returnable is 0
                 initial_data.append({
@@ -387,28 +380,13 @@ class ReturnSalesCreateView(LoginRequiredMixin,PermissionRequiredMixin, CreateVi
                     formset.instance = self.object  
                     formset_items = formset.save(commit=False)
                     
-                    has_items = False
-                    # Process each form/item manually
-                    for item in formset_items:
-                        # Only save items with quantity > 0
-                        if item.quantity > 0:
-                            has_items = True
-                            # Ensure total is calculated
-                            item.total = Decimal(item.quantity) * item.unit_price  
-                            item.return_sales = self.object  
-                            item.save()  
-                    
-                    # Handle deleted forms if any
-                    for form in formset.deleted_forms:
-                        if form.instance.pk:
-                            form.instance.delete()
-                    
                     # Check if at least one item was returned
-                    if not has_items:
+                    if not any(item.quantity > 0 for item in formset_items):
                         raise ValidationError("You must return at least one item.")
                     
-                    # Update total amount
-                    self.object.update_total_amount()
+                    # Lines, returned totals, stock movements and the return
+                    # total in a fixed number of queries
+                    sales_returns.post_return(self.object, formset_items)
                     
                     messages.success(self.request, 'Sales return created successfully.')
                     return HttpResponseRedirect(self.get_success_url())
@@ -454,7 +432,53 @@ class ReturnSalesDetailView(LoginRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         return_sales = self.object
         context['sales_order'] = return_sales.sales_order
-        context['return_items'] = ReturnSalesItem.objects.filter(return_sales=return_sales)
+        context['return_items'] = ReturnSalesItem.objects.filter(return_sales=return_sales).select_related(
+            'sales_order_item__product'
+        )
         
         return context
 
+
+class SalesOrderBatchImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    POST a JSON batch of sales orders, ``{"orders": [...], "dry_run": false}``
+    (see ``uniworlderp.order_import`` for the order format). Every order is
+    created or rejected as a whole; the response lists the outcome per order.
+
+    The field app authenticates like a browser: it signs in through the
+    login page, keeps the session cookie, and sends the ``csrftoken`` cookie
+    back in an ``X-CSRFToken`` header with every batch. Without a session the
+    endpoint answers 403; an app that was offline syncs once it has signed in
+    again.
+    """
+    permission_required = 'uniworlderp.add_salesorder'
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+        limit = settings.SALES_ORDER_IMPORT_MAX_BYTES
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        # Read the stream directly, a day's batch can exceed DATA_UPLOAD_MAX_MEMORY_SIZE,
+        # but never more than the limit (a missing Content-Length is no way around it)
+        body = b'' if length > limit else request.read(limit + 1)
+        if length > limit or len(body) > limit:
+            return JsonResponse({'error': f'Request body too large (max {limit} bytes)'}, status=413)
+        try:
+            payload = json.loads(body)
+        except (ValueError, UnicodeDecodeError) as e:
+            return JsonResponse({'error': f'Invalid JSON: {str(e)}'}, status=400)
+
+        orders = payload.get('orders') if isinstance(payload, dict) else payload
+        if not isinstance(orders, list):
+            return JsonResponse({'error': 'Expected a list of orders or {"orders": [...]}'}, status=400)
+        if len(orders) > settings.SALES_ORDER_IMPORT_MAX_ORDERS:
+            return JsonResponse(
+                {'error': f'Too many orders in one batch (max {settings.SALES_ORDER_IMPORT_MAX_ORDERS})'},
+                status=413,
+            )
+
+        dry_run = bool(payload.get('dry_run')) if isinstance(payload, dict) else False
+        result = order_import.import_sales_orders(orders, request.user, dry_run=dry_run)
+        return JsonResponse({'dry_run': dry_run, **result.as_dict()})
@@ -0,0 +1,127 @@
+import time
+
+from django.core.paginator import Paginator
+from .common_imports import *
+from .exports import csv_response
+from uniworlderp import importers, stock_take as stock_takes
+from uniworlderp.forms import StockTakeCountImportForm, StockTakeStartForm
+from uniworlderp.models import StockTake
+
+
+class StockTakeListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+    """Stock-takes, newest first, with the form starting a new one."""
+    model = StockTake
+    template_name = 'stock_take/list.html'
+    context_object_name = 'stock_takes'
+    permission_required = 'uniworlderp.view_stocktake'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return (
+            StockTake.objects.select_related('owner')
+            .annotate(line_count=Count('lines'), counted_count=Count('lines__counted_quantity'))
+            .order_by('-created_at')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['start_form'] = StockTakeStartForm()
+        return context
+
+
+class StockTakeStartView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Freeze the expected quantities of a new stock-take (see uniworlderp/stock_take.py)."""
+    permission_required = 'uniworlderp.add_stocktake'
+
+    def post(self, request, *args, **kwargs):
+        form = StockTakeStartForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, "Invalid stock-take options.")
+            return redirect('customer_vendor:stock_take_list')
+        stock_take = stock_takes.start(request.user, form.cleaned_data['abc_class'], form.cleaned_data['notes'])
+        messages.success(request, f"{stock_take.reference} started: {stock_take.lines.count()} product(s) to count.")
+        return redirect('customer_vendor:stock_take_detail', pk=stock_take.pk)
+
+
+class StockTakeDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+    """Summary and variance lines of a stock-take; POST imports counted quantities."""
+    model = StockTake
+    template_name = 'stock_take/detail.html'
+    context_object_name = 'stock_take'
+    permission_required = 'uniworlderp.view_stocktake'
+    paginate_by = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        lines = stock_takes.variances(self.object).select_related('product').order_by('product__name', 'pk')
+        context.update({
+            'summary': stock_takes.summary(self.object),
+            'page_obj': Paginator(lines, self.paginate_by).get_page(self.request.GET.get('page')),
+            'import_form': kwargs.get('import_form') or StockTakeCountImportForm(),
+            'can_change': self.request.user.has_perm('uniworlderp.change_stocktake'),
+        })
+        return context
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if not request.user.has_perm('uniworlderp.change_stocktake'):
+            messages.error(request, "You do not have permission to import counts.")
+            return redirect('customer_vendor:stock_take_detail', pk=self.object.pk)
+
+        form = StockTakeCountImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return self.render_to_response(self.get_context_data(import_form=form))
+        upload = form.cleaned_data['file']
+        dry_run = form.cleaned_data['dry_run']
+        try:
+            result = stock_takes.import_counts(
+                self.object, importers.iter_rows(upload, upload.name), dry_run=dry_run,
+            )
+        except ValidationError as e:
+            messages.error(request, "; ".join(e.messages))
+            return self.render_to_response(self.get_context_data(import_form=form))
+        except Exception as e:
+            messages.error(request, f"Could not read the file: {str(e)}")
+            return self.render_to_response(self.get_context_data(import_form=form))
+
+        summary = f"{result.rows} row(s) read: {result.updated} line(s) counted, {len(result.errors)} rejected."
+        if dry_run:
+            summary = f"Validation only, nothing was saved. {summary}"
+        if result.errors:
+            messages.warning(request, summary)
+        else:
+            messages.success(request, summary)
+        return self.render_to_response(self.get_context_data(
+            import_form=form,
+            result=result,
+            import_errors=result.errors[:500],
+        ))
+
+
+class StockTakePostView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Book the differences of a stock-take as ADJ stock movements."""
+    permission_required = ('uniworlderp.change_stocktake', 'uniworlderp.add_stocktransaction')
+
+    def post(self, request, pk, *args, **kwargs):
+        stock_take = get_object_or_404(StockTake, pk=pk)
+        started = time.perf_counter()
+        try:
+            movements = stock_takes.post(stock_take, request.user)
+        except ValidationError as e:
+            messages.error(request, "; ".join(e.messages))
+        else:
+            messages.success(
+                request,
+                f"{stock_take.reference} posted: {len(movements)} stock adjustment(s) "
+                f"in {time.perf_counter() - started:.2f}s.",
+            )
+        return redirect('customer_vendor:stock_take_detail', pk=stock_take.pk)
+
+
+class StockTakeVarianceExportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """The variance report of a stock-take as CSV, streamed row by row."""
+    permission_required = 'uniworlderp.view_stocktake'
+
+    def get(self, request, pk, *args, **kwargs):
+        stock_take = get_object_or_404(StockTake, pk=pk)
+        return csv_response(stock_takes.csv_rows(stock_take), f'stock_take_{stock_take.pk}_variances.csv')
@@ -0,0 +1,99 @@
+"""
+Work a fresh worker process would otherwise do on its first requests:
+building the URL resolver, compiling the templates, connecting to the
+database and filling the per-process caches.
+
+Called from the gunicorn ``post_worker_init`` hook (``gunicorn.conf.py``)
+when ``WARMUP_ON_BOOT`` is set, or by hand::
+
+    from uniworlderp.warmup import warmup
+    warmup()
+"""
+
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+
+def warm_urls(resolver=None):
+    """Build the reverse lookup tables of the URLconf and every namespace; returns the route count."""
+    resolver = resolver or get_resolver()
+    count = len(resolver.reverse_dict)
+    for _, namespace_resolver in resolver.namespace_dict.values():
+        count += warm_urls(namespace_resolver)
+    return count
+
+
+def warm_templates():
+    """Compile every ``.html`` template into the cached loader; returns the number compiled."""
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    if not filename.endswith('.html'):
+                        continue
+                    name = os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+                    try:
+                        get_template(name)
+                        count += 1
+                    except Exception as e:
+                        # Broken drafts in the template dirs must not stop the worker
+                        logger.debug('Warmup skipped template %s: %s', name, e)
+    return count
+
+
+def warm_database():
+    """Open the database connections and fill the content type cache used by permission checks."""
+    for alias in connections:
+        connections[alias].ensure_connection()
+    return len(ContentType.objects.get_for_models(*apps.get_models()))
+
+
+def warm_caches():
+    """Fill the per-process caches that every page or print view reads."""
+    from uniworlderp import printing
+
+    printing.get_company()
+    return 1
+
+
+STEPS = [
+    ('urls', warm_urls),
+    ('templates', warm_templates),
+    ('database', warm_database),
+    ('caches', warm_caches),
+]
+
+
+def warmup():
+    """
+    Run every warmup step; returns ``{step: (count, seconds)}``. A failing step
+    is logged and skipped, it never stops the worker from serving.
+    """
+    results = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            count = step()
+        except Exception:
+            logger.exception('Warmup step "%s" failed', name)
+            count = None
+        results[name] = (count, time.perf_counter() - started)
+    logger.info('Warmup: %s', ', '.join(
+        f'{name} {count} in {seconds * 1000:.0f} ms' for name, (count, seconds) in results.items()
+    ))
+    return results
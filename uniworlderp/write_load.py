@@ -0,0 +1,488 @@
+"""
+Concurrent write-path load harness.
+
+``run()`` drives the application in-process (the test client's WSGI handler,
+no network) from many threads or processes at once, each worker a clerk
+replaying a mix of the requests that move stock: sales order create and
+edit, sales return, purchase order receive and add stock. They all work on
+the same few products so they contend for the same rows. ``prepare()``
+creates those products (with an opening IN movement), a customer, a vendor,
+a sales employee and the pending purchase orders to receive, tagged
+``LOAD-<run>-``.
+
+Every statement of a worker goes through an execute wrapper that times the
+writing ones (``INSERT`` / ``UPDATE`` / ``DELETE`` / ``SELECT ... FOR
+UPDATE``, busy waits on a locked SQLite database included) and counts the
+database errors by kind (deadlock, serialization failure, lock timeout,
+"database is locked"), also those a view catches and turns into a form
+error. On PostgreSQL the sessions waiting for a lock are also sampled from
+``pg_stat_activity``.
+
+Afterwards the ledger of the products is replayed from zero
+(``stock_ledger.rebuild(opening='zero', dry_run=True)``): ``stock_quantity``
+must equal the sum of the movements and every movement's ``previous_stock``
+the balance before it. Two requests moving the stock from the same stale
+read (a lost update) show up as a mismatch or a broken running balance.
+"""
+
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from uniworlderp import stock_ledger
+from uniworlderp.benchmarks import percentile
+from uniworlderp.models import (
+    CustomerVendor, Product, PurchaseOrder, PurchaseOrderItem, SalesEmployee, SalesOrder, SalesOrderItem,
+    StockTransaction,
+)
+
+
+OPERATIONS = ['create', 'edit', 'return', 'receive', 'add_stock']
+DEFAULT_MIX = {'create': 40, 'edit': 15, 'return': 15, 'receive': 10, 'add_stock': 20}
+DEFAULT_OPENING_STOCK = 100000
+LOCK_SAMPLE_SECONDS = 0.01
+
+# (kind, SQLSTATE, message fragment) of the errors caused by concurrency
+CONCURRENCY_ERRORS = [
+    ('deadlock', '40P01', 'deadlock detected'),
+    ('serialization', '40001', 'could not serialize'),
+    ('lock_timeout', '55P03', 'lock timeout'),
+    ('locked', None, 'database is locked'),
+    ('locked', None, 'database table is locked'),
+]
+CONCURRENCY_KINDS = list(dict.fromkeys(kind for kind, _, _ in CONCURRENCY_ERRORS))
+
+
+def parse_mix(value):
+    """``"create=40,edit=15"`` -> ``{"create": 40, "edit": 15}``; raises ``ValueError`` on an unknown operation."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'Unknown operation "{name}", choose from {", ".join(OPERATIONS)}')
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one operation with a positive weight')
+    return mix
+
+
+def classify(error):
+    """Kind of a database error: one of ``CONCURRENCY_KINDS``, or else its class name."""
+    cause = error.__cause__ or error
+    code = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    message = str(error).lower()
+    for kind, sqlstate, fragment in CONCURRENCY_ERRORS:
+        if (sqlstate and code == sqlstate) or fragment in message:
+            return kind
+    return type(error).__name__
+
+
+class StatementRecorder:
+    """``execute_wrapper`` timing the writing statements and counting the database errors by kind."""
+
+    def __init__(self):
+        self.statements = 0
+        self.write_seconds = 0.0
+        self.errors = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError as e:
+            self.errors[classify(e)] += 1
+            raise
+        finally:
+            self.statements += 1
+            verb = sql.lstrip()[:6].upper()
+            if verb in ('INSERT', 'UPDATE', 'DELETE') or (verb == 'SELECT' and 'FOR UPDATE' in sql):
+                self.write_seconds += time.perf_counter() - started
+
+
+class LockMonitor(threading.Thread):
+    """Samples the sessions of the database waiting for a lock (PostgreSQL)."""
+
+    def __init__(self, interval=LOCK_SAMPLE_SECONDS):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.waiting_samples = 0
+        self.max_waiting = 0
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopping.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                    )
+                    waiting = cursor.fetchone()[0]
+                    self.waiting_samples += waiting
+                    self.max_waiting = max(self.max_waiting, waiting)
+                    self.stopping.wait(self.interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+    @property
+    def wait_seconds(self):
+        return self.waiting_samples * self.interval
+
+
+# Set up
+
+def prepare(owner, products=5, opening_stock=DEFAULT_OPENING_STOCK, purchase_orders=0, seed=None):
+    """Create the contended products, the trading partners and ``purchase_orders`` pending POs; returns their ids."""
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:6].upper()
+    with transaction.atomic():
+        hot = Product.objects.bulk_create([
+            Product(name=f'Load {run} product {i:03d}', sku=f'LOAD-{run}-{i:03d}',
+                    price=Decimal(rng.randrange(100, 10000)) / 100, owner=owner)
+            for i in range(products)
+        ])
+        for product in hot:
+            # Through save(): the opening stock is a ledger row like any other
+            StockTransaction.objects.create(product=product, transaction_type='IN', quantity=opening_stock,
+                                            reference=f'LOAD-{run}-OPENING', owner=owner)
+        customer = CustomerVendor.objects.create(name=f'Load {run} customer', phone_number='0100000000',
+                                                 entity_type='customer', owner=owner)
+        vendor = CustomerVendor.objects.create(name=f'Load {run} vendor', phone_number='0100000000',
+                                               entity_type='vendor', owner=owner)
+        employee = SalesEmployee.objects.create(full_name=f'Load {run} clerk', owner=owner)
+
+        orders = PurchaseOrder.objects.bulk_create(
+            [PurchaseOrder(supplier=vendor, owner=owner) for _ in range(purchase_orders)]
+        )
+        items = []
+        for order in orders:
+            for product in rng.sample(hot, min(len(hot), rng.randint(1, 2))):
+                quantity = rng.randint(10, 50)
+                items.append(PurchaseOrderItem(purchase_order=order, product=product, unit_price=product.price,
+                                               quantity=quantity, total=product.price * quantity))
+                order.total_amount += items[-1].total
+        # PurchaseOrderItem.save() would take the quantity off the stock
+        PurchaseOrderItem.objects.bulk_create(items)
+        PurchaseOrder.objects.bulk_update(orders, ['total_amount'])
+    return {
+        'run': run,
+        'products': [(str(product.pk), str(product.price)) for product in hot],
+        'customer': str(customer.pk),
+        'employee': employee.pk,
+        'purchase_orders': [order.pk for order in orders],
+    }
+
+
+def plan(setup, owner, workers, operations, mix, seed=None):
+    """Split ``operations`` requests drawn from ``mix`` over ``workers`` clerks, each with its own POs to receive."""
+    rng = random.Random(seed)
+    names = [name for name in OPERATIONS if mix.get(name)]
+    drawn = rng.choices(names, weights=[mix[name] for name in names], k=operations)
+    tasks = []
+    for index in range(workers):
+        tasks.append({
+            **setup,
+            'index': index,
+            'user_id': owner.pk,
+            'operations': drawn[index::workers],
+            'purchase_orders': setup['purchase_orders'][index::workers],
+            'seed': rng.getrandbits(32),
+        })
+    return tasks
+
+
+# Workers
+
+class Clerk:
+    """Builds and sends the requests of one worker."""
+
+    def __init__(self, client, task):
+        self.client = client
+        self.task = task
+        self.rng = random.Random(task['seed'])
+        self.orders = []
+        self.purchase_orders = list(task['purchase_orders'])
+        self.today = timezone.localdate().isoformat()
+        self.requests = {
+            'create': self.create, 'edit': self.edit, 'return': self.sales_return,
+            'receive': self.receive, 'add_stock': self.add_stock,
+        }
+
+    def perform(self, name, number):
+        """Send one request; returns ``(operation, milliseconds, outcome)``."""
+        request = self.requests[name](number)
+        if request is None:
+            # Nothing to edit / return / receive yet
+            name, request = 'add_stock', self.add_stock(number)
+        url, data, after = request
+
+        started = time.perf_counter()
+        try:
+            response = self.client.post(url, data)
+        except Exception as e:
+            outcome = classify(e) if isinstance(e, DatabaseError) else type(e).__name__
+        else:
+            # Every write view redirects on success and renders its form again on errors
+            outcome = 'ok' if response.status_code == 302 else 'rejected'
+        elapsed = (time.perf_counter() - started) * 1000
+        if outcome == 'ok' and after:
+            after()
+        return name, elapsed, outcome
+
+    def order_form(self, lines, notes, **extra):
+        data = {
+            'customer': self.task['customer'],
+            'sales_employee': self.task['employee'],
+            'delivery_status': 'P',
+            'order_date': self.today,
+            'discount': '0.00',
+            'shipping': '0.00',
+            'notes': notes,
+            'order_items-TOTAL_FORMS': len(lines),
+            'order_items-MIN_NUM_FORMS': 0,
+            'order_items-MAX_NUM_FORMS': 1000,
+            **extra,
+        }
+        for index, line in enumerate(lines):
+            data.update({f'order_items-{index}-{key}': value for key, value in line.items()})
+        return data
+
+    def create(self, number):
+        notes = f'LOAD-{self.task["run"]}-{self.task["index"]}-{number}'
+        products = self.rng.sample(self.task['products'], min(len(self.task['products']), self.rng.randint(1, 3)))
+        lines = [
+            {'product': pk, 'quantity': self.rng.randint(1, 3), 'unit_price': price, 'stock_quantity': 0}
+            for pk, price in products
+        ]
+
+        def remember():
+            self.orders.extend(SalesOrder.objects.filter(notes=notes).values_list('pk', flat=True))
+
+        data = self.order_form(lines, notes, **{'order_items-INITIAL_FORMS': 0})
+        return reverse('customer_vendor:sales_order_create'), data, remember
+
+    def edit(self, number):
+        if not self.orders:
+            return None
+        pk = self.rng.choice(self.orders)
+        lines = [
+            {'id': item_pk, 'product': product_id, 'unit_price': price, 'stock_quantity': 0,
+             # One more or one less of each line, never below what was returned
+             'quantity': max(quantity + self.rng.choice([-1, 1]), returned, 1)}
+            for item_pk, product_id, quantity, returned, price in SalesOrderItem.objects.filter(sales_order_id=pk)
+            .order_by('pk').values_list('pk', 'product_id', 'quantity', 'returned_quantity', 'unit_price')
+        ]
+        data = self.order_form(lines, f'LOAD-{self.task["run"]}-{self.task["index"]}-edited',
+                               **{'order_items-INITIAL_FORMS': len(lines)})
+        return reverse('customer_vendor:sales_order_update', args=[pk]), data, None
+
+    def sales_return(self, number):
+        returnable = list(
+            SalesOrderItem.objects.filter(sales_order_id__in=self.orders, quantity__gt=F('returned_quantity'))
+            .values_list('sales_order_id', 'pk', 'unit_price')[:50]
+        )
+        if not returnable:
+            return None
+        order_id, item_pk, price = self.rng.choice(returnable)
+        data = {
+            'return_employee': self.task['employee'],
+            'return_date': self.today,
+            'return_items-TOTAL_FORMS': 1,
+            'return_items-INITIAL_FORMS': 0,
+            'return_items-MIN_NUM_FORMS': 0,
+            'return_items-MAX_NUM_FORMS': 1000,
+            'return_items-0-sales_order_item': item_pk,
+            'return_items-0-quantity': 1,
+            'return_items-0-unit_price': price,
+        }
+        return reverse('customer_vendor:sales_order_return', args=[order_id]), data, None
+
+    def receive(self, number):
+        if not self.purchase_orders:
+            return None
+        return reverse('customer_vendor:purchase_order_receive', args=[self.purchase_orders.pop()]), {}, None
+
+    def add_stock(self, number):
+        pk, _ = self.rng.choice(self.task['products'])
+        data = {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 0,
+            'form-MIN_NUM_FORMS': 0,
+            'form-MAX_NUM_FORMS': 1000,
+            'form-0-product': pk,
+            'form-0-quantity': self.rng.randint(1, 20),
+        }
+        return reverse('customer_vendor:add_stock'), data, None
+
+
+def run_worker(task, close_connections=True):
+    """Replay the operations of one clerk; returns its samples and statement counters."""
+    _init_worker()
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    client = Client()
+    client.force_login(get_user_model().objects.get(pk=task['user_id']))
+    clerk = Clerk(client, task)
+    recorder = StatementRecorder()
+    samples = []
+    try:
+        with connection.execute_wrapper(recorder):
+            for number, name in enumerate(task['operations']):
+                samples.append(clerk.perform(name, number))
+    finally:
+        if close_connections:
+            connections.close_all()
+    return {
+        'samples': samples,
+        'statements': recorder.statements,
+        'write_seconds': recorder.write_seconds,
+        'errors': dict(recorder.errors),
+    }
+
+
+def _init_worker():
+    # Workers started with "spawn" import nothing from the parent
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+        django.setup()
+
+
+# Run and report
+
+@dataclass
+class LoadReport:
+    vendor: str
+    mode: str
+    workers: int
+    run: str = ''
+    seconds: float = 0.0
+    samples: list = field(default_factory=list)
+    statements: int = 0
+    write_seconds: float = 0.0
+    errors: Counter = field(default_factory=Counter)
+    lock_wait_seconds: float = None
+    max_waiting: int = None
+    ledger: stock_ledger.LedgerReport = None
+
+    @property
+    def requests(self):
+        return len(self.samples)
+
+    @property
+    def throughput(self):
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    def operations(self):
+        """Per operation: count, outcomes and latency percentiles (ms)."""
+        rows = {}
+        for name in OPERATIONS + ['all']:
+            samples = [s for s in self.samples if name in ('all', s[0])]
+            if not samples:
+                continue
+            latencies = [ms for _, ms, _ in samples]
+            outcomes = Counter(outcome for _, _, outcome in samples)
+            rows[name] = {
+                'count': len(samples),
+                'ok': outcomes.pop('ok', 0),
+                'rejected': outcomes.pop('rejected', 0),
+                'errors': dict(outcomes),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'max_ms': round(max(latencies), 2),
+            }
+        return rows
+
+    @property
+    def consistent(self):
+        return self.ledger is not None and not self.ledger.mismatches
+
+    def as_dict(self):
+        return {
+            'vendor': self.vendor,
+            'mode': self.mode,
+            'workers': self.workers,
+            'seconds': round(self.seconds, 3),
+            'requests': self.requests,
+            'throughput': round(self.throughput, 2),
+            'operations': self.operations(),
+            'statements': self.statements,
+            'write_seconds': round(self.write_seconds, 3),
+            'database_errors': {kind: self.errors.get(kind, 0) for kind in CONCURRENCY_KINDS}
+            | {kind: count for kind, count in self.errors.items() if kind not in CONCURRENCY_KINDS},
+            'lock_wait_seconds': self.lock_wait_seconds,
+            'max_waiting': self.max_waiting,
+            'invariants': {
+                'products': self.ledger.products,
+                'movements': self.ledger.transactions,
+                'stock_mismatches': self.ledger.mismatches,
+                'broken_balances': self.ledger.changed,
+                'clamped': self.ledger.clamped,
+            },
+        }
+
+
+def run(owner, workers=8, operations=400, mix=None, mode='threads', products=5,
+        opening_stock=DEFAULT_OPENING_STOCK, seed=None):
+    """
+    Prepare the data, replay ``operations`` requests drawn from ``mix`` on
+    ``workers`` threads (or processes with ``mode='processes'``) and check
+    the stock invariants. With one worker the requests run on the calling
+    thread, inside its transaction if it has one. Returns a ``LoadReport``.
+    """
+    mix = mix or DEFAULT_MIX
+    # Enough pending purchase orders for every receive that may be drawn
+    receives = round(operations * mix.get('receive', 0) / sum(mix.values())) * 2 + workers
+    setup = prepare(owner, products, opening_stock, receives if mix.get('receive') else 0, seed)
+    tasks = plan(setup, owner, workers, operations, mix, seed)
+    vendor = connections['default'].vendor
+    report = LoadReport(vendor=vendor, mode=mode if workers > 1 else 'inline', workers=workers, run=setup['run'])
+
+    monitor = LockMonitor() if vendor == 'postgresql' and workers > 1 else None
+    if monitor:
+        monitor.start()
+    started = time.perf_counter()
+    if workers == 1:
+        results = [run_worker(tasks[0], close_connections=False)]
+    elif mode == 'processes':
+        # Children must open their own connections, never share the parent's socket
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            results = list(pool.map(run_worker, tasks))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_worker, tasks))
+    report.seconds = time.perf_counter() - started
+    if monitor:
+        monitor.stop()
+        report.lock_wait_seconds = round(monitor.wait_seconds, 3)
+        report.max_waiting = monitor.max_waiting
+
+    for result in results:
+        report.samples.extend(result['samples'])
+        report.statements += result['statements']
+        report.write_seconds += result['write_seconds']
+        report.errors.update(result['errors'])
+
+    product_ids = [pk for pk, _ in setup['products']]
+    report.ledger = stock_ledger.rebuild(product_ids, opening=stock_ledger.OPENING_ZERO, dry_run=True)
+    return report